@@ -4,57 +4,254 @@ bot.py - Ponto de entrada principal do Bot Discord de Ranking de Atividade.
 
 Este módulo configura e inicializa o bot Discord, registrando eventos e comandos
 conforme especificado na seção 4.3 do PRD.
+
+A inicialização é dividida em fases cronometradas (imports, logging,
+criação do bot, ready) e o aquecimento de caches roda só depois do
+on_ready. Use ``python bot.py --import-profile`` para ver o custo de
+import de cada módulo.
 """
 
+import time
+
+# Marco zero do time-to-ready (antes dos imports pesados)
+_PROCESS_START = time.perf_counter()
+
+import asyncio
 import logging
+import signal
 import sys
-from typing import NoReturn
+from pathlib import Path
+from typing import Any, List, NoReturn, Optional
 
 import discord
+from discord import app_commands
 from discord.ext import commands
 
 # Importar configurações dos módulos
-from config import DISCORD_TOKEN, COMMAND_PREFIX, get_intents, setup_logger
+from config import (
+    AUTO_SHARDING,
+    COMMAND_PREFIX,
+    DASHBOARD_HOST,
+    DASHBOARD_PORT,
+    DASHBOARD_REFRESH_SECONDS,
+    DASHBOARD_TOKEN,
+    DISCORD_TOKEN,
+    HEALTH_HOST,
+    HEALTH_PORT,
+    LOOP_DEBUG,
+    LOOP_LAG_INTERVAL,
+    LOOP_STALL_SECONDS,
+    PARTITION_BY_GUILD,
+    PROFILE_DIR,
+    PROFILE_SIGNAL_SECONDS,
+    SHARD_COUNT,
+    SHARD_IDS,
+    SLOW_CALLBACK_SECONDS,
+    configure_logging,
+    get_cache_options,
+    get_intents,
+)
 
 # Importar handlers e comandos
-from events import on_voice_state_update as voice_handler
-from commands import ranking_video
-
-# Configuração de logging
-logger = setup_logger(__name__)
-
-
-def create_bot() -> commands.Bot:
+from database import verify_data_files
+from storage_service import close_storage_client, get_storage_client
+from group_commit import close_group_committer
+from event_trace import close_trace_recorder
+from session_history import run_retention
+from command_sync import sync_command_tree
+from events import flush_pending_closes, install_receive_clock, on_voice_state_update as voice_handler
+from commands import (
+    PERIOD_LABELS,
+    SharedRankingError,
+    adjust_time,
+    export_command,
+    guild_stats_command,
+    heatmap_command,
+    member_cache,
+    merge_users_command,
+    my_position_command,
+    my_position_slash,
+    profile_command,
+    ranking_pages_command,
+    ranking_slash,
+    ranking_admin,
+    ranking_video,
+    reset_ranking,
+    reset_user_command,
+    warm_up_ranking_cache,
+)
+from startup import StartupProfiler, format_import_profile, profile_imports
+from health import LoopMonitor
+
+# Logger do módulo (configurado uma única vez em run_bot)
+logger = logging.getLogger(__name__)
+
+
+def create_bot(profiler: Optional[StartupProfiler] = None) -> commands.Bot:
     """
     Cria e configura a instância do bot Discord.
 
     Configura o bot com:
     - Command prefix do ambiente
     - Intents configurados
+    - AutoShardedBot quando sharding está configurado
     - Event handlers registrados
     - Command handlers registrados
     - Tratamento de erros
 
+    Args:
+        profiler: Cronômetro da inicialização; o marco "ready" é
+            registrado no primeiro on_ready
+
     Returns:
         commands.Bot: Instância do bot configurada
+
+    Raises:
+        ValueError: Se SHARD_IDS for definido sem SHARD_COUNT
     """
-    # Criar bot com intents e prefix do config
-    bot = commands.Bot(
-        command_prefix=COMMAND_PREFIX,
-        intents=get_intents(),
-        help_command=None  # Desabilita comando de help padrão
+    bot_kwargs = {
+        'command_prefix': COMMAND_PREFIX,
+        'intents': get_intents(),
+        'help_command': None,  # Desabilita comando de help padrão
+        **get_cache_options(),
+    }
+
+    if AUTO_SHARDING:
+        # Cluster multi-processo: cada processo recebe um subconjunto de shards
+        if SHARD_IDS is not None and SHARD_COUNT is None:
+            raise ValueError('SHARD_IDS exige SHARD_COUNT definido')
+        if SHARD_IDS is not None and not PARTITION_BY_GUILD:
+            logger.warning(
+                'Cluster com SHARD_IDS sem PARTITION_BY_GUILD: '
+                'todos os processos disputarão o mesmo arquivo de dados'
+            )
+        bot = commands.AutoShardedBot(
+            shard_count=SHARD_COUNT,
+            shard_ids=SHARD_IDS,
+            **bot_kwargs
+        )
+    else:
+        bot = commands.Bot(**bot_kwargs)
+
+    # Sessões usam o instante de recebimento no gateway, não o do handler
+    install_receive_clock(bot)
+
+    # Monitor do event loop (sempre ativo)
+    bot.loop_monitor = LoopMonitor(
+        interval=LOOP_LAG_INTERVAL,
+        slow_threshold=SLOW_CALLBACK_SECONDS,
+        stall_threshold=LOOP_STALL_SECONDS,
+        debug=LOOP_DEBUG
     )
 
+    # Endpoint de saúde (HEALTH_PORT) e API do dashboard (DASHBOARD_PORT):
+    # criados no setup_hook, para que aiohttp e os módulos dos servidores
+    # só sejam importados quando habilitados
+    http_servers: List[Any] = []
+
+    def member_name(guild_id: int, user_id: str) -> Optional[str]:
+        """Nome exibido a partir dos caches locais (sem chamadas à API)"""
+        guild = bot.get_guild(guild_id)
+        member = guild.get_member(int(user_id)) if guild is not None else None
+        if member is None:
+            member = member_cache.get(guild_id, int(user_id))[1]
+        return member.display_name if member is not None else None
+
+    # Tasks disparadas por sinais (referência forte até terminarem)
+    signal_tasks = set()
+
+    def _spawn(coro) -> None:
+        task = asyncio.create_task(coro)
+        signal_tasks.add(task)
+        task.add_done_callback(signal_tasks.discard)
+
+    async def setup_hook() -> None:
+        # Checksum dos dados contra o journal antes do primeiro evento; no
+        # modo multi-processo quem verifica é o storage_service
+        if get_storage_client() is None:
+            restored = await asyncio.to_thread(verify_data_files)
+            if restored:
+                logger.error(f'Dados restaurados do journal: {", ".join(map(str, restored))}')
+        bot.loop_monitor.start()
+        if HEALTH_PORT:
+            from health import HealthServer, build_health_report
+
+            http_servers.append(HealthServer(
+                lambda: build_health_report(bot, bot.loop_monitor),
+                host=HEALTH_HOST,
+                port=HEALTH_PORT
+            ))
+        if DASHBOARD_PORT:
+            # API somente leitura, servida dos snapshots do ranking em memória
+            from dashboard import DashboardServer, DashboardState
+
+            http_servers.append(DashboardServer(
+                DashboardState(DASHBOARD_REFRESH_SECONDS, names=member_name),
+                host=DASHBOARD_HOST,
+                port=DASHBOARD_PORT,
+                token=DASHBOARD_TOKEN,
+                known_guild=lambda guild_id: bot.get_guild(guild_id) is not None
+            ))
+        for server in http_servers:
+            await server.start()
+        # Comandos de barra: só reenviados ao Discord quando mudam
+        try:
+            await sync_command_tree(bot.tree)
+        except discord.HTTPException as e:
+            logger.warning(f'Falha ao sincronizar comandos de barra: {e}')
+        # kill -USR1 <pid>: perfil de PROFILE_SIGNAL_SECONDS sem reiniciar
+        if hasattr(signal, 'SIGUSR1'):
+            asyncio.get_running_loop().add_signal_handler(
+                signal.SIGUSR1,
+                lambda: _spawn(_profile_on_signal())
+            )
+
+    bot.setup_hook = setup_hook
+
+    # Gravar sessões na janela de coalescência e enviar as pendentes ao
+    # storage_service (ou ao lote do group commit) antes de desconectar
+    discord_close = bot.close
+
+    async def close() -> None:
+        flush_pending_closes()
+        await close_group_committer()
+        await close_storage_client()
+        close_trace_recorder()
+        bot.loop_monitor.stop()
+        for server in http_servers:
+            await server.close()
+        await discord_close()
+
+    bot.close = close
+
+    # Tarefas disparadas no primeiro on_ready (reconexões não repetem)
+    background_tasks = set()
+
     @bot.event
     async def on_ready() -> None:
         """
         Evento chamado quando o bot está conectado e pronto.
 
-        Loga informações de conexão e inicializa sistemas.
+        Loga informações de conexão e inicializa sistemas. O aquecimento
+        do cache de ranking é agendado em segundo plano.
         """
         logger.info(f'Bot conectado como {bot.user.name}#{bot.user.discriminator}')
         logger.info(f'ID do bot: {bot.user.id}')
         logger.info(f'Conectado a {len(bot.guilds)} servidores')
+        if bot.shard_count:
+            logger.info(f'Shards: {bot.shard_ids or "todos"} de {bot.shard_count}')
+
+        if profiler is not None and not background_tasks:
+            profiler.mark('ready')
+            logger.info('Inicialização: %s', profiler.report())
+
+        if not background_tasks:
+            task = asyncio.create_task(_warm_up([guild.id for guild in bot.guilds]))
+            background_tasks.add(task)
+            # Retenção só no processo que grava o histórico: com
+            # STORAGE_SOCKET é o storage_service
+            if get_storage_client() is None:
+                background_tasks.add(asyncio.create_task(run_retention()))
 
         # Configurar status do bot
         await bot.change_presence(
@@ -64,6 +261,11 @@ def create_bot() -> commands.Bot:
             )
         )
 
+    @bot.event
+    async def on_shard_ready(shard_id: int) -> None:
+        """Evento chamado quando um shard individual está pronto."""
+        logger.info(f'Shard {shard_id} pronto')
+
     @bot.event
     async def on_voice_state_update(
         member: discord.Member,
@@ -103,6 +305,121 @@ def create_bot() -> commands.Bot:
             logger.error(f'Erro no comando rankingvideo: {e}', exc_info=True)
             await ctx.send('Erro ao processar comando. Tente novamente mais tarde.')
 
+    @bot.command(name='rankingcompleto')
+    @commands.guild_only()
+    async def ranking_pages_cmd(ctx: commands.Context, pagina: int = 1) -> None:
+        """Ranking completo com botões de navegação entre páginas."""
+        await ranking_pages_command(ctx, pagina)
+
+    @bot.command(name='minhaposicao')
+    @commands.guild_only()
+    async def my_position_cmd(ctx: commands.Context) -> None:
+        """Mostra sua posição e a página do ranking onde você está."""
+        await my_position_command(ctx)
+
+    # Comandos de barra (dispensam o intent de conteúdo de mensagem)
+    period_choices = [
+        app_commands.Choice(name=label, value=period) for period, label in PERIOD_LABELS.items()
+    ]
+
+    @bot.tree.command(name='ranking', description='Ranking de tempo com câmera ligada')
+    @app_commands.guild_only()
+    @app_commands.describe(periodo='Período do ranking', pagina='Página inicial (10 usuários por página)')
+    @app_commands.choices(periodo=period_choices)
+    async def ranking_slash_cmd(
+        interaction: discord.Interaction,
+        periodo: str = 'total',
+        pagina: app_commands.Range[int, 1] = 1
+    ) -> None:
+        """Ranking por período com botões de navegação."""
+        await ranking_slash(interaction, periodo, pagina)
+
+    @bot.tree.command(name='minhaposicao', description='Sua posição no ranking')
+    @app_commands.guild_only()
+    @app_commands.describe(periodo='Período do ranking')
+    @app_commands.choices(periodo=period_choices)
+    async def my_position_slash_cmd(interaction: discord.Interaction, periodo: str = 'total') -> None:
+        """Posição do autor e a página do ranking onde ele está."""
+        await my_position_slash(interaction, periodo)
+
+    @bot.tree.error
+    async def on_app_command_error(
+        interaction: discord.Interaction,
+        error: app_commands.AppCommandError
+    ) -> None:
+        """Erro em um comando de barra: loga e avisa o usuário."""
+        logger.error(f'Erro no comando /{interaction.command.name if interaction.command else "?"}: {error}',
+                     exc_info=error)
+        message = 'Ocorreu um erro ao executar o comando.'
+        if interaction.response.is_done():
+            await interaction.followup.send(message, ephemeral=True)
+        else:
+            await interaction.response.send_message(message, ephemeral=True)
+
+    @bot.command(name='statsservidor')
+    @commands.guild_only()
+    async def guild_stats_cmd(ctx: commands.Context) -> None:
+        """Estatísticas agregadas do servidor (totais, média, mediana, histograma)."""
+        await guild_stats_command(ctx)
+
+    @bot.command(name='mapacalor')
+    @commands.guild_only()
+    async def heatmap_cmd(ctx: commands.Context) -> None:
+        """Mapa de calor de câmeras ligadas por hora da semana."""
+        await heatmap_command(ctx)
+
+    # Comandos administrativos (Fase 2 do PRD) - exigem administrador do
+    # servidor; sem PARTITION_BY_GUILD (ranking compartilhado), o dono do bot
+    @bot.command(name='resetranking')
+    @commands.guild_only()
+    @ranking_admin()
+    async def reset_ranking_command(ctx: commands.Context, confirmacao: str = '') -> None:
+        """Zera o ranking inteiro (troca de época em O(1))."""
+        await reset_ranking(ctx, confirmacao)
+
+    @bot.command(name='resetusuario')
+    @commands.guild_only()
+    @ranking_admin()
+    async def reset_user_cmd(ctx: commands.Context, usuario: discord.User) -> None:
+        """Remove os dados de um usuário."""
+        await reset_user_command(ctx, usuario)
+
+    @bot.command(name='ajustartempo')
+    @commands.guild_only()
+    @ranking_admin()
+    async def adjust_time_command(
+        ctx: commands.Context,
+        usuario: discord.User,
+        segundos: int
+    ) -> None:
+        """Soma ou subtrai segundos do tempo de um usuário."""
+        await adjust_time(ctx, usuario, segundos)
+
+    @bot.command(name='mesclarusuarios')
+    @commands.guild_only()
+    @ranking_admin()
+    async def merge_users_cmd(
+        ctx: commands.Context,
+        origem: discord.User,
+        destino: discord.User
+    ) -> None:
+        """Mescla os dados de um usuário em outro."""
+        await merge_users_command(ctx, origem, destino)
+
+    @bot.command(name='exportar')
+    @commands.guild_only()
+    @ranking_admin()
+    async def export_cmd(ctx: commands.Context, formato: str = 'csv', compressao: str = '') -> None:
+        """Exporta o ranking do servidor em CSV ou JSONL (gz opcional)."""
+        await export_command(ctx, formato, compressao)
+
+    # Diagnóstico - apenas o dono do bot
+    @bot.command(name='perfil')
+    @commands.is_owner()
+    async def profile_cmd(ctx: commands.Context, segundos: int = 10) -> None:
+        """Perfila o event loop por alguns segundos (flamegraph + tasks)."""
+        await profile_command(ctx, segundos)
+
     @bot.event
     async def on_command_error(ctx: commands.Context, error: Exception) -> None:
         """
@@ -122,6 +439,14 @@ def create_bot() -> commands.Bot:
             await ctx.send(f'Argumento faltando: {error.param.name}')
             return
 
+        if isinstance(error, SharedRankingError):
+            await ctx.send(f'⚠️ {error}')
+            return
+
+        if isinstance(error, (commands.MissingPermissions, commands.NoPrivateMessage, commands.NotOwner)):
+            await ctx.send('Você não tem permissão para usar este comando.')
+            return
+
         if isinstance(error, commands.BadArgument):
             await ctx.send(f'Argumento inválido fornecido.')
             return
@@ -133,26 +458,66 @@ def create_bot() -> commands.Bot:
     return bot
 
 
+async def _warm_up(guild_ids: List[int]) -> None:
+    """Aquece o cache de ranking após o on_ready, sem bloquear o gateway."""
+    start = time.perf_counter()
+    try:
+        warmed = await warm_up_ranking_cache(guild_ids)
+    except Exception as e:
+        logger.warning(f'Falha ao aquecer cache de ranking: {e}')
+        return
+    logger.info(
+        'Cache de ranking aquecido: %d partição(ões) em %.1fms',
+        warmed, (time.perf_counter() - start) * 1000
+    )
+
+
+async def _profile_on_signal() -> None:
+    """Perfil disparado por SIGUSR1; os arquivos ficam em PROFILE_DIR."""
+    from sampling_profiler import ProfilerBusyError, profile_for
+
+    try:
+        stacks_path, tasks_path, sampler = await profile_for(
+            PROFILE_SIGNAL_SECONDS, Path(PROFILE_DIR)
+        )
+    except ProfilerBusyError:
+        logger.warning('SIGUSR1 ignorado: já existe um perfil em andamento')
+        return
+    logger.info(
+        'Perfil gravado: %s e %s (%d amostras)', stacks_path, tasks_path, sampler.samples
+    )
+
+
 def run_bot() -> NoReturn:
     """
     Inicializa e executa o bot Discord.
 
     Carrega o token do ambiente, cria o bot e inicia a conexão.
     Implementa shutdown graceful e tratamento de erros críticos.
+    Cada fase da inicialização é cronometrada e o resumo é logado no
+    on_ready. O armazenamento só é aberto no primeiro acesso.
 
     Raises:
         SystemExit: Se o token não estiver configurado
     """
+    profiler = StartupProfiler(_PROCESS_START)
+    profiler.mark('imports')
+
+    with profiler.phase('logging'):
+        configure_logging()
+
     if not DISCORD_TOKEN:
         logger.error('DISCORD_TOKEN não encontrado no arquivo .env')
         logger.error('Crie um arquivo .env baseado no .env.example')
         sys.exit(1)
 
-    bot = create_bot()
+    with profiler.phase('create_bot'):
+        bot = create_bot(profiler)
 
     try:
         logger.info('Iniciando bot...')
-        bot.run(DISCORD_TOKEN)
+        # log_handler=None: o logging já foi configurado acima
+        bot.run(DISCORD_TOKEN, log_handler=None)
     except discord.LoginFailure:
         logger.error('Falha na autenticação. Verifique o DISCORD_TOKEN no arquivo .env')
         sys.exit(1)
@@ -167,5 +532,32 @@ def run_bot() -> NoReturn:
         sys.exit(1)
 
 
-if __name__ == '__main__':
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Ponto de entrada da linha de comando.
+
+    Args:
+        argv: Argumentos (default: sys.argv[1:])
+    """
+    import argparse  # só necessário na linha de comando
+
+    parser = argparse.ArgumentParser(description='Bot Discord Bate-Ponto')
+    parser.add_argument(
+        '--import-profile',
+        nargs='?',
+        type=int,
+        const=20,
+        metavar='N',
+        help='Mostra os N módulos mais lentos de importar (estilo -X importtime) e sai'
+    )
+    args = parser.parse_args(argv)
+
+    if args.import_profile is not None:
+        print(format_import_profile(profile_imports('bot'), top=args.import_profile))
+        return
+
     run_bot()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+command_sync.py - Sincronização da árvore de comandos de barra sob demanda.
+
+tree.sync() reenvia todos os comandos ao Discord (uma chamada REST com
+rate limit próprio) e, se feito a cada inicialização, faz os clientes
+recarregarem a lista de comandos. Aqui a árvore local é reduzida a uma
+assinatura (SHA-256 do payload que seria enviado) gravada em
+COMMAND_SYNC_FILE; a sincronização só acontece quando a assinatura ou a
+aplicação mudam. Apagar o arquivo força uma nova sincronização.
+"""
+
+import hashlib
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from discord import app_commands
+
+from config import COMMAND_SYNC_FILE
+from database_lock import atomic_write_json, safe_load_json
+
+logger = logging.getLogger(__name__)
+
+
+def command_tree_payload(tree: app_commands.CommandTree) -> List[Dict[str, Any]]:
+    """
+    Payload dos comandos globais da árvore, em ordem estável.
+
+    Returns:
+        List[Dict[str, Any]]: Um dicionário por comando, como enviado pelo sync
+    """
+    payload = [command.to_dict(tree) for command in tree.get_commands()]
+    return sorted(payload, key=lambda command: (command.get("type", 1), command["name"]))
+
+
+def command_tree_fingerprint(tree: app_commands.CommandTree) -> str:
+    """Assinatura (SHA-256 hex) do payload da árvore"""
+    encoded = json.dumps(command_tree_payload(tree), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+async def sync_command_tree(
+    tree: app_commands.CommandTree,
+    path: Optional[str] = COMMAND_SYNC_FILE
+) -> bool:
+    """
+    Sincroniza os comandos globais apenas se mudaram desde o último sync.
+
+    Args:
+        tree: Árvore de comandos do bot (bot.tree)
+        path: Arquivo com a assinatura do último sync (vazio = sempre sincroniza)
+
+    Returns:
+        bool: True se a árvore foi enviada ao Discord
+
+    Raises:
+        discord.HTTPException: Se o sync falhar (a assinatura não é gravada)
+    """
+    fingerprint = command_tree_fingerprint(tree)
+    application_id = tree.client.application_id
+    if path:
+        saved = safe_load_json(path, {}, strict=False)
+        if saved.get("application_id") == application_id and saved.get("fingerprint") == fingerprint:
+            logger.info("Comandos de barra inalterados, sync ignorado")
+            return False
+
+    synced = await tree.sync()
+    logger.info("Comandos de barra sincronizados: %d", len(synced))
+    if path:
+        atomic_write_json({"application_id": application_id, "fingerprint": fingerprint}, path)
+    return True
+
+
+__all__ = [
+    'command_tree_fingerprint',
+    'command_tree_payload',
+    'sync_command_tree',
+]
@@ -2,56 +2,280 @@
 Comandos do bot Discord de ranking de atividade.
 
 Este modulo implementa os comandos disponiveis para os usuarios,
-incluindo o comando !rankingvideo conforme RF04 e secao 4.4.3 do PRD.
+incluindo o comando !rankingvideo conforme RF04 e secao 4.4.3 do PRD
+e os comandos administrativos de reset/ajuste da Fase 2.
 """
 
 import asyncio
+import time
+from collections import OrderedDict
 import discord
 from discord.ext import commands
-from typing import List, Tuple, Optional, Union
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, NamedTuple, Tuple, Optional, Union
 
-from config import EMBED_COLOR, MAX_RANKING_SIZE
-from database import load_data
-from utils import fetch_user, format_seconds_to_time, truncate_string
+from config import (
+    EMBED_COLOR,
+    MAX_RANKING_SIZE,
+    MEMBER_CACHE_SIZE,
+    MEMBER_CACHE_TTL,
+    PROFILE_DIR,
+    PROFILE_MAX_SECONDS,
+    RANKING_COOLDOWN_MAX_CHANNELS,
+    RANKING_COOLDOWN_SECONDS,
+    RANKING_PAGE_CACHE_SIZE,
+    RANKING_VIEW_TIMEOUT,
+)
+from database import (
+    apply_adjustments,
+    guild_stats_summary,
+    load_data,
+    merge_users,
+    partition_key,
+    reset_all_data,
+    reset_user,
+)
+from export import EXPORT_FORMATS, export_data
+from heatmap import WEEKDAY_LABELS, load_heatmap, render_heatmap
+from ranking import ranking_cache, ranking_page, ranking_version
+from storage_service import get_storage_client
+from utils import MemberCache, fetch_members, fetch_user, format_seconds_to_time, truncate_string
 
+# Palavra exigida para confirmar o reset completo do ranking
+RESET_CONFIRMATION: str = "confirmar"
 
-async def ranking_video(ctx: commands.Context) -> None:
+# Membros do ranking resolvidos pela API (modo enxuto: fora do cache do
+# discord.py, que so guarda quem esta em canal de voz)
+member_cache = MemberCache(MEMBER_CACHE_SIZE, MEMBER_CACHE_TTL)
+
+
+class SingleFlight:
+    """Coalescencia de consultas identicas em andamento
+
+    Chamadas concorrentes com a mesma chave aguardam uma unica execucao
+    (ex: dezenas de !rankingvideo no fim de uma reuniao carregam, ordenam
+    e buscam os membros uma vez so).
+
+    Estrutura interna:
+        _flights: Dict[chave, asyncio.Task] das execucoes em andamento
     """
-    Comando !rankingvideo - Exibe o top 10 usuarios por tempo com camera.
 
-    Conforme RF04 e secao 6.1 do PRD:
-    - Exibe top 10 usuarios por tempo com camera
-    - Formato: Embed Discord com estilizacao
-    - Informacoes: posicao, nome/avatar, tempo total (Xh Ymin), numero de sessoes
-    - Ordenacao: Decrescente por total_seconds
-    - Resposta quando vazio: Mensagem amigavel
+    def __init__(self):
+        self._flights: Dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Executa ``factory`` ou aguarda a execucao ja em andamento da chave.
+
+        Args:
+            key: Identificador da consulta (ex: guild.id)
+            factory: Funcao que cria a coroutine da consulta
+
+        Returns:
+            Any: Resultado compartilhado da execucao
+
+        Raises:
+            Exception: A mesma excecao da execucao compartilhada
+        """
+        task = self._flights.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._flights[key] = task
+            task.add_done_callback(lambda _: self._flights.pop(key, None))
+        # shield: um chamador cancelado nao cancela a execucao dos demais
+        return await asyncio.shield(task)
+
+
+class ChannelCooldown:
+    """Ultima mensagem de ranking por canal, valida por ``seconds`` segundos
+
+    Limitado: entradas expiradas sao varridas a cada registro e no maximo
+    ``max_channels`` canais sao lembrados (os mais antigos saem primeiro).
+
+    Estrutura interna:
+        _messages: OrderedDict {channel_id: (instante monotonico, mensagem)},
+            em ordem de registro (a mais antiga primeiro)
+    """
+
+    def __init__(
+        self,
+        seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+        max_channels: int = RANKING_COOLDOWN_MAX_CHANNELS
+    ):
+        self.seconds = seconds
+        self.max_channels = max(1, max_channels)
+        self._clock = clock
+        self._messages: "OrderedDict[Hashable, Tuple[float, discord.Message]]" = OrderedDict()
+
+    def recent(self, channel_id: Hashable) -> Optional[Tuple[discord.Message, float]]:
+        """
+        Retorna a mensagem publicada no canal dentro do cooldown.
+
+        Args:
+            channel_id: ID do canal
+
+        Returns:
+            Tupla (mensagem, idade em segundos) ou None se nao houver
+        """
+        if self.seconds <= 0:
+            return None
+        entry = self._messages.get(channel_id)
+        if entry is None:
+            return None
+        age = self._clock() - entry[0]
+        if age >= self.seconds:
+            del self._messages[channel_id]
+            return None
+        return entry[1], age
+
+    def record(self, channel_id: Hashable, message: discord.Message) -> None:
+        """Registra a mensagem de ranking recem-publicada no canal"""
+        if self.seconds <= 0:
+            return
+        now = self._clock()
+        self._messages[channel_id] = (now, message)
+        self._messages.move_to_end(channel_id)
+        # Varre as expiradas (no inicio, por ordem de registro) e limita o tamanho
+        while self._messages:
+            recorded_at, _ = next(iter(self._messages.values()))
+            if now - recorded_at < self.seconds and len(self._messages) <= self.max_channels:
+                break
+            self._messages.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def clear(self) -> None:
+        """Esquece todas as mensagens (ex: apos uma alteracao administrativa)"""
+        self._messages.clear()
+
+
+# Uma montagem de ranking por guild em andamento e cooldown por canal
+ranking_flights = SingleFlight()
+ranking_cooldown = ChannelCooldown(RANKING_COOLDOWN_SECONDS)
+
+# Nomes dos periodos do ranking (chaves de ranking.RANKING_PERIODS)
+PERIOD_LABELS: Dict[str, str] = {
+    "total": "Total",
+    "semana": "Últimos 7 dias",
+    "mes": "Últimos 30 dias",
+}
+
+# Resposta do ranking sem dados (RF04 - caso vazio)
+EMPTY_RANKING_MESSAGE: str = (
+    "🎥 **Ranking - Tempo com Câmera Ligada**\n\n"
+    "Ainda não há dados de sessões registradas.\n"
+    "Seja o primeiro a ligar a câmera! 📹"
+)
+
+
+class RenderedPage(NamedTuple):
+    """Pagina do ranking pronta para envio (embed None = ranking vazio)"""
+    embed: Optional[discord.Embed]
+    page: int
+    pages: int
+
+
+class RankingPageCache:
+    """Paginas renderizadas do ranking por versao dos dados
+
+    Cliques repetidos nos botoes de navegacao e /ranking reaproveitam a
+    pagina ja montada (consulta, nomes dos membros e embed) enquanto a
+    versao do ranking (ranking.ranking_version) nao mudar. Limitado a
+    ``max_size`` paginas (LRU).
+
+    Estrutura interna:
+        _pages: OrderedDict {(guild_id, periodo, pagina): (versao, RenderedPage)}
+    """
+
+    def __init__(self, max_size: int = RANKING_PAGE_CACHE_SIZE):
+        self.max_size = max_size
+        self._pages: "OrderedDict[Tuple[Hashable, str, int], Tuple[Hashable, RenderedPage]]" = OrderedDict()
+
+    def get(self, guild_id: Hashable, period: str, page: int, version: Hashable) -> Optional[RenderedPage]:
+        """Retorna a pagina se ela foi montada na versao informada"""
+        key = (guild_id, period, page)
+        entry = self._pages.get(key)
+        if entry is None or entry[0] != version:
+            return None
+        self._pages.move_to_end(key)
+        return entry[1]
+
+    def put(self, guild_id: Hashable, period: str, page: int, version: Hashable, rendered: RenderedPage) -> None:
+        key = (guild_id, period, page)
+        self._pages[key] = (version, rendered)
+        self._pages.move_to_end(key)
+        while len(self._pages) > self.max_size:
+            self._pages.popitem(last=False)
+
+    def clear(self) -> None:
+        self._pages.clear()
+
+
+ranking_pages = RankingPageCache()
+
+
+def _forget_published_rankings() -> None:
+    """Esquece rankings publicados e paginas montadas
+
+    Chamada apos toda alteracao administrativa (reset, ajuste, remocao,
+    mescla): links e paginas anteriores mostrariam totais que nao valem mais.
+    """
+    ranking_cooldown.clear()
+    ranking_pages.clear()
+
+
+async def _storage_call(func: Callable[..., Any], *args: Any) -> Any:
+    """
+    Executa uma operacao de armazenamento sem bloquear o event loop.
+
+    Com STORAGE_SOCKET definido a operacao e encaminhada ao storage_service
+    (mesmo nome de funcao); caso contrario roda em uma thread local.
 
     Args:
-        ctx: Contexto do comando Discord
+        func: Funcao de database.py a executar
+        *args: Argumentos posicionais da funcao
 
-    Example:
-        >>> !rankingvideo
-        # Exibe embed com o ranking
+    Returns:
+        Any: Resultado da operacao
     """
-    # Carregar dados do JSON
-    data = load_data()
+    client = get_storage_client()
+    if client is not None:
+        return await client.call(func.__name__, *args)
+    return await asyncio.to_thread(func, *args)
 
-    # Verificar se ha dados (RF04 - caso vazio)
-    if not data:
-        empty_message = (
-            "🎥 **Ranking - Tempo com Câmera Ligada**\n\n"
-            "Ainda não há dados de sessões registradas.\n"
-            "Seja o primeiro a ligar a câmera! 📹"
+
+async def _build_ranking(guild: discord.Guild) -> Tuple[Optional[str], Optional[discord.Embed]]:
+    """
+    Monta a resposta do !rankingvideo de um guild.
+
+    Args:
+        guild: Guild do comando
+
+    Returns:
+        Tupla (mensagem de ranking vazio, embed); apenas um dos dois e
+        diferente de None
+    """
+    client = get_storage_client()
+    if client is not None:
+        # Modo multi-processo: ordenacao feita no processo do storage_service
+        result = await client.call("ranking", guild.id, MAX_RANKING_SIZE)
+        total_users, sorted_users = result["total_users"], result["top"]
+    else:
+        # Ranking ordenado vem do cache enquanto nao houver escrita
+        data, ranked = ranking_cache.get(
+            lambda: load_data(guild.id),
+            key=partition_key(guild.id)
         )
-        await ctx.send(empty_message)
-        return
+        total_users, sorted_users = len(data), ranked[:MAX_RANKING_SIZE]
 
-    # Ordenar por total_seconds decrescente e pegar top 10
-    sorted_users: List[Tuple[str, int]] = sorted(
-        data.items(),
-        key=lambda item: item[1]["total_seconds"],
-        reverse=True
-    )[:MAX_RANKING_SIZE]
+    # Verificar se ha dados (RF04 - caso vazio)
+    if not total_users:
+        return EMPTY_RANKING_MESSAGE, None
 
     # Criar embed com cor #5865F2 (Azul Discord)
     embed = discord.Embed(
@@ -60,12 +284,10 @@ async def ranking_video(ctx: commands.Context) -> None:
     )
 
     # Adicionar campos para cada usuario no ranking
-    guild = ctx.guild
-
     # Buscar todos os membros em paralelo usando asyncio.gather
     # Isso melhora performance de ~2-5s para ~200-500ms (conforme Task 2)
     member_tasks = [
-        fetch_user(guild, user_id)
+        fetch_user(guild, user_id, member_cache)
         for user_id, _ in sorted_users[:MAX_RANKING_SIZE]
     ]
     members = await asyncio.gather(*member_tasks, return_exceptions=True)
@@ -102,23 +324,645 @@ async def ranking_video(ctx: commands.Context) -> None:
 
     # Adicionar rodape com informacoes do servidor
     embed.set_footer(
-        text=f"Servidor: {guild.name} | Total de {len(data)} usuários registrados"
+        text=f"Servidor: {guild.name} | Total de {total_users} usuários registrados"
     )
 
     # Adicionar thumbnail com icone do servidor se disponivel
     if guild.icon:
         embed.set_thumbnail(url=guild.icon.url)
 
+    return None, embed
+
+
+async def ranking_video(ctx: commands.Context) -> None:
+    """
+    Comando !rankingvideo - Exibe o top 10 usuarios por tempo com camera.
+
+    Conforme RF04 e secao 6.1 do PRD:
+    - Exibe top 10 usuarios por tempo com camera
+    - Formato: Embed Discord com estilizacao
+    - Informacoes: posicao, nome/avatar, tempo total (Xh Ymin), numero de sessoes
+    - Ordenacao: Decrescente por total_seconds
+    - Resposta quando vazio: Mensagem amigavel
+
+    Invocacoes simultaneas no mesmo guild compartilham uma unica montagem
+    (ranking_flights). Com RANKING_COOLDOWN_SECONDS, um novo pedido no
+    mesmo canal dentro do cooldown recebe o link do ultimo ranking
+    publicado em vez de um novo embed.
+
+    Args:
+        ctx: Contexto do comando Discord
+
+    Example:
+        >>> !rankingvideo
+        # Exibe embed com o ranking
+    """
+    guild = ctx.guild
+    channel_id = getattr(ctx.channel, "id", None)
+
+    recent = ranking_cooldown.recent(channel_id)
+    if recent is not None:
+        message, age = recent
+        await ctx.send(f"📌 Ranking publicado há {int(age)}s: {message.jump_url}")
+        return
+
+    empty_message, embed = await ranking_flights.run(guild.id, lambda: _build_ranking(guild))
+    if embed is None:
+        await ctx.send(empty_message)
+        return
+
     # Enviar embed
+    message = await ctx.send(embed=embed)
+    ranking_cooldown.record(channel_id, message)
+
+
+def _cached_page(guild_id: int, page: int, period: str = "total") -> Optional[RenderedPage]:
+    """Pagina em cache sem consulta (so no modo de processo unico, em que
+    a versao dos dados e do historico e conhecida localmente; com o
+    storage_service quem grava e o outro processo)"""
+    if get_storage_client() is not None:
+        return None
+    return ranking_pages.get(guild_id, period, page, ranking_version(period))
+
+
+async def render_ranking_page(
+    guild: discord.Guild,
+    page: int = 0,
+    user_id: Optional[str] = None,
+    period: str = "total"
+) -> Tuple[RenderedPage, Optional[int]]:
+    """
+    Monta uma pagina do ranking paginado.
+
+    A pagina e uma fatia do indice ordenado (ranking.ranking_page, por
+    offset ou pela posicao do usuario); os nomes da pagina sao resolvidos
+    em lote (fetch_members) e o resultado fica em ranking_pages.
+
+    Args:
+        guild: Guild do ranking
+        page: Pagina (0 = primeira); ajustada para a ultima se passar dela
+        user_id: Se informado, monta a pagina que contem o usuario
+        period: Chave de ranking.RANKING_PERIODS
+
+    Returns:
+        Tupla (pagina renderizada, posicao do usuario ou None)
+    """
+    size = MAX_RANKING_SIZE
+    if user_id is None:
+        cached = _cached_page(guild.id, page, period)
+        if cached is not None:
+            return cached, None
+
+    # Rankings por periodo somam o historico de sessoes: com o
+    # storage_service e ele quem grava o historico e conhece a versao
+    result = await _storage_call(ranking_page, guild.id, page * size, size, user_id, period)
+    total_users = result["total_users"]
+    page = result["offset"] // size
+    pages = max(1, -(-total_users // size))
+
+    cached = ranking_pages.get(guild.id, period, page, result["version"])
+    if cached is not None:
+        return cached, result["position"]
+
+    if not total_users:
+        rendered = RenderedPage(None, 0, 1)
+    else:
+        entries = result["entries"]
+        members = await fetch_members(guild, [entry_user for entry_user, _ in entries], member_cache)
+
+        title = "🎥 Ranking - Tempo com Câmera Ligada"
+        if period != "total":
+            title += f" ({PERIOD_LABELS[period]})"
+        embed = discord.Embed(title=title, color=EMBED_COLOR)
+        for index, (entry_user, user_data) in enumerate(entries, start=result["offset"] + 1):
+            member = members.get(entry_user)
+            # Usuarios que sairam do servidor nao aparecem (RNF06), mas as
+            # posicoes continuam absolutas
+            if member is None:
+                continue
+            embed.add_field(
+                name=truncate_string(f"#{index} {member.display_name}", 50),
+                value=(
+                    f"⏱️ {format_seconds_to_time(user_data['total_seconds'])}\n"
+                    f"📹 {user_data['sessions']} sessão(ões)"
+                ),
+                inline=False
+            )
+        embed.set_footer(
+            text=f"Página {page + 1}/{pages} | Total de {total_users} usuários registrados"
+        )
+        rendered = RenderedPage(embed, page, pages)
+
+    ranking_pages.put(guild.id, period, page, result["version"], rendered)
+    return rendered, result["position"]
+
+
+class RankingView(discord.ui.View):
+    """Botoes de navegacao do ranking paginado
+
+    Cada clique troca o embed da propria mensagem. Paginas em cache
+    respondem na hora; as demais usam defer() antes de montar a pagina,
+    para nao estourar o prazo de 3s da interacao.
+
+    Ao expirar, os botoes sao removidos pela mensagem (``message``) ou,
+    se ela foi a resposta de um comando de barra, pela interacao
+    (``interaction``).
+    """
+
+    def __init__(
+        self,
+        guild: discord.Guild,
+        page: int,
+        pages: int,
+        timeout: float = RANKING_VIEW_TIMEOUT,
+        period: str = "total"
+    ):
+        super().__init__(timeout=timeout)
+        self.guild = guild
+        self.page = page
+        self.pages = pages
+        self.period = period
+        self.message: Optional[Union[discord.Message, discord.WebhookMessage]] = None
+        self.interaction: Optional[discord.Interaction] = None
+        self._update_buttons()
+
+    def _update_buttons(self) -> None:
+        self.previous_page.disabled = self.page <= 0
+        self.next_page.disabled = self.page >= self.pages - 1
+
+    async def _show(self, interaction: discord.Interaction, page: int) -> None:
+        cached = _cached_page(self.guild.id, page, self.period)
+        if cached is not None:
+            self.page, self.pages = cached.page, cached.pages
+            self._update_buttons()
+            await interaction.response.edit_message(embed=cached.embed, view=self)
+            return
+
+        await interaction.response.defer()
+        rendered, _ = await render_ranking_page(self.guild, page, period=self.period)
+        self.page, self.pages = rendered.page, rendered.pages
+        self._update_buttons()
+        if rendered.embed is None:
+            await interaction.edit_original_response(content=EMPTY_RANKING_MESSAGE, embed=None, view=None)
+        else:
+            await interaction.edit_original_response(embed=rendered.embed, view=self)
+
+    @discord.ui.button(label="◀", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
+        await self._show(interaction, self.page - 1)
+
+    @discord.ui.button(label="▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
+        await self._show(interaction, self.page + 1)
+
+    async def on_timeout(self) -> None:
+        """Remove os botoes quando a navegacao expira"""
+        try:
+            if self.message is not None:
+                await self.message.edit(view=None)
+            elif self.interaction is not None:
+                await self.interaction.edit_original_response(view=None)
+        except discord.HTTPException:
+            pass
+
+
+async def _send_ranking_page(
+    ctx: commands.Context,
+    rendered: RenderedPage,
+    content: Optional[str] = None
+) -> None:
+    """Envia uma pagina do ranking com os botoes de navegacao"""
+    if rendered.embed is None:
+        await ctx.send(EMPTY_RANKING_MESSAGE)
+        return
+    if rendered.pages <= 1:
+        await ctx.send(content, embed=rendered.embed)
+        return
+    view = RankingView(ctx.guild, rendered.page, rendered.pages)
+    view.message = await ctx.send(content, embed=rendered.embed, view=view)
+
+
+async def ranking_pages_command(ctx: commands.Context, page: int = 1) -> None:
+    """
+    Comando !rankingcompleto [pagina] - Ranking completo, pagina a pagina.
+
+    Args:
+        ctx: Contexto do comando Discord
+        page: Pagina inicial (1 = top 10)
+    """
+    rendered, _ = await render_ranking_page(ctx.guild, max(page, 1) - 1)
+    await _send_ranking_page(ctx, rendered)
+
+
+async def my_position_command(ctx: commands.Context) -> None:
+    """
+    Comando !minhaposicao - Posicao do autor e a pagina do ranking onde ele esta.
+
+    A posicao vem de uma busca binaria no indice ordenado (O(log n)).
+
+    Args:
+        ctx: Contexto do comando Discord
+    """
+    rendered, position = await render_ranking_page(ctx.guild, user_id=str(ctx.author.id))
+    if position is None:
+        await ctx.send("Você ainda não tem tempo de câmera registrado neste servidor.")
+        return
+    await _send_ranking_page(ctx, rendered, f"📍 {ctx.author.display_name}, você está em #{position + 1}.")
+
+
+# ============================================================================
+# COMANDOS DE BARRA (app_commands)
+# ============================================================================
+
+async def _respond_ranking_page(
+    interaction: discord.Interaction,
+    rendered: RenderedPage,
+    period: str = "total",
+    content: Optional[str] = None,
+    ephemeral: bool = False
+) -> None:
+    """
+    Responde uma interacao com uma pagina do ranking.
+
+    Se a interacao ainda nao foi respondida a pagina vai na propria
+    resposta; depois de um defer() ela vai como followup.
+    """
+    kwargs: Dict[str, Any] = {"ephemeral": ephemeral}
+    view = None
+    if rendered.embed is None:
+        content = EMPTY_RANKING_MESSAGE
+    else:
+        kwargs["embed"] = rendered.embed
+        if rendered.pages > 1:
+            view = RankingView(interaction.guild, rendered.page, rendered.pages, period=period)
+            kwargs["view"] = view
+
+    if interaction.response.is_done():
+        message = await interaction.followup.send(content, wait=True, **kwargs)
+        if view is not None:
+            view.message = message
+    else:
+        await interaction.response.send_message(content, **kwargs)
+        if view is not None:
+            view.interaction = interaction
+
+
+async def ranking_slash(interaction: discord.Interaction, period: str = "total", page: int = 1) -> None:
+    """
+    Comando /ranking [periodo] [pagina] - Ranking por periodo, pagina a pagina.
+
+    Com a pagina ja renderizada na versao atual do ranking (ranking_pages)
+    a resposta sai na hora, sem consulta nem rede alem da propria
+    resposta. Caso contrario a interacao e reconhecida com defer() antes
+    da consulta e dos nomes, e a pagina vai como followup: o prazo de 3s
+    da interacao nunca depende do armazenamento ou da API.
+
+    Args:
+        interaction: Interacao do comando
+        period: Chave de ranking.RANKING_PERIODS
+        page: Pagina inicial (1 = top 10)
+    """
+    page = max(page, 1) - 1
+    cached = _cached_page(interaction.guild.id, page, period)
+    if cached is not None:
+        await _respond_ranking_page(interaction, cached, period)
+        return
+
+    await interaction.response.defer(thinking=True)
+    rendered, _ = await render_ranking_page(interaction.guild, page, period=period)
+    await _respond_ranking_page(interaction, rendered, period)
+
+
+async def my_position_slash(interaction: discord.Interaction, period: str = "total") -> None:
+    """
+    Comando /minhaposicao [periodo] - Posicao do autor (resposta efemera).
+
+    A posicao depende do usuario e nao fica em cache: a interacao e sempre
+    reconhecida com defer() antes da consulta.
+
+    Args:
+        interaction: Interacao do comando
+        period: Chave de ranking.RANKING_PERIODS
+    """
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    rendered, position = await render_ranking_page(
+        interaction.guild, user_id=str(interaction.user.id), period=period
+    )
+    if position is None:
+        await interaction.followup.send(
+            "Você ainda não tem tempo de câmera registrado neste período.", ephemeral=True
+        )
+        return
+    await _respond_ranking_page(
+        interaction, rendered, period, f"📍 Você está em #{position + 1}.", ephemeral=True
+    )
+
+
+async def guild_stats_command(ctx: commands.Context) -> None:
+    """
+    Comando !statsservidor - Estatisticas agregadas do servidor.
+
+    Le as estatisticas mantidas incrementalmente a cada escrita
+    (guild_stats.py): o custo independe do numero de usuarios.
+
+    Args:
+        ctx: Contexto do comando Discord
+    """
+    stats = await _storage_call(guild_stats_summary, ctx.guild.id)
+    if not stats["sessions"]:
+        await ctx.send("Ainda não há sessões registradas neste servidor.")
+        return
+
+    def fmt(seconds: Optional[float]) -> str:
+        return format_seconds_to_time(int(seconds)) if seconds is not None else "-"
+
+    embed = discord.Embed(title="📊 Estatísticas do Servidor", color=EMBED_COLOR)
+    embed.add_field(name="Usuários", value=str(stats["users"]), inline=True)
+    embed.add_field(name="Sessões", value=str(stats["sessions"]), inline=True)
+    embed.add_field(name="Tempo total", value=fmt(stats["total_seconds"]), inline=True)
+    embed.add_field(name="Média por sessão", value=fmt(stats["mean_session"]), inline=True)
+    embed.add_field(name="Mediana", value=fmt(stats["median_session"]), inline=True)
+    embed.add_field(name="90% das sessões até", value=fmt(stats["p90_session"]), inline=True)
+
+    # Histograma em barras de texto, proporcionais a maior faixa
+    largest = max(count for _, count in stats["histogram"]) or 1
+    bars = "\n".join(
+        f"`{label:>9}` {'█' * round(10 * count / largest):<10} {count}"
+        for label, count in stats["histogram"]
+    )
+    embed.add_field(name="Duração das sessões", value=bars, inline=False)
+    embed.set_footer(text=f"Servidor: {ctx.guild.name}")
     await ctx.send(embed=embed)
 
 
+async def heatmap_command(ctx: commands.Context) -> None:
+    """
+    Comando !mapacalor - Horarios da semana com mais camera ligada.
+
+    Renderiza os 168 contadores por hora da semana do servidor, mantidos
+    a cada sessao encerrada (heatmap.py), sem ler o historico de sessoes.
+
+    Args:
+        ctx: Contexto do comando Discord
+    """
+    counters = await asyncio.to_thread(load_heatmap, ctx.guild.id)
+    if not any(counters):
+        await ctx.send("Ainda não há sessões registradas neste servidor.")
+        return
+
+    peak = max(range(len(counters)), key=counters.__getitem__)
+    day, hour = divmod(peak, 24)
+    await ctx.send(
+        f"🗓️ **Câmeras ligadas por hora da semana**\n```\n{render_heatmap(counters)}\n```"
+        f"Pico: {WEEKDAY_LABELS[day]} {hour:02d}h ({format_seconds_to_time(counters[peak])} acumulados)"
+    )
+
+
+async def warm_up_ranking_cache(guild_ids: Iterable[int]) -> int:
+    """
+    Pre-carrega o ranking de cada particao apos o on_ready.
+
+    Roda em segundo plano para que o primeiro !rankingvideo nao pague a
+    leitura e ordenacao do arquivo, sem atrasar o time-to-ready do bot.
+
+    Args:
+        guild_ids: IDs dos guilds conectados
+
+    Returns:
+        int: Numero de particoes aquecidas
+    """
+    client = get_storage_client()
+    warmed = set()
+    for guild_id in guild_ids:
+        key = partition_key(guild_id)
+        if key in warmed:
+            continue
+        warmed.add(key)
+
+        if client is not None:
+            await client.call("ranking", guild_id, MAX_RANKING_SIZE)
+        else:
+            await asyncio.to_thread(
+                ranking_cache.get,
+                lambda guild_id=guild_id: load_data(guild_id),
+                key
+            )
+    return len(warmed)
+
+
+# ============================================================================
+# COMANDOS ADMINISTRATIVOS (Fase 2 do PRD)
+# ============================================================================
+
+class SharedRankingError(commands.CheckFailure):
+    """Comando administrativo recusado: o ranking e compartilhado entre servidores"""
+
+
+def ranking_admin() -> Callable[[Any], Any]:
+    """
+    Check dos comandos administrativos do ranking (reset, ajuste, mescla,
+    exportacao).
+
+    Com PARTITION_BY_GUILD cada servidor tem o proprio arquivo e basta ser
+    administrador dele. Sem particionamento todos os servidores
+    compartilham o arquivo global: o comando alteraria (ou exportaria) o
+    ranking de todos, entao so o dono do bot pode executa-lo.
+
+    Raises:
+        NoPrivateMessage: Fora de um servidor
+        MissingPermissions: Servidor particionado, autor sem administrador
+        SharedRankingError: Ranking compartilhado, autor nao e o dono do bot
+    """
+    async def predicate(ctx: commands.Context) -> bool:
+        if ctx.guild is None:
+            raise commands.NoPrivateMessage()
+        if partition_key(ctx.guild.id) is not None:
+            if not ctx.permissions.administrator:
+                raise commands.MissingPermissions(["administrator"])
+            return True
+        if await ctx.bot.is_owner(ctx.author):
+            return True
+        raise SharedRankingError(
+            "Sem PARTITION_BY_GUILD o ranking é compartilhado entre servidores; "
+            "apenas o dono do bot pode alterá-lo ou exportá-lo."
+        )
+
+    return commands.check(predicate)
+
+
+async def reset_ranking(ctx: commands.Context, confirmation: str = "") -> None:
+    """
+    Comando !resetranking confirmar - Zera o ranking inteiro.
+
+    O reset e uma troca de epoca em O(1): o arquivo atual e arquivado e um
+    arquivo vazio passa a ser usado, sem reescrever registro por registro.
+
+    Args:
+        ctx: Contexto do comando Discord
+        confirmation: Deve ser "confirmar" para evitar resets acidentais
+    """
+    if confirmation.lower() != RESET_CONFIRMATION:
+        await ctx.send(
+            f"⚠️ Isso apagará o ranking de todos os usuários. "
+            f"Use `{ctx.prefix}resetranking {RESET_CONFIRMATION}` para continuar."
+        )
+        return
+
+    archive_path = await _storage_call(reset_all_data, ctx.guild.id)
+    _forget_published_rankings()
+    await ctx.send(f"🗑️ Ranking zerado. Dados anteriores arquivados em `{Path(archive_path).name}`.")
+
+
+async def export_command(ctx: commands.Context, fmt: str = "csv", compression: str = "") -> None:
+    """
+    Comando !exportar [csv|jsonl] [gz] - Exporta o ranking do servidor.
+
+    A exportacao le o snapshot em blocos em uma thread (ou no processo do
+    storage_service) e envia o arquivo se couber no limite de upload.
+
+    Args:
+        ctx: Contexto do comando Discord
+        fmt: "csv" ou "jsonl"
+        compression: "gz" para comprimir com gzip
+    """
+    fmt = fmt.lower()
+    if fmt not in EXPORT_FORMATS:
+        await ctx.send(f"Formato inválido. Use: {', '.join(EXPORT_FORMATS)}.")
+        return
+
+    path = Path(await _storage_call(export_data, ctx.guild.id, fmt, compression.lower() == "gz"))
+    size = path.stat().st_size if path.exists() else None
+    if size is not None and size <= ctx.guild.filesize_limit:
+        await ctx.send("📦 Exportação concluída.", file=discord.File(str(path)))
+    else:
+        await ctx.send(f"📦 Exportação concluída em `{path}` (grande demais para anexar).")
+
+
+async def reset_user_command(ctx: commands.Context, user: discord.User) -> None:
+    """
+    Comando !resetusuario @usuario - Remove os dados de um usuario.
+
+    Args:
+        ctx: Contexto do comando Discord
+        user: Usuario cujos dados serao removidos
+    """
+    removed = await _storage_call(reset_user, str(user.id), ctx.guild.id)
+    _forget_published_rankings()
+    if removed is None:
+        await ctx.send(f"{user.display_name} não possui dados registrados.")
+        return
+
+    await ctx.send(
+        f"🗑️ Dados de {user.display_name} removidos "
+        f"({format_seconds_to_time(removed['total_seconds'])}, "
+        f"{removed['sessions']} sessão(ões))."
+    )
+
+
+async def adjust_time(ctx: commands.Context, user: discord.User, seconds: int) -> None:
+    """
+    Comando !ajustartempo @usuario <segundos> - Soma (ou subtrai) tempo.
+
+    Args:
+        ctx: Contexto do comando Discord
+        user: Usuario a ajustar
+        seconds: Segundos a somar; valores negativos subtraem
+    """
+    result = await _storage_call(apply_adjustments, {str(user.id): seconds}, ctx.guild.id)
+    _forget_published_rankings()
+    entry = result[str(user.id)]
+    await ctx.send(
+        f"⏱️ Tempo de {user.display_name} ajustado em {seconds:+d}s. "
+        f"Total atual: {format_seconds_to_time(entry['total_seconds'])}."
+    )
+
+
+async def merge_users_command(
+    ctx: commands.Context,
+    source: discord.User,
+    target: discord.User
+) -> None:
+    """
+    Comando !mesclarusuarios <origem> <destino> - Mescla dois usuarios.
+
+    Tempo e sessoes da origem sao somados ao destino e a origem e removida.
+
+    Args:
+        ctx: Contexto do comando Discord
+        source: Usuario de origem (sera removido)
+        target: Usuario de destino
+    """
+    if source.id == target.id:
+        await ctx.send("Origem e destino devem ser usuários diferentes.")
+        return
+
+    merged = await _storage_call(merge_users, str(source.id), str(target.id), ctx.guild.id)
+    _forget_published_rankings()
+    if merged is None:
+        await ctx.send(f"{source.display_name} não possui dados registrados.")
+        return
+
+    await ctx.send(
+        f"🔀 Dados de {source.display_name} mesclados em {target.display_name}. "
+        f"Total atual: {format_seconds_to_time(merged['total_seconds'])}, "
+        f"{merged['sessions']} sessão(ões)."
+    )
+
+
 # Configurar comandos para o bot
 def setup_commands(bot: commands.Bot) -> None:
     """
     Registra os comandos do bot.
 
+    Comandos administrativos exigem permissao de administrador no servidor;
+    os que alteram o ranking compartilhado (sem PARTITION_BY_GUILD), o dono
+    do bot (ver ranking_admin).
+
     Args:
         bot: Instancia do bot Discord
     """
     bot.command(name="rankingvideo")(ranking_video)
+    bot.command(name="rankingcompleto")(commands.guild_only()(ranking_pages_command))
+    bot.command(name="minhaposicao")(commands.guild_only()(my_position_command))
+    bot.command(name="statsservidor")(commands.guild_only()(guild_stats_command))
+    bot.command(name="mapacalor")(commands.guild_only()(heatmap_command))
+
+    admin_only = ranking_admin()
+    bot.command(name="resetranking")(admin_only(reset_ranking))
+    bot.command(name="resetusuario")(admin_only(reset_user_command))
+    bot.command(name="ajustartempo")(admin_only(adjust_time))
+    bot.command(name="mesclarusuarios")(admin_only(merge_users_command))
+
+
+# ============================================================================
+# DIAGNOSTICO (dono do bot)
+# ============================================================================
+
+async def profile_command(ctx: commands.Context, seconds: int = 10) -> None:
+    """
+    Comando !perfil [segundos] - Perfila o bot em producao.
+
+    Amostra a pilha do event loop por alguns segundos e envia o arquivo
+    collapsed (flamegraph) e o snapshot das tasks asyncio pendentes.
+
+    Args:
+        ctx: Contexto do comando Discord
+        seconds: Duracao da amostragem (1 a PROFILE_MAX_SECONDS)
+    """
+    from sampling_profiler import ProfilerBusyError, profile_for
+
+    seconds = max(1, min(seconds, PROFILE_MAX_SECONDS))
+    await ctx.send(f"🔬 Perfilando por {seconds}s...")
+    try:
+        stacks_path, tasks_path, sampler = await profile_for(seconds, Path(PROFILE_DIR))
+    except ProfilerBusyError:
+        await ctx.send("⚠️ Já existe um perfil em andamento.")
+        return
+
+    top = "\n".join(
+        f"`{count:>5}` {truncate_string(frame, 80)}" for frame, count in sampler.top_frames()
+    )
+    await ctx.send(
+        f"🔬 {sampler.samples} amostras. Frames mais quentes:\n{top or '(nenhum)'}",
+        files=[discord.File(str(stacks_path)), discord.File(str(tasks_path))]
+    )
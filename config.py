@@ -5,16 +5,20 @@ Este módulo centraliza todas as configurações do bot, incluindo:
 - Carregamento de variáveis de ambiente via .env
 - Constantes do projeto (prefixo, caminhos, cores)
 - Configuração de Intents do Discord
+- Configuração de sharding e particionamento de dados
 - Configuração de logger estruturado
 """
 from os import getenv
-from logging import INFO, basicConfig, getLogger, Logger
-from typing import Optional
+from logging import INFO, getLevelName, getLogger, Logger
+from typing import Any, Dict, List, Optional
 
 import discord
 from dotenv import load_dotenv
 
+import utils
+
 # Carregar variáveis de ambiente do arquivo .env
+# (único efeito colateral no import: as constantes abaixo dependem dele)
 load_dotenv()
 
 # ============================================================================
@@ -31,15 +35,222 @@ DATA_FILE: str = "video_ranking.json"
 EMBED_COLOR: int = 0x5865F2  # Azul Discord (#5865F2)
 MAX_RANKING_SIZE: int = 10
 
+# Cooldown por canal do !rankingvideo: dentro dele o bot responde com o
+# link do último ranking publicado no canal (0 = desativado), lembrando no
+# máximo RANKING_COOLDOWN_MAX_CHANNELS canais
+RANKING_COOLDOWN_SECONDS: float = float(getenv("RANKING_COOLDOWN_SECONDS", "0"))
+RANKING_COOLDOWN_MAX_CHANNELS: int = int(getenv("RANKING_COOLDOWN_MAX_CHANNELS", "1024"))
+
+# Ranking paginado (!rankingcompleto / !minhaposicao): tempo (s) em que os
+# botoes de navegacao respondem e paginas renderizadas mantidas em cache
+RANKING_VIEW_TIMEOUT: float = float(getenv("RANKING_VIEW_TIMEOUT", "300"))
+RANKING_PAGE_CACHE_SIZE: int = int(getenv("RANKING_PAGE_CACHE_SIZE", "256"))
+
+# Comandos de barra (/ranking, /minhaposicao): a árvore só é reenviada ao
+# Discord quando a assinatura gravada neste arquivo muda (vazio = sempre)
+COMMAND_SYNC_FILE: str = getenv("COMMAND_SYNC_FILE", "command_tree.json")
+
 # Formato de tempo para logs
 TIME_FORMAT: str = "%Y-%m-%d %H:%M:%S"
 
+# Janela de coalescência de câmera: um "desligou" seguido de "ligou" em até
+# N segundos retoma a mesma sessão (0 = desativado, grava na hora)
+CAMERA_GRACE_SECONDS: float = float(getenv("CAMERA_GRACE_SECONDS", "0"))
+
+# Eventos de voz recentes lembrados para descartar duplicatas e replays do
+# gateway (identificados por sessão do websocket e número de sequência)
+EVENT_DEDUP_SIZE: int = int(getenv("EVENT_DEDUP_SIZE", "4096"))
+
+# Trace dos eventos de voz para replay (event_trace.py; vazio = desativado):
+# JSONL rotacionado ao passar de EVENT_TRACE_MAX_BYTES, com
+# EVENT_TRACE_BACKUPS arquivos anteriores
+EVENT_TRACE_FILE: str = getenv("EVENT_TRACE_FILE", "")
+EVENT_TRACE_MAX_BYTES: int = int(getenv("EVENT_TRACE_MAX_BYTES", str(64 * 1024 * 1024)))
+EVENT_TRACE_BACKUPS: int = int(getenv("EVENT_TRACE_BACKUPS", "5"))
+
+
+# ============================================================================
+# SHARDING E PARTICIONAMENTO
+# ============================================================================
+
+def _env_bool(name: str, default: bool = False) -> bool:
+    """Lê uma variável de ambiente booleana ("1", "true", "yes", "on")."""
+    value = getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _parse_shard_ids(value: Optional[str]) -> Optional[List[int]]:
+    """
+    Converte SHARD_IDS ("0,1,2") em lista de inteiros.
+
+    Args:
+        value: Valor bruto da variável de ambiente
+
+    Returns:
+        Optional[List[int]]: Lista de shard IDs ou None se não definido
+    """
+    if not value or not value.strip():
+        return None
+    return [int(part) for part in value.split(",") if part.strip()]
+
+
+# AutoShardedBot: ativado explicitamente ou ao definir SHARD_COUNT/SHARD_IDS.
+# Em clusters multi-processo cada processo define SHARD_IDS com seus shards
+# e todos compartilham o mesmo SHARD_COUNT.
+SHARD_COUNT: Optional[int] = int(getenv("SHARD_COUNT")) if getenv("SHARD_COUNT") else None
+SHARD_IDS: Optional[List[int]] = _parse_shard_ids(getenv("SHARD_IDS"))
+AUTO_SHARDING: bool = _env_bool("AUTO_SHARDING") or SHARD_COUNT is not None or SHARD_IDS is not None
+
+# Um arquivo de dados por guild: shards (e processos) diferentes nunca
+# disputam o mesmo lock. Obrigatório quando há mais de um processo.
+PARTITION_BY_GUILD: bool = _env_bool("PARTITION_BY_GUILD")
+
+
+# ============================================================================
+# SERVIÇO DE ARMAZENAMENTO (MODO MULTI-PROCESSO)
+# ============================================================================
+
+# Socket Unix do storage_service. Vazio = o bot acessa os arquivos direto.
+STORAGE_SOCKET: str = getenv("STORAGE_SOCKET", "")
+
+# Conexões mantidas pelo cliente e janela de agrupamento dos deltas
+STORAGE_POOL_SIZE: int = int(getenv("STORAGE_POOL_SIZE", "2"))
+STORAGE_FLUSH_INTERVAL: float = float(getenv("STORAGE_FLUSH_INTERVAL", "0.5"))
+STORAGE_FLUSH_MAX_DELTAS: int = int(getenv("STORAGE_FLUSH_MAX_DELTAS", "256"))
+
+
+# ============================================================================
+# DURABILIDADE DAS ESCRITAS
+# ============================================================================
+
+DURABILITY_MODES = ("none", "group-commit", "strict")
+
+# "none": sem fsync (o SO decide quando gravar; pode perder sessões numa
+#         queda de energia)
+# "group-commit": sessões acumuladas por até GROUP_COMMIT_INTERVAL_MS ou
+#         GROUP_COMMIT_MAX_RECORDS e gravadas com um único fsync por lote
+# "strict": fsync a cada sessão gravada
+DURABILITY_MODE: str = getenv("DURABILITY_MODE", "none").lower()
+if DURABILITY_MODE not in DURABILITY_MODES:
+    raise ValueError(
+        f"DURABILITY_MODE inválido: {DURABILITY_MODE!r} (use {', '.join(DURABILITY_MODES)})"
+    )
+
+GROUP_COMMIT_INTERVAL_MS: int = int(getenv("GROUP_COMMIT_INTERVAL_MS", "200"))
+GROUP_COMMIT_MAX_RECORDS: int = int(getenv("GROUP_COMMIT_MAX_RECORDS", "256"))
+
+
+# ============================================================================
+# HISTÓRICO DE SESSÕES
+# ============================================================================
+
+# Log de sessões encerradas (usuário, canal, início, fim), um arquivo JSONL
+# por guild e dia de início. Vazio = desativado.
+SESSION_HISTORY_DIR: str = getenv("SESSION_HISTORY_DIR", "video_history")
+
+# Retenção: sessões brutas por HISTORY_RAW_DAYS dias; depois disso cada dia
+# vira um resumo diário por usuário, mantido até HISTORY_RETENTION_DAYS
+HISTORY_RAW_DAYS: int = int(getenv("HISTORY_RAW_DAYS", "30"))
+HISTORY_RETENTION_DAYS: int = int(getenv("HISTORY_RETENTION_DAYS", "365"))
+
+# Mapa de calor por hora da semana (!mapacalor): um arquivo por guild em
+# HEATMAP_DIR (vazio = desativado). HEATMAP_TIMEZONE é um nome IANA
+# (ex: America/Sao_Paulo); vazio usa o fuso do sistema.
+HEATMAP_DIR: str = getenv("HEATMAP_DIR", "heatmaps")
+HEATMAP_TIMEZONE: str = getenv("HEATMAP_TIMEZONE", "")
+
+
+# ============================================================================
+# SAÚDE E MONITORAMENTO DO EVENT LOOP
+# ============================================================================
+
+# Endpoint HTTP /health e /ready para o orquestrador (0 = desativado)
+HEALTH_HOST: str = getenv("HEALTH_HOST", "127.0.0.1")
+HEALTH_PORT: int = int(getenv("HEALTH_PORT", "0"))
+
+# Amostragem do lag do loop; bloqueios acima de SLOW_CALLBACK_SECONDS são
+# registrados com o nome da task e acima de LOOP_STALL_SECONDS o /health
+# responde 503. LOOP_DEBUG liga também o modo debug do asyncio.
+LOOP_LAG_INTERVAL: float = float(getenv("LOOP_LAG_INTERVAL", "0.5"))
+SLOW_CALLBACK_SECONDS: float = float(getenv("SLOW_CALLBACK_SECONDS", "0.1"))
+LOOP_STALL_SECONDS: float = float(getenv("LOOP_STALL_SECONDS", "5"))
+LOOP_DEBUG: bool = _env_bool("LOOP_DEBUG")
+
+
+# ============================================================================
+# DASHBOARD (API HTTP SOMENTE LEITURA)
+# ============================================================================
+
+# API do dashboard web (0 = desativado). Servida dos snapshots do ranking em
+# memória, renovados no máximo a cada DASHBOARD_REFRESH_SECONDS; com
+# DASHBOARD_TOKEN, exige "Authorization: Bearer <token>"
+DASHBOARD_HOST: str = getenv("DASHBOARD_HOST", "127.0.0.1")
+DASHBOARD_PORT: int = int(getenv("DASHBOARD_PORT", "0"))
+DASHBOARD_TOKEN: str = getenv("DASHBOARD_TOKEN", "")
+DASHBOARD_REFRESH_SECONDS: float = float(getenv("DASHBOARD_REFRESH_SECONDS", "2"))
+
+
+# ============================================================================
+# BACKEND SQL (sql_storage.py)
+# ============================================================================
+
+# URL do banco SQL (sqlite:///arquivo.db ou postgresql://...; vazio = só
+# JSON) e máximo de conexões abertas pelo pool
+SQL_DATABASE_URL: str = getenv("SQL_DATABASE_URL", "")
+SQL_POOL_SIZE: int = int(getenv("SQL_POOL_SIZE", "5"))
+
+
+# Diretório das exportações do ranking (!exportar / export.py)
+EXPORT_DIR: str = getenv("EXPORT_DIR", "exports")
+
+# Profiler sob demanda (!perfil / SIGUSR1): diretório dos arquivos gerados,
+# duração máxima pelo comando e duração ao receber o sinal
+PROFILE_DIR: str = getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_SECONDS: int = int(getenv("PROFILE_MAX_SECONDS", "120"))
+PROFILE_SIGNAL_SECONDS: int = int(getenv("PROFILE_SIGNAL_SECONDS", "30"))
+
+
+# ============================================================================
+# CACHE DO GATEWAY
+# ============================================================================
+
+# Modo enxuto para a carga só de voz: sem intent members, sem chunking no
+# startup e cache de membros restrito a quem está em canal de voz. Nomes do
+# ranking são resolvidos sob demanda e guardados em um cache limitado
+# (MEMBER_CACHE_SIZE entradas, renovadas após MEMBER_CACHE_TTL segundos).
+LEAN_CACHE: bool = _env_bool("LEAN_CACHE")
+MEMBER_CACHE_SIZE: int = int(getenv("MEMBER_CACHE_SIZE", "1000"))
+MEMBER_CACHE_TTL: float = float(getenv("MEMBER_CACHE_TTL", "600"))
+
+
+def get_cache_options(lean: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    Opções de cache do discord.py para o modo configurado.
+
+    Args:
+        lean: Força o modo (default: LEAN_CACHE)
+
+    Returns:
+        Dict[str, Any]: Argumentos extras do construtor do bot (vazio no
+            modo completo, que usa os padrões do discord.py)
+    """
+    if not (LEAN_CACHE if lean is None else lean):
+        return {}
+    flags = discord.MemberCacheFlags.none()
+    flags.voice = True
+    return {
+        'member_cache_flags': flags,
+        'chunk_guilds_at_startup': False,
+    }
+
 
 # ============================================================================
 # CONFIGURAÇÃO DE INTENTS
 # ============================================================================
 
-def get_intents() -> discord.Intents:
+def get_intents(lean: Optional[bool] = None) -> discord.Intents:
     """
     Configura e retorna os Intents necessários para o bot.
 
@@ -47,7 +258,11 @@ def get_intents() -> discord.Intents:
     Para rastreamento de câmera, precisamos de:
     - guilds: Para operações básicas de servidor
     - voice_states: Para detectar mudanças de estado de voz (câmera)
-    - members: Para buscar informações de usuários (fetch_user)
+    - members: Para buscar informações de usuários (fetch_user); desligado
+      no modo enxuto (LEAN_CACHE), em que fetch_user usa a API REST
+
+    Args:
+        lean: Força o modo (default: LEAN_CACHE)
 
     Returns:
         discord.Intents: Objeto de Intents configurado para o bot.
@@ -59,7 +274,8 @@ def get_intents() -> discord.Intents:
     intents = discord.Intents.default()
     intents.guilds = True
     intents.voice_states = True
-    intents.members = True  # Necessário para fetch_user em ranking
+    # Necessário para o cache completo de membros usado pelo ranking
+    intents.members = not (LEAN_CACHE if lean is None else lean)
     return intents
 
 
@@ -67,12 +283,45 @@ def get_intents() -> discord.Intents:
 # CONFIGURAÇÃO DE LOGGER
 # ============================================================================
 
+# Logging: "text" (padrão) ou "json"; arquivo opcional além do console
+LOG_FORMAT: str = getenv("LOG_FORMAT", "text").lower()
+LOG_LEVEL: str = getenv("LOG_LEVEL", "INFO").upper()
+LOG_FILE: str = getenv("LOG_FILE", "")
+
+# Máximo de logs INFO por segundo para cada evento de voz (0 = sem limite)
+VOICE_LOG_RATE_LIMIT: int = int(getenv("VOICE_LOG_RATE_LIMIT", "20"))
+
+
+def configure_logging(level: Optional[int] = None) -> None:
+    """
+    Configura o logging do processo uma única vez.
+
+    Deve ser chamada na fase de inicialização (bot.py / storage_service.py),
+    nunca no import de módulos. Delega para utils.configure_logging, que
+    envia os registros por uma fila para uma thread de escrita (o event
+    loop não faz I/O de log). Chamadas seguintes não têm efeito.
+
+    Args:
+        level: Nível de log do logger root (default: LOG_LEVEL do ambiente).
+    """
+    if level is None:
+        resolved = getLevelName(LOG_LEVEL)
+        level = resolved if isinstance(resolved, int) else INFO
+
+    utils.configure_logging(
+        level=level,
+        json_format=LOG_FORMAT == "json",
+        log_file=LOG_FILE or None,
+    )
+
+
 def setup_logger(name: Optional[str] = None, level: int = INFO) -> Logger:
     """
     Configura e retorna um logger estruturado para o bot.
 
     O logger é configurado com formato estruturado para facilitar debug
-    e monitoramento do bot em produção.
+    e monitoramento do bot em produção. A configuração do processo é feita
+    por configure_logging e acontece apenas uma vez.
 
     Args:
         name: Nome do logger (default: None usa o logger root).
@@ -85,9 +334,5 @@ def setup_logger(name: Optional[str] = None, level: int = INFO) -> Logger:
         >>> logger = setup_logger("bot")
         >>> logger.info("Bot iniciado com sucesso")
     """
-    basicConfig(
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        datefmt=TIME_FORMAT,
-        level=level,
-    )
+    configure_logging(level)
     return getLogger(name or __name__)
@@ -0,0 +1,500 @@
+"""
+dashboard.py - API HTTP somente leitura para o dashboard web (Fase 3 do PRD).
+
+Rankings, estatísticas de usuários e agregados do servidor são servidos de
+snapshots em memória do ranking ordenado (ranking.ranking_page), nunca de
+uma leitura do armazenamento por requisição:
+
+- cada guild tem um snapshot renovado no máximo a cada
+  DASHBOARD_REFRESH_SECONDS; no modo de processo único ele só é recarregado
+  se a versão dos dados mudou, e cargas concorrentes são coalescidas
+- o corpo de cada resposta é serializado e comprimido (gzip) uma vez por
+  snapshot e reaproveitado por todos os clientes
+- o ETag é um hash do conteúdo do snapshot (a versão dos dados é local ao
+  processo e recomeça a cada reinício): If-None-Match igual responde 304
+  sem corpo
+- /events é um stream Server-Sent Events: uma única task por guild compara
+  snapshots consecutivos e envia as mudanças de posição a todos os
+  inscritos
+
+Centenas de dashboards abertos custam uma carga por versão dos dados, não
+uma leitura por visualização.
+
+Rotas (guild_id e user_id numéricos):
+    GET /api/guilds/{guild_id}/ranking?offset=0&limit=50
+    GET /api/guilds/{guild_id}/users/{user_id}
+    GET /api/guilds/{guild_id}/stats
+    GET /api/guilds/{guild_id}/events
+"""
+
+import asyncio
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from aiohttp import web
+
+from commands import SingleFlight
+from database import get_data_version
+from ranking import ranking_page
+from storage_service import get_storage_client
+
+logger = logging.getLogger(__name__)
+
+# Maior página de /ranking
+MAX_PAGE_SIZE = 100
+
+# Posições acompanhadas pelo stream de eventos
+STREAM_TOP = 50
+
+# Eventos pendentes por inscrito; um cliente que não consome é desconectado
+STREAM_QUEUE_SIZE = 16
+
+# Intervalo (s) dos comentários que mantêm o stream aberto em proxies
+STREAM_KEEPALIVE_SECONDS = 15.0
+
+# Corpos serializados guardados por snapshot (um por rota e parâmetros)
+_MAX_BODIES = 64
+
+# Abaixo disso o gzip não compensa
+_COMPRESS_MIN_BYTES = 512
+
+# Limite da consulta que carrega o ranking inteiro
+_ALL_USERS = 2 ** 31
+
+RankingLoader = Callable[[int], Awaitable[Dict[str, Any]]]
+NameLookup = Callable[[int, str], Optional[str]]
+
+
+async def load_ranking(guild_id: int) -> Dict[str, Any]:
+    """
+    Carrega o ranking completo de um guild (storage_service ou thread local).
+
+    Returns:
+        Dict[str, Any]: Resultado de ranking.ranking_page com todas as entradas
+    """
+    client = get_storage_client()
+    if client is not None:
+        return await client.call("ranking_page", guild_id, 0, _ALL_USERS)
+    return await asyncio.to_thread(ranking_page, guild_id, 0, _ALL_USERS)
+
+
+class DashboardSnapshot:
+    """Ranking de um guild congelado em uma versão dos dados
+
+    Estrutura interna:
+        entries: List[(user_id, {"total_seconds", "sessions"})] ordenada
+        _positions: Dict[user_id, posição] (montado no primeiro uso)
+        _bodies: Dict[chave da rota, (JSON, JSON com gzip)]
+        _etag: hash do conteúdo (calculado no primeiro uso)
+    """
+
+    def __init__(self, guild_id: int, version: Any, entries: List[Tuple[str, Dict[str, int]]], loaded_at: float):
+        self.guild_id = guild_id
+        self.version = version
+        self.entries = entries
+        self.loaded_at = loaded_at
+        self.total_seconds = sum(data["total_seconds"] for _, data in entries)
+        self.sessions = sum(data["sessions"] for _, data in entries)
+        self._positions: Optional[Dict[str, int]] = None
+        self._bodies: Dict[str, Tuple[bytes, bytes]] = {}
+        self._etag: Optional[str] = None
+
+    @property
+    def etag(self) -> str:
+        """ETag do conteúdo; não se repete para dados diferentes após um reinício"""
+        if self._etag is None:
+            digest = hashlib.blake2b(digest_size=12)
+            for user_id, data in self.entries:
+                digest.update(f"{user_id}:{data['total_seconds']}:{data['sessions']};".encode("utf-8"))
+            self._etag = f'"{self.guild_id}-{digest.hexdigest()}"'
+        return self._etag
+
+    def position(self, user_id: str) -> Optional[int]:
+        """Posição (0 = primeiro) de um usuário ou None"""
+        if self._positions is None:
+            self._positions = {entry_user: index for index, (entry_user, _) in enumerate(self.entries)}
+        return self._positions.get(user_id)
+
+    def encoded(self, key: str, build: Callable[[], Any]) -> Tuple[bytes, bytes]:
+        """
+        Corpo JSON de uma rota, serializado e comprimido uma vez por snapshot.
+
+        Args:
+            key: Rota e parâmetros
+            build: Monta o objeto da resposta
+
+        Returns:
+            Tuple[bytes, bytes]: (JSON, JSON com gzip)
+        """
+        body = self._bodies.get(key)
+        if body is None:
+            raw = json.dumps(build(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            body = (raw, gzip.compress(raw, compresslevel=6))
+            if len(self._bodies) >= _MAX_BODIES:
+                self._bodies.pop(next(iter(self._bodies)))
+            self._bodies[key] = body
+        return body
+
+
+def rank_changes(old: DashboardSnapshot, new: DashboardSnapshot, top: int = STREAM_TOP) -> List[Dict[str, Any]]:
+    """
+    Mudanças no topo do ranking entre dois snapshots.
+
+    Args:
+        old: Snapshot anterior
+        new: Snapshot atual
+        top: Posições comparadas
+
+    Returns:
+        List[Dict[str, Any]]: Uma entrada por usuário que mudou de posição
+            ou de tempo no topo (position None = saiu do topo)
+    """
+    before = {user_id: (index, data["total_seconds"]) for index, (user_id, data) in enumerate(old.entries[:top])}
+    changes = []
+    for index, (user_id, data) in enumerate(new.entries[:top]):
+        previous = before.pop(user_id, None)
+        if previous == (index, data["total_seconds"]):
+            continue
+        changes.append({
+            "user_id": user_id,
+            "position": index + 1,
+            "previous_position": previous[0] + 1 if previous else None,
+            "total_seconds": data["total_seconds"],
+        })
+    for user_id, (index, _) in before.items():
+        changes.append({"user_id": user_id, "position": None, "previous_position": index + 1})
+    return changes
+
+
+def _encode_event(event: str, event_id: Any, data: Any) -> bytes:
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n".encode("utf-8")
+
+
+class DashboardState:
+    """Snapshots por guild e inscritos do stream de eventos
+
+    Estrutura interna:
+        _snapshots: Dict[guild_id, DashboardSnapshot]
+        _subscribers: Dict[guild_id, Set[asyncio.Queue]]
+        _watchers: Dict[guild_id, asyncio.Task] (uma por guild com inscritos)
+    """
+
+    def __init__(
+        self,
+        refresh_seconds: float,
+        loader: RankingLoader = load_ranking,
+        names: Optional[NameLookup] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            refresh_seconds: Idade máxima de um snapshot
+            loader: Carrega o ranking completo de um guild
+            names: Nome exibido de um usuário sem chamadas à API (ex: cache
+                de membros do bot); None omite os nomes
+            clock: Relógio monotônico
+        """
+        self.refresh_seconds = refresh_seconds
+        self.loads = 0
+        self._loader = loader
+        self._names = names
+        self._clock = clock
+        self._flights = SingleFlight()
+        self._snapshots: Dict[int, DashboardSnapshot] = {}
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self._watchers: Dict[int, asyncio.Task] = {}
+
+    async def snapshot(self, guild_id: int) -> DashboardSnapshot:
+        """
+        Snapshot atual de um guild, recarregado só quando expirou.
+
+        No modo de processo único a versão dos dados é conhecida
+        localmente: um snapshot expirado com a mesma versão é renovado
+        sem recarga.
+        """
+        snapshot = self._snapshots.get(guild_id)
+        now = self._clock()
+        if snapshot is not None:
+            if now - snapshot.loaded_at < self.refresh_seconds:
+                return snapshot
+            if get_storage_client() is None and snapshot.version == get_data_version():
+                snapshot.loaded_at = now
+                return snapshot
+        return await self._flights.run(guild_id, lambda: self._load(guild_id))
+
+    async def _load(self, guild_id: int) -> DashboardSnapshot:
+        result = await self._loader(guild_id)
+        self.loads += 1
+        snapshot = DashboardSnapshot(
+            guild_id, result["version"], [tuple(entry) for entry in result["entries"]], self._clock()
+        )
+        self._snapshots[guild_id] = snapshot
+        return snapshot
+
+    def entry(self, snapshot: DashboardSnapshot, index: int) -> Dict[str, Any]:
+        """Entrada do ranking na posição ``index`` como objeto da API"""
+        user_id, data = snapshot.entries[index]
+        return {
+            "position": index + 1,
+            "user_id": user_id,
+            "name": self._names(snapshot.guild_id, user_id) if self._names else None,
+            "total_seconds": data["total_seconds"],
+            "sessions": data["sessions"],
+        }
+
+    def subscribe(self, guild_id: int) -> asyncio.Queue:
+        """Inscreve um cliente no stream do guild (inicia o watcher)"""
+        queue: asyncio.Queue = asyncio.Queue(STREAM_QUEUE_SIZE)
+        self._subscribers.setdefault(guild_id, set()).add(queue)
+        if guild_id not in self._watchers:
+            task = asyncio.create_task(self._watch(guild_id))
+            self._watchers[guild_id] = task
+            task.add_done_callback(lambda _: self._watchers.pop(guild_id, None))
+        return queue
+
+    def unsubscribe(self, guild_id: int, queue: asyncio.Queue) -> None:
+        subscribers = self._subscribers.get(guild_id)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[guild_id]
+
+    def subscriber_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    async def _watch(self, guild_id: int) -> None:
+        """Compara snapshots do guild e publica as mudanças enquanto houver inscritos"""
+        previous: Optional[DashboardSnapshot] = None
+        delay = 0.0
+        while self._subscribers.get(guild_id):
+            await asyncio.sleep(delay)
+            delay = self.refresh_seconds
+            try:
+                current = await self.snapshot(guild_id)
+            except Exception as e:
+                # Inclusive a primeira carga: o watcher tenta de novo no
+                # próximo intervalo em vez de morrer em silêncio
+                logger.warning("Falha ao renovar snapshot do dashboard (guild %s): %s", guild_id, e)
+                continue
+            if previous is None:
+                previous = current
+                continue
+            if current is previous or current.etag == previous.etag:
+                continue
+            changes = rank_changes(previous, current)
+            previous = current
+            if changes:
+                self.publish(guild_id, _encode_event(
+                    "ranking", current.version,
+                    {"version": current.version, "total_users": len(current.entries), "changes": changes}
+                ))
+
+    def publish(self, guild_id: int, event: bytes) -> None:
+        """Entrega um evento aos inscritos; quem está com a fila cheia é desconectado"""
+        for queue in list(self._subscribers.get(guild_id, ())):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                logger.info("Cliente lento desconectado do stream do dashboard (guild %s)", guild_id)
+                self._disconnect(guild_id, queue)
+
+    def _disconnect(self, guild_id: int, queue: asyncio.Queue) -> None:
+        """Remove o inscrito e encerra o stream dele (sentinela None)"""
+        self.unsubscribe(guild_id, queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    async def close(self) -> None:
+        """Encerra os streams abertos e os watchers"""
+        for guild_id, subscribers in list(self._subscribers.items()):
+            for queue in list(subscribers):
+                self._disconnect(guild_id, queue)
+        for task in list(self._watchers.values()):
+            task.cancel()
+        await asyncio.gather(*self._watchers.values(), return_exceptions=True)
+
+
+class DashboardServer:
+    """API HTTP somente leitura do dashboard (aiohttp)
+
+    Roda no mesmo event loop do bot, como o HealthServer. Com ``token``,
+    toda requisição deve trazer "Authorization: Bearer <token>" (ou
+    ?token=, para o EventSource do navegador, que não envia cabeçalhos).
+    """
+
+    def __init__(
+        self,
+        state: DashboardState,
+        host: str = "127.0.0.1",
+        port: int = 8081,
+        token: str = "",
+        known_guild: Optional[Callable[[int], bool]] = None
+    ):
+        """
+        Args:
+            state: Snapshots e inscritos
+            host: Endereço de escuta
+            port: Porta TCP (0 escolhe uma porta livre)
+            token: Token exigido (vazio = sem autenticação)
+            known_guild: Diz se o guild é atendido pelo bot (None = todos)
+        """
+        self.state = state
+        self.host = host
+        self.port = port
+        self.token = token
+        self.known_guild = known_guild
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self) -> None:
+        """Inicia o servidor HTTP"""
+        app = web.Application(middlewares=[self._authenticate])
+        app.router.add_get("/api/guilds/{guild_id:\\d+}/ranking", self._ranking)
+        app.router.add_get("/api/guilds/{guild_id:\\d+}/users/{user_id:\\d+}", self._user)
+        app.router.add_get("/api/guilds/{guild_id:\\d+}/stats", self._stats)
+        app.router.add_get("/api/guilds/{guild_id:\\d+}/events", self._events)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        logger.info("API do dashboard em http://%s:%d/api", self.host, self.port)
+
+    async def close(self) -> None:
+        """Encerra os streams e o servidor HTTP"""
+        await self.state.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    @web.middleware
+    async def _authenticate(self, request: web.Request, handler: Callable) -> web.StreamResponse:
+        if self.token:
+            header = request.headers.get("Authorization", "")
+            supplied = header[7:] if header.startswith("Bearer ") else request.query.get("token", "")
+            if not hmac.compare_digest(supplied.encode(), self.token.encode()):
+                return web.json_response({"error": "unauthorized"}, status=401)
+        return await handler(request)
+
+    async def _snapshot(self, request: web.Request) -> DashboardSnapshot:
+        guild_id = int(request.match_info["guild_id"])
+        if self.known_guild is not None and not self.known_guild(guild_id):
+            raise web.HTTPNotFound(text='{"error":"unknown guild"}', content_type="application/json")
+        return await self.state.snapshot(guild_id)
+
+    def _respond(
+        self,
+        request: web.Request,
+        snapshot: DashboardSnapshot,
+        key: str,
+        build: Callable[[], Any]
+    ) -> web.Response:
+        """Resposta condicional (ETag) com o corpo em cache do snapshot"""
+        headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        # Proxies que comprimem trocam o ETag por um ETag fraco (W/"...")
+        tags = {tag.strip()[2:] if tag.strip().startswith("W/") else tag.strip()
+                for tag in request.headers.get("If-None-Match", "").split(",")}
+        if snapshot.etag in tags or "*" in tags:
+            return web.Response(status=304, headers=headers)
+
+        raw, compressed = snapshot.encoded(key, build)
+        body = raw
+        if len(raw) >= _COMPRESS_MIN_BYTES and "gzip" in request.headers.get("Accept-Encoding", ""):
+            body = compressed
+            headers["Content-Encoding"] = "gzip"
+        return web.Response(body=body, content_type="application/json", charset="utf-8", headers=headers)
+
+    async def _ranking(self, request: web.Request) -> web.Response:
+        try:
+            offset = max(0, int(request.query.get("offset", "0")))
+            limit = min(MAX_PAGE_SIZE, max(1, int(request.query.get("limit", "50"))))
+        except ValueError:
+            return web.json_response({"error": "offset e limit devem ser inteiros"}, status=400)
+
+        snapshot = await self._snapshot(request)
+
+        def build() -> Dict[str, Any]:
+            end = min(offset + limit, len(snapshot.entries))
+            return {
+                "version": snapshot.version,
+                "total_users": len(snapshot.entries),
+                "offset": offset,
+                "entries": [self.state.entry(snapshot, index) for index in range(offset, end)],
+            }
+
+        return self._respond(request, snapshot, f"ranking:{offset}:{limit}", build)
+
+    async def _user(self, request: web.Request) -> web.Response:
+        snapshot = await self._snapshot(request)
+        user_id = request.match_info["user_id"]
+        position = snapshot.position(user_id)
+        if position is None:
+            return web.json_response({"error": "user not found"}, status=404)
+
+        def build() -> Dict[str, Any]:
+            entry = self.state.entry(snapshot, position)
+            entry.update(version=snapshot.version, total_users=len(snapshot.entries))
+            return entry
+
+        return self._respond(request, snapshot, f"user:{user_id}", build)
+
+    async def _stats(self, request: web.Request) -> web.Response:
+        snapshot = await self._snapshot(request)
+
+        def build() -> Dict[str, Any]:
+            return {
+                "version": snapshot.version,
+                "users": len(snapshot.entries),
+                "total_seconds": snapshot.total_seconds,
+                "sessions": snapshot.sessions,
+                "mean_session": snapshot.total_seconds / snapshot.sessions if snapshot.sessions else None,
+            }
+
+        return self._respond(request, snapshot, "stats", build)
+
+    async def _events(self, request: web.Request) -> web.StreamResponse:
+        """Stream SSE: o topo atual ao conectar e as mudanças de posição depois"""
+        snapshot = await self._snapshot(request)
+        response = web.StreamResponse(headers={
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        })
+        await response.prepare(request)
+
+        queue = self.state.subscribe(snapshot.guild_id)
+        try:
+            top = [self.state.entry(snapshot, index) for index in range(min(STREAM_TOP, len(snapshot.entries)))]
+            await response.write(_encode_event(
+                "snapshot", snapshot.version,
+                {"version": snapshot.version, "total_users": len(snapshot.entries), "entries": top}
+            ))
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    await response.write(b": keepalive\n\n")
+                    continue
+                if event is None:
+                    break
+                await response.write(event)
+        except ConnectionResetError:
+            pass
+        finally:
+            self.state.unsubscribe(snapshot.guild_id, queue)
+        return response
+
+
+__all__ = [
+    'DashboardServer',
+    'DashboardSnapshot',
+    'DashboardState',
+    'load_ranking',
+    'rank_changes',
+]
@@ -7,30 +7,114 @@ RF06 e seção 4.4.2 do PRD.
 """
 
 import json
+import logging
 import time
 from pathlib import Path
-from typing import Dict, Any
+from typing import Callable, Dict, Any, Iterable, Iterator, List, Optional, Tuple
 
+from config import DURABILITY_MODE, PARTITION_BY_GUILD
 # Importar módulo de bloqueio de arquivos
 from database_lock import (
+    iter_json_object,
     safe_load_json,
     atomic_write_json,
     safe_update_json,
+    rotate_json_file,
+    verify_json_file,
     FileLockError
 )
+import guild_stats
 
+logger = logging.getLogger(__name__)
 
 # Caminho do arquivo JSON de dados
 DATA_FILE = Path("video_ranking.json")
 
+# Origens (processos) por usuário cujas sessões aplicadas são lembradas
+# em entry["applied"] para descartar reentregas (ver is_session_applied)
+APPLIED_ORIGINS_KEPT = 8
 
-def load_data() -> Dict[str, Dict[str, int]]:
+# Versão lógica dos dados em memória. Toda mutação incrementa o contador,
+# o que invalida de uma só vez todos os caches de ranking que o usam como chave.
+_data_version: int = 0
+
+
+def get_data_version() -> int:
+    """
+    Retorna a versão lógica atual dos dados de ranking.
+
+    Caches derivados (ex: ranking ordenado) guardam a versão em que foram
+    calculados e são descartados quando ela muda.
+
+    Returns:
+        int: Contador monotônico incrementado a cada mutação
+    """
+    return _data_version
+
+
+def _bump_data_version() -> None:
+    """Incrementa a versão dos dados, invalidando os caches de ranking."""
+    global _data_version
+    _data_version += 1
+
+
+def _durable() -> bool:
+    """
+    Indica se as escritas devem ir para o disco (fsync) antes de retornar.
+
+    Em "strict" cada sessão é uma escrita sincronizada; em "group-commit"
+    as sessões chegam aqui em lotes (group_commit.py) e cada lote custa um
+    único fsync; em "none" a durabilidade fica a cargo do sistema operacional.
+    """
+    return DURABILITY_MODE != "none"
+
+
+def partition_key(guild_id: Optional[int] = None) -> Optional[int]:
+    """
+    Retorna a chave de partição usada para um guild.
+
+    Com PARTITION_BY_GUILD desativado todos os guilds compartilham a
+    partição global (None).
+
+    Args:
+        guild_id: ID do guild Discord
+
+    Returns:
+        Optional[int]: ID do guild ou None para a partição global
+    """
+    if not PARTITION_BY_GUILD or guild_id is None:
+        return None
+    return guild_id
+
+
+def data_file_for(guild_id: Optional[int] = None) -> Path:
+    """
+    Retorna o arquivo de dados da partição de um guild.
+
+    Partições ficam ao lado de DATA_FILE, ex: video_ranking.guild-123.json.
+
+    Args:
+        guild_id: ID do guild Discord (None para a partição global)
+
+    Returns:
+        Path: Caminho do arquivo JSON da partição
+    """
+    key = partition_key(guild_id)
+    if key is None:
+        return DATA_FILE
+    return DATA_FILE.with_name(f"{DATA_FILE.stem}.guild-{key}{DATA_FILE.suffix}")
+
+
+def load_data(guild_id: Optional[int] = None) -> Dict[str, Dict[str, int]]:
     """
     Carrega os dados de ranking do arquivo JSON.
 
     Conforme RF06: Lê o arquivo video_ranking.json e retorna
     o dicionário com dados de todos os usuários.
 
+    Args:
+        guild_id: ID do guild (usado apenas com PARTITION_BY_GUILD)
+
     Returns:
         Dict[str, Dict[str, int]]: Dicionário onde a chave é o user_id
             e o valor é um dict com 'total_seconds' e 'sessions'.
@@ -41,14 +125,92 @@ def load_data() -> Dict[str, Dict[str, int]]:
         >>> data["123456789"]
         {'total_seconds': 3600, 'sessions': 5}
     """
+    data_file = data_file_for(guild_id)
+
     # Criar arquivo vazio se não existir
-    if not DATA_FILE.exists():
-        _ensure_data_file_exists()
+    if not data_file.exists():
+        _ensure_data_file_exists(data_file=data_file)
+
+    return safe_load_json(str(data_file), {})
+
+
+def iter_data(guild_id: Optional[int] = None) -> Iterator[Tuple[str, Dict[str, int]]]:
+    """
+    Itera os usuários de uma partição sem materializar o dicionário inteiro.
+
+    Lê o snapshot publicado em blocos (ver database_lock.iter_json_object),
+    com memória constante independente do número de usuários.
+
+    Args:
+        guild_id: ID do guild (usado apenas com PARTITION_BY_GUILD)
+
+    Yields:
+        Tuple[str, Dict[str, int]]: (user_id, {"total_seconds", "sessions"})
+    """
+    for user_id, entry in iter_json_object(str(data_file_for(guild_id))):
+        if isinstance(entry, dict):
+            yield user_id, entry
+
+
+def partition_files() -> List[Tuple[Optional[int], Path]]:
+    """
+    Lista os arquivos de dados existentes: o global e o de cada guild.
+
+    Returns:
+        List[Tuple[Optional[int], Path]]: (guild_id ou None, arquivo)
+    """
+    files: List[Tuple[Optional[int], Path]] = [(None, DATA_FILE)]
+    prefix = f"{DATA_FILE.stem}.guild-"
+    for path in sorted(DATA_FILE.parent.glob(f"{prefix}*{DATA_FILE.suffix}")):
+        suffix = path.stem[len(prefix):]
+        if suffix.isdigit():
+            files.append((int(suffix), path))
+    return files
+
+
+def verify_data_files() -> List[Path]:
+    """
+    Confere o checksum de cada partição com o seu journal (inicialização).
 
-    return safe_load_json(str(DATA_FILE), {})
+    Custa um sha256 por arquivo; uma partição que não confere é restaurada
+    do último snapshot válido mais o tail do journal (ver
+    database_lock.verify_json_file).
+
+    Returns:
+        List[Path]: Partições restauradas
+
+    Raises:
+        CorruptedFileError: Se uma partição não puder ser restaurada
+    """
+    restored = [data_file for _, data_file in partition_files() if not verify_json_file(str(data_file))]
+    if restored:
+        _bump_data_version()
+    return restored
+
+
+def load_aggregated_data() -> Dict[str, Dict[str, int]]:
+    """
+    Agrega os dados de todas as partições em um ranking único.
+
+    Com PARTITION_BY_GUILD cada guild (e portanto cada shard) grava no
+    próprio arquivo; esta função soma tempo e sessões de cada usuário
+    em todas as partições para um ranking global entre shards.
+
+    Returns:
+        Dict[str, Dict[str, int]]: Dados agregados por user_id
+    """
+    aggregated: Dict[str, Dict[str, int]] = {}
+
+    for _, data_file in partition_files():
+        for user_id, entry in safe_load_json(str(data_file), {}).items():
+            target = aggregated.setdefault(user_id, {"total_seconds": 0, "sessions": 0})
+            target["total_seconds"] += entry.get("total_seconds", 0)
+            target["sessions"] += entry.get("sessions", 0)
+
+    return aggregated
 
 
-def _ensure_data_file_exists(max_retries: int = 3) -> None:
+def _ensure_data_file_exists(max_retries: int = 3, data_file: Optional[Path] = None) -> None:
     """
     Garante que o arquivo de dados existe, criando-o se necessário.
 
@@ -57,17 +219,21 @@ def _ensure_data_file_exists(max_retries: int = 3) -> None:
 
     Args:
         max_retries: Número máximo de tentativas de criação
+        data_file: Arquivo a garantir (default: DATA_FILE)
     """
+    if data_file is None:
+        data_file = DATA_FILE
+
     for attempt in range(max_retries):
         try:
             # Verificar novamente se o arquivo já existe
-            if DATA_FILE.exists():
+            if data_file.exists():
                 # Verificar se o arquivo é non-empty
-                if DATA_FILE.stat().st_size > 0:
+                if data_file.stat().st_size > 0:
                     return
 
             # Tentar criar arquivo vazio
-            atomic_write_json({}, str(DATA_FILE))
+            atomic_write_json({}, str(data_file), journal=True)
             return
 
         except FileLockError:
@@ -77,11 +243,11 @@ def _ensure_data_file_exists(max_retries: int = 3) -> None:
                 time.sleep(wait_time)
             else:
                 # Última tentativa: criar sem lock como fallback
-                with open(DATA_FILE, 'w', encoding='utf-8') as f:
+                with open(data_file, 'w', encoding='utf-8') as f:
                     json.dump({}, f, indent=2, ensure_ascii=False)
 
 
-def save_data(data: Dict[str, Dict[str, int]]) -> None:
+def save_data(data: Dict[str, Dict[str, int]], guild_id: Optional[int] = None) -> None:
     """
     Salva os dados de ranking no arquivo JSON.
     
@@ -96,17 +262,66 @@ def save_data(data: Dict[str, Dict[str, int]]) -> None:
                     "sessions": int
                 }
             }
+        guild_id: ID do guild (usado apenas com PARTITION_BY_GUILD)
     
     Example:
         >>> save_data({"123": {"total_seconds": 100, "sessions": 1}})
     """
     try:
-        atomic_write_json(data, str(DATA_FILE))
+        atomic_write_json(data, str(data_file_for(guild_id)), durable=_durable(), journal=True)
     except FileLockError as e:
         raise RuntimeError(f"Erro ao salvar dados: {e}")
+    finally:
+        _bump_data_version()
+
+
+def is_session_applied(applied: Dict[str, int], session_id: Optional[Tuple[str, int]]) -> bool:
+    """
+    Indica se a sessão já foi somada, dado o registro ``applied`` do usuário.
+
+    Uma sessão é identificada por (origem, n): a origem muda a cada início
+    do processo que a encerrou e n cresce a cada sessão dele (ver
+    events.SessionIds). ``applied`` guarda o maior n aplicado de cada
+    origem recente; uma sessão com n menor ou igual ao da sua origem é uma
+    reentrega (lote repetido após falha) e não é somada de novo. Nada é
+    comparado com o relógio de parede: sessões de um processo reiniciado
+    ou de outro processo do cluster têm outra origem e sempre são somadas.
+    """
+    if session_id is None:
+        return False
+    origin, counter = session_id
+    return counter <= applied.get(origin, 0)
+
 
+def mark_session_applied(applied: Dict[str, int], session_id: Optional[Tuple[str, int]]) -> None:
+    """Registra a sessão em ``applied``, mantendo as APPLIED_ORIGINS_KEPT origens mais recentes"""
+    if session_id is None:
+        return
+    origin, counter = session_id
+    applied[origin] = max(applied.pop(origin, 0), counter)
+    while len(applied) > APPLIED_ORIGINS_KEPT:
+        del applied[next(iter(applied))]
 
-def update_video_time(user_id: str, duration: int) -> None:
+
+def _is_applied(entry: Optional[Dict[str, Any]], session_id: Optional[Tuple[str, int]]) -> bool:
+    """Indica se a sessão já foi somada à entrada (ver is_session_applied)"""
+    return entry is not None and is_session_applied(entry.get("applied", {}), session_id)
+
+
+def _mark_applied(entry: Dict[str, Any], session_id: Optional[Tuple[str, int]]) -> None:
+    """Registra a sessão aplicada na entrada"""
+    # Formato anterior: versão pelo relógio de parede, sem efeito agora
+    entry.pop("version", None)
+    if session_id is not None:
+        mark_session_applied(entry.setdefault("applied", {}), session_id)
+
+
+def update_video_time(
+    user_id: str,
+    duration: int,
+    guild_id: Optional[int] = None,
+    session_id: Optional[Tuple[str, int]] = None
+) -> None:
     """
     Atualiza o tempo acumulado de câmera para um usuário.
     
@@ -117,6 +332,8 @@ def update_video_time(user_id: str, duration: int) -> None:
     Args:
         user_id: ID do usuário Discord (string)
         duration: Duração da sessão em segundos (int > 0)
+        guild_id: ID do guild (usado apenas com PARTITION_BY_GUILD)
+        session_id: Id da sessão (origem, n); já aplicada = ignorada (idempotente)
     
     Raises:
         ValueError: Se duration for negativo
@@ -130,9 +347,17 @@ def update_video_time(user_id: str, duration: int) -> None:
     """
     if duration < 0:
         raise ValueError("duration must be non-negative")
-    
+
+    data_file = data_file_for(guild_id)
+    seen = {"version": None, "new_user": False, "duplicate": False}
+
     def update_func(current_data: Dict[str, Dict[str, int]]) -> Dict[str, Dict[str, int]]:
         """Função de atualização para safe_update_json."""
+        seen["version"] = guild_stats.file_version(data_file)
+        seen["new_user"] = user_id not in current_data
+        seen["duplicate"] = _is_applied(current_data.get(user_id), session_id)
+        if seen["duplicate"]:
+            return current_data
         if user_id not in current_data:
             # Nova entrada para o usuário
             current_data[user_id] = {
@@ -143,20 +368,397 @@ def update_video_time(user_id: str, duration: int) -> None:
             # Atualizar entrada existente
             current_data[user_id]["total_seconds"] += duration
             current_data[user_id]["sessions"] += 1
+        _mark_applied(current_data[user_id], session_id)
         
         return current_data
-    
+
+    if not data_file.exists():
+        _ensure_data_file_exists(data_file=data_file)
+
     try:
-        safe_update_json(str(DATA_FILE), update_func)
+        safe_update_json(str(data_file), update_func, durable=_durable(), journal=True)
+        if seen["duplicate"]:
+            logger.info("Sessão %s de %s já aplicada, ignorada", session_id, user_id)
+        guild_stats.record_sessions(
+            data_file, seen["version"], [] if seen["duplicate"] else [duration],
+            new_users=int(seen["new_user"])
+        )
     except FileLockError as e:
         raise RuntimeError(f"Erro ao atualizar dados: {e}")
+    finally:
+        _bump_data_version()
+
+
+def _upsert_batch(
+    by_file: Dict[Path, List[Tuple[str, int, int, Optional[Tuple[str, int]], Any]]],
+    action: str,
+    single_sessions: bool = False,
+    on_applied: Optional[Callable[[List[Any]], None]] = None
+) -> int:
+    """
+    Soma (segundos, sessões) por usuário com um read-modify-write por partição.
+
+    Args:
+        by_file: Entradas (user_id, segundos, sessões, id da sessão ou None,
+            origem) agrupadas por arquivo; entradas já aplicadas são ignoradas
+        action: Descrição da operação para a mensagem de erro
+        single_sessions: Cada entrada é uma sessão encerrada (entra no
+            histograma de durações das estatísticas do guild)
+        on_applied: Chamada após a escrita de cada partição com a origem
+            das entradas aplicadas nela
+
+    Returns:
+        int: Número de entradas aplicadas (sem as já aplicadas antes)
+
+    Raises:
+        RuntimeError: Se ocorrer erro no bloqueio de arquivo
+    """
+    applied = 0
+    try:
+        for data_file, entries in by_file.items():
+            seen = {"version": None, "new_users": 0, "applied": []}
+
+            def update_func(current_data: Dict[str, Dict[str, int]]) -> Dict[str, Dict[str, int]]:
+                """Aplica todas as entradas da partição."""
+                seen["version"] = guild_stats.file_version(data_file)
+                seen["new_users"] = 0
+                seen["applied"] = []
+                for user_id, seconds, sessions, session_id, source in entries:
+                    if _is_applied(current_data.get(user_id), session_id):
+                        continue
+                    if user_id not in current_data:
+                        seen["new_users"] += 1
+                    entry = current_data.setdefault(
+                        user_id, {"total_seconds": 0, "sessions": 0}
+                    )
+                    entry["total_seconds"] += seconds
+                    entry["sessions"] += sessions
+                    _mark_applied(entry, session_id)
+                    seen["applied"].append((seconds, sessions, source))
+                return current_data
+
+            if not data_file.exists():
+                _ensure_data_file_exists(data_file=data_file)
+            safe_update_json(str(data_file), update_func, durable=_durable(), journal=True)
+            applied += len(seen["applied"])
+            if len(seen["applied"]) < len(entries):
+                logger.info(
+                    "%d entradas já aplicadas ignoradas em %s",
+                    len(entries) - len(seen["applied"]), data_file.name
+                )
+
+            if single_sessions:
+                guild_stats.record_sessions(
+                    data_file, seen["version"], [seconds for seconds, _, _ in seen["applied"]],
+                    new_users=seen["new_users"]
+                )
+            else:
+                guild_stats.adjust_totals(
+                    data_file,
+                    seen["version"],
+                    users=seen["new_users"],
+                    seconds=sum(seconds for seconds, _, _ in seen["applied"]),
+                    sessions=sum(sessions for _, sessions, _ in seen["applied"])
+                )
+            if on_applied is not None and seen["applied"]:
+                on_applied([source for _, _, source in seen["applied"]])
+    except FileLockError as e:
+        raise RuntimeError(f"Erro ao {action}: {e}")
+    finally:
+        if by_file:
+            _bump_data_version()
+
+    return applied
+
+
+def apply_session_deltas(
+    deltas: Iterable[Tuple],
+    on_applied: Optional[Callable[[List[Tuple]], None]] = None
+) -> int:
+    """
+    Aplica um lote de sessões encerradas com uma escrita por partição.
+
+    Cada delta tem a mesma semântica de update_video_time (upsert: soma a
+    duração e incrementa as sessões), mas o lote inteiro de uma partição é
+    gravado em um único read-modify-write.
+
+    Deltas com id de sessão são idempotentes: reaplicar um lote (ex: após uma
+    falha no meio de um lote com várias partições, ou um reenvio ao
+    storage_service) não soma de novo as sessões já gravadas.
 
+    Args:
+        deltas: Sequência de (user_id, duração em segundos, guild_id) ou
+            (user_id, duração, guild_id, id da sessão (origem, n), ...);
+            campos após o id da sessão são ignorados aqui
+        on_applied: Chamada após a escrita de cada partição com os deltas
+            aplicados nela (nunca os já aplicados antes), para gravar dados
+            derivados (histórico, mapa de calor) uma única vez por sessão
+
+    Returns:
+        int: Número de deltas aplicados (sem os já aplicados antes)
+
+    Raises:
+        ValueError: Se alguma duração for negativa
+        RuntimeError: Se ocorrer erro no bloqueio de arquivo
+    """
+    by_file: Dict[Path, List[Tuple[str, int, int, Optional[Tuple[str, int]], Tuple]]] = {}
+    for delta in deltas:
+        user_id, duration, guild_id, *rest = delta
+        if duration < 0:
+            raise ValueError("duration must be non-negative")
+        by_file.setdefault(data_file_for(guild_id), []).append(
+            (user_id, duration, 1, rest[0] if rest else None, delta)
+        )
+
+    return _upsert_batch(by_file, "aplicar sessões", single_sessions=True, on_applied=on_applied)
+
+
+def merge_totals(records: Iterable[Tuple[str, int, int, Optional[int]]]) -> int:
+    """
+    Soma totais agregados (ex: importados de outro bot) com uma escrita por partição.
+
+    Mesma semântica de upsert de update_video_time, mas cada registro traz
+    o total de segundos e de sessões a somar.
+
+    Args:
+        records: Sequência de (user_id, segundos, sessões, guild_id)
+
+    Returns:
+        int: Número de registros aplicados
+
+    Raises:
+        ValueError: Se segundos ou sessões forem negativos
+        RuntimeError: Se ocorrer erro no bloqueio de arquivo
+    """
+    by_file: Dict[Path, List[Tuple[str, int, int, None, Any]]] = {}
+    for record in records:
+        user_id, seconds, sessions, guild_id = record
+        if seconds < 0 or sessions < 0:
+            raise ValueError("seconds and sessions must be non-negative")
+        by_file.setdefault(data_file_for(guild_id), []).append(
+            (user_id, seconds, sessions, None, record)
+        )
+
+    return _upsert_batch(by_file, "importar registros")
+
+
+def guild_stats_summary(guild_id: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Estatísticas agregadas da partição de um guild, sem varrer os usuários.
+
+    Lê o arquivo de estatísticas mantido incrementalmente pelas escritas
+    (ver guild_stats.py); o custo independe do número de usuários.
+
+    Args:
+        guild_id: ID do guild (usado apenas com PARTITION_BY_GUILD)
+
+    Returns:
+        Dict[str, Any]: Totais, média, mediana, p90 e histograma de sessões
+    """
+    return guild_stats.load_stats(data_file_for(guild_id)).summary()
+
+
+# ============================================================================
+# OPERAÇÕES ADMINISTRATIVAS (Fase 2 do PRD)
+# ============================================================================
+
+def reset_all_data(guild_id: Optional[int] = None) -> Path:
+    """
+    Zera o ranking inteiro em O(1).
+
+    Em vez de reescrever cada registro, o arquivo atual é arquivado via
+    rename (nova "época") e um arquivo vazio é publicado no lugar. O custo
+    independe do número de usuários e o histórico anterior continua
+    disponível no arquivo arquivado.
+
+    Args:
+        guild_id: ID do guild (usado apenas com PARTITION_BY_GUILD)
+
+    Returns:
+        Path: Caminho do arquivo arquivado com os dados da época anterior
+
+    Raises:
+        RuntimeError: Se ocorrer erro no bloqueio de arquivo
+    """
+    data_file = data_file_for(guild_id)
+    _ensure_data_file_exists(data_file=data_file)
+    archive_path = data_file.with_name(
+        f"{data_file.stem}.epoch-{time.time_ns()}{data_file.suffix}"
+    )
+
+    try:
+        rotate_json_file(str(data_file), str(archive_path), durable=_durable(), journal=True)
+        guild_stats.reset_stats(data_file)
+    except FileLockError as e:
+        raise RuntimeError(f"Erro ao resetar dados: {e}")
+    finally:
+        _bump_data_version()
+
+    return archive_path
+
+
+def apply_adjustments(
+    adjustments: Dict[str, int],
+    guild_id: Optional[int] = None
+) -> Dict[str, Dict[str, int]]:
+    """
+    Aplica vários ajustes de tempo em uma única transação.
+
+    Todos os ajustes são aplicados sob o mesmo lock e gravados em uma
+    única escrita, independente de quantos usuários forem afetados.
+    O tempo total de um usuário nunca fica negativo.
+
+    Args:
+        adjustments: Dict {user_id: segundos}, onde segundos pode ser negativo
+        guild_id: ID do guild (usado apenas com PARTITION_BY_GUILD)
+
+    Returns:
+        Dict[str, Dict[str, int]]: Registros resultantes dos usuários ajustados
 
-# Inicialização: criar arquivo vazio se não existir
-if not DATA_FILE.exists():
+    Raises:
+        RuntimeError: Se ocorrer erro no bloqueio de arquivo
+
+    Example:
+        >>> apply_adjustments({"123456789012345678": -600})
+        {'123456789012345678': {'total_seconds': 3000, 'sessions': 5}}
+    """
+    result: Dict[str, Dict[str, int]] = {}
+    changes = {"version": None, "users": 0, "seconds": 0}
+
+    def update_func(current_data: Dict[str, Dict[str, int]]) -> Dict[str, Dict[str, int]]:
+        """Aplica todos os ajustes no mesmo read-modify-write."""
+        changes.update(version=guild_stats.file_version(data_file), users=0, seconds=0)
+        for user_id, seconds in adjustments.items():
+            if user_id not in current_data:
+                changes["users"] += 1
+            entry = current_data.setdefault(
+                user_id, {"total_seconds": 0, "sessions": 0}
+            )
+            previous = entry["total_seconds"]
+            entry["total_seconds"] = max(0, previous + seconds)
+            changes["seconds"] += entry["total_seconds"] - previous
+            result[user_id] = dict(entry)
+        return current_data
+
+    if not adjustments:
+        return result
+
+    data_file = data_file_for(guild_id)
+    _ensure_data_file_exists(data_file=data_file)
     try:
-        atomic_write_json({}, str(DATA_FILE))
-    except FileLockError:
-        # Se falhar o bloqueio, tentar criar sem bloqueio (fallback)
-        with open(DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump({}, f, indent=2, ensure_ascii=False)
+        safe_update_json(str(data_file), update_func, durable=_durable(), journal=True)
+        guild_stats.adjust_totals(
+            data_file, changes["version"], users=changes["users"], seconds=changes["seconds"]
+        )
+    except FileLockError as e:
+        raise RuntimeError(f"Erro ao ajustar dados: {e}")
+    finally:
+        _bump_data_version()
+
+    return result
+
+
+def reset_user(user_id: str, guild_id: Optional[int] = None) -> Optional[Dict[str, int]]:
+    """
+    Remove todos os dados de um usuário.
+
+    Os ids das sessões aplicadas saem junto: uma sessão ainda em um lote
+    pendente (group commit, storage_service) conta como encerrada depois
+    do reset, como qualquer sessão que termine depois dele.
+
+    Args:
+        user_id: ID do usuário Discord (string)
+        guild_id: ID do guild (usado apenas com PARTITION_BY_GUILD)
+
+    Returns:
+        Optional[Dict[str, int]]: Registro removido ou None se não existia
+
+    Raises:
+        RuntimeError: Se ocorrer erro no bloqueio de arquivo
+    """
+    removed: Dict[str, Any] = {"entry": None, "version": None}
+
+    def update_func(current_data: Dict[str, Dict[str, int]]) -> Dict[str, Dict[str, int]]:
+        """Remove o registro do usuário."""
+        removed["version"] = guild_stats.file_version(data_file)
+        removed["entry"] = current_data.pop(user_id, None)
+        return current_data
+
+    data_file = data_file_for(guild_id)
+    _ensure_data_file_exists(data_file=data_file)
+    try:
+        safe_update_json(str(data_file), update_func, durable=_durable(), journal=True)
+        entry = removed["entry"]
+        if entry is not None:
+            guild_stats.adjust_totals(
+                data_file, removed["version"], users=-1,
+                seconds=-entry["total_seconds"], sessions=-entry["sessions"]
+            )
+    except FileLockError as e:
+        raise RuntimeError(f"Erro ao resetar usuário: {e}")
+    finally:
+        _bump_data_version()
+
+    return removed["entry"]
+
+
+def merge_users(
+    source_id: str,
+    target_id: str,
+    guild_id: Optional[int] = None
+) -> Optional[Dict[str, int]]:
+    """
+    Mescla os dados de um usuário em outro em uma única transação.
+
+    Soma tempo e sessões da origem no destino e remove a origem.
+    Útil quando uma pessoa troca de conta.
+
+    Args:
+        source_id: ID do usuário de origem (será removido)
+        target_id: ID do usuário de destino
+        guild_id: ID do guild (usado apenas com PARTITION_BY_GUILD)
+
+    Returns:
+        Optional[Dict[str, int]]: Registro resultante do destino, ou None
+            se a origem não possuía dados
+
+    Raises:
+        ValueError: Se origem e destino forem o mesmo usuário
+        RuntimeError: Se ocorrer erro no bloqueio de arquivo
+    """
+    if source_id == target_id:
+        raise ValueError("source_id e target_id devem ser diferentes")
+
+    merged: Dict[str, Optional[Dict[str, int]]] = {"entry": None}
+    removed_users = {"count": 0, "version": None}
+
+    def update_func(current_data: Dict[str, Dict[str, int]]) -> Dict[str, Dict[str, int]]:
+        """Move o registro de origem para o destino."""
+        removed_users["version"] = guild_stats.file_version(data_file)
+        source = current_data.pop(source_id, None)
+        if source is None:
+            return current_data
+
+        removed_users["count"] = int(target_id in current_data)
+
+        target = current_data.setdefault(
+            target_id, {"total_seconds": 0, "sessions": 0}
+        )
+        target["total_seconds"] += source["total_seconds"]
+        target["sessions"] += source["sessions"]
+        merged["entry"] = dict(target)
+        return current_data
+
+    data_file = data_file_for(guild_id)
+    _ensure_data_file_exists(data_file=data_file)
+    try:
+        safe_update_json(str(data_file), update_func, durable=_durable(), journal=True)
+        if removed_users["count"]:
+            guild_stats.adjust_totals(data_file, removed_users["version"], users=-1)
+    except FileLockError as e:
+        raise RuntimeError(f"Erro ao mesclar usuários: {e}")
+    finally:
+        _bump_data_version()
+
+    return merged["entry"]
+
@@ -3,14 +3,28 @@ Módulo de bloqueio de arquivos para operações de banco de dados seguras.
 
 Este módulo implementa mecanismos de bloqueio de arquivos para garantir
 operações atômicas e seguras em operações de leitura/escrita de JSON.
+
+Escritores se serializam por um arquivo de lock ao lado dos dados
+(``<arquivo>.lock``) e publicam cada versão com os.replace; leitores
+apenas abrem o arquivo, sem lock.
+
+Arquivos gravados com journal=True têm gerações com checksum e um journal
+das escritas (ver snapshot_journal): um arquivo corrompido é restaurado do
+último snapshot válido mais o tail do journal. Um arquivo corrompido sem
+recuperação possível levanta CorruptedFileError em vez de ser lido como
+vazio (e sobrescrito pela próxima escrita).
 """
 
 import json
+import logging
 import os
+import re
 import time
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Callable, Dict, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import snapshot_journal
 
 try:
     import portalocker
@@ -18,11 +32,19 @@ except ImportError:
     portalocker = None
 
 
+logger = logging.getLogger(__name__)
+
+
 class FileLockError(Exception):
     """Exceção levantada quando ocorre erro no bloqueio de arquivo."""
     pass
 
 
+class CorruptedFileError(FileLockError):
+    """Arquivo JSON corrompido e sem snapshot válido para restaurar."""
+    pass
+
+
 @contextmanager
 def acquire_file_lock(file_path: str, timeout: int = 30, mode: str = 'r+'):
     """
@@ -77,7 +99,154 @@ def acquire_file_lock(file_path: str, timeout: int = 30, mode: str = 'r+'):
                 logging.getLogger("bate-ponto").warning(f"Error closing file {file_path}: {e}")
 
 
-def atomic_write_json(data: Dict[str, Any], file_path: str, timeout: int = 30) -> None:
+def _lock_path(file_path: str) -> str:
+    """
+    Caminho do arquivo de lock dos escritores de ``file_path``.
+
+    O lock fica em um arquivo separado e estável: o arquivo de dados é
+    substituído por os.replace a cada escrita (novo inode), então um lock
+    sobre ele não excluiria um escritor que abriu o caminho depois da troca.
+    """
+    return file_path + '.lock'
+
+
+@contextmanager
+def writer_lock(file_path: str, timeout: int = 30):
+    """
+    Context manager que serializa os escritores de um arquivo JSON.
+
+    Leitores não usam este lock (ver safe_load_json).
+
+    Args:
+        file_path: Caminho do arquivo JSON protegido
+        timeout: Tempo máximo de espera para bloqueio (segundos)
+
+    Raises:
+        FileLockError: Se não conseguir adquirir o bloqueio no tempo especificado
+    """
+    Path(file_path).parent.mkdir(parents=True, exist_ok=True)
+    # 'a+' cria o arquivo de lock se ainda não existir
+    with acquire_file_lock(_lock_path(file_path), timeout=timeout, mode='a+') as f:
+        yield f
+
+
+def fsync_directory(directory: str) -> None:
+    """
+    Sincroniza a entrada de diretório após um rename (os.replace).
+
+    Sem isso o rename pode não sobreviver a uma queda de energia mesmo com
+    o conteúdo do arquivo já em disco. Sistemas sem fsync de diretório
+    (ex: Windows) são ignorados.
+
+    Args:
+        directory: Diretório que contém o arquivo publicado
+    """
+    try:
+        fd = os.open(directory or '.', os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _publish(temp_file_path: str, file_path: str, durable: bool = False, retries: int = 5) -> None:
+    """
+    Publica ``temp_file_path`` como ``file_path`` em um único rename atômico.
+
+    No Windows o rename falha enquanto um leitor mantém o arquivo aberto;
+    leituras são curtas, então algumas novas tentativas bastam.
+
+    Args:
+        temp_file_path: Arquivo temporário já escrito
+        file_path: Caminho publicado
+        durable: Sincroniza o diretório após o rename
+        retries: Tentativas de rename no Windows
+    """
+    for attempt in range(retries):
+        try:
+            os.replace(temp_file_path, file_path)
+            break
+        except PermissionError:
+            if attempt == retries - 1:
+                raise
+            time.sleep(0.01 * (2 ** attempt))
+
+    if durable:
+        fsync_directory(os.path.dirname(os.path.abspath(file_path)))
+
+
+def _write_temp_json(data: Dict[str, Any], file_path: str, durable: bool = False) -> Tuple[str, str]:
+    """Escreve ``data`` no arquivo temporário de ``file_path``
+
+    Com ``durable`` o conteúdo vai para o disco (fsync) antes do rename.
+
+    Returns:
+        Tuple[str, str]: Caminho do temporário e sha256 do conteúdo
+    """
+    file_path_obj = Path(file_path)
+    temp_file_path = str(file_path_obj.with_suffix(file_path_obj.suffix + '.tmp'))
+    with open(temp_file_path, 'w', encoding='utf-8', newline='\n') as f:
+        writer = snapshot_journal.HashingWriter(f)
+        json.dump(data, writer, indent=2, ensure_ascii=False)
+        if durable:
+            f.flush()
+            os.fsync(f.fileno())
+    return temp_file_path, writer.hexdigest()
+
+
+def _publish_generation(
+    data: Dict[str, Any],
+    file_path: str,
+    durable: bool = False,
+    journal: bool = False,
+    changes: Optional[Tuple[Dict[str, Any], List[str]]] = None,
+    generation: Optional[int] = None
+) -> None:
+    """
+    Escreve e publica um snapshot, registrando a geração no journal.
+
+    Deve ser chamada com o writer_lock de ``file_path``.
+
+    Args:
+        data: Conteúdo do snapshot
+        file_path: Caminho publicado
+        durable: fsync do snapshot, do journal e do diretório
+        journal: Registra a geração (snapshot_journal)
+        changes: Diff da escrita incremental; None = reescrita completa
+        generation: Geração do snapshot (default: a seguinte à do journal)
+    """
+    temp_file_path, digest = _write_temp_json(data, file_path, durable)
+    if journal:
+        if generation is None:
+            last = snapshot_journal.last_generation(file_path, durable)
+            generation = 1 if last is None else last + 1
+        snapshot_journal.commit(file_path, temp_file_path, digest, generation, changes, durable)
+    _publish(temp_file_path, file_path, durable)
+
+
+def _cleanup_temp(file_path: str) -> None:
+    """Remove o arquivo temporário de ``file_path`` após uma falha"""
+    file_path_obj = Path(file_path)
+    temp_file_path = str(file_path_obj.with_suffix(file_path_obj.suffix + '.tmp'))
+    if os.path.exists(temp_file_path):
+        try:
+            os.remove(temp_file_path)
+        except Exception as cleanup_error:
+            import logging
+            logging.getLogger("bate-ponto").warning(f"Failed to cleanup temp file {temp_file_path}: {cleanup_error}")
+
+
+def atomic_write_json(
+    data: Dict[str, Any],
+    file_path: str,
+    timeout: int = 30,
+    durable: bool = False,
+    journal: bool = False
+) -> None:
     """
     Escreve dados JSON de forma atômica com bloqueio de arquivo.
 
@@ -85,6 +254,8 @@ def atomic_write_json(data: Dict[str, Any], file_path: str, timeout: int = 30) -
         data: Dados a serem escritos no formato JSON
         file_path: Caminho do arquivo JSON
         timeout: Tempo máximo de espera para bloqueio (segundos)
+        durable: fsync do arquivo e do diretório antes de retornar
+        journal: Registra a escrita como geração com checkpoint
 
     Raises:
         FileLockError: Se não conseguir bloquear o arquivo
@@ -94,69 +265,296 @@ def atomic_write_json(data: Dict[str, Any], file_path: str, timeout: int = 30) -
     if not isinstance(data, dict):
         raise ValueError("Os dados devem ser um dicionário")
 
-    # Garantir que o diretório existe
-    Path(file_path).parent.mkdir(parents=True, exist_ok=True)
-
-    # Temp file no mesmo diretório para garantir atomic rename
-    file_path_obj = Path(file_path)
-    temp_file_path = str(file_path_obj.with_suffix(file_path_obj.suffix + '.tmp'))
-
     try:
-        # Adquirir lock e escrever de forma atômica
-        with acquire_file_lock(file_path, timeout=timeout, mode='r+'):
-            # Escrever no arquivo temporário primeiro
-            with open(temp_file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-
-            # Usar os.replace em vez de os.rename (funciona em todos os sistemas)
-            os.replace(temp_file_path, file_path)
+        # Escritores serializados pelo lock; leitores veem o arquivo antigo
+        # ou o novo inteiro, nunca uma escrita pela metade
+        with writer_lock(file_path, timeout=timeout):
+            _publish_generation(data, file_path, durable, journal)
 
     except Exception as e:
         # Limpar arquivo temporário em caso de erro
-        if os.path.exists(temp_file_path):
-            try:
-                os.remove(temp_file_path)
-            except Exception as cleanup_error:
-                import logging
-                logging.getLogger("bate-ponto").warning(f"Failed to cleanup temp file {temp_file_path}: {cleanup_error}")
+        _cleanup_temp(file_path)
         raise FileLockError(f"Erro ao escrever arquivo JSON: {e}")
 
 
-def safe_load_json(file_path: str, default_data: Optional[Dict] = None) -> Dict[str, Any]:
+def _read_json(file_path: str, default_data: Dict) -> Dict[str, Any]:
+    """
+    Lê o snapshot publicado (default_data se o arquivo não existir).
+
+    Raises:
+        ValueError: Se o conteúdo não for um objeto JSON válido
+        FileLockError: Em outros erros de leitura
+    """
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return default_data.copy()
+    except ValueError:
+        raise
+    except Exception as e:
+        raise FileLockError(f"Erro ao carregar arquivo JSON: {e}")
+    if not isinstance(data, dict):
+        raise ValueError("o conteúdo não é um objeto JSON")
+    return data
+
+
+def _preserve_corrupt(file_path: str) -> Optional[str]:
+    """Guarda uma cópia do arquivo corrompido para análise (hardlink)"""
+    if not os.path.exists(file_path):
+        return None
+    target = f"{file_path}.corrupt-{int(time.time())}"
+    try:
+        snapshot_journal.link_or_copy(file_path, target)
+    except OSError:
+        return None
+    return target
+
+
+def _recover_locked(file_path: str, reason: str) -> Dict[str, Any]:
     """
-    Carrega dados JSON de forma segura com bloqueio de leitura.
+    Restaura ``file_path`` do último snapshot válido mais o tail do journal.
+
+    Deve ser chamada com o writer_lock. O estado restaurado é publicado
+    como uma nova geração com checkpoint.
+
+    Raises:
+        CorruptedFileError: Se não houver journal ou snapshot válido
+    """
+    start = time.perf_counter()
+    result = snapshot_journal.replay_journal(file_path)
+    if result is None:
+        logger.error("Arquivo %s corrompido (%s) e sem snapshot válido para restaurar", file_path, reason)
+        raise CorruptedFileError(f"Arquivo JSON corrompido sem recuperação: {file_path} ({reason})")
+
+    data, base, replayed, base_path, last = result
+    copy = _preserve_corrupt(file_path) if base_path != file_path else None
+    _publish_generation(data, file_path, durable=True, journal=True, generation=last + 1)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if base_path == file_path:
+        logger.warning(
+            "%s: journal à frente do snapshot, %d registro(s) reaplicado(s) em %.1fms",
+            file_path, replayed, elapsed_ms
+        )
+    else:
+        logger.error(
+            "Arquivo %s corrompido (%s): restaurado da geração %d + %d registro(s) do journal em %.1fms "
+            "(cópia do arquivo corrompido: %s)",
+            file_path, reason, base, replayed, elapsed_ms, copy
+        )
+    return data
+
+
+def _load_locked(file_path: str, default_data: Dict, strict: bool = True) -> Dict[str, Any]:
+    """Lê o snapshot com o writer_lock, restaurando-o se estiver corrompido"""
+    try:
+        return _read_json(file_path, default_data)
+    except ValueError as e:
+        try:
+            return _recover_locked(file_path, str(e))
+        except CorruptedFileError:
+            if strict:
+                raise
+            return default_data.copy()
+
+
+def safe_load_json(file_path: str, default_data: Optional[Dict] = None, strict: bool = True) -> Dict[str, Any]:
+    """
+    Carrega o snapshot atual de um arquivo JSON sem bloqueio.
+
+    Todo escritor publica o arquivo inteiro com os.replace, então abrir o
+    caminho sempre entrega um snapshot completo e imutável: a leitura não
+    espera escritores nem os bloqueia (ex: !rankingvideo durante gravações).
+
+    Um arquivo corrompido (ex: escrita cortada por queda de energia) nunca
+    é lido como vazio: com journal ele é restaurado (ver _recover_locked);
+    sem, o erro é registrado e levantado.
 
     Args:
         file_path: Caminho do arquivo JSON
-        default_data: Dados padrão se o arquivo não existir ou estiver corrompido
+        default_data: Dados padrão se o arquivo não existir
+        strict: False retorna default_data (com log de erro) para arquivos
+            corrompidos sem recuperação; para dados derivados, reconstruíveis
 
     Returns:
         Dict: Dados carregados do arquivo ou dados padrão
+
+    Raises:
+        CorruptedFileError: Se o arquivo estiver corrompido sem recuperação (strict)
+        FileLockError: Em outros erros de leitura
     """
     if default_data is None:
         default_data = {}
 
-    if not os.path.exists(file_path):
-        return default_data.copy()
+    try:
+        return _read_json(file_path, default_data)
+    except ValueError:
+        pass
+
+    # Corrompido: restaurar com o lock dos escritores (outro processo pode
+    # já ter restaurado; _load_locked relê antes)
+    with writer_lock(file_path):
+        return _load_locked(file_path, default_data, strict)
+
+
+def verify_json_file(file_path: str, timeout: int = 30) -> bool:
+    """
+    Confere o checksum do snapshot publicado com o journal.
+
+    Usada na inicialização: custa um sha256 do arquivo. Um arquivo que não
+    confere com a última geração é restaurado (ver _recover_locked); um
+    arquivo sem journal não é verificado.
+
+    Args:
+        file_path: Caminho do arquivo JSON
+        timeout: Tempo máximo de espera para bloqueio (segundos)
+
+    Returns:
+        bool: True se o arquivo confere (ou não tem journal)
+
+    Raises:
+        CorruptedFileError: Se não conferir e não houver snapshot válido
+    """
+    if not os.path.exists(snapshot_journal.journal_path(file_path)):
+        return True
+    with writer_lock(file_path, timeout=timeout):
+        record = snapshot_journal.last_record(file_path)
+        if record is not None and record.get('sha') == snapshot_journal.file_digest(file_path):
+            return True
+        _recover_locked(file_path, "checksum não confere com o journal")
+        return False
+
+
+class _ChunkReader:
+    """Leitor em blocos para decodificar um objeto JSON membro a membro"""
+
+    _WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+    def __init__(self, file_obj, chunk_size: int):
+        self._file = file_obj
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        """Descarta o que já foi consumido e lê o próximo bloco"""
+        if self.eof:
+            return False
+        chunk = self._file.read(self._chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Próximo caractere não branco (sem consumir); '' no fim do arquivo"""
+        while True:
+            self.pos = self._WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char: str) -> None:
+        """Consome ``char`` ou levanta JSONDecodeError"""
+        if self.peek() != char:
+            raise json.JSONDecodeError(f"Esperado {char!r}", self.buffer, self.pos)
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decodifica o próximo valor JSON, lendo mais blocos se necessário"""
+        self.peek()
+        while True:
+            try:
+                obj, end = self._decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # Um número no fim do bloco pode continuar no próximo
+            if end == len(self.buffer) and self._fill():
+                continue
+            self.pos = end
+            return obj
+
+
+def iter_json_members(file_obj, chunk_size: int = 1 << 16) -> Iterator[Tuple[str, Any]]:
+    """
+    Itera os pares (chave, valor) de um objeto JSON lido de um arquivo aberto.
+
+    Args:
+        file_obj: Arquivo em modo texto (ex: open(..., 'r') ou gzip.open(..., 'rt'))
+        chunk_size: Tamanho dos blocos lidos
+
+    Yields:
+        Tuple[str, Any]: Chave e valor de cada membro, na ordem do arquivo
+
+    Raises:
+        json.JSONDecodeError: Se o conteúdo não for um objeto JSON válido
+    """
+    reader = _ChunkReader(file_obj, chunk_size)
+    if reader.peek() == '':
+        return
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+
+    while True:
+        key = reader.value()
+        if not isinstance(key, str):
+            raise json.JSONDecodeError("Chave deve ser string", reader.buffer, reader.pos)
+        reader.expect(':')
+        yield key, reader.value()
+
+        separator = reader.peek()
+        if separator == ',':
+            reader.pos += 1
+        elif separator == '}':
+            return
+        else:
+            raise json.JSONDecodeError("Esperado ',' ou '}'", reader.buffer, reader.pos)
+
+
+def iter_json_object(file_path: str, chunk_size: int = 1 << 16) -> Iterator[Tuple[str, Any]]:
+    """
+    Itera os pares (chave, valor) de um objeto JSON sem carregá-lo inteiro.
 
+    O arquivo é aberto uma única vez: como escritores publicam com
+    os.replace, a iteração inteira enxerga o mesmo snapshot, mesmo que
+    novas versões sejam publicadas no meio dela. A memória usada é a de um
+    bloco mais o maior valor, independente do tamanho do arquivo.
+
+    Args:
+        file_path: Caminho do arquivo JSON (objeto no nível raiz)
+        chunk_size: Tamanho dos blocos lidos do disco
+
+    Yields:
+        Tuple[str, Any]: Chave e valor de cada membro, na ordem do arquivo
+
+    Raises:
+        json.JSONDecodeError: Se o arquivo não for um objeto JSON válido
+    """
     try:
-        # Usar o file handle retornado pelo lock em vez de re-abrir o arquivo
-        with acquire_file_lock(file_path, mode='r') as f:
-            data = json.load(f)
-            if not isinstance(data, dict):
-                return default_data.copy()
-            return data
-    except (json.JSONDecodeError, FileLockError, FileNotFoundError):
-        return default_data.copy()
-    except Exception as e:
-        raise FileLockError(f"Erro ao carregar arquivo JSON: {e}")
+        file_obj = open(file_path, 'r', encoding='utf-8')
+    except FileNotFoundError:
+        return
+
+    with file_obj:
+        yield from iter_json_members(file_obj, chunk_size)
 
 
 def safe_update_json(
     file_path: str,
     update_func: Callable[[Dict[str, Any]], Dict[str, Any]],
     timeout: int = 30,
-    default_data: Optional[Dict] = None
+    default_data: Optional[Dict] = None,
+    durable: bool = False,
+    journal: bool = False,
+    strict: bool = True
 ) -> Dict[str, Any]:
     """
     Atualiza dados JSON de forma segura com bloqueio exclusivo.
@@ -169,11 +567,17 @@ def safe_update_json(
         update_func: Função que recebe os dados atuais e retorna os dados atualizados
         timeout: Tempo máximo de espera para bloqueio (segundos)
         default_data: Dados padrão se o arquivo não existir
+        durable: fsync do arquivo e do diretório antes de retornar
+        journal: Registra as chaves alteradas no journal (snapshot_journal)
+        strict: False parte de default_data se o arquivo estiver corrompido
+            sem recuperação (dados derivados)
 
     Returns:
         Dict: Dados atualizados após a operação
 
     Raises:
+        CorruptedFileError: Se o arquivo estiver corrompido sem recuperação
+            (nada é gravado por cima dele)
         FileLockError: Se não conseguir bloquear o arquivo
     """
     if default_data is None:
@@ -181,25 +585,75 @@ def safe_update_json(
 
     try:
         # Adquirir lock para toda operação read-modify-write (evita TOCTOU)
-        with acquire_file_lock(file_path, timeout=timeout, mode='r+') as f:
-            # Ler dados atuais
-            try:
-                f.seek(0)
-                data = json.load(f)
-                if not isinstance(data, dict):
-                    data = default_data.copy()
-            except (json.JSONDecodeError, ValueError):
-                data = default_data.copy()
+        with writer_lock(file_path, timeout=timeout):
+            # Ler o snapshot atual (ninguém mais publica enquanto o lock é nosso)
+            data = _load_locked(file_path, default_data, strict)
+
+            generation = None
+            if journal:
+                last = snapshot_journal.last_generation(file_path, durable)
+                if last is None:
+                    last = snapshot_journal.bootstrap(file_path, durable)
+                generation = last + 1
+                before = snapshot_journal.copy_entries(data)
 
             # Aplicar atualização
             updated_data = update_func(data)
 
-            # Escrever de volta ao arquivo (com truncate)
-            f.seek(0)
-            json.dump(updated_data, f, indent=2, ensure_ascii=False)
-            f.truncate()
+            # Publicar o novo snapshot atomicamente (nunca truncar no lugar)
+            changes = snapshot_journal.diff_entries(before, updated_data) if journal else None
+            _publish_generation(updated_data, file_path, durable, journal, changes, generation)
 
             return updated_data
 
+    except CorruptedFileError:
+        raise
+    except Exception as e:
+        _cleanup_temp(file_path)
+        raise FileLockError(f"Erro ao atualizar arquivo JSON: {e}")
+
+
+def rotate_json_file(
+    file_path: str,
+    archive_path: str,
+    timeout: int = 30,
+    initial_data: Optional[Dict] = None,
+    durable: bool = False,
+    journal: bool = False
+) -> None:
+    """
+    Arquiva o arquivo JSON atual e publica um novo arquivo no lugar.
+
+    A operação custa dois renames, independente do tamanho dos dados:
+    o arquivo atual é movido para ``archive_path`` e um arquivo com
+    ``initial_data`` (default: dict vazio) é publicado atomicamente.
+
+    Args:
+        file_path: Caminho do arquivo JSON ativo
+        archive_path: Caminho de destino do arquivo arquivado
+        timeout: Tempo máximo de espera para bloqueio (segundos)
+        initial_data: Conteúdo do novo arquivo
+        durable: fsync do novo arquivo e do diretório antes de retornar
+        journal: Registra o novo arquivo como geração com checkpoint
+
+    Raises:
+        FileLockError: Se não conseguir bloquear ou renomear o arquivo
+    """
+    if initial_data is None:
+        initial_data = {}
+
+    try:
+        with writer_lock(file_path, timeout=timeout):
+            # Preparar o novo arquivo antes de mexer no atual
+            temp_file_path, digest = _write_temp_json(initial_data, file_path, durable)
+            if journal:
+                last = snapshot_journal.last_generation(file_path, durable)
+                snapshot_journal.commit(file_path, temp_file_path, digest, 1 if last is None else last + 1,
+                                        durable=durable)
+
+            os.replace(file_path, archive_path)
+            _publish(temp_file_path, file_path, durable)
+
     except Exception as e:
-        raise FileLockError(f"Erro ao atualizar arquivo JSON: {e}")
\ No newline at end of file
+        _cleanup_temp(file_path)
+        raise FileLockError(f"Erro ao rotacionar arquivo JSON: {e}")
@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+"""
+event_trace.py - Gravação e replay determinístico dos eventos de voz.
+
+Gravação: com EVENT_TRACE_FILE definido, cada VOICE_STATE_UPDATE que chega
+a events.on_voice_state_update vira uma linha JSON compacta:
+
+    {"t": 5123.402117, "w": 1718000000.512, "g": 123, "u": 456,
+     "c": [canal_antes, canal_depois], "b": 0, "a": 1}
+
+    t: relógio monotônico do recebimento (durações)
+    w: horário de parede do recebimento (histórico)
+    b / a: flags antes / depois (VIDEO=1, STREAM=2, MUTE=4, DEAF=8)
+
+O handler só enfileira uma tupla; a codificação e a escrita acontecem em
+uma thread própria (como o logging, ver utils.configure_logging). O
+arquivo é rotacionado ao passar de EVENT_TRACE_MAX_BYTES, mantendo
+EVENT_TRACE_BACKUPS arquivos anteriores (trace.jsonl.1 é o mais recente).
+
+Replay: replay() lê os arquivos do mais antigo ao mais recente e chama
+on_voice_state_update com membros e estados simulados. Os instantes são
+os gravados (o handler os recebe como instantes de recebimento do
+gateway) e a janela de coalescência (CAMERA_GRACE_SECONDS) corre no tempo
+do trace, de modo que as sessões e totais gerados não dependem da
+velocidade: 1x reproduz o ritmo de produção (o atraso de dispatch medido
+é o do replay) e a velocidade máxima serve para benchmarks de regressão e
+para reconstruir os agregados a partir do trace bruto.
+
+O replay grava sempre direto no arquivo de dados (nunca no storage_service
+nem no buffer de group commit) e só grava histórico e mapa de calor nos
+diretórios passados explicitamente: reconstruir em um arquivo novo não
+duplica os dados de produção. A CLI exige --data-file diferente do
+arquivo configurado: as sessões do trace já estão nele e o replay as
+somaria de novo.
+
+Uso:
+    python event_trace.py voice.trace.jsonl --speed max --data-file rebuilt.json \
+        [--history-dir rebuilt_history] [--heatmap-dir rebuilt_heatmaps]
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from config import EVENT_TRACE_BACKUPS, EVENT_TRACE_FILE, EVENT_TRACE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+# Flags de estado de voz gravadas em "b" / "a"
+VIDEO = 1
+STREAM = 2
+MUTE = 4
+DEAF = 8
+
+_FLAGS = (("self_video", VIDEO), ("self_stream", STREAM), ("self_mute", MUTE), ("self_deaf", DEAF))
+
+# (monotônico, parede, guild_id, user_id, canal antes, canal depois, flags antes, flags depois)
+TraceEvent = Tuple[float, float, Optional[int], int, Optional[int], Optional[int], int, int]
+
+
+def state_flags(state: Any) -> int:
+    """Flags (VIDEO | STREAM | MUTE | DEAF) de um discord.VoiceState"""
+    flags = 0
+    for attribute, flag in _FLAGS:
+        if getattr(state, attribute, False) is True:
+            flags |= flag
+    return flags
+
+
+def _channel_id(state: Any) -> Optional[int]:
+    channel_id = getattr(getattr(state, "channel", None), "id", None)
+    return channel_id if isinstance(channel_id, int) else None
+
+
+def encode_event(event: TraceEvent) -> str:
+    """Linha JSON (sem quebra de linha) de um evento"""
+    clock, wall, guild_id, user_id, before_channel, after_channel, before, after = event
+    return json.dumps(
+        {"t": round(clock, 6), "w": round(wall, 3), "g": guild_id, "u": user_id,
+         "c": [before_channel, after_channel], "b": before, "a": after},
+        separators=(",", ":")
+    )
+
+
+def decode_event(line: str) -> TraceEvent:
+    """
+    Evento de uma linha do trace.
+
+    Raises:
+        ValueError: Se a linha não for um evento válido
+    """
+    try:
+        data = json.loads(line)
+        before_channel, after_channel = data["c"]
+        return (float(data["t"]), float(data["w"]), data["g"], int(data["u"]),
+                before_channel, after_channel, int(data["b"]), int(data["a"]))
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"linha de trace inválida: {e}") from e
+
+
+# ============================================================================
+# GRAVAÇÃO
+# ============================================================================
+
+class TraceRecorder:
+    """Grava eventos de voz em JSONL rotativo a partir de uma thread própria
+
+    - record(): chamado no event loop; só enfileira a tupla do evento
+    - a thread codifica, escreve e rotaciona; o arquivo recebe flush
+      sempre que a fila esvazia
+    - close(): grava o que estiver na fila e para a thread
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = EVENT_TRACE_MAX_BYTES,
+        backups: int = EVENT_TRACE_BACKUPS
+    ):
+        """
+        Args:
+            path: Arquivo do trace (aberto em modo append)
+            max_bytes: Tamanho que dispara a rotação (0 = sem rotação)
+            backups: Arquivos anteriores mantidos (path.1 ... path.N)
+        """
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.recorded = 0
+        self.rotations = 0
+        self._queue: "queue.SimpleQueue[Optional[TraceEvent]]" = queue.SimpleQueue()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._write_loop, name="event-trace", daemon=True)
+        self._thread.start()
+
+    def record(self, clock: float, wall: datetime, guild_id: Optional[int], user_id: int,
+               before: Any, after: Any) -> None:
+        """
+        Enfileira uma transição de estado de voz.
+
+        Args:
+            clock: Instante monotônico do recebimento
+            wall: Horário de parede do recebimento
+            guild_id: ID do guild (None fora de guilds)
+            user_id: ID do membro
+            before: Estado de voz anterior
+            after: Estado de voz atual
+        """
+        self._queue.put((
+            clock, wall.timestamp(), guild_id, user_id,
+            _channel_id(before), _channel_id(after), state_flags(before), state_flags(after)
+        ))
+
+    def _write_loop(self) -> None:
+        while True:
+            event = self._queue.get()
+            while event is not None:
+                try:
+                    self._file.write(encode_event(event) + "\n")
+                    self.recorded += 1
+                    if self.max_bytes and self._file.tell() >= self.max_bytes:
+                        self._rotate()
+                except (OSError, TypeError, ValueError) as e:
+                    logger.warning("Falha ao gravar evento no trace: %s", e)
+                try:
+                    event = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            self._file.flush()
+            if event is None:
+                return
+
+    def _rotate(self) -> None:
+        """trace -> trace.1 -> ... -> trace.N (o mais antigo é descartado)"""
+        self._file.close()
+        if self.backups > 0:
+            for index in range(self.backups - 1, 0, -1):
+                source = self.path.with_name(f"{self.path.name}.{index}")
+                if source.exists():
+                    os.replace(source, self.path.with_name(f"{self.path.name}.{index + 1}"))
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        self._file = open(self.path, "w", encoding="utf-8")
+        self.rotations += 1
+
+    def close(self) -> None:
+        """Grava os eventos enfileirados e fecha o arquivo"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._file.close()
+
+
+# Instância global, criada sob demanda com EVENT_TRACE_FILE definido
+_trace_recorder: Optional[TraceRecorder] = None
+
+# Gravação suspensa durante um replay (o replay não grava a si mesmo)
+_replaying = False
+
+
+def get_trace_recorder() -> Optional[TraceRecorder]:
+    """
+    Retorna o gravador de eventos do processo.
+
+    Returns:
+        Optional[TraceRecorder]: None se EVENT_TRACE_FILE estiver vazio
+    """
+    global _trace_recorder
+    if not EVENT_TRACE_FILE or _replaying:
+        return None
+    if _trace_recorder is None:
+        _trace_recorder = TraceRecorder(EVENT_TRACE_FILE)
+    return _trace_recorder
+
+
+def close_trace_recorder() -> None:
+    """Grava os eventos pendentes do gravador global (shutdown)"""
+    global _trace_recorder
+    if _trace_recorder is not None:
+        _trace_recorder.close()
+        _trace_recorder = None
+
+
+# ============================================================================
+# REPLAY
+# ============================================================================
+
+def trace_files(path: str) -> List[Path]:
+    """
+    Arquivos de um trace, do mais antigo (path.N) ao atual (path).
+
+    Args:
+        path: Arquivo atual do trace
+
+    Returns:
+        List[Path]: Arquivos existentes em ordem cronológica
+    """
+    base = Path(path)
+    rotated = []
+    for candidate in base.parent.glob(f"{base.name}.*"):
+        suffix = candidate.name[len(base.name) + 1:]
+        if suffix.isdigit():
+            rotated.append((int(suffix), candidate))
+    files = [candidate for _, candidate in sorted(rotated, reverse=True)]
+    if base.exists():
+        files.append(base)
+    return files
+
+
+def iter_trace(path: str) -> Iterator[TraceEvent]:
+    """
+    Itera os eventos de um trace (incluindo os arquivos rotacionados).
+
+    Linhas inválidas (ex: a última linha de um processo interrompido) são
+    ignoradas com um aviso.
+
+    Yields:
+        TraceEvent: Eventos em ordem de gravação
+    """
+    for trace_file in trace_files(path):
+        with open(trace_file, encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield decode_event(line)
+                except ValueError as e:
+                    logger.warning("%s:%d: %s", trace_file, number, e)
+
+
+def _voice_state(channel_id: Optional[int], flags: int) -> SimpleNamespace:
+    """Estado de voz simulado com os atributos usados pelo handler"""
+    return SimpleNamespace(
+        channel=SimpleNamespace(id=channel_id) if channel_id is not None else None,
+        self_video=bool(flags & VIDEO),
+        self_stream=bool(flags & STREAM),
+        self_mute=bool(flags & MUTE),
+        self_deaf=bool(flags & DEAF),
+    )
+
+
+class ReplayStats(NamedTuple):
+    """Resultado de um replay"""
+    events: int
+    elapsed: float
+    trace_seconds: float
+
+
+async def replay(
+    path: str,
+    speed: float = 1.0,
+    handler: Optional[Callable[..., Any]] = None,
+    history_dir: Optional[Path] = None,
+    heatmap_dir: Optional[Path] = None
+) -> ReplayStats:
+    """
+    Reproduz um trace chamando o handler de voz com membros simulados.
+
+    Enquanto o replay roda, a gravação fica suspensa (o replay não grava a
+    si mesmo), as sessões vão direto para database.DATA_FILE (sem
+    storage_service nem group commit), o histórico e o mapa de calor usam
+    os diretórios dados (None = desativados) e a roda de fechamentos
+    pendentes de events.py é substituída por uma no relógio do trace. Ao
+    final, as sessões na janela de coalescência são gravadas; sessões
+    ainda com câmera ligada no fim do trace continuam abertas.
+
+    Args:
+        path: Arquivo atual do trace
+        speed: 1.0 = ritmo gravado, 2.0 = duas vezes mais rápido,
+            0 = o mais rápido possível
+        handler: Handler chamado com (member, before, after)
+            (default: events.on_voice_state_update)
+        history_dir: Diretório do histórico de sessões reconstruído
+        heatmap_dir: Diretório do mapa de calor reconstruído
+
+    Returns:
+        ReplayStats: Eventos reproduzidos, duração do replay e período
+            coberto pelo trace (segundos)
+    """
+    global _replaying
+    import events
+    import heatmap
+    import session_history
+    from timer_wheel import TimerWheel
+
+    handler = handler or events.on_voice_state_update
+    start = time.monotonic()
+    trace_clock = [start]
+    original_wheel = events.pending_closes
+    wheel = TimerWheel(events._close_pending, tick=original_wheel.tick, clock=lambda: trace_clock[0])
+    _replaying = True
+
+    guilds: Dict[Optional[int], Any] = {}
+    members: Dict[Tuple[Optional[int], int], SimpleNamespace] = {}
+    first: Optional[float] = None
+    shift = 0.0
+    last = 0.0
+    count = 0
+    # Alvos de produção trocados pelos do replay (restaurados no finally)
+    swapped = [
+        (events, "pending_closes", wheel),
+        (events, "get_storage_client", lambda: None),
+        (events, "get_group_committer", lambda: None),
+        (session_history, "HISTORY_DIR", history_dir),
+        (heatmap, "HEATMAP_DIR", heatmap_dir),
+    ]
+    originals = [(module, name, getattr(module, name)) for module, name, _ in swapped]
+    for module, name, value in swapped:
+        setattr(module, name, value)
+    try:
+        for clock, wall, guild_id, user_id, before_channel, after_channel, before, after in iter_trace(path):
+            if first is None:
+                first = clock
+                shift = float(math.ceil(start - first))
+            offset = clock - first
+            if speed > 0:
+                delay = start + offset / speed - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            # Relógio do trace transladado em segundos inteiros para o deste
+            # processo: durações idênticas às gravadas (sem arredondamento
+            # de start + offset), atraso de dispatch real em 1x
+            trace_clock[0] = clock + shift
+            for key, payload in wheel.advance():
+                events._close_pending(key, payload)
+
+            if guild_id not in guilds:
+                guilds[guild_id] = SimpleNamespace(id=guild_id, shard_id=None) if guild_id is not None else None
+            member = members.get((guild_id, user_id))
+            if member is None:
+                member = members[(guild_id, user_id)] = SimpleNamespace(
+                    id=user_id, display_name=str(user_id), guild=guilds[guild_id]
+                )
+
+            token = events._received_at.set((trace_clock[0], wall))
+            try:
+                await handler(member, _voice_state(before_channel, before), _voice_state(after_channel, after))
+            finally:
+                events._received_at.reset(token)
+            last = offset
+            count += 1
+
+        events.flush_pending_closes()
+    finally:
+        wheel.drain()
+        for module, name, value in originals:
+            setattr(module, name, value)
+        _replaying = False
+
+    return ReplayStats(count, time.monotonic() - start, last)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Ponto de entrada da linha de comando"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Replay de um trace de eventos de voz")
+    parser.add_argument("trace", help="Arquivo do trace (os rotacionados .1, .2... são incluídos)")
+    parser.add_argument("--speed", default="1", help="Multiplicador de velocidade ou 'max' (padrão: 1)")
+    parser.add_argument("--data-file", required=True,
+                        help="Arquivo de dados reconstruído (diferente do configurado)")
+    parser.add_argument("--history-dir", help="Diretório do histórico reconstruído (padrão: não grava)")
+    parser.add_argument("--heatmap-dir", help="Diretório do mapa de calor reconstruído (padrão: não grava)")
+    args = parser.parse_args(argv)
+    speed = 0.0 if args.speed == "max" else float(args.speed)
+
+    import database
+    import heatmap
+    import session_history
+    from events import dispatch_delay
+
+    data_file = Path(args.data_file)
+    targets = [
+        (data_file, database.DATA_FILE, "--data-file"),
+        (args.history_dir, session_history.HISTORY_DIR, "--history-dir"),
+        (args.heatmap_dir, heatmap.HEATMAP_DIR, "--heatmap-dir"),
+    ]
+    for target, live, flag in targets:
+        if target is not None and live is not None and Path(target).resolve() == Path(live).resolve():
+            parser.error(f"{flag} não pode ser o de produção ({live}): o replay duplicaria os dados")
+    database.DATA_FILE = data_file
+
+    async def run() -> ReplayStats:
+        return await replay(
+            args.trace, speed,
+            history_dir=Path(args.history_dir) if args.history_dir else None,
+            heatmap_dir=Path(args.heatmap_dir) if args.heatmap_dir else None,
+        )
+
+    stats = asyncio.run(run())
+    rate = stats.events / stats.elapsed if stats.elapsed else 0.0
+    print(f"{stats.events} eventos ({stats.trace_seconds:.1f}s de trace) em {stats.elapsed:.2f}s: {rate:.0f} eventos/s")
+    print(dispatch_delay.snapshot())
+
+
+__all__ = [
+    'DEAF',
+    'MUTE',
+    'STREAM',
+    'ReplayStats',
+    'TraceRecorder',
+    'VIDEO',
+    'close_trace_recorder',
+    'decode_event',
+    'encode_event',
+    'get_trace_recorder',
+    'iter_trace',
+    'replay',
+    'state_flags',
+    'trace_files',
+]
+
+
+if __name__ == "__main__":
+    main()
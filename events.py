@@ -7,21 +7,39 @@ no rastreamento de câmera ligada através de on_voice_state_update.
 Seção 4.4.1 do PRD: Event Handler - Voice State
 """
 
+from config import CAMERA_GRACE_SECONDS, EVENT_DEDUP_SIZE, VOICE_LOG_RATE_LIMIT
 from database import update_video_time
+from event_trace import get_trace_recorder
+from group_commit import get_group_committer
+import heatmap
+from session_history import append_session
+from storage_service import get_storage_client
+from timer_wheel import TimerWheel
+from utils import RateLimitFilter
 import logging
 import asyncio
+import secrets
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Any, Dict, NamedTuple, Optional, Tuple
 
 import discord
 from discord.ext import commands
 
-# Configuração de logging conforme seção 6.2 do PRD
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+# Logging conforme seção 6.2 do PRD (configurado uma vez em bot.py).
+# Toggles de câmera são o caminho mais quente do bot: mensagens usam
+# %-args (formatadas só na thread do QueueListener) e cada evento é
+# limitado a VOICE_LOG_RATE_LIMIT registros INFO por segundo.
 logger = logging.getLogger(__name__)
+logger.addFilter(RateLimitFilter(max_per_interval=VOICE_LOG_RATE_LIMIT))
+
+
+class SessionStart(NamedTuple):
+    """Início de uma sessão: horário de parede e relógio monotônico"""
+    wall: datetime
+    clock: float
 
 
 class VideoSessionManager:
@@ -30,23 +48,49 @@ class VideoSessionManager:
     Gerencia sessões de vídeo ativas com asyncio.Lock() para prevenir
     race conditions quando múltiplos toggles de câmera ocorrem simultaneamente.
 
+    O horário de parede vai para o histórico; a duração é calculada pelo
+    relógio monotônico (time.monotonic), imune a ajustes do relógio do
+    sistema (NTP).
+
     Estrutura interna:
         _sessions: Dict[str, datetime] = {"user_id": datetime_object}
+        _clocks: Dict[str, float] = {"user_id": time.monotonic() no início}
     """
 
     def __init__(self):
         self._sessions: Dict[str, datetime] = {}
+        self._clocks: Dict[str, float] = {}
         self._lock = asyncio.Lock()
 
-    async def start_session(self, user_id: str, timestamp: datetime) -> None:
+    async def start_session(self, user_id: str, timestamp: datetime, clock: Optional[float] = None) -> None:
         """Inicia sessão de vídeo para usuário
 
         Args:
             user_id: ID do usuário Discord como string
             timestamp: Timestamp de início da sessão
+            clock: time.monotonic() no início (default: derivado de timestamp)
         """
+        if clock is None:
+            clock = time.monotonic() - (datetime.now() - timestamp).total_seconds()
         async with self._lock:
             self._sessions[user_id] = timestamp
+            self._clocks[user_id] = clock
+
+    async def pop_session(self, user_id: str) -> Optional[SessionStart]:
+        """Finaliza sessão e retorna seu início
+
+        Args:
+            user_id: ID do usuário Discord como string
+
+        Returns:
+            SessionStart da sessão ou None se não existir
+        """
+        async with self._lock:
+            timestamp = self._sessions.pop(user_id, None)
+            clock = self._clocks.pop(user_id, None)
+        if timestamp is None:
+            return None
+        return SessionStart(timestamp, clock)
 
     async def end_session(self, user_id: str) -> Optional[datetime]:
         """Finaliza sessão e retorna timestamp de início
@@ -57,8 +101,8 @@ class VideoSessionManager:
         Returns:
             Timestamp de início da sessão ou None se não existir
         """
-        async with self._lock:
-            return self._sessions.pop(user_id, None)
+        start = await self.pop_session(user_id)
+        return start.wall if start is not None else None
 
     def has_session(self, user_id: str) -> bool:
         """Verifica se usuário tem sessão ativa
@@ -81,6 +125,7 @@ class VideoSessionManager:
         Em produção, considere adicionar versão async com lock.
         """
         self._sessions.clear()
+        self._clocks.clear()
 
     @property
     def sessions(self) -> Dict[str, datetime]:
@@ -92,9 +137,315 @@ class VideoSessionManager:
         return self._sessions.copy()
 
 
-# Instância global do gerenciador de sessões
+# Instância global do gerenciador de sessões (shard 0 / bot sem sharding)
 active_video_sessions = VideoSessionManager()
 
+# Gerenciadores por shard: cada shard tem seu próprio lock, de modo que
+# toggles em shards diferentes não disputam o mesmo asyncio.Lock
+_shard_sessions: Dict[int, VideoSessionManager] = {0: active_video_sessions}
+
+
+def get_session_manager(shard_id: Optional[int] = None) -> VideoSessionManager:
+    """Retorna o gerenciador de sessões local de um shard
+
+    Args:
+        shard_id: ID do shard (None ou 0 para o bot sem sharding)
+
+    Returns:
+        VideoSessionManager do shard, criado sob demanda
+    """
+    if not isinstance(shard_id, int):
+        return active_video_sessions
+    if shard_id not in _shard_sessions:
+        _shard_sessions[shard_id] = VideoSessionManager()
+    return _shard_sessions[shard_id]
+
+
+def _guild_of(member: discord.Member) -> Optional[discord.Guild]:
+    """Retorna o guild do membro, se disponível"""
+    return getattr(member, "guild", None)
+
+
+# Horário (epoch) da última sessão gravada direto no arquivo, para o
+# relatório de saúde (no modo multi-processo vale StorageClient.last_flush_time)
+_last_persist_time: Optional[float] = None
+
+
+def get_last_persist_time() -> Optional[float]:
+    """Retorna o horário (epoch) da última gravação direta bem-sucedida"""
+    return _last_persist_time
+
+
+class DispatchDelay:
+    """Atraso entre o recebimento de VOICE_STATE_UPDATE e o início do handler
+
+    Mede o backlog do event loop visto pelos eventos de voz: com o loop
+    ocupado (ex: bloqueado em uma escrita), o handler roda depois do
+    recebimento, mas a sessão usa o instante de recebimento.
+    """
+
+    def __init__(self):
+        self.last = 0.0
+        self.max = 0.0
+        self.total = 0.0
+        self.count = 0
+
+    def record(self, seconds: float) -> None:
+        self.last = seconds
+        self.max = max(self.max, seconds)
+        self.total += seconds
+        self.count += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Métricas para o relatório de saúde"""
+        return {
+            "dispatch_delay_ms": round(self.last * 1000, 1),
+            "dispatch_delay_max_ms": round(self.max * 1000, 1),
+            "dispatch_delay_avg_ms": round(self.total / self.count * 1000, 1) if self.count else None,
+        }
+
+
+dispatch_delay = DispatchDelay()
+
+
+class RecentEvents:
+    """Conjunto limitado dos eventos de voz recentes do gateway
+
+    Um evento é identificado pela sessão do websocket e pelo número de
+    sequência (s) do dispatch: replays após RESUME e duplicatas trazem o
+    mesmo par e são descartados antes do parser do discord.py, de modo que
+    nem o cache de estados de voz nem os handlers os veem.
+
+    Estrutura interna:
+        _seen: OrderedDict {(session_id, seq): None}, do mais antigo ao mais recente
+    """
+
+    def __init__(self, max_size: int = EVENT_DEDUP_SIZE):
+        self.max_size = max_size
+        self._seen: "OrderedDict[Tuple[str, int], None]" = OrderedDict()
+        self.duplicates = 0
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def seen(self, key: Tuple[str, int]) -> bool:
+        """Registra o evento; True se ele já havia sido visto"""
+        if key in self._seen:
+            self._seen.move_to_end(key)
+            self.duplicates += 1
+            return True
+        self._seen[key] = None
+        while len(self._seen) > self.max_size:
+            self._seen.popitem(last=False)
+        return False
+
+    def clear(self) -> None:
+        self._seen.clear()
+
+
+recent_events = RecentEvents()
+
+
+class SessionIds:
+    """Identificadores únicos das sessões encerradas
+
+    Cada sessão encerrada recebe (origem, n): a origem é aleatória a cada
+    início do processo e n cresce a cada sessão encerrada por ele. O par
+    nunca se repete entre reinícios nem entre processos que gravam no
+    mesmo arquivo, e não depende do relógio de parede (um relógio corrigido
+    para trás pelo NTP não descarta sessões). database.py guarda, por
+    usuário, o maior n aplicado das origens recentes e ignora os já
+    aplicados, o que torna idempotente a regravação de um lote
+    (GroupCommitter) e o reenvio ao storage_service.
+    """
+
+    def __init__(self):
+        self.origin = secrets.token_hex(4)
+        self._count = 0
+
+    def next(self) -> Tuple[str, int]:
+        """Emite o identificador da próxima sessão encerrada"""
+        self._count += 1
+        return self.origin, self._count
+
+    def clear(self) -> None:
+        """Recomeça a contagem com uma nova origem (nunca reaproveita ids)"""
+        self.origin = secrets.token_hex(4)
+        self._count = 0
+
+
+session_ids = SessionIds()
+
+# Instante de recebimento (time.monotonic(), time.time()) do evento do
+# gateway em processamento. Definido pelo parser de VOICE_STATE_UPDATE
+# (install_receive_clock) e herdado pelas tasks dos handlers, que copiam
+# o contexto ao serem criadas pelo dispatch
+_received_at: ContextVar[Optional[Tuple[float, float]]] = ContextVar("received_at", default=None)
+
+
+def _event_key(state: Any, data: Any) -> Optional[Tuple[str, int]]:
+    """(sessão do websocket, sequência) do evento sendo decodificado"""
+    try:
+        ws = state._get_websocket(int(data["guild_id"]))
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
+    session_id, seq = getattr(ws, "session_id", None), getattr(ws, "sequence", None)
+    if not isinstance(session_id, str) or not isinstance(seq, int):
+        return None
+    return session_id, seq
+
+
+def install_receive_clock(bot: Any) -> bool:
+    """Marca o instante de recebimento de cada VOICE_STATE_UPDATE
+
+    Envolve o parser do discord.py, chamado pelo websocket logo após
+    decodificar a mensagem e antes de criar as tasks dos listeners: o
+    ponto mais cedo do caminho de dispatch dentro do processo. Eventos já
+    vistos (mesma sessão e sequência, ver RecentEvents) são descartados
+    ali mesmo.
+
+    Args:
+        bot: Instância do bot (usa o ConnectionState em bot._connection)
+
+    Returns:
+        True se o parser foi envolvido (ou já estava)
+    """
+    state = getattr(bot, "_connection", None)
+    parsers = getattr(state, "parsers", None)
+    if not isinstance(parsers, dict) or "VOICE_STATE_UPDATE" not in parsers:
+        return False
+
+    parse = parsers["VOICE_STATE_UPDATE"]
+    if getattr(parse, "receive_clock", False):
+        return True
+
+    def parse_with_clock(data: Any) -> None:
+        key = _event_key(state, data)
+        if key is not None and recent_events.seen(key):
+            logger.debug(
+                "VOICE_STATE_UPDATE duplicado ignorado (seq %s)", key[1],
+                extra={"event": "voice_duplicate", "seq": key[1]}
+            )
+            return
+        token = _received_at.set((time.monotonic(), time.time()))
+        try:
+            parse(data)
+        finally:
+            _received_at.reset(token)
+
+    parse_with_clock.receive_clock = True
+    parsers["VOICE_STATE_UPDATE"] = parse_with_clock
+    return True
+
+
+def _event_clock() -> Tuple[float, datetime]:
+    """Instante do evento corrente: (time.monotonic(), horário de parede)
+
+    Usa o recebimento no gateway quando disponível e registra o atraso
+    até o handler; sem ele (testes, parser não envolvido), o instante atual.
+    """
+    received = _received_at.get()
+    if received is None:
+        return time.monotonic(), datetime.now()
+    clock, wall = received
+    dispatch_delay.record(max(0.0, time.monotonic() - clock))
+    return clock, datetime.fromtimestamp(wall)
+
+
+class PendingClose(NamedTuple):
+    """Sessão desligada aguardando a janela de coalescência"""
+    start_time: datetime
+    end_time: datetime
+    duration: float
+    session_id: Tuple[str, int]
+    guild_id: Optional[int]
+    channel_id: Optional[int]
+    display_name: str
+
+
+def _persist_session(
+    user_id: str,
+    start_time: datetime,
+    end_time: datetime,
+    duration: float,
+    session_id: Tuple[str, int],
+    guild_id: Optional[int],
+    channel_id: Optional[int],
+    display_name: str
+) -> None:
+    """Grava uma sessão encerrada (direto ou via storage_service)
+
+    O total vai para o ranking e a sessão completa para o histórico
+    (session_history) e o mapa de calor (heatmap); uma falha nesses dois
+    não afeta o ranking. Com storage_service ou group commit os dois seguem
+    com o delta e são gravados em lote, fora do event loop.
+
+    Args:
+        user_id: ID do usuário Discord como string
+        start_time: Início da sessão (horário de parede, para o histórico)
+        end_time: Fim da sessão (horário de parede, para o histórico)
+        duration: Duração pelo relógio monotônico, em segundos
+        session_id: Identificador da sessão (SessionIds); a gravação é idempotente
+        guild_id: ID do guild da sessão
+        channel_id: ID do canal de voz da sessão
+        display_name: Nome exibido (apenas para log)
+    """
+    global _last_persist_time
+    duration_seconds = int(duration)
+    start, end = start_time.timestamp(), end_time.timestamp()
+    client = get_storage_client() or get_group_committer()
+    if client is not None:
+        # Modo multi-processo ou group commit: delta gravado em lote
+        # (storage_service ou um fsync por lote), junto com histórico e mapa de calor
+        client.record_session(user_id, duration_seconds, guild_id, session_id, (channel_id, start, end))
+    else:
+        # Atualiza dados persistentes via database.py (partição do guild)
+        update_video_time(user_id, duration_seconds, guild_id=guild_id, session_id=session_id)
+        _last_persist_time = time.time()
+        # Histórico e mapa de calor são auxiliares: uma falha neles nunca
+        # derruba a gravação do ranking
+        try:
+            append_session(user_id, guild_id, channel_id, start, end)
+        except Exception as e:
+            logger.warning("Falha ao gravar sessão no histórico: %s", e)
+        try:
+            heatmap.record_session(guild_id, start, end)
+        except Exception as e:
+            logger.warning("Falha ao atualizar o mapa de calor: %s", e)
+
+    # Log conforme seção 6.2 do PRD
+    logger.info(
+        "📹 %s desligou - %ds gravados", display_name, duration_seconds,
+        extra={"event": "camera_off", "user_id": user_id, "duration": duration_seconds}
+    )
+
+
+def _close_pending(user_id: str, pending: PendingClose) -> None:
+    """Grava a sessão cuja janela de coalescência expirou"""
+    _persist_session(
+        user_id, pending.start_time, pending.end_time, pending.duration, pending.session_id,
+        pending.guild_id, pending.channel_id, pending.display_name
+    )
+
+
+# Fechamentos pendentes: uma única roda de temporizadores para todos os
+# usuários (10 mil fechamentos pendentes não criam 10 mil tasks)
+pending_closes = TimerWheel(_close_pending, tick=min(1.0, CAMERA_GRACE_SECONDS or 1.0))
+
+
+def flush_pending_closes() -> int:
+    """Grava imediatamente todas as sessões na janela de coalescência
+
+    Usado no shutdown para não perder sessões já desligadas.
+
+    Returns:
+        Número de sessões gravadas
+    """
+    drained = pending_closes.drain()
+    for user_id, pending in drained:
+        _close_pending(user_id, pending)
+    return len(drained)
+
 
 async def on_voice_state_update(
     member: discord.Member,
@@ -114,31 +465,89 @@ async def on_voice_state_update(
     Comportamento (UC01/UC02 - seção 5 do PRD):
         1. Detecta self_video = True -> Salva timestamp
         2. Detecta self_video = False -> Calcula duração -> Atualiza JSON
+
+    Com CAMERA_GRACE_SECONDS > 0, o passo 2 é adiado pela janela de
+    coalescência: se a câmera voltar no mesmo canal antes dela expirar, a
+    sessão é retomada (o intervalo desligado não é contado) e nada é
+    gravado; em outro guild ou canal, a sessão anterior é gravada na hora.
+
+    Os instantes são os do recebimento do evento no gateway (ver
+    install_receive_clock), não os da execução do handler: um loop
+    atrasado não desloca início nem fim das sessões.
+
+    Idempotência: cada usuário segue a máquina de estados desligado ->
+    ligado -> desligado. Um "ligou" com sessão ativa ou um "desligou" sem
+    sessão (duplicatas que passaram pelo RecentEvents) não têm efeito, e
+    cada sessão encerrada leva um id único que database.py aplica uma vez.
     """
+    clock, now = _event_clock()
+    guild = _guild_of(member)
+    sessions = get_session_manager(getattr(guild, "shard_id", None))
+
+    recorder = get_trace_recorder()
+    if recorder is not None:
+        # Trace para replay (event_trace.py): só enfileira, sem I/O no loop
+        recorder.record(clock, now, getattr(guild, "id", None), member.id, before, after)
+
     # Detecta quando usuário liga a câmera (UC01)
     if not before.self_video and after.self_video:
         user_id = str(member.id)
-        await active_video_sessions.start_session(user_id, datetime.now())
+
+        pending = pending_closes.cancel(user_id)
+        if pending is not None:
+            location = (getattr(guild, "id", None), getattr(after.channel, "id", None))
+            if (pending.guild_id, pending.channel_id) == location:
+                # Oscilação: retoma a sessão com o início original; só a
+                # duração desconta o intervalo desligado
+                await sessions.start_session(user_id, pending.start_time, clock - pending.duration)
+                logger.debug(
+                    "📹 %s retomou a sessão", member.display_name,
+                    extra={"event": "camera_resume", "user_id": user_id}
+                )
+                return
+            # Religou em outro guild/canal: a sessão anterior termina ali
+            _close_pending(user_id, pending)
+
+        if sessions.has_session(user_id):
+            # Duplicata: a sessão já foi iniciada; manter o início original
+            logger.debug(
+                "📹 %s: ligou repetido ignorado", member.display_name,
+                extra={"event": "camera_on_duplicate", "user_id": user_id}
+            )
+            return
+
+        await sessions.start_session(user_id, now, clock)
 
         # Log conforme seção 6.2 do PRD
-        logger.info(f"📹 {member.display_name} ligou a câmera")
+        logger.info(
+            "📹 %s ligou a câmera", member.display_name,
+            extra={"event": "camera_on", "user_id": user_id}
+        )
 
     # Detecta quando usuário desliga a câmera (UC02)
     elif before.self_video and not after.self_video:
         user_id = str(member.id)
 
         # Finaliza sessão e obtém timestamp de início
-        start_time = await active_video_sessions.end_session(user_id)
-        if start_time:
-            # Calcula duração da sessão
-            duration = datetime.now() - start_time
-            duration_seconds = int(duration.total_seconds())
-
-            # Atualiza dados persistentes via database.py
-            update_video_time(user_id, duration_seconds)
-
-            # Log conforme seção 6.2 do PRD
-            logger.info(f"📹 {member.display_name} desligou - {duration_seconds}s gravados")
+        start = await sessions.pop_session(user_id)
+        if start is not None:
+            guild_id = getattr(guild, "id", None)
+            channel_id = getattr(before.channel, "id", None)
+            # Relógio monotônico: ajustes do relógio do sistema não geram
+            # durações negativas nem infladas
+            duration = max(0.0, clock - start.clock)
+            session_id = session_ids.next()
+
+            if CAMERA_GRACE_SECONDS > 0:
+                # Adia a gravação: um "ligou" dentro da janela retoma a sessão
+                pending_closes.schedule(
+                    user_id,
+                    CAMERA_GRACE_SECONDS,
+                    PendingClose(start.wall, now, duration, session_id, guild_id, channel_id, member.display_name)
+                )
+                return
+
+            _persist_session(user_id, start.wall, now, duration, session_id, guild_id, channel_id, member.display_name)
 
 
 def setup(bot: commands.Bot) -> None:
@@ -148,12 +557,22 @@ def setup(bot: commands.Bot) -> None:
     Args:
         bot: Instância do bot Discord
     """
+    install_receive_clock(bot)
     bot.add_listener(on_voice_state_update, 'on_voice_state_update')
 
 
 # Type hints para todos os componentes (RNF10)
 __all__ = [
+    'SessionStart',
     'active_video_sessions',
+    'dispatch_delay',
+    'flush_pending_closes',
+    'get_last_persist_time',
+    'get_session_manager',
+    'install_receive_clock',
+    'pending_closes',
+    'recent_events',
+    'session_ids',
     'on_voice_state_update',
     'setup',
 ]
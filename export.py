@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+export.py - Exportação em streaming do ranking (CSV/JSONL, opcionalmente gzip).
+
+Os usuários são lidos do snapshot publicado em blocos (database.iter_data)
+e escritos linha a linha, com memória constante independente do número de
+usuários. Cada partição é lida de um único snapshot (o arquivo aberto não
+muda quando uma nova versão é publicada), então a exportação é consistente
+sem bloquear os escritores.
+
+Uso:
+    python export.py --format jsonl --gzip --guild 123456789012345678
+    python export.py --all --output ranking.csv
+"""
+
+import csv
+import gzip
+import io
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import database
+from config import EXPORT_DIR
+
+# Colunas exportadas, na ordem do CSV
+EXPORT_FIELDS = ("guild_id", "user_id", "total_seconds", "sessions")
+
+EXPORT_FORMATS = ("csv", "jsonl")
+
+
+def iter_export_rows(guild_id: Optional[int] = None, all_partitions: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    Itera as linhas da exportação, uma por usuário.
+
+    Args:
+        guild_id: Guild exportado (ignorado com all_partitions)
+        all_partitions: Exporta o arquivo global e todas as partições
+
+    Yields:
+        Dict[str, Any]: Linha com as colunas de EXPORT_FIELDS
+    """
+    if all_partitions:
+        partitions = [guild for guild, _ in database.partition_files()]
+    else:
+        partitions = [guild_id]
+
+    for partition in partitions:
+        label = database.partition_key(partition)
+        for user_id, entry in database.iter_data(partition):
+            yield {
+                "guild_id": label if label is not None else "",
+                "user_id": user_id,
+                "total_seconds": entry.get("total_seconds", 0),
+                "sessions": entry.get("sessions", 0),
+            }
+
+
+def write_export(rows: Iterator[Dict[str, Any]], path: Path, fmt: str = "csv", compress: bool = False) -> int:
+    """
+    Escreve as linhas no arquivo de destino à medida que são lidas.
+
+    O arquivo é publicado com os.replace ao final, de modo que um consumidor
+    nunca veja uma exportação pela metade.
+
+    Args:
+        rows: Linhas (ex: iter_export_rows)
+        path: Arquivo de destino
+        fmt: "csv" ou "jsonl"
+        compress: Comprime com gzip
+
+    Returns:
+        int: Número de linhas escritas
+
+    Raises:
+        ValueError: Se o formato for desconhecido
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Formato inválido: {fmt!r} (use {', '.join(EXPORT_FORMATS)})")
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(path.name + ".tmp")
+    count = 0
+    raw = gzip.open(temp_path, "wb") if compress else open(temp_path, "wb")
+    try:
+        with raw, io.TextIOWrapper(raw, encoding="utf-8", newline="") as out:
+            if fmt == "csv":
+                writer = csv.DictWriter(out, fieldnames=EXPORT_FIELDS)
+                writer.writeheader()
+                for row in rows:
+                    writer.writerow(row)
+                    count += 1
+            else:
+                for row in rows:
+                    out.write(json.dumps(row, ensure_ascii=False) + "\n")
+                    count += 1
+        temp_path.replace(path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+    return count
+
+
+def export_data(
+    guild_id: Optional[int] = None,
+    fmt: str = "csv",
+    compress: bool = False,
+    output: Optional[str] = None,
+    all_partitions: bool = False
+) -> str:
+    """
+    Exporta o ranking para um arquivo (roda em uma thread; nunca no loop).
+
+    Args:
+        guild_id: Guild exportado
+        fmt: "csv" ou "jsonl"
+        compress: Comprime com gzip
+        output: Arquivo de destino (default: EXPORT_DIR/export-<guild>-<data>.<fmt>)
+        all_partitions: Exporta todas as partições
+
+    Returns:
+        str: Caminho do arquivo gerado (serializável para o storage_service)
+    """
+    if output is None:
+        scope = "all" if all_partitions else (database.partition_key(guild_id) or "global")
+        suffix = f".{fmt}.gz" if compress else f".{fmt}"
+        output = str(Path(EXPORT_DIR) / f"export-{scope}-{time.strftime('%Y%m%d-%H%M%S')}{suffix}")
+
+    path = Path(output)
+    write_export(iter_export_rows(guild_id, all_partitions), path, fmt, compress)
+    return str(path)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Ponto de entrada da linha de comando"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Exporta o ranking do Bate-Ponto")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("--gzip", action="store_true", help="Comprime a saída com gzip")
+    parser.add_argument("--guild", type=int, default=None, help="Guild exportado")
+    parser.add_argument("--all", action="store_true", help="Exporta todas as partições")
+    parser.add_argument("--output", default=None, help="Arquivo de destino")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    path = export_data(args.guild, args.format, args.gzip, args.output, args.all)
+    print(f"Exportado para {path} em {time.perf_counter() - start:.2f}s")
+
+
+__all__ = [
+    'EXPORT_FIELDS',
+    'export_data',
+    'iter_export_rows',
+    'write_export',
+]
+
+
+if __name__ == "__main__":
+    main()
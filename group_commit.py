@@ -0,0 +1,271 @@
+"""
+group_commit.py - Gravação em grupo (group commit) das sessões encerradas.
+
+Com DURABILITY_MODE="group-commit", as sessões encerradas não são gravadas
+uma a uma: ficam em um buffer e são aplicadas em lote com
+database.apply_session_deltas (uma escrita e um fsync por partição) a cada
+GROUP_COMMIT_INTERVAL_MS ou GROUP_COMMIT_MAX_RECORDS sessões. A escrita
+roda fora do event loop (asyncio.to_thread).
+
+O delta também leva o canal e os horários da sessão: apply_closed_sessions
+grava no mesmo lote o histórico (session_history) e o mapa de calor
+(heatmap), de modo que nenhuma escrita auxiliar roda no event loop. O storage_service usa a mesma
+função para os lotes que recebe.
+
+A interface espelha storage_service.StorageClient (record_session,
+flush, pending_deltas, last_flush_time), de modo que events.py e o
+relatório de saúde tratam os dois caminhos de escrita da mesma forma.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, List, Optional, Set, Tuple
+
+import database
+import heatmap
+import session_history
+from config import DURABILITY_MODE, GROUP_COMMIT_INTERVAL_MS, GROUP_COMMIT_MAX_RECORDS
+from session_history import SessionRecord
+
+logger = logging.getLogger(__name__)
+
+# (user_id, duração, guild_id, id da sessão (origem, n)), opcionalmente
+# seguido de (canal, início, fim) para o histórico e o mapa de calor
+SessionDelta = Tuple[Any, ...]
+
+# Canal e horários de parede (segundos epoch) de uma sessão encerrada
+SessionDetails = Tuple[Optional[int], float, float]
+
+
+def make_delta(
+    user_id: str,
+    duration: int,
+    guild_id: Optional[int] = None,
+    session_id: Optional[Tuple[str, int]] = None,
+    details: Optional[SessionDetails] = None
+) -> SessionDelta:
+    """Monta o delta de uma sessão encerrada (ver SessionDelta)"""
+    if duration < 0:
+        raise ValueError("duration must be non-negative")
+    delta = (user_id, duration, guild_id, session_id)
+    return delta + tuple(details) if details is not None else delta
+
+
+def _write_session_details(deltas: List[SessionDelta]) -> None:
+    """Grava histórico e mapa de calor das sessões recém-aplicadas ao ranking
+
+    Auxiliares: uma falha é registrada e não afeta o ranking, já gravado.
+    """
+    records = [
+        SessionRecord(delta[0], delta[2], *delta[4:7])
+        for delta in deltas if len(delta) >= 7
+    ]
+    if not records:
+        return
+    try:
+        session_history.append_sessions(records)
+    except Exception as e:
+        logger.warning("Falha ao gravar %d sessões no histórico: %s", len(records), e)
+    try:
+        heatmap.record_sessions((record.guild_id, record.start, record.end) for record in records)
+    except Exception as e:
+        logger.warning("Falha ao atualizar o mapa de calor com %d sessões: %s", len(records), e)
+
+
+def apply_closed_sessions(batch: List[SessionDelta]) -> int:
+    """
+    Aplica um lote de sessões encerradas: ranking, histórico e mapa de calor.
+
+    Chamada fora do event loop (GroupCommitter e storage_service). Histórico
+    e mapa de calor de cada partição são gravados logo após o ranking dela e
+    apenas para as sessões aplicadas agora, de modo que reaplicar o lote
+    após uma falha não os duplica.
+
+    Args:
+        batch: Deltas (ver SessionDelta)
+
+    Returns:
+        int: Número de sessões aplicadas (sem as já aplicadas antes)
+
+    Raises:
+        ValueError: Se alguma duração for negativa
+        RuntimeError: Se ocorrer erro no bloqueio de arquivo
+    """
+    return database.apply_session_deltas(batch, on_applied=_write_session_details)
+
+
+class GroupCommitter:
+    """Buffer de sessões gravado em lote com um fsync por lote
+
+    - record_session(): enfileira; dispara o flush ao atingir max_records
+    - flush(): grava o lote pendente fora do event loop
+    - flush_sync(): grava no thread atual (shutdown ou sem event loop)
+    """
+
+    def __init__(
+        self,
+        interval: float = GROUP_COMMIT_INTERVAL_MS / 1000,
+        max_records: int = GROUP_COMMIT_MAX_RECORDS
+    ):
+        """
+        Args:
+            interval: Tempo máximo (s) que uma sessão espera no buffer
+            max_records: Tamanho do lote que força um flush imediato
+        """
+        self.interval = interval
+        self.max_records = max(1, max_records)
+        self._pending_deltas: List[SessionDelta] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_wakeup: Optional[asyncio.Event] = None
+        # Gravações em andamento: cancelar quem espera não para o thread,
+        # e uma falha ainda devolve o lote ao buffer
+        self._in_flight: Set[asyncio.Future] = set()
+        self.last_flush_time: Optional[float] = None
+
+    @property
+    def pending_deltas(self) -> int:
+        """Número de sessões aguardando gravação"""
+        return len(self._pending_deltas)
+
+    def record_session(
+        self,
+        user_id: str,
+        duration: int,
+        guild_id: Optional[int] = None,
+        session_id: Optional[Tuple[str, int]] = None,
+        details: Optional[SessionDetails] = None
+    ) -> None:
+        """
+        Enfileira uma sessão encerrada para a próxima gravação em lote.
+
+        Args:
+            user_id: ID do usuário Discord
+            duration: Duração da sessão em segundos
+            guild_id: ID do guild da sessão
+            session_id: Id da sessão (torna a regravação do lote idempotente)
+            details: (canal, início, fim) para gravar histórico e mapa de
+                calor no mesmo lote
+
+        Raises:
+            ValueError: Se duration for negativo
+        """
+        self._pending_deltas.append(make_delta(user_id, duration, guild_id, session_id, details))
+
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # Sem event loop (ex: script síncrono): grava na hora
+            self.flush_sync()
+            return
+
+        if self._flush_wakeup is None:
+            self._flush_wakeup = asyncio.Event()
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+        if len(self._pending_deltas) >= self.max_records:
+            self._flush_wakeup.set()
+
+    def _take_batch(self) -> List[SessionDelta]:
+        batch, self._pending_deltas = self._pending_deltas, []
+        return batch
+
+    def _apply(self, batch: List[SessionDelta]) -> bool:
+        """Aplica um lote; em caso de falha devolve-o ao buffer
+
+        O lote pode ter sido gravado em parte (uma partição gravada, outra
+        não); a nova tentativa não soma de novo as sessões já gravadas,
+        pois apply_session_deltas ignora as sessões já aplicadas (e o
+        histórico só é gravado para as aplicadas).
+        """
+        try:
+            apply_closed_sessions(batch)
+        except Exception as e:
+            # Qualquer falha (lock, disco cheio, permissão...) mantém o lote:
+            # perdê-lo apagaria sessões e derrubaria o _flush_loop
+            self._pending_deltas[:0] = batch
+            logger.warning("Falha ao gravar lote de %d sessões: %s", len(batch), e)
+            return False
+        self.last_flush_time = time.time()
+        return True
+
+    async def flush(self) -> None:
+        """Grava imediatamente todas as sessões pendentes (fora do loop)"""
+        if not self._pending_deltas:
+            return
+        batch = self._take_batch()
+        future = asyncio.ensure_future(asyncio.to_thread(self._apply, batch))
+        self._in_flight.add(future)
+        future.add_done_callback(self._in_flight.discard)
+        await asyncio.shield(future)
+
+    def flush_sync(self) -> int:
+        """
+        Grava as sessões pendentes no thread atual.
+
+        Returns:
+            int: Número de sessões gravadas
+        """
+        if not self._pending_deltas:
+            return 0
+        batch = self._take_batch()
+        return len(batch) if self._apply(batch) else 0
+
+    async def _flush_loop(self) -> None:
+        """Grava a cada intervalo (ou antes, se o lote encher)"""
+        while self._pending_deltas:
+            try:
+                await asyncio.wait_for(self._flush_wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_wakeup.clear()
+            await self.flush()
+
+    async def close(self) -> None:
+        """Para o flush periódico e grava o que estiver pendente"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        # Um lote que falhe depois do flush final voltaria a um buffer que
+        # ninguém mais grava: espera as gravações em andamento antes dele
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight)
+        await self.flush()
+
+
+# Instância global, criada sob demanda no modo "group-commit"
+_group_committer: Optional[GroupCommitter] = None
+
+
+def get_group_committer() -> Optional[GroupCommitter]:
+    """
+    Retorna o buffer de group commit do processo.
+
+    Returns:
+        Optional[GroupCommitter]: None se DURABILITY_MODE não for "group-commit"
+    """
+    global _group_committer
+    if DURABILITY_MODE != "group-commit":
+        return None
+    if _group_committer is None:
+        _group_committer = GroupCommitter()
+    return _group_committer
+
+
+async def close_group_committer() -> None:
+    """Grava as sessões pendentes do buffer global (shutdown)"""
+    if _group_committer is not None:
+        await _group_committer.close()
+
+
+__all__ = [
+    'GroupCommitter',
+    'apply_closed_sessions',
+    'close_group_committer',
+    'get_group_committer',
+    'make_delta',
+]
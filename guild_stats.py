@@ -0,0 +1,372 @@
+"""
+guild_stats.py - Estatísticas agregadas de uma partição mantidas incrementalmente.
+
+Cada arquivo de dados tem ao lado um pequeno arquivo de estatísticas
+(ex: video_ranking.guild-123.stats.json) com somas correntes, um
+histograma de durações de sessão em faixas fixas e um sketch de quantis.
+database.py atualiza esse arquivo a cada escrita, de modo que o
+!statsservidor lê um arquivo de tamanho fixo em vez de varrer todos os
+usuários. As estatísticas guardam a versão do snapshot de dados a que
+correspondem; se não baterem (queda, save_data), são reconstruídas.
+
+O sketch guarda contagens em faixas logarítmicas (erro relativo de
+SKETCH_ACCURACY): a mediana de uma sessão de 1h sai com erro de ~36s,
+em no máximo algumas centenas de faixas.
+"""
+
+import logging
+import math
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from database_lock import atomic_write_json, iter_json_members, safe_load_json, safe_update_json
+
+logger = logging.getLogger(__name__)
+
+# Limites superiores (segundos) das faixas do histograma; a última faixa
+# é aberta (> 4h)
+HISTOGRAM_BOUNDS: Tuple[int, ...] = (60, 300, 900, 1800, 3600, 7200, 14400)
+
+HISTOGRAM_LABELS: Tuple[str, ...] = (
+    "< 1min", "1-5min", "5-15min", "15-30min", "30min-1h", "1-2h", "2-4h", "> 4h"
+)
+
+# Erro relativo máximo dos quantis
+SKETCH_ACCURACY = 0.01
+
+
+def histogram_bucket(duration: float) -> int:
+    """Índice da faixa do histograma de uma duração"""
+    for index, bound in enumerate(HISTOGRAM_BOUNDS):
+        if duration < bound:
+            return index
+    return len(HISTOGRAM_BOUNDS)
+
+
+class QuantileSketch:
+    """Sketch de quantis com erro relativo limitado (faixas logarítmicas)
+
+    Um valor x > 0 cai na faixa ceil(log(x) / log(gamma)), com
+    gamma = (1 + a) / (1 - a); o quantil é estimado pelo ponto médio da
+    faixa. Valores zero têm contador próprio.
+
+    Estrutura interna:
+        bins: Dict[índice da faixa, contagem]
+    """
+
+    def __init__(self, accuracy: float = SKETCH_ACCURACY):
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+        self.zeros = 0
+        self.count = 0
+
+    def add(self, value: float, count: int = 1) -> None:
+        """
+        Registra ``count`` ocorrências de um valor.
+
+        Args:
+            value: Valor observado (>= 0)
+            count: Número de ocorrências
+        """
+        if value <= 0:
+            self.zeros += count
+        else:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.count += count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estima o quantil q (0 a 1).
+
+        Returns:
+            Optional[float]: Valor estimado ou None se o sketch estiver vazio
+        """
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if rank < seen:
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "accuracy": self.accuracy,
+            "zeros": self.zeros,
+            "bins": {str(index): count for index, count in self.bins.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "QuantileSketch":
+        sketch = cls(data.get("accuracy", SKETCH_ACCURACY))
+        sketch.zeros = data.get("zeros", 0)
+        sketch.bins = {int(index): count for index, count in data.get("bins", {}).items()}
+        sketch.count = sketch.zeros + sum(sketch.bins.values())
+        return sketch
+
+
+class GuildStats:
+    """Agregados de uma partição
+
+    users/total_seconds/sessions espelham os totais do arquivo de dados;
+    histogram e sketch descrevem as durações das sessões registradas;
+    source é o file_version do snapshot de dados a que correspondem.
+    """
+
+    def __init__(self):
+        self.source: Optional[List[int]] = None
+        self.users = 0
+        self.total_seconds = 0
+        self.sessions = 0
+        self.histogram: List[int] = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+        self.sketch = QuantileSketch()
+
+    def add_session(self, duration: float, count: int = 1) -> None:
+        """Registra a duração de ``count`` sessões no histograma e no sketch"""
+        self.histogram[histogram_bucket(duration)] += count
+        self.sketch.add(duration, count)
+
+    @property
+    def mean_session(self) -> Optional[float]:
+        """Duração média das sessões (segundos)"""
+        return self.total_seconds / self.sessions if self.sessions else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "source": self.source,
+            "users": self.users,
+            "total_seconds": self.total_seconds,
+            "sessions": self.sessions,
+            "histogram": list(self.histogram),
+            "sketch": self.sketch.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "GuildStats":
+        stats = cls()
+        stats.source = data.get("source")
+        stats.users = data.get("users", 0)
+        stats.total_seconds = data.get("total_seconds", 0)
+        stats.sessions = data.get("sessions", 0)
+        histogram = data.get("histogram", [])
+        stats.histogram[:len(histogram)] = histogram
+        stats.sketch = QuantileSketch.from_dict(data.get("sketch", {}))
+        return stats
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Resumo para exibição (serializável para o storage_service).
+
+        Returns:
+            Dict[str, Any]: Totais, média, mediana, p90 e histograma rotulado
+        """
+        return {
+            "users": self.users,
+            "total_seconds": self.total_seconds,
+            "sessions": self.sessions,
+            "mean_session": self.mean_session,
+            "median_session": self.sketch.quantile(0.5),
+            "p90_session": self.sketch.quantile(0.9),
+            "histogram": list(zip(HISTOGRAM_LABELS, self.histogram)),
+        }
+
+
+def stats_file_for(data_file: Path) -> Path:
+    """Arquivo de estatísticas de um arquivo de dados"""
+    return data_file.with_name(f"{data_file.stem}.stats{data_file.suffix}")
+
+
+def file_version(data_file: Path) -> Optional[List[int]]:
+    """
+    Identifica o snapshot publicado de um arquivo de dados.
+
+    Cada publicação (os.replace) cria um novo inode, então (inode, mtime,
+    tamanho) muda a cada escrita.
+
+    Returns:
+        Optional[List[int]]: [inode, mtime_ns, tamanho] ou None se não existir
+    """
+    try:
+        st = os.stat(data_file)
+    except FileNotFoundError:
+        return None
+    return [st.st_ino, st.st_mtime_ns, st.st_size]
+
+
+def rebuild_stats(data_file: Path) -> GuildStats:
+    """
+    Reconstrói as estatísticas varrendo o arquivo de dados (O(n), raro).
+
+    Usado quando o arquivo de estatísticas não existe ou não corresponde
+    ao snapshot atual dos dados (dados anteriores a este módulo, save_data,
+    queda entre a escrita dos dados e a das estatísticas). As sessões
+    antigas entram no histograma e no sketch pela média de cada usuário.
+
+    Args:
+        data_file: Arquivo de dados da partição
+
+    Returns:
+        GuildStats: Estatísticas do snapshot lido (``source`` preenchido)
+    """
+    stats = GuildStats()
+    try:
+        f = open(data_file, "r", encoding="utf-8")
+    except FileNotFoundError:
+        return stats
+
+    with f:
+        st = os.fstat(f.fileno())
+        stats.source = [st.st_ino, st.st_mtime_ns, st.st_size]
+        for _, entry in iter_json_members(f):
+            if not isinstance(entry, dict):
+                continue
+            seconds = entry.get("total_seconds", 0)
+            sessions = entry.get("sessions", 0)
+            stats.users += 1
+            stats.total_seconds += seconds
+            stats.sessions += sessions
+            if sessions:
+                stats.add_session(seconds / sessions, sessions)
+    return stats
+
+
+def update_stats(
+    data_file: Path,
+    before: Optional[List[int]],
+    func: Callable[[GuildStats], None]
+) -> None:
+    """
+    Aplica a alteração de uma escrita já publicada às estatísticas.
+
+    A alteração só é somada se as estatísticas correspondem ao snapshot
+    sobre o qual a escrita foi feita (``before``); caso contrário elas são
+    reconstruídas do snapshot atual, que já inclui a escrita. Assim as
+    estatísticas não precisam de fsync: depois de uma queda, uma versão
+    antiga é detectada e reconstruída em vez de divergir dos dados.
+
+    Args:
+        data_file: Arquivo de dados da partição
+        before: file_version do snapshot lido pela escrita
+        func: Recebe as estatísticas e aplica a alteração no lugar
+    """
+    after = file_version(data_file)
+
+    def update_func(current: Dict[str, Any]) -> Dict[str, Any]:
+        """Soma a alteração ou reconstrói a partir dos dados."""
+        if not current or current.get("source") != before:
+            return rebuild_stats(data_file).to_dict()
+        stats = GuildStats.from_dict(current)
+        func(stats)
+        stats.source = after
+        return stats.to_dict()
+
+    try:
+        safe_update_json(str(stats_file_for(data_file)), update_func)
+    except Exception as e:
+        logger.warning("Estatísticas de %s descartadas: %s", data_file, e)
+        discard_stats(data_file)
+
+
+def record_sessions(
+    data_file: Path,
+    before: Optional[List[int]],
+    durations: Iterable[int],
+    new_users: int = 0
+) -> None:
+    """
+    Registra sessões encerradas (update_video_time / apply_session_deltas).
+
+    Args:
+        data_file: Arquivo de dados da partição
+        before: file_version do snapshot lido pela escrita
+        durations: Duração de cada sessão em segundos
+        new_users: Usuários que não existiam antes da escrita
+    """
+    durations = list(durations)
+
+    def apply(stats: GuildStats) -> None:
+        stats.users += new_users
+        for duration in durations:
+            stats.total_seconds += duration
+            stats.sessions += 1
+            stats.add_session(duration)
+
+    update_stats(data_file, before, apply)
+
+
+def adjust_totals(
+    data_file: Path,
+    before: Optional[List[int]],
+    users: int = 0,
+    seconds: int = 0,
+    sessions: int = 0
+) -> None:
+    """
+    Ajusta os totais sem registrar durações (importação e comandos admin).
+
+    O histograma e o sketch continuam descrevendo as sessões registradas.
+
+    Args:
+        data_file: Arquivo de dados da partição
+        before: file_version do snapshot lido pela escrita
+        users: Variação no número de usuários
+        seconds: Variação no total de segundos
+        sessions: Variação no total de sessões
+    """
+    def apply(stats: GuildStats) -> None:
+        stats.users += users
+        stats.total_seconds += seconds
+        stats.sessions += sessions
+
+    update_stats(data_file, before, apply)
+
+
+def reset_stats(data_file: Path) -> None:
+    """Zera as estatísticas após a troca de época do arquivo de dados"""
+    stats = GuildStats()
+    stats.source = file_version(data_file)
+    atomic_write_json(stats.to_dict(), str(stats_file_for(data_file)))
+
+
+def discard_stats(data_file: Path) -> None:
+    """Descarta as estatísticas; a próxima leitura ou escrita as reconstrói"""
+    stats_file_for(data_file).unlink(missing_ok=True)
+
+
+def load_stats(data_file: Path) -> GuildStats:
+    """
+    Lê as estatísticas de uma partição (sem lock, snapshot publicado).
+
+    Returns:
+        GuildStats: Estatísticas atuais; reconstruídas do arquivo de dados
+            se estiverem ausentes ou desatualizadas
+    """
+    # Estatísticas são derivadas: um arquivo corrompido é reconstruído
+    data = safe_load_json(str(stats_file_for(data_file)), {}, strict=False)
+    if data and data.get("source") == file_version(data_file):
+        return GuildStats.from_dict(data)
+    return rebuild_stats(data_file)
+
+
+__all__ = [
+    'GuildStats',
+    'HISTOGRAM_BOUNDS',
+    'HISTOGRAM_LABELS',
+    'QuantileSketch',
+    'adjust_totals',
+    'discard_stats',
+    'file_version',
+    'load_stats',
+    'rebuild_stats',
+    'record_sessions',
+    'reset_stats',
+    'stats_file_for',
+]
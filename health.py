@@ -0,0 +1,309 @@
+"""
+health.py - Monitor do event loop e endpoint de saúde do bot.
+
+Este módulo mede o atraso (lag) do event loop, identifica callbacks lentos
+(com o nome da task e a linha que bloqueou o loop) e expõe um endpoint
+HTTP de saúde/prontidão para o orquestrador. Um gateway travado deixa de
+ser silencioso: o lag aparece no /health e o watchdog registra o culpado.
+"""
+
+import asyncio
+import logging
+import math
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, NamedTuple, Optional
+
+from events import dispatch_delay, get_last_persist_time, pending_closes, recent_events
+from group_commit import get_group_committer
+from storage_service import get_storage_client
+
+if TYPE_CHECKING:
+    # aiohttp só é importado quando o endpoint de saúde é iniciado: o
+    # LoopMonitor (sempre ativo) não paga o custo de import
+    from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+
+class SlowCallback(NamedTuple):
+    """Bloqueio do event loop acima do limite configurado"""
+    timestamp: float
+    seconds: float
+    task: str
+    location: str
+
+
+class LoopMonitor:
+    """Amostrador de lag do event loop com watchdog em thread separada
+
+    Uma task acorda a cada ``interval`` segundos e mede quanto o sleep
+    atrasou (lag). Uma thread watchdog observa o último batimento da task:
+    se o loop ficar bloqueado por mais de ``slow_threshold`` segundos, ela
+    captura a task corrente e o frame do loop enquanto o bloqueio acontece
+    (o que o asyncio debug só informa depois, e com custo em todo callback).
+
+    Estrutura interna:
+        slow_callbacks: Deque[SlowCallback] com os bloqueios mais recentes
+        _suspect: (task, local) capturados pelo watchdog no bloqueio atual
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.5,
+        slow_threshold: float = 0.1,
+        stall_threshold: float = 5.0,
+        history: int = 32,
+        debug: bool = False
+    ):
+        """
+        Args:
+            interval: Período de amostragem do lag em segundos
+            slow_threshold: Bloqueio mínimo registrado como callback lento
+            stall_threshold: Lag a partir do qual o loop é considerado travado
+            history: Quantidade de callbacks lentos mantidos
+            debug: Ativa também o modo debug do asyncio
+                (``slow_callback_duration``); tem custo em todo callback
+        """
+        self.interval = interval
+        self.slow_threshold = slow_threshold
+        self.stall_threshold = stall_threshold
+        self.debug = debug
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.slow_callbacks: Deque[SlowCallback] = deque(maxlen=history)
+        self._heartbeat = time.monotonic()
+        self._suspect: Optional[tuple] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def blocked_for(self) -> float:
+        """Segundos além do esperado desde o último batimento do loop"""
+        return max(0.0, time.monotonic() - self._heartbeat - self.interval)
+
+    @property
+    def stalled(self) -> bool:
+        """True se o loop está (ou acabou de ficar) travado"""
+        return max(self.lag, self.blocked_for) >= self.stall_threshold
+
+    def start(self) -> None:
+        """Inicia a amostragem no event loop corrente e o watchdog
+
+        Raises:
+            RuntimeError: Se chamado fora de um event loop
+        """
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        if self.debug:
+            self._loop.set_debug(True)
+            self._loop.slow_callback_duration = self.slow_threshold
+
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = self._loop.create_task(self._sample(), name="loop-monitor")
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Para a amostragem e o watchdog"""
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 2)
+            self._thread = None
+
+    async def _sample(self) -> None:
+        """Mede o atraso do sleep a cada intervalo"""
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - start - self.interval)
+            self._heartbeat = now
+            self.lag = lag
+            self.max_lag = max(self.max_lag, lag)
+
+            if lag >= self.slow_threshold:
+                task, location = self._suspect or ("?", "?")
+                self.slow_callbacks.append(SlowCallback(time.time(), lag, task, location))
+                logger.warning(
+                    "Event loop bloqueado por %.3fs (task=%s em %s)", lag, task, location,
+                    extra={"event": "loop_blocked", "seconds": round(lag, 3), "task": task}
+                )
+            self._suspect = None
+
+    def _watch(self) -> None:
+        """Thread watchdog: captura a task que está bloqueando o loop"""
+        poll = max(self.slow_threshold / 2, 0.01)
+        reported = None
+        stall_logged = None
+        while not self._stop.wait(poll):
+            heartbeat = self._heartbeat
+            blocked = time.monotonic() - heartbeat - self.interval
+            if blocked < self.slow_threshold:
+                continue
+
+            if reported != heartbeat:
+                reported = heartbeat
+                self._suspect = self._capture()
+
+            if blocked >= self.stall_threshold and stall_logged != heartbeat:
+                stall_logged = heartbeat
+                task, location = self._suspect or ("?", "?")
+                logger.error(
+                    "Event loop travado há %.1fs (task=%s em %s)", blocked, task, location,
+                    extra={"event": "loop_stalled", "seconds": round(blocked, 1), "task": task}
+                )
+
+    def _capture(self) -> tuple:
+        """Nome da task corrente do loop e o frame mais interno da thread dele"""
+        task_name = "?"
+        try:
+            task = asyncio.current_task(self._loop)
+            if task is not None:
+                task_name = task.get_name()
+        except RuntimeError:
+            pass
+
+        location = "?"
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is not None:
+            summary = traceback.extract_stack(frame, limit=1)[-1]
+            location = f"{summary.filename}:{summary.lineno} {summary.name}"
+        return task_name, location
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Estado atual do monitor para o relatório de saúde"""
+        return {
+            "loop_lag_ms": round(max(self.lag, self.blocked_for) * 1000, 1),
+            "loop_lag_max_ms": round(self.max_lag * 1000, 1),
+            "slow_callbacks": [
+                {
+                    "at": round(entry.timestamp, 3),
+                    "ms": round(entry.seconds * 1000, 1),
+                    "task": entry.task,
+                    "location": entry.location,
+                }
+                for entry in list(self.slow_callbacks)[-5:]
+            ],
+        }
+
+
+def build_health_report(bot: Any, monitor: LoopMonitor) -> Dict[str, Any]:
+    """
+    Monta o relatório de saúde do processo.
+
+    Args:
+        bot: Instância do bot (usa latency, is_ready e is_closed)
+        monitor: Monitor do event loop
+
+    Returns:
+        Dict[str, Any]: Lag do loop, latência do gateway, atraso entre o
+            recebimento dos eventos de voz e o handler, filas de escrita
+            pendentes e horário da última gravação bem-sucedida
+    """
+    latency = getattr(bot, "latency", float("nan"))
+    ready = bool(bot.is_ready()) and not bot.is_closed()
+
+    client = get_storage_client() or get_group_committer()
+    if client is not None:
+        pending_deltas = client.pending_deltas
+        last_flush = client.last_flush_time
+    else:
+        pending_deltas = 0
+        last_flush = get_last_persist_time()
+
+    report = {
+        "status": "stalled" if monitor.stalled else "ok",
+        "ready": ready,
+        "gateway_latency_ms": round(latency * 1000, 1) if math.isfinite(latency) else None,
+        "pending_deltas": pending_deltas,
+        "pending_closes": len(pending_closes),
+        "duplicate_events": recent_events.duplicates,
+        "last_flush": last_flush,
+        "last_flush_age_s": round(time.time() - last_flush, 1) if last_flush else None,
+    }
+    report.update(monitor.snapshot())
+    report.update(dispatch_delay.snapshot())
+    return report
+
+
+class HealthServer:
+    """Endpoint HTTP de saúde para orquestradores (aiohttp)
+
+    Rotas:
+        GET /health: liveness; 503 se o event loop estiver travado
+        GET /ready: readiness; 503 se o bot não estiver conectado ao gateway
+
+    Roda no mesmo event loop do bot: se o loop travar de vez, o próprio
+    endpoint deixa de responder e o timeout do orquestrador detecta o travamento.
+    """
+
+    def __init__(self, report: Callable[[], Dict[str, Any]], host: str = "127.0.0.1", port: int = 8080):
+        """
+        Args:
+            report: Função que monta o relatório (ex: build_health_report)
+            host: Endereço de escuta
+            port: Porta TCP (0 escolhe uma porta livre)
+        """
+        self.report = report
+        self.host = host
+        self.port = port
+        self._runner: Optional["web.AppRunner"] = None
+
+    async def start(self) -> None:
+        """Inicia o servidor HTTP"""
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_get("/health", self._health)
+        app.router.add_get("/ready", self._ready)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        logger.info("Endpoint de saúde em http://%s:%d/health", self.host, self.port)
+
+    async def close(self) -> None:
+        """Encerra o servidor HTTP"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _health(self, request: "web.Request") -> "web.Response":
+        from aiohttp import web
+
+        report = self.report()
+        status = 503 if report["status"] == "stalled" else 200
+        return web.json_response(report, status=status)
+
+    async def _ready(self, request: "web.Request") -> "web.Response":
+        from aiohttp import web
+
+        report = self.report()
+        ok = report["ready"] and report["status"] != "stalled"
+        return web.json_response(report, status=200 if ok else 503)
+
+
+__all__ = [
+    'HealthServer',
+    'LoopMonitor',
+    'SlowCallback',
+    'build_health_report',
+]
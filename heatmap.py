@@ -0,0 +1,196 @@
+"""
+heatmap.py - Mapa de calor de câmera ligada por hora da semana.
+
+Cada guild tem 168 contadores (7 dias x 24 horas, segunda 00h = índice 0)
+com os segundos de câmera ligada em cada hora da semana, no fuso
+HEATMAP_TIMEZONE. Ao encerrar uma sessão, sua duração é dividida entre as
+horas que ela atravessa por aritmética: a primeira e a última hora
+recebem as frações, semanas completas somam 3600s a todas as horas e o
+resto da volta soma 3600s às horas seguintes. O custo independe da
+duração da sessão (no máximo uma volta de 168 horas), sem laço por minuto.
+
+Os contadores ficam em HEATMAP_DIR/guild-<id>.json como um array de 168
+inteiros; o !mapacalor os renderiza sem tocar no histórico de sessões.
+"""
+
+import math
+import time
+from array import array
+from datetime import datetime, timezone, tzinfo
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config import HEATMAP_DIR as HEATMAP_DIR_NAME, HEATMAP_TIMEZONE
+from database_lock import safe_load_json, safe_update_json
+
+HOURS_PER_WEEK = 168
+
+# 01/01/1970 foi uma quinta-feira: desloca para a semana começar na segunda
+_EPOCH_HOUR_OF_WEEK = 3 * 24
+
+WEEKDAY_LABELS = ("Seg", "Ter", "Qua", "Qui", "Sex", "Sáb", "Dom")
+
+# Intensidade do mapa renderizado, do vazio ao máximo
+_SHADES = " ░▒▓█"
+
+# Diretório dos contadores (None = mapa de calor desativado)
+HEATMAP_DIR: Optional[Path] = Path(HEATMAP_DIR_NAME) if HEATMAP_DIR_NAME else None
+
+
+def _timezone() -> Optional[tzinfo]:
+    """Fuso configurado (None = fuso do sistema)"""
+    if not HEATMAP_TIMEZONE:
+        return None
+    from zoneinfo import ZoneInfo
+    return ZoneInfo(HEATMAP_TIMEZONE)
+
+
+def utc_offset(timestamp: float, tz: Optional[tzinfo] = None) -> int:
+    """
+    Deslocamento (segundos) do fuso em relação ao UTC em um instante.
+
+    Args:
+        timestamp: Instante em segundos epoch
+        tz: Fuso (None = fuso do sistema)
+
+    Returns:
+        int: Segundos a somar ao horário UTC
+    """
+    if tz is None:
+        return time.localtime(timestamp).tm_gmtoff
+    return int(datetime.fromtimestamp(timestamp, timezone.utc).astimezone(tz).utcoffset().total_seconds())
+
+
+def add_session(counters: array, start: float, end: float, offset: int = 0) -> None:
+    """
+    Distribui a duração de uma sessão entre as horas da semana.
+
+    Args:
+        counters: 168 contadores (alterados no lugar)
+        start: Início da sessão (segundos epoch)
+        end: Fim da sessão (segundos epoch)
+        offset: Deslocamento do fuso (ver utc_offset), fixo na sessão
+    """
+    if end <= start:
+        return
+
+    start, end = int(start) + offset, int(end) + offset
+    first_hour, last_hour = start // 3600, (end - 1) // 3600
+
+    def bucket(hour: int) -> int:
+        return (hour + _EPOCH_HOUR_OF_WEEK) % HOURS_PER_WEEK
+
+    if first_hour == last_hour:
+        counters[bucket(first_hour)] += end - start
+        return
+
+    counters[bucket(first_hour)] += (first_hour + 1) * 3600 - start
+    counters[bucket(last_hour)] += end - last_hour * 3600
+
+    full_hours = last_hour - first_hour - 1
+    weeks, remainder = divmod(full_hours, HOURS_PER_WEEK)
+    if weeks:
+        for index in range(HOURS_PER_WEEK):
+            counters[index] += weeks * 3600
+    for hour in range(first_hour + 1, first_hour + 1 + remainder):
+        counters[bucket(hour)] += 3600
+
+
+def _heatmap_path(guild_id: Optional[int]) -> Path:
+    return HEATMAP_DIR / (f"guild-{guild_id}.json" if guild_id is not None else "global.json")
+
+
+def record_session(guild_id: Optional[int], start: float, end: float) -> None:
+    """
+    Soma uma sessão encerrada ao mapa de calor do guild.
+
+    Args:
+        guild_id: ID do guild da sessão
+        start: Início da sessão (segundos epoch)
+        end: Fim da sessão (segundos epoch)
+
+    Raises:
+        FileLockError: Se não conseguir bloquear o arquivo do guild
+    """
+    record_sessions([(guild_id, start, end)])
+
+
+def record_sessions(sessions: Iterable[Tuple[Optional[int], float, float]]) -> None:
+    """
+    Soma um lote de sessões encerradas aos mapas de calor.
+
+    Usada pelos escritores em lote (group_commit e storage_service), fora do
+    event loop: um único read-modify-write por guild para o lote inteiro.
+
+    Args:
+        sessions: Sequência de (guild_id, início, fim) em segundos epoch
+
+    Raises:
+        FileLockError: Se não conseguir bloquear o arquivo de um guild
+    """
+    if HEATMAP_DIR is None:
+        return
+
+    tz = _timezone()
+    by_guild: Dict[Optional[int], List[Tuple[float, float, int]]] = {}
+    for guild_id, start, end in sessions:
+        by_guild.setdefault(guild_id, []).append((start, end, utc_offset(start, tz)))
+
+    HEATMAP_DIR.mkdir(parents=True, exist_ok=True)
+    for guild_id, spans in by_guild.items():
+
+        def update_func(current: Dict[str, List[int]], spans=spans) -> Dict[str, List[int]]:
+            """Soma as sessões do guild aos contadores gravados."""
+            counters = array("q", current.get("seconds") or [0] * HOURS_PER_WEEK)
+            for start, end, offset in spans:
+                add_session(counters, start, end, offset)
+            current["seconds"] = counters.tolist()
+            return current
+
+        safe_update_json(str(_heatmap_path(guild_id)), update_func)
+
+
+def load_heatmap(guild_id: Optional[int]) -> List[int]:
+    """
+    Lê os contadores de um guild.
+
+    Returns:
+        List[int]: 168 contadores em segundos (segunda 00h primeiro)
+    """
+    if HEATMAP_DIR is None:
+        return [0] * HOURS_PER_WEEK
+    return safe_load_json(str(_heatmap_path(guild_id)), {}).get("seconds") or [0] * HOURS_PER_WEEK
+
+
+def render_heatmap(counters: Sequence[int]) -> str:
+    """
+    Renderiza os contadores como uma grade 7 x 24 em texto.
+
+    Args:
+        counters: 168 contadores (segunda 00h primeiro)
+
+    Returns:
+        str: Uma linha por dia, um caractere por hora (intensidade relativa
+            à hora mais ativa)
+    """
+    peak = max(counters) or 1
+    lines = ["    " + "".join(str(hour // 10) if hour % 6 == 0 else " " for hour in range(24)),
+             "    " + "".join(str(hour % 10) if hour % 6 == 0 else " " for hour in range(24))]
+    for day, label in enumerate(WEEKDAY_LABELS):
+        row = counters[day * 24:(day + 1) * 24]
+        lines.append(f"{label} " + "".join(
+            _SHADES[math.ceil(value / peak * (len(_SHADES) - 1))] for value in row
+        ))
+    return "\n".join(lines)
+
+
+__all__ = [
+    'HOURS_PER_WEEK',
+    'WEEKDAY_LABELS',
+    'add_session',
+    'load_heatmap',
+    'record_session',
+    'record_sessions',
+    'render_heatmap',
+    'utc_offset',
+]
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+importer.py - Importação em streaming de dados legados e de outros bots.
+
+Lê registros de um arquivo JSONL (um registro por linha) ou de um objeto
+JSON no formato do video_ranking.json, opcionalmente comprimidos com gzip,
+sem carregar o arquivo inteiro. Cada registro é validado
+(utils.validate_user_id) e somado ao ranking com a semântica de upsert
+de update_video_time, em lotes (database.merge_totals: uma escrita por
+partição e lote).
+
+Após cada lote gravado, a posição no arquivo é salva em um checkpoint
+(``<arquivo>.checkpoint``); uma nova execução continua de onde parou.
+
+Formatos de registro aceitos:
+    {"user_id": "...", "total_seconds": 3600, "sessions": 5, "guild_id": 123}
+    {"user_id": "...", "duration": 60}          (uma sessão)
+    {"<user_id>": {"total_seconds": ..., "sessions": ...}, ...}  (objeto JSON)
+
+Uso:
+    python importer.py legado.jsonl.gz --batch-size 5000 --guild 123
+"""
+
+import gzip
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import database
+from database_lock import atomic_write_json, iter_json_members, safe_load_json
+from utils import validate_user_id
+
+logger = logging.getLogger(__name__)
+
+ImportRecord = Tuple[str, int, int, Optional[int]]
+
+
+class ImportProgress:
+    """Contadores de uma importação (também o conteúdo do checkpoint)
+
+    position: byte após a última linha aplicada (JSONL) ou número de
+        membros aplicados (objeto JSON)
+    imported/skipped: acumulados desde o início, incluindo execuções
+        anteriores retomadas pelo checkpoint
+    """
+
+    def __init__(self, position: int = 0, imported: int = 0, skipped: int = 0, done: bool = False):
+        self.position = position
+        self.imported = imported
+        self.skipped = skipped
+        self.done = done
+        self.started = time.perf_counter()
+        self._imported_at_start = imported
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self) -> float:
+        """Registros importados por segundo nesta execução"""
+        imported = self.imported - self._imported_at_start
+        return imported / self.elapsed if self.elapsed > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "position": self.position,
+            "imported": self.imported,
+            "skipped": self.skipped,
+            "done": self.done,
+        }
+
+
+def _open_text(path: Path):
+    """Abre o arquivo em modo texto, descomprimindo se terminar em .gz"""
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def _is_jsonl(path: Path) -> bool:
+    name = path.name[:-3] if path.suffix == ".gz" else path.name
+    return name.endswith(".jsonl") or name.endswith(".ndjson")
+
+
+def iter_jsonl(path: Path, offset: int = 0) -> Iterator[Tuple[Any, int]]:
+    """
+    Itera as linhas de um JSONL a partir de um offset em bytes.
+
+    Args:
+        path: Arquivo .jsonl (ou .jsonl.gz)
+        offset: Byte de início (checkpoint)
+
+    Yields:
+        Tuple[Any, int]: (registro decodificado ou None se inválido,
+            offset logo após a linha)
+    """
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            offset += len(line)
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line), offset
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                yield None, offset
+
+
+def iter_json_members_from(path: Path, skip: int = 0) -> Iterator[Tuple[Any, int]]:
+    """
+    Itera os membros de um objeto JSON {user_id: {...}} em blocos.
+
+    Args:
+        path: Arquivo .json (ou .json.gz)
+        skip: Membros já aplicados (checkpoint)
+
+    Yields:
+        Tuple[Any, int]: (registro, número de membros lidos até ele)
+    """
+    with _open_text(path) as f:
+        for index, (user_id, entry) in enumerate(iter_json_members(f), start=1):
+            if index <= skip:
+                continue
+            record = dict(entry, user_id=user_id) if isinstance(entry, dict) else None
+            yield record, index
+
+
+def to_import_record(raw: Any, default_guild: Optional[int] = None) -> Optional[ImportRecord]:
+    """
+    Valida e normaliza um registro de entrada.
+
+    Args:
+        raw: Registro decodificado
+        default_guild: Guild usado quando o registro não traz guild_id
+
+    Returns:
+        Optional[ImportRecord]: (user_id, segundos, sessões, guild_id) ou
+            None se o registro for inválido
+    """
+    if not isinstance(raw, dict):
+        return None
+
+    user_id = str(raw.get("user_id", ""))
+    if not validate_user_id(user_id):
+        return None
+
+    try:
+        if "total_seconds" in raw:
+            seconds = int(raw["total_seconds"])
+            sessions = int(raw.get("sessions", 0))
+        else:
+            seconds = int(raw["duration"])
+            sessions = 1
+        guild_id = raw.get("guild_id")
+        guild_id = int(guild_id) if guild_id not in (None, "") else default_guild
+    except (KeyError, TypeError, ValueError):
+        return None
+
+    if seconds < 0 or sessions < 0:
+        return None
+    return user_id, seconds, sessions, guild_id
+
+
+def checkpoint_path_for(path: Path) -> Path:
+    """Arquivo de checkpoint de uma importação"""
+    return path.with_name(path.name + ".checkpoint")
+
+
+def import_file(
+    path: Path,
+    batch_size: int = 5000,
+    default_guild: Optional[int] = None,
+    restart: bool = False,
+    on_progress: Optional[Callable[[ImportProgress], None]] = None
+) -> ImportProgress:
+    """
+    Importa um arquivo em lotes, retomando do checkpoint se existir.
+
+    Um lote é gravado antes de o checkpoint avançar: se o processo cair
+    entre os dois, a nova execução repete apenas o último lote.
+
+    Args:
+        path: Arquivo de origem (.jsonl, .ndjson ou .json, com ou sem .gz)
+        batch_size: Registros por escrita
+        default_guild: Guild dos registros sem guild_id
+        restart: Ignora o checkpoint existente
+        on_progress: Chamado após cada lote gravado
+
+    Returns:
+        ImportProgress: Contadores finais
+
+    Raises:
+        RuntimeError: Se ocorrer erro no bloqueio de arquivo
+        json.JSONDecodeError: Se um objeto JSON de origem estiver malformado
+    """
+    checkpoint = checkpoint_path_for(path)
+    saved = {} if restart else safe_load_json(str(checkpoint), {})
+    progress = ImportProgress(
+        position=saved.get("position", 0),
+        imported=saved.get("imported", 0),
+        skipped=saved.get("skipped", 0),
+        done=saved.get("done", False),
+    )
+    if progress.done:
+        logger.info("%s já foi importado (checkpoint %s)", path, checkpoint)
+        return progress
+
+    if _is_jsonl(path):
+        source = iter_jsonl(path, progress.position)
+    else:
+        source = iter_json_members_from(path, progress.position)
+
+    batch: List[ImportRecord] = []
+    position = progress.position
+
+    def commit() -> None:
+        if batch:
+            database.merge_totals(batch)
+            progress.imported += len(batch)
+            batch.clear()
+        progress.position = position
+        atomic_write_json(progress.to_dict(), str(checkpoint))
+        if on_progress is not None:
+            on_progress(progress)
+
+    for raw, position in source:
+        record = to_import_record(raw, default_guild)
+        if record is None:
+            progress.skipped += 1
+            continue
+        batch.append(record)
+        if len(batch) >= batch_size:
+            commit()
+
+    progress.done = True
+    commit()
+    return progress
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Ponto de entrada da linha de comando"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Importa dados legados para o Bate-Ponto")
+    parser.add_argument("source", type=Path, help="Arquivo .jsonl/.ndjson/.json (gzip opcional)")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--guild", type=int, default=None, help="Guild dos registros sem guild_id")
+    parser.add_argument("--restart", action="store_true", help="Ignora o checkpoint e recomeça")
+    args = parser.parse_args(argv)
+
+    def report(progress: ImportProgress) -> None:
+        print(
+            f"{progress.imported} importados, {progress.skipped} inválidos, "
+            f"posição {progress.position} ({progress.rate:.0f} registros/s)",
+            flush=True
+        )
+
+    result = import_file(args.source, args.batch_size, args.guild, args.restart, report)
+    print(f"Concluído: {result.imported} importados, {result.skipped} inválidos em {result.elapsed:.1f}s")
+
+
+__all__ = [
+    'ImportProgress',
+    'checkpoint_path_for',
+    'import_file',
+    'to_import_record',
+]
+
+
+if __name__ == "__main__":
+    main()
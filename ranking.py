@@ -0,0 +1,254 @@
+"""
+Cache do ranking ordenado para o bot Discord de ranking de atividade.
+
+Este módulo mantém o ranking já ordenado em memória, evitando recarregar
+e reordenar o arquivo JSON a cada comando. O cache é indexado pela versão
+lógica dos dados (database.get_data_version), de modo que qualquer mutação
+invalida o cache em um único passo.
+
+Páginas do ranking são fatias do índice ordenado: por offset em O(page)
+ou por cursor (total, user_id) com busca binária em O(log n + page), sem
+reordenar nada.
+
+Rankings por período (últimos 7 ou 30 dias) somam os totais diários do
+histórico de sessões (session_history.daily_totals) e usam um cache
+próprio, indexado pela versão do histórico e pelo dia corrente.
+"""
+
+import time
+from bisect import bisect_left, bisect_right
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+from config import MAX_RANKING_SIZE
+from database import get_data_version, load_data, partition_key
+from session_history import DAY_SECONDS, daily_totals, get_history_version
+
+RankingEntry = Tuple[str, Dict[str, int]]
+
+# Chave de ordenação de uma entrada: (-total_seconds, user_id). O user_id
+# desempata, de modo que a ordem é total e um cursor identifica uma
+# posição única no índice
+SortKey = Tuple[int, str]
+
+# Períodos do ranking: dias (UTC) cobertos, contando hoje (None = desde o início)
+RANKING_PERIODS: Dict[str, Optional[int]] = {
+    "total": None,
+    "semana": 7,
+    "mes": 30,
+}
+
+
+class RankingPage(NamedTuple):
+    """Fatia do ranking ordenado"""
+    version: Hashable
+    total_users: int
+    offset: int
+    entries: List[RankingEntry]
+
+
+def _sort_key(item: RankingEntry) -> SortKey:
+    return -item[1]["total_seconds"], item[0]
+
+
+class RankingCache:
+    """Cache do ranking ordenado por total_seconds decrescente
+
+    Mantém uma entrada por partição (ver database.partition_key), de modo
+    que cada guild tenha seu ranking quando PARTITION_BY_GUILD está ativo.
+    Uma entrada vale enquanto ``version_func`` retornar a mesma versão.
+
+    Estrutura interna:
+        _entries: Dict[chave, (versão, dados, ranking ordenado, chaves de ordenação)]
+    """
+
+    def __init__(self, version_func: Callable[[], Hashable] = get_data_version):
+        self.version = version_func
+        self._entries: Dict[
+            Hashable,
+            Tuple[Hashable, Dict[str, Dict[str, int]], List[RankingEntry], List[SortKey]]
+        ] = {}
+
+    def _entry(
+        self,
+        loader: Callable[[], Dict[str, Dict[str, Any]]],
+        key: Hashable
+    ) -> Tuple[Hashable, Dict[str, Dict[str, int]], List[RankingEntry], List[SortKey]]:
+        version = self.version()
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != version:
+            data = loader()
+            ranked = sorted(data.items(), key=_sort_key)
+            entry = (version, data, ranked, [_sort_key(item) for item in ranked])
+            self._entries[key] = entry
+        return entry
+
+    def get(
+        self,
+        loader: Callable[[], Dict[str, Dict[str, Any]]],
+        key: Hashable = None
+    ) -> Tuple[Dict[str, Dict[str, int]], List[RankingEntry]]:
+        """Retorna os dados e o ranking ordenado, recalculando se necessário
+
+        Args:
+            loader: Função que carrega os dados brutos (ex: load_data)
+            key: Chave da partição (None para a partição global)
+
+        Returns:
+            Tupla (dados, ranking ordenado)
+        """
+        _, data, ranked, _ = self._entry(loader, key)
+        return data, ranked
+
+    def page(
+        self,
+        loader: Callable[[], Dict[str, Dict[str, Any]]],
+        key: Hashable = None,
+        offset: int = 0,
+        limit: int = MAX_RANKING_SIZE,
+        after: Optional[SortKey] = None
+    ) -> RankingPage:
+        """Retorna uma página do ranking ordenado
+
+        Args:
+            loader: Função que carrega os dados brutos (ex: load_data)
+            key: Chave da partição (None para a partição global)
+            offset: Posição (0 = primeiro) do início da página
+            limit: Tamanho da página
+            after: Cursor (chave de ordenação da última entrada da página
+                anterior); tem precedência sobre offset
+
+        Returns:
+            RankingPage com até ``limit`` entradas
+        """
+        version, data, ranked, keys = self._entry(loader, key)
+        if after is not None:
+            offset = bisect_right(keys, tuple(after))
+        offset = max(0, offset)
+        return RankingPage(version, len(data), offset, ranked[offset:offset + limit])
+
+    def position(
+        self,
+        loader: Callable[[], Dict[str, Dict[str, Any]]],
+        user_id: str,
+        key: Hashable = None
+    ) -> Optional[int]:
+        """Retorna a posição (0 = primeiro) de um usuário em O(log n)
+
+        Returns:
+            Posição no ranking ou None se o usuário não tiver dados
+        """
+        _, data, _, keys = self._entry(loader, key)
+        entry = data.get(user_id)
+        if entry is None:
+            return None
+        return bisect_left(keys, (-entry["total_seconds"], user_id))
+
+    def invalidate(self) -> None:
+        """Descarta o ranking em cache de todas as partições"""
+        self._entries.clear()
+
+
+def _period_version() -> Tuple[int, int]:
+    """Versão dos rankings por período: muda a cada sessão gravada e à
+    meia-noite (UTC), quando a janela de dias avança"""
+    return get_history_version(), int(time.time() // DAY_SECONDS)
+
+
+# Instância global do cache de ranking e dos rankings por período
+ranking_cache = RankingCache()
+period_cache = RankingCache(_period_version)
+
+
+def period_totals(guild_id: Optional[int], days: int, now: Optional[float] = None) -> Dict[str, Dict[str, int]]:
+    """
+    Totais por usuário das sessões iniciadas nos últimos ``days`` dias.
+
+    Args:
+        guild_id: ID do guild
+        days: Dias (UTC) cobertos, contando o dia atual
+        now: Horário de referência (default: agora)
+
+    Returns:
+        Dict[str, Dict[str, int]]: {user_id: {"total_seconds", "sessions"}},
+            no formato do arquivo de dados
+    """
+    today = int((time.time() if now is None else now) // DAY_SECONDS)
+    totals: Dict[str, Dict[str, int]] = {}
+    for summary in daily_totals(guild_id, (today - days + 1) * DAY_SECONDS, (today + 1) * DAY_SECONDS).values():
+        for user_id, (seconds, sessions) in summary.items():
+            entry = totals.setdefault(user_id, {"total_seconds": 0, "sessions": 0})
+            entry["total_seconds"] += seconds
+            entry["sessions"] += sessions
+    return totals
+
+
+def ranking_version(period: str = "total") -> Hashable:
+    """Versão atual do ranking de um período (a mesma de ranking_page)"""
+    return ranking_cache.version() if RANKING_PERIODS[period] is None else period_cache.version()
+
+
+def ranking_page(
+    guild_id: Optional[int] = None,
+    offset: int = 0,
+    limit: int = MAX_RANKING_SIZE,
+    user_id: Optional[str] = None,
+    period: str = "total"
+) -> Dict[str, Any]:
+    """
+    Página do ranking de um guild (serializável para o storage_service).
+
+    Args:
+        guild_id: ID do guild (usado apenas com PARTITION_BY_GUILD no
+            ranking total)
+        offset: Posição do início da página
+        limit: Tamanho da página
+        user_id: Se informado, retorna a página que contém o usuário
+        period: Chave de RANKING_PERIODS
+
+    Returns:
+        Dict[str, Any]: version, total_users, offset, entries e position
+            (posição do usuário ou None)
+
+    Raises:
+        KeyError: Se o período não existir
+    """
+    days = RANKING_PERIODS[period]
+    if days is None:
+        cache, key = ranking_cache, partition_key(guild_id)
+
+        def loader() -> Dict[str, Dict[str, Any]]:
+            return load_data(guild_id)
+    else:
+        cache, key = period_cache, (guild_id, days)
+
+        def loader() -> Dict[str, Dict[str, Any]]:
+            return period_totals(guild_id, days)
+
+    position = None
+    if user_id is not None:
+        position = cache.position(loader, user_id, key)
+        if position is not None:
+            offset = position - position % limit
+    page = cache.page(loader, key, offset, limit)
+    if not page.entries and page.total_users:
+        # Alem da ultima pagina: devolve a ultima
+        page = cache.page(loader, key, (page.total_users - 1) // limit * limit, limit)
+    return {
+        "version": page.version,
+        "total_users": page.total_users,
+        "offset": page.offset,
+        "entries": page.entries,
+        "position": position,
+    }
+
+
+__all__ = [
+    'RANKING_PERIODS',
+    'RankingCache',
+    'RankingPage',
+    'period_cache',
+    'period_totals',
+    'ranking_cache',
+    'ranking_page',
+    'ranking_version',
+]
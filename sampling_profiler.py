@@ -0,0 +1,188 @@
+"""
+sampling_profiler.py - Profiler por amostragem sob demanda.
+
+Este módulo permite perfilar o bot em produção sem reiniciá-lo: uma
+thread amostra a pilha do event loop a cada poucos milissegundos durante
+N segundos e grava as pilhas no formato "collapsed" (flamegraph.pl,
+speedscope, inferno), junto com um snapshot das tasks asyncio pendentes e
+seus frames atuais. Inativo, não há thread, hook nem custo algum.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from types import FrameType
+from typing import List, Optional, Tuple
+
+# Um único perfil por vez no processo
+_active_lock = threading.Lock()
+
+
+class ProfilerBusyError(RuntimeError):
+    """Exceção levantada quando já existe um perfil em andamento."""
+    pass
+
+
+def _frame_label(frame: FrameType) -> str:
+    """Rótulo estável de um frame: função (arquivo:primeira linha)"""
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse_stack(frame: Optional[FrameType]) -> str:
+    """
+    Converte uma pilha em uma linha "raiz;...;folha" do formato collapsed.
+
+    Args:
+        frame: Frame mais interno da pilha
+
+    Returns:
+        str: Frames da raiz até a folha separados por ";"
+    """
+    labels: List[str] = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class StackSampler:
+    """Amostrador de pilha de uma thread (por padrão, a do event loop)
+
+    Estrutura interna:
+        stacks: Counter {pilha collapsed: amostras}
+    """
+
+    def __init__(self, interval: float = 0.005, thread_id: Optional[int] = None):
+        """
+        Args:
+            interval: Intervalo entre amostras em segundos
+            thread_id: Thread amostrada (default: a thread que chama start())
+        """
+        self.interval = interval
+        self.thread_id = thread_id
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Inicia a thread de amostragem"""
+        if self.thread_id is None:
+            self.thread_id = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Para a amostragem e aguarda a thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.stacks[collapse_stack(frame)] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Pilhas no formato collapsed ("pilha contagem" por linha)"""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def top_frames(self, limit: int = 5) -> List[Tuple[str, int]]:
+        """
+        Frames folha com mais amostras (tempo próprio).
+
+        Args:
+            limit: Quantidade de frames retornados
+
+        Returns:
+            List[Tuple[str, int]]: (frame, amostras) em ordem decrescente
+        """
+        leaves: Counter = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return leaves.most_common(limit)
+
+
+def snapshot_tasks(limit: int = 10) -> str:
+    """
+    Lista as tasks asyncio pendentes com seus frames de coroutine atuais.
+
+    Deve ser chamada de dentro do event loop.
+
+    Args:
+        limit: Máximo de frames por task
+
+    Returns:
+        str: Uma seção por task (nome, coroutine e pilha)
+    """
+    lines: List[str] = []
+    tasks = sorted(asyncio.all_tasks(), key=lambda task: task.get_name())
+    lines.append(f"{len(tasks)} task(s) pendente(s)")
+    for task in tasks:
+        coro = task.get_coro()
+        lines.append("")
+        lines.append(f"Task {task.get_name()}: {getattr(coro, '__qualname__', coro)}")
+        for frame in task.get_stack(limit=limit):
+            code = frame.f_code
+            lines.append(f"  {code.co_filename}:{frame.f_lineno} em {code.co_name}")
+    return "\n".join(lines)
+
+
+async def profile_for(
+    seconds: float,
+    output_dir: Path,
+    interval: float = 0.005
+) -> Tuple[Path, Path, StackSampler]:
+    """
+    Perfila o event loop por ``seconds`` segundos e grava os resultados.
+
+    Args:
+        seconds: Duração da amostragem
+        output_dir: Diretório dos arquivos gerados
+        interval: Intervalo entre amostras em segundos
+
+    Returns:
+        Tupla (arquivo .collapsed, arquivo de tasks, amostrador)
+
+    Raises:
+        ProfilerBusyError: Se já houver um perfil em andamento
+    """
+    if not _active_lock.acquire(blocking=False):
+        raise ProfilerBusyError("Já existe um perfil em andamento")
+    try:
+        sampler = StackSampler(interval=interval)
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+            tasks = snapshot_tasks()
+        finally:
+            sampler.stop()
+
+        output_dir.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        stacks_path = output_dir / f"profile-{stamp}.collapsed"
+        tasks_path = output_dir / f"tasks-{stamp}.txt"
+        await asyncio.to_thread(stacks_path.write_text, sampler.collapsed() + "\n", encoding="utf-8")
+        await asyncio.to_thread(tasks_path.write_text, tasks + "\n", encoding="utf-8")
+        return stacks_path, tasks_path, sampler
+    finally:
+        _active_lock.release()
+
+
+__all__ = [
+    'ProfilerBusyError',
+    'StackSampler',
+    'collapse_stack',
+    'profile_for',
+    'snapshot_tasks',
+]
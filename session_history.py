@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+session_history.py - Log das sessões de câmera encerradas.
+
+O ranking guarda só totais por usuário. Este módulo guarda cada sessão
+encerrada (usuário, guild, canal, início, fim) para responder perguntas
+como "quem estava com a câmera ligada terça das 14h às 15h".
+
+Organização em disco (o próprio caminho é o índice por (guild, início)):
+
+    SESSION_HISTORY_DIR/
+        guild-<id>/                 (ou global/ para sessões sem guild)
+            index.json              {"max_duration": maior sessão gravada}
+            2024-05-14.jsonl        sessões iniciadas no dia (UTC), uma por linha
+            2024-03-01.daily.json   resumo diário {user_id: [segundos, sessões]}
+
+Uma consulta por intervalo abre apenas os arquivos dos dias que podem
+conter sessões sobrepostas (do início menos a maior sessão do guild até o
+fim), nunca o histórico inteiro. As gravações são appends de uma linha
+(O_APPEND), sem reescrever o arquivo.
+
+Retenção (compact_history): dias com mais de HISTORY_RAW_DAYS viram um
+resumo diário por usuário e dias com mais de HISTORY_RETENTION_DAYS são
+apagados, mantendo o log limitado.
+
+Uso:
+    python session_history.py --guild 123 --from 2024-05-14T14:00 --to 2024-05-14T15:00
+    python session_history.py --compact
+"""
+
+import asyncio
+import calendar
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from config import (
+    DURABILITY_MODE,
+    HISTORY_RAW_DAYS,
+    HISTORY_RETENTION_DAYS,
+    SESSION_HISTORY_DIR,
+)
+from database_lock import atomic_write_json, safe_load_json, safe_update_json
+
+logger = logging.getLogger(__name__)
+
+# Diretório do log (None = histórico desativado)
+HISTORY_DIR: Optional[Path] = Path(SESSION_HISTORY_DIR) if SESSION_HISTORY_DIR else None
+
+DAY_SECONDS = 86400
+
+_DAY_FORMAT = "%Y-%m-%d"
+_SEGMENT_SUFFIX = ".jsonl"
+_SUMMARY_SUFFIX = ".daily.json"
+
+# Maior sessão já gravada por diretório de guild (cache do index.json)
+_max_durations: Dict[Path, int] = {}
+
+# Versão do histórico neste processo: incrementada a cada sessão gravada,
+# invalida os rankings por período (ranking.py)
+_history_version: int = 0
+
+
+class SessionRecord(NamedTuple):
+    """Sessão encerrada (início e fim em segundos epoch)"""
+    user_id: str
+    guild_id: Optional[int]
+    channel_id: Optional[int]
+    start: int
+    end: int
+
+    @property
+    def duration(self) -> int:
+        return self.end - self.start
+
+
+def get_history_version() -> int:
+    """Versão do histórico (muda a cada append_session neste processo)"""
+    return _history_version
+
+
+def _guild_dir(guild_id: Optional[int]) -> Path:
+    """Diretório do histórico de um guild"""
+    return HISTORY_DIR / (f"guild-{guild_id}" if guild_id is not None else "global")
+
+
+def _day_of(timestamp: float) -> int:
+    """Dia (UTC) de um timestamp, em dias desde a epoch"""
+    return int(timestamp // DAY_SECONDS)
+
+
+def _day_name(day: int) -> str:
+    return time.strftime(_DAY_FORMAT, time.gmtime(day * DAY_SECONDS))
+
+
+def _parse_day(name: str) -> Optional[int]:
+    """Converte "AAAA-MM-DD" em dias desde a epoch (None se não for uma data)"""
+    try:
+        return _day_of(calendar.timegm(time.strptime(name, _DAY_FORMAT)))
+    except ValueError:
+        return None
+
+
+def _segment_path(guild_id: Optional[int], day: int) -> Path:
+    return _guild_dir(guild_id) / f"{_day_name(day)}{_SEGMENT_SUFFIX}"
+
+
+def _summary_path(guild_id: Optional[int], day: int) -> Path:
+    return _guild_dir(guild_id) / f"{_day_name(day)}{_SUMMARY_SUFFIX}"
+
+
+def _max_duration(guild_dir: Path) -> int:
+    """Maior sessão gravada no guild (limita o recuo das consultas)"""
+    if guild_dir not in _max_durations:
+        index = safe_load_json(str(guild_dir / "index.json"), {})
+        _max_durations[guild_dir] = int(index.get("max_duration", 0))
+    return _max_durations[guild_dir]
+
+
+def _note_duration(guild_dir: Path, duration: int) -> None:
+    """Atualiza o index.json quando uma sessão supera a maior já vista"""
+    if duration <= _max_duration(guild_dir):
+        return
+
+    def update_func(index: Dict[str, int]) -> Dict[str, int]:
+        index["max_duration"] = max(int(index.get("max_duration", 0)), duration)
+        return index
+
+    index = safe_update_json(str(guild_dir / "index.json"), update_func)
+    _max_durations[guild_dir] = index["max_duration"]
+
+
+def append_session(
+    user_id: str,
+    guild_id: Optional[int],
+    channel_id: Optional[int],
+    start: float,
+    end: float
+) -> Optional[SessionRecord]:
+    """
+    Grava uma sessão encerrada no segmento do dia em que ela começou.
+
+    Args:
+        user_id: ID do usuário Discord
+        guild_id: ID do guild da sessão
+        channel_id: ID do canal de voz
+        start: Início da sessão (segundos epoch)
+        end: Fim da sessão (segundos epoch)
+
+    Returns:
+        Optional[SessionRecord]: Registro gravado, ou None com o histórico desativado
+
+    Raises:
+        ValueError: Se end for anterior a start
+        OSError: Se o append falhar
+    """
+    record = SessionRecord(user_id, guild_id, channel_id, int(start), int(end))
+    if not append_sessions([record]):
+        return None
+    return record
+
+
+def append_sessions(records: Iterable[SessionRecord]) -> int:
+    """
+    Grava um lote de sessões encerradas.
+
+    Usada pelos escritores em lote (group_commit e storage_service), fora do
+    event loop: um único append (e um fsync no modo strict) por segmento e
+    no máximo uma atualização do index.json por guild, para o lote inteiro.
+
+    Args:
+        records: Sessões encerradas (início e fim em segundos epoch)
+
+    Returns:
+        int: Número de sessões gravadas (0 com o histórico desativado)
+
+    Raises:
+        ValueError: Se alguma sessão terminar antes de começar (nada é gravado)
+        OSError: Se um append falhar
+    """
+    global _history_version
+    if HISTORY_DIR is None:
+        return 0
+
+    lines: Dict[Path, List[str]] = {}
+    longest: Dict[Path, int] = {}
+    count = 0
+    for record in records:
+        record = record._replace(start=int(record.start), end=int(record.end))
+        if record.end < record.start:
+            raise ValueError("end must not be before start")
+        path = _segment_path(record.guild_id, _day_of(record.start))
+        lines.setdefault(path, []).append(json.dumps(
+            [record.user_id, record.channel_id, record.start, record.end],
+            separators=(",", ":")
+        ) + "\n")
+        longest[path.parent] = max(longest.get(path.parent, 0), record.duration)
+        count += 1
+
+    for path, chunk in lines.items():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Linhas inteiras num único write com O_APPEND: appends concorrentes
+        # não se intercalam
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, "".join(chunk).encode("utf-8"))
+            if DURABILITY_MODE == "strict":
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    for guild_dir, duration in longest.items():
+        _note_duration(guild_dir, duration)
+    _history_version += count
+    return count
+
+
+def _read_segment(path: Path, guild_id: Optional[int]) -> Iterator[SessionRecord]:
+    """Lê um segmento; linhas malformadas (ex: append interrompido) são ignoradas"""
+    try:
+        f = open(path, "r", encoding="utf-8")
+    except FileNotFoundError:
+        return
+    with f:
+        for line in f:
+            try:
+                user_id, channel_id, start, end = json.loads(line)
+            except (ValueError, TypeError):
+                continue
+            yield SessionRecord(user_id, guild_id, channel_id, start, end)
+
+
+def query_sessions(
+    guild_id: Optional[int],
+    start: float,
+    end: float,
+    user_id: Optional[str] = None
+) -> List[SessionRecord]:
+    """
+    Lista as sessões brutas que se sobrepõem ao intervalo [start, end).
+
+    Só lê os segmentos dos dias entre ``start - maior sessão`` e ``end``.
+    Dias já resumidos (ver compact_history) não têm sessões brutas; use
+    daily_totals para eles.
+
+    Args:
+        guild_id: ID do guild
+        start: Início do intervalo (segundos epoch)
+        end: Fim do intervalo (segundos epoch, exclusivo)
+        user_id: Filtra um único usuário
+
+    Returns:
+        List[SessionRecord]: Sessões ordenadas pelo início
+    """
+    if HISTORY_DIR is None or end <= start:
+        return []
+
+    guild_dir = _guild_dir(guild_id)
+    first_day = _day_of(start - _max_duration(guild_dir))
+    result: List[SessionRecord] = []
+    for day in range(first_day, _day_of(end) + 1):
+        for record in _read_segment(_segment_path(guild_id, day), guild_id):
+            if record.start < end and record.end > start and user_id in (None, record.user_id):
+                result.append(record)
+
+    result.sort(key=lambda record: (record.start, record.user_id))
+    return result
+
+
+def overlap_totals(guild_id: Optional[int], start: float, end: float) -> Dict[str, int]:
+    """
+    Segundos de câmera de cada usuário dentro do intervalo [start, end).
+
+    Args:
+        guild_id: ID do guild
+        start: Início do intervalo (segundos epoch)
+        end: Fim do intervalo (segundos epoch, exclusivo)
+
+    Returns:
+        Dict[str, int]: {user_id: segundos no intervalo}
+    """
+    totals: Dict[str, int] = {}
+    for record in query_sessions(guild_id, start, end):
+        seconds = int(min(record.end, end) - max(record.start, start))
+        totals[record.user_id] = totals.get(record.user_id, 0) + seconds
+    return totals
+
+
+def _summarize(records: Iterator[SessionRecord]) -> Dict[str, List[int]]:
+    """Resumo diário {user_id: [segundos, sessões]} de um segmento"""
+    summary: Dict[str, List[int]] = {}
+    for record in records:
+        entry = summary.setdefault(record.user_id, [0, 0])
+        entry[0] += record.duration
+        entry[1] += 1
+    return summary
+
+
+def daily_totals(guild_id: Optional[int], start: float, end: float) -> Dict[str, Dict[str, List[int]]]:
+    """
+    Totais diários por usuário, de dias brutos ou já resumidos.
+
+    Args:
+        guild_id: ID do guild
+        start: Início do intervalo (segundos epoch)
+        end: Fim do intervalo (segundos epoch, exclusivo)
+
+    Returns:
+        Dict[str, Dict[str, List[int]]]: {"AAAA-MM-DD": {user_id: [segundos, sessões]}},
+            pelo dia de início das sessões
+    """
+    if HISTORY_DIR is None or end <= start:
+        return {}
+
+    result: Dict[str, Dict[str, List[int]]] = {}
+    for day in range(_day_of(start), _day_of(end - 1) + 1):
+        segment = _segment_path(guild_id, day)
+        if segment.exists():
+            summary = _summarize(_read_segment(segment, guild_id))
+        else:
+            summary = safe_load_json(str(_summary_path(guild_id, day)), {})
+        if summary:
+            result[_day_name(day)] = summary
+    return result
+
+
+def compact_history(
+    now: Optional[float] = None,
+    raw_days: int = HISTORY_RAW_DAYS,
+    retention_days: int = HISTORY_RETENTION_DAYS
+) -> Tuple[int, int]:
+    """
+    Aplica a política de retenção do histórico.
+
+    Segmentos com mais de ``raw_days`` dias viram resumos diários e
+    arquivos com mais de ``retention_days`` dias são apagados.
+
+    Args:
+        now: Horário de referência (default: agora)
+        raw_days: Dias mantidos com sessões brutas
+        retention_days: Dias mantidos no total
+
+    Returns:
+        Tuple[int, int]: (dias resumidos, arquivos apagados)
+    """
+    if HISTORY_DIR is None or not HISTORY_DIR.exists():
+        return 0, 0
+
+    today = _day_of(time.time() if now is None else now)
+    downsampled = expired = 0
+    for guild_dir in HISTORY_DIR.iterdir():
+        if not guild_dir.is_dir():
+            continue
+        for path in sorted(guild_dir.iterdir()):
+            if path.name.endswith(_SUMMARY_SUFFIX):
+                name = path.name[:-len(_SUMMARY_SUFFIX)]
+            elif path.name.endswith(_SEGMENT_SUFFIX):
+                name = path.name[:-len(_SEGMENT_SUFFIX)]
+            else:
+                continue
+            day = _parse_day(name)
+            if day is None:
+                continue
+
+            age = today - day
+            if age > retention_days:
+                path.unlink()
+                expired += 1
+            elif age > raw_days and path.name.endswith(_SEGMENT_SUFFIX):
+                summary = _summarize(_read_segment(path, None))
+                atomic_write_json(summary, str(path.with_name(name + _SUMMARY_SUFFIX)))
+                path.unlink()
+                downsampled += 1
+
+    if downsampled or expired:
+        logger.info("Histórico compactado: %d dia(s) resumido(s), %d arquivo(s) apagado(s)",
+                    downsampled, expired)
+    return downsampled, expired
+
+
+async def run_retention(interval: float = DAY_SECONDS) -> None:
+    """
+    Aplica compact_history uma vez por intervalo, fora do event loop.
+
+    Deve rodar só no processo que grava o histórico (o storage_service com
+    STORAGE_SOCKET, senão o bot): a compactação reescreve segmentos e não
+    pode disputá-los com appends de outro processo.
+    """
+    while True:
+        try:
+            await asyncio.to_thread(compact_history)
+        except OSError as e:
+            logger.warning("Falha ao compactar histórico de sessões: %s", e)
+        await asyncio.sleep(interval)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Ponto de entrada da linha de comando"""
+    import argparse
+    from datetime import datetime
+
+    parser = argparse.ArgumentParser(description="Consulta o histórico de sessões do Bate-Ponto")
+    parser.add_argument("--guild", type=int, default=None, help="Guild consultado")
+    parser.add_argument("--from", dest="start", help="Início (ISO 8601, horário local)")
+    parser.add_argument("--to", dest="end", help="Fim (ISO 8601, horário local)")
+    parser.add_argument("--compact", action="store_true", help="Aplica a política de retenção")
+    args = parser.parse_args(argv)
+
+    if args.compact:
+        downsampled, expired = compact_history()
+        print(f"{downsampled} dia(s) resumido(s), {expired} arquivo(s) apagado(s)")
+        return
+    if not args.start or not args.end:
+        parser.error("--from e --to são obrigatórios na consulta")
+
+    start = datetime.fromisoformat(args.start).timestamp()
+    end = datetime.fromisoformat(args.end).timestamp()
+    for record in query_sessions(args.guild, start, end):
+        began = datetime.fromtimestamp(record.start).isoformat(timespec="minutes")
+        ended = datetime.fromtimestamp(record.end).isoformat(timespec="minutes")
+        print(f"{record.user_id}  canal {record.channel_id}  {began} -> {ended}")
+
+
+__all__ = [
+    'SessionRecord',
+    'append_session',
+    'append_sessions',
+    'compact_history',
+    'daily_totals',
+    'get_history_version',
+    'overlap_totals',
+    'query_sessions',
+    'run_retention',
+]
+
+
+if __name__ == "__main__":
+    main()
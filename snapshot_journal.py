@@ -0,0 +1,412 @@
+"""
+snapshot_journal.py - Snapshots com checksum, gerações e journal das escritas.
+
+Os arquivos JSON gravados com journal=True (ver database_lock; usado pelos
+dados do ranking) ganham, ao lado de ``<arquivo>``:
+
+    <arquivo>.journal   um registro por geração, em linhas "crc32 {json}"
+    <arquivo>.gen-<N>   checkpoints: o snapshot publicado na geração N
+
+Registros:
+    {"g": N, "sha": sha256, "set": {chave: valor}, "del": [chaves]}
+        escrita incremental: as chaves de primeiro nível alteradas
+    {"g": N, "sha": sha256, "replace": true}
+        reescrita completa (save_data, reset), sempre com checkpoint
+
+``sha`` é o sha256 do snapshot publicado na geração, calculado enquanto o
+arquivo temporário é escrito (sem reler o arquivo).
+
+Cada escrita, sob o writer_lock, segue a ordem: snapshot no temporário,
+registro no journal (write-ahead), hardlink do temporário como checkpoint
+(a cada CHECKPOINT_EVERY gerações e em reescritas completas; sem cópia) e
+publicação com os.replace. Uma queda em qualquer ponto deixa o journal
+igual ou à frente do snapshot publicado.
+
+Recuperação (replay_journal): o snapshot mais novo cujo sha256 confere com
+o registro da sua geração - o arquivo atual ou um checkpoint - recebe os
+registros seguintes. O custo é ler um snapshot e o tail do journal (no
+máximo CHECKPOINTS_KEPT * CHECKPOINT_EVERY registros), não a história.
+
+O diff é por chave de primeiro nível, com cópia de um nível dos valores:
+adequado a arquivos {chave: {campo: escalar}} como os do ranking.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Gerações entre checkpoints e checkpoints mantidos (o journal guarda os
+# registros desde o checkpoint mais antigo)
+CHECKPOINT_EVERY = 100
+CHECKPOINTS_KEPT = 2
+
+_HASH_CHUNK = 1 << 20
+
+
+class HashingWriter:
+    """Arquivo texto que calcula o sha256 do que é escrito"""
+
+    def __init__(self, file_obj):
+        self._file = file_obj
+        self._hash = hashlib.sha256()
+
+    def write(self, text: str) -> int:
+        self._hash.update(text.encode('utf-8'))
+        return self._file.write(text)
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+
+def journal_path(file_path: str) -> str:
+    """Caminho do journal de ``file_path``"""
+    return file_path + '.journal'
+
+
+def checkpoint_path(file_path: str, generation: int) -> str:
+    """Caminho do checkpoint de uma geração"""
+    return f"{file_path}.gen-{generation}"
+
+
+def list_checkpoints(file_path: str) -> List[Tuple[int, str]]:
+    """
+    Checkpoints existentes de um arquivo.
+
+    Returns:
+        List[Tuple[int, str]]: (geração, caminho), do mais novo ao mais antigo
+    """
+    base = Path(file_path)
+    prefix = f"{base.name}.gen-"
+    found = []
+    for candidate in base.parent.glob(f"{prefix}*"):
+        suffix = candidate.name[len(prefix):]
+        if suffix.isdigit():
+            found.append((int(suffix), str(candidate)))
+    return sorted(found, reverse=True)
+
+
+def file_digest(path: str) -> Optional[str]:
+    """sha256 de um arquivo lido em blocos (None se não existir)"""
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK), b''):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+
+def encode_record(record: Dict[str, Any]) -> str:
+    """Linha do journal: crc32 do JSON seguido do JSON"""
+    payload = json.dumps(record, separators=(',', ':'), ensure_ascii=False)
+    return f"{zlib.crc32(payload.encode('utf-8')):08x} {payload}\n"
+
+
+def decode_record(line: str) -> Dict[str, Any]:
+    """
+    Registro de uma linha do journal.
+
+    Raises:
+        ValueError: Se a linha estiver cortada ou o crc32 não conferir
+    """
+    crc, _, payload = line.rstrip('\n').partition(' ')
+    if not payload or f"{zlib.crc32(payload.encode('utf-8')):08x}" != crc:
+        raise ValueError("registro do journal corrompido")
+    record = json.loads(payload)
+    if not isinstance(record, dict) or not isinstance(record.get('g'), int):
+        raise ValueError("registro do journal sem geração")
+    return record
+
+
+def read_journal(file_path: str) -> List[Dict[str, Any]]:
+    """
+    Registros válidos do journal, do mais antigo ao mais novo.
+
+    A leitura para no primeiro registro inválido (final cortado por uma
+    queda); os descartados são registrados em log.
+    """
+    records: List[Dict[str, Any]] = []
+    try:
+        f = open(journal_path(file_path), 'r', encoding='utf-8', newline='\n')
+    except FileNotFoundError:
+        return records
+    with f:
+        lines = f.readlines()
+    for index, line in enumerate(lines):
+        try:
+            records.append(decode_record(line))
+        except ValueError:
+            logger.warning(
+                "Journal de %s: %d registro(s) final(is) inválido(s) descartado(s)",
+                file_path, len(lines) - index
+            )
+            break
+    return records
+
+
+def _last_line(path: str) -> Optional[str]:
+    """Última linha de um arquivo, lida de trás para frente em blocos"""
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+    with f:
+        position = f.seek(0, os.SEEK_END)
+        block = b''
+        while position > 0:
+            step = min(1 << 16, position)
+            position -= step
+            f.seek(position)
+            block = f.read(step) + block
+            start = block.rstrip(b'\n').rfind(b'\n')
+            if start >= 0:
+                return block[start + 1:].decode('utf-8', errors='replace')
+        return block.decode('utf-8', errors='replace') or None
+
+
+def _write_journal(file_path: str, records: List[Dict[str, Any]], durable: bool) -> None:
+    """Reescreve o journal com ``records`` (compactação ou reparo)"""
+    path = journal_path(file_path)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8', newline='\n') as f:
+        f.writelines(encode_record(record) for record in records)
+        if durable:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def last_generation(file_path: str, durable: bool = False) -> Optional[int]:
+    """
+    Geração do último registro do journal.
+
+    Um final cortado (queda no meio de um append) é removido antes, para
+    que o próximo registro comece em uma linha nova.
+
+    Returns:
+        Optional[int]: Última geração ou None se não houver journal
+    """
+    line = _last_line(journal_path(file_path))
+    if line is None:
+        return None
+    try:
+        if not line.endswith('\n'):
+            raise ValueError("registro sem fim de linha")
+        return decode_record(line)['g']
+    except ValueError:
+        records = read_journal(file_path)
+        _write_journal(file_path, records, durable)
+        return records[-1]['g'] if records else None
+
+
+def last_record(file_path: str) -> Optional[Dict[str, Any]]:
+    """Último registro do journal (None se ausente ou cortado)"""
+    line = _last_line(journal_path(file_path))
+    try:
+        return decode_record(line) if line is not None else None
+    except ValueError:
+        return None
+
+
+def append_record(file_path: str, record: Dict[str, Any], durable: bool = False) -> None:
+    """Anexa um registro ao journal (fsync com ``durable``)"""
+    with open(journal_path(file_path), 'a', encoding='utf-8', newline='\n') as f:
+        f.write(encode_record(record))
+        if durable:
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def link_or_copy(source: str, target: str) -> None:
+    """Hardlink (sem cópia) com fallback para cópia em sistemas sem suporte"""
+    try:
+        os.link(source, target)
+    except FileExistsError:
+        os.remove(target)
+        link_or_copy(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+def make_checkpoint(file_path: str, snapshot_path: str, generation: int, durable: bool = False) -> None:
+    """
+    Guarda ``snapshot_path`` como checkpoint da geração e compacta o journal.
+
+    Mantém os CHECKPOINTS_KEPT checkpoints mais novos e, no journal, só os
+    registros a partir do mais antigo deles.
+    """
+    link_or_copy(snapshot_path, checkpoint_path(file_path, generation))
+    checkpoints = list_checkpoints(file_path)
+    for _, stale in checkpoints[CHECKPOINTS_KEPT:]:
+        os.remove(stale)
+    oldest = checkpoints[:CHECKPOINTS_KEPT][-1][0]
+    records = read_journal(file_path)
+    if records and records[0]['g'] < oldest:
+        _write_journal(file_path, [record for record in records if record['g'] >= oldest], durable)
+
+
+def bootstrap(file_path: str, durable: bool = False) -> int:
+    """
+    Inicia o journal de um arquivo já válido (geração 0).
+
+    O arquivo atual (ou o objeto vazio, se ele não existir) vira a base
+    das gerações seguintes.
+
+    Returns:
+        int: Geração inicial (0)
+    """
+    digest = file_digest(file_path)
+    append_record(file_path, {'g': 0, 'sha': digest, 'replace': True}, durable)
+    if digest is not None:
+        make_checkpoint(file_path, file_path, 0, durable)
+    return 0
+
+
+def commit(
+    file_path: str,
+    snapshot_path: str,
+    digest: str,
+    generation: int,
+    changes: Optional[Tuple[Dict[str, Any], List[str]]] = None,
+    durable: bool = False
+) -> None:
+    """
+    Registra uma geração antes de ``snapshot_path`` ser publicado.
+
+    Args:
+        file_path: Arquivo publicado
+        snapshot_path: Snapshot da geração (arquivo temporário ainda não publicado)
+        digest: sha256 do snapshot
+        generation: Geração do snapshot
+        changes: (chaves alteradas, chaves removidas); None = reescrita completa
+        durable: fsync do journal
+    """
+    record: Dict[str, Any] = {'g': generation, 'sha': digest}
+    if changes is None:
+        record['replace'] = True
+    else:
+        record['set'], record['del'] = changes
+    append_record(file_path, record, durable)
+    if changes is None or generation % CHECKPOINT_EVERY == 0:
+        make_checkpoint(file_path, snapshot_path, generation, durable)
+
+
+def copy_entries(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Cópia de um nível dos valores (base do diff de uma escrita)"""
+    return {
+        key: dict(value) if isinstance(value, dict) else list(value) if isinstance(value, list) else value
+        for key, value in data.items()
+    }
+
+
+def diff_entries(before: Dict[str, Any], after: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Chaves de primeiro nível alteradas e removidas entre dois estados.
+
+    Returns:
+        Tuple[Dict[str, Any], List[str]]: ({chave: valor novo}, [chaves removidas])
+    """
+    changed = {key: value for key, value in after.items() if key not in before or before[key] != value}
+    deleted = [key for key in before if key not in after]
+    return changed, deleted
+
+
+def _load_snapshot(path: Optional[str]) -> Dict[str, Any]:
+    if path is None:
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError("snapshot não é um objeto JSON")
+    return data
+
+
+def replay_journal(file_path: str) -> Optional[Tuple[Dict[str, Any], int, int, Optional[str], int]]:
+    """
+    Reconstrói o estado mais recente a partir dos snapshots verificados.
+
+    Candidatos, do mais novo ao mais antigo: o arquivo atual, os
+    checkpoints e a base vazia de um journal iniciado sem arquivo. O
+    primeiro cujo sha256 confere com o registro da sua geração recebe os
+    registros seguintes. Uma reescrita completa no meio do caminho torna o
+    candidato inutilizável; como último registro (queda antes de
+    publicá-la), é ignorada.
+
+    Returns:
+        Optional[Tuple]: (dados, geração da base, registros reaplicados,
+            caminho da base ou None para a base vazia, última geração
+            registrada), ou None se nenhum candidato for válido
+    """
+    records = read_journal(file_path)
+    if not records:
+        return None
+    by_generation = {record['g']: record for record in records}
+
+    def candidates():
+        digest = file_digest(file_path)
+        if digest is not None:
+            for record in reversed(records):
+                if record.get('sha') == digest:
+                    yield record['g'], file_path
+                    break
+        for generation, path in list_checkpoints(file_path):
+            record = by_generation.get(generation)
+            if record is not None and record.get('sha') is not None and file_digest(path) == record['sha']:
+                yield generation, path
+        for record in reversed(records):
+            if record.get('replace') and record.get('sha') is None:
+                yield record['g'], None
+
+    for base, path in candidates():
+        try:
+            data = _load_snapshot(path)
+        except (OSError, ValueError):
+            continue
+        replayed = 0
+        for record in records:
+            if record['g'] <= base:
+                continue
+            if record.get('replace'):
+                if record is records[-1]:
+                    break
+                replayed = -1
+                break
+            data.update(record.get('set', {}))
+            for key in record.get('del', []):
+                data.pop(key, None)
+            replayed += 1
+        if replayed >= 0:
+            return data, base, replayed, path, records[-1]['g']
+    return None
+
+
+__all__ = [
+    'CHECKPOINTS_KEPT',
+    'CHECKPOINT_EVERY',
+    'HashingWriter',
+    'append_record',
+    'bootstrap',
+    'checkpoint_path',
+    'commit',
+    'copy_entries',
+    'decode_record',
+    'diff_entries',
+    'encode_record',
+    'file_digest',
+    'journal_path',
+    'last_generation',
+    'last_record',
+    'link_or_copy',
+    'list_checkpoints',
+    'make_checkpoint',
+    'read_journal',
+    'replay_journal',
+]
@@ -0,0 +1,134 @@
+"""
+startup.py - Medição da inicialização do bot.
+
+Este módulo separa a inicialização em fases explícitas e cronometradas
+(time-to-ready importa para as perdas do UC04 em reinícios de container)
+e gera o relatório de tempo de import no estilo ``python -X importtime``.
+"""
+
+import logging
+import re
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Linha do -X importtime: "import time:       123 |        456 | pacote"
+_IMPORTTIME_LINE = re.compile(r"^import time:\s*(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S.*)$")
+
+ImportTiming = Tuple[str, int, int]
+
+
+class StartupProfiler:
+    """Cronômetro das fases de inicialização
+
+    Cada fase é registrada com sua duração; ``elapsed`` mede desde o início
+    do processo (ou da criação do profiler), incluindo os imports.
+
+    Estrutura interna:
+        phases: Lista [(nome, segundos)] na ordem de execução
+    """
+
+    def __init__(self, started_at: Optional[float] = None):
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Cronometra um bloco como uma fase da inicialização
+
+        Args:
+            name: Nome da fase (ex: "logging", "create_bot")
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def mark(self, name: str) -> None:
+        """Registra um marco medido desde o início do processo
+
+        Args:
+            name: Nome do marco (ex: "ready")
+        """
+        self.phases.append((name, self.elapsed))
+
+    @property
+    def elapsed(self) -> float:
+        """Segundos desde o início do processo"""
+        return time.perf_counter() - self.started_at
+
+    def report(self) -> str:
+        """Resumo das fases em uma linha para log"""
+        parts = [f"{name}={seconds * 1000:.1f}ms" for name, seconds in self.phases]
+        return " | ".join(parts)
+
+
+def parse_importtime(output: str) -> List[ImportTiming]:
+    """
+    Interpreta a saída de ``python -X importtime``.
+
+    Args:
+        output: Texto emitido em stderr pelo interpretador
+
+    Returns:
+        List[ImportTiming]: Tuplas (módulo, self_us, cumulative_us) na
+            ordem em que aparecem
+    """
+    timings: List[ImportTiming] = []
+    for line in output.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, _, module = match.groups()
+            timings.append((module.strip(), int(self_us), int(cumulative_us)))
+    return timings
+
+
+def profile_imports(module: str = "bot") -> List[ImportTiming]:
+    """
+    Mede o tempo de import de um módulo em um interpretador novo.
+
+    Args:
+        module: Módulo a importar (default: "bot")
+
+    Returns:
+        List[ImportTiming]: Tempos por módulo importado
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=str(Path(__file__).parent),
+    )
+    return parse_importtime(result.stderr)
+
+
+def format_import_profile(timings: List[ImportTiming], top: int = 20) -> str:
+    """
+    Formata os módulos mais caros por tempo cumulativo.
+
+    Args:
+        timings: Tempos retornados por profile_imports/parse_importtime
+        top: Quantidade de módulos listados
+
+    Returns:
+        str: Tabela pronta para imprimir
+    """
+    ranked = sorted(timings, key=lambda item: item[2], reverse=True)[:top]
+    lines = [f"{'cumulativo (ms)':>16} {'próprio (ms)':>13}  módulo"]
+    for module, self_us, cumulative_us in ranked:
+        lines.append(f"{cumulative_us / 1000:>16.1f} {self_us / 1000:>13.1f}  {module}")
+    return "\n".join(lines)
+
+
+__all__ = [
+    'StartupProfiler',
+    'format_import_profile',
+    'parse_importtime',
+    'profile_imports',
+]
@@ -0,0 +1,515 @@
+#!/usr/bin/env python3
+"""
+storage_service.py - Serviço local de armazenamento via socket Unix.
+
+Permite rodar o gateway Discord em um processo e o armazenamento/agregação
+em outro, de modo que ordenação do ranking, backups e compactação nunca
+bloqueiem os heartbeats do gateway.
+
+Protocolo (frames compactos):
+    cabeçalho de 9 bytes "!IBI" = (tamanho do payload, opcode, request_id)
+    seguido do payload JSON compacto em UTF-8.
+
+Opcodes:
+    OP_DELTAS   - lote de sessões encerradas
+                  [user_id, duração, guild_id, [origem, n], canal, início, fim];
+                  o serviço grava ranking, histórico e mapa de calor e
+                  confirma com OP_RESULT {"applied": n} só depois de gravar
+                  (OP_ERROR: nada confirmado, o cliente reenvia; o reenvio é
+                  idempotente)
+    OP_CALL     - consulta {"m": método, "a": [args]} com resposta
+    OP_RESULT   - resposta de OP_CALL/OP_DELTAS com o mesmo request_id
+    OP_ERROR    - erro de OP_CALL/OP_DELTAS com o mesmo request_id
+
+Uso:
+    python storage_service.py --socket /run/bate-ponto/storage.sock
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import os
+import struct
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import database
+import export
+from group_commit import SessionDelta, SessionDetails, apply_closed_sessions, make_delta
+from config import (
+    MAX_RANKING_SIZE,
+    STORAGE_FLUSH_INTERVAL,
+    STORAGE_FLUSH_MAX_DELTAS,
+    STORAGE_POOL_SIZE,
+    STORAGE_SOCKET,
+    configure_logging,
+)
+from ranking import ranking_cache, ranking_page
+from session_history import run_retention
+
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct("!IBI")
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+OP_DELTAS = 1
+OP_CALL = 2
+OP_RESULT = 3
+OP_ERROR = 4
+
+# Espera máxima (s) pela confirmação de um lote; sem ela o lote é reenviado
+DELTAS_ACK_TIMEOUT = 30.0
+
+class StorageServiceError(Exception):
+    """Exceção levantada quando o serviço de armazenamento falha."""
+    pass
+
+
+# ============================================================================
+# PROTOCOLO
+# ============================================================================
+
+def encode_frame(opcode: int, request_id: int, payload: Any) -> bytes:
+    """
+    Codifica um frame do protocolo.
+
+    Args:
+        opcode: Tipo da mensagem (OP_*)
+        request_id: ID para casar resposta e requisição (0 se não houver)
+        payload: Objeto serializável em JSON
+
+    Returns:
+        bytes: Cabeçalho + payload
+    """
+    body = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    if len(body) > MAX_FRAME_SIZE:
+        raise StorageServiceError(f"Frame excede {MAX_FRAME_SIZE} bytes")
+    return HEADER.pack(len(body), opcode, request_id) + body
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Tuple[int, int, Any]:
+    """
+    Lê um frame completo do stream.
+
+    Args:
+        reader: Stream de leitura da conexão
+
+    Returns:
+        Tupla (opcode, request_id, payload)
+
+    Raises:
+        asyncio.IncompleteReadError: Se a conexão for encerrada
+        StorageServiceError: Se o frame for maior que o permitido
+    """
+    header = await reader.readexactly(HEADER.size)
+    size, opcode, request_id = HEADER.unpack(header)
+    if size > MAX_FRAME_SIZE:
+        raise StorageServiceError(f"Frame de {size} bytes excede o limite")
+    body = await reader.readexactly(size)
+    return opcode, request_id, json.loads(body)
+
+
+# ============================================================================
+# SERVIDOR
+# ============================================================================
+
+def _query_ranking(guild_id: Optional[int] = None, limit: int = MAX_RANKING_SIZE) -> Dict[str, Any]:
+    """Calcula o ranking no processo do serviço (usa o cache local)."""
+    data, ranked = ranking_cache.get(
+        lambda: database.load_data(guild_id),
+        key=database.partition_key(guild_id)
+    )
+    return {"total_users": len(data), "top": ranked[:limit]}
+
+
+def _reset_all_data(guild_id: Optional[int] = None) -> str:
+    """Versão serializável de database.reset_all_data."""
+    return str(database.reset_all_data(guild_id))
+
+
+# Métodos expostos via OP_CALL
+QUERY_METHODS: Dict[str, Callable[..., Any]] = {
+    "ranking": _query_ranking,
+    "ranking_page": ranking_page,
+    "load_data": database.load_data,
+    "load_aggregated_data": database.load_aggregated_data,
+    "apply_adjustments": database.apply_adjustments,
+    "reset_user": database.reset_user,
+    "merge_users": database.merge_users,
+    "reset_all_data": _reset_all_data,
+    "export_data": export.export_data,
+    "guild_stats_summary": database.guild_stats_summary,
+}
+
+
+class StorageServer:
+    """Servidor que detém o armazenamento e atende clientes via socket Unix
+
+    Deltas são aplicados em ordem de chegada, um lote por vez (_write_lock),
+    em tasks próprias: um lote lento não atrasa as consultas que chegam
+    depois dele na mesma conexão. Consultas são atendidas em paralelo e
+    respondidas fora de ordem, identificadas pelo request_id (pipelining).
+    """
+
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._write_lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        """Confere os dados (ver database.verify_data_files) e abre o socket"""
+        restored = await asyncio.to_thread(database.verify_data_files)
+        if restored:
+            logger.error("Dados restaurados do journal: %s", ", ".join(map(str, restored)))
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self._server = await asyncio.start_unix_server(self._handle_client, path=self.socket_path)
+        logger.info("Serviço de armazenamento ouvindo em %s", self.socket_path)
+
+    async def serve_forever(self) -> None:
+        """Inicia (se necessário) e atende até ser cancelado
+
+        O serviço grava o histórico de sessões, então é ele quem aplica a
+        retenção (session_history.run_retention).
+        """
+        if self._server is None:
+            await self.start()
+        retention = asyncio.create_task(run_retention())
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            retention.cancel()
+
+    async def close(self) -> None:
+        """Encerra o servidor e remove o socket"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Loop de leitura de frames de uma conexão"""
+        tasks = set()
+        try:
+            while True:
+                opcode, request_id, payload = await read_frame(reader)
+                if opcode == OP_DELTAS:
+                    # Tasks criadas em ordem de chegada esperam o _write_lock
+                    # (FIFO) na mesma ordem
+                    handler = self._apply_deltas(writer, request_id, payload)
+                elif opcode == OP_CALL:
+                    handler = self._handle_call(writer, request_id, payload)
+                else:
+                    logger.warning("Opcode desconhecido recebido: %s", opcode)
+                    continue
+                task = asyncio.create_task(handler)
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        except StorageServiceError as e:
+            logger.error("Frame inválido, encerrando conexão: %s", e)
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+
+    async def _apply_deltas(self, writer: asyncio.StreamWriter, request_id: int, deltas: List[List[Any]]) -> None:
+        """Aplica um lote de deltas fora do event loop e confirma a gravação"""
+        async with self._write_lock:
+            try:
+                # Ids das sessões tornam a reaplicação de um lote reenviado idempotente
+                applied = await asyncio.to_thread(apply_closed_sessions, [tuple(delta) for delta in deltas])
+                frame = encode_frame(OP_RESULT, request_id, {"applied": applied})
+            except ValueError as e:
+                # Lote inválido nunca será gravado: confirmado como rejeitado
+                # para não ser reenviado
+                logger.error("Lote de %d sessões rejeitado: %s", len(deltas), e)
+                frame = encode_frame(OP_RESULT, request_id, {"applied": 0, "rejected": str(e)})
+            except Exception as e:
+                # Nada confirmado: o cliente mantém o lote e reenvia
+                logger.error("Erro ao aplicar lote de %d sessões: %s", len(deltas), e)
+                frame = encode_frame(OP_ERROR, request_id, f"{type(e).__name__}: {e}")
+
+        if not writer.is_closing():
+            writer.write(frame)
+            await writer.drain()
+
+    async def _handle_call(self, writer: asyncio.StreamWriter, request_id: int, payload: Dict[str, Any]) -> None:
+        """Executa uma consulta e responde com o mesmo request_id"""
+        method = QUERY_METHODS.get(payload.get("m"))
+        try:
+            if method is None:
+                raise StorageServiceError(f"Método desconhecido: {payload.get('m')}")
+            result = await asyncio.to_thread(method, *payload.get("a", []))
+            frame = encode_frame(OP_RESULT, request_id, result)
+        except Exception as e:
+            frame = encode_frame(OP_ERROR, request_id, f"{type(e).__name__}: {e}")
+
+        if not writer.is_closing():
+            writer.write(frame)
+            await writer.drain()
+
+
+# ============================================================================
+# CLIENTE
+# ============================================================================
+
+class _Connection:
+    """Conexão do pool com múltiplas requisições em voo (pipelining)"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.reader_task = asyncio.create_task(self._read_responses())
+
+    @property
+    def closed(self) -> bool:
+        return self.writer.is_closing() or self.reader_task.done()
+
+    async def _read_responses(self) -> None:
+        """Entrega cada resposta à future do request_id correspondente"""
+        error: Exception = ConnectionError("Conexão com o serviço encerrada")
+        try:
+            while True:
+                opcode, request_id, payload = await read_frame(self.reader)
+                future = self.pending.pop(request_id, None)
+                if future is None or future.done():
+                    continue
+                if opcode == OP_RESULT:
+                    future.set_result(payload)
+                else:
+                    future.set_exception(StorageServiceError(payload))
+        except (asyncio.IncompleteReadError, ConnectionError, StorageServiceError) as e:
+            error = ConnectionError(f"Conexão com o serviço encerrada: {e}")
+        finally:
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            self.pending.clear()
+            self.writer.close()
+
+    async def close(self) -> None:
+        self.writer.close()
+        self.reader_task.cancel()
+        try:
+            await self.reader_task
+        except asyncio.CancelledError:
+            pass
+
+
+class StorageClient:
+    """Cliente do serviço de armazenamento com pool de conexões
+
+    - record_session(): não bloqueia; os deltas são agrupados e enviados
+      em um único frame a cada flush_interval ou max_deltas sessões. O lote
+      só sai do buffer quando o serviço confirma que o gravou.
+    - call(): requisição/resposta; várias chamadas compartilham as mesmas
+      conexões em paralelo (pipelining).
+    """
+
+    def __init__(
+        self,
+        socket_path: str,
+        pool_size: int = STORAGE_POOL_SIZE,
+        flush_interval: float = STORAGE_FLUSH_INTERVAL,
+        max_deltas: int = STORAGE_FLUSH_MAX_DELTAS
+    ):
+        self.socket_path = socket_path
+        self.pool_size = max(1, pool_size)
+        self.flush_interval = flush_interval
+        self.max_deltas = max_deltas
+
+        self._connections: List[Optional[_Connection]] = [None] * self.pool_size
+        self._connect_lock = asyncio.Lock()
+        self._round_robin = itertools.cycle(range(self.pool_size))
+        self._request_ids = itertools.count(1)
+
+        self._pending_deltas: List[SessionDelta] = []
+        self._in_flight = 0
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_wakeup = asyncio.Event()
+        self.last_flush_time: Optional[float] = None
+
+    @property
+    def pending_deltas(self) -> int:
+        """Número de sessões ainda não confirmadas pelo serviço"""
+        return len(self._pending_deltas) + self._in_flight
+
+    async def _get_connection(self) -> _Connection:
+        """Retorna a próxima conexão do pool, reconectando se necessário"""
+        index = next(self._round_robin)
+        connection = self._connections[index]
+        if connection is not None and not connection.closed:
+            return connection
+
+        async with self._connect_lock:
+            connection = self._connections[index]
+            if connection is None or connection.closed:
+                reader, writer = await asyncio.open_unix_connection(self.socket_path)
+                connection = _Connection(reader, writer)
+                self._connections[index] = connection
+        return connection
+
+    async def call(self, method: str, *args: Any) -> Any:
+        """
+        Executa uma consulta no serviço e aguarda a resposta.
+
+        Args:
+            method: Nome do método (ver QUERY_METHODS)
+            *args: Argumentos posicionais serializáveis em JSON
+
+        Returns:
+            Any: Resultado retornado pelo serviço
+
+        Raises:
+            StorageServiceError: Se o serviço retornar erro
+            ConnectionError: Se a conexão cair antes da resposta
+        """
+        return await self._request(OP_CALL, {"m": method, "a": list(args)})
+
+    async def _request(self, opcode: int, payload: Any, timeout: Optional[float] = None) -> Any:
+        """Envia um frame e aguarda a resposta com o mesmo request_id"""
+        connection = await self._get_connection()
+        request_id = next(self._request_ids) & 0xFFFFFFFF
+        future = asyncio.get_running_loop().create_future()
+        connection.pending[request_id] = future
+        try:
+            connection.writer.write(encode_frame(opcode, request_id, payload))
+            await connection.writer.drain()
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            connection.pending.pop(request_id, None)
+
+    def record_session(
+        self,
+        user_id: str,
+        duration: int,
+        guild_id: Optional[int] = None,
+        session_id: Optional[Tuple[str, int]] = None,
+        details: Optional[SessionDetails] = None
+    ) -> None:
+        """
+        Enfileira uma sessão encerrada para envio em lote (sem bloquear).
+
+        Args:
+            user_id: ID do usuário Discord
+            duration: Duração da sessão em segundos
+            guild_id: ID do guild da sessão
+            session_id: Id da sessão; um lote reenviado após falha parcial
+                não é somado duas vezes pelo serviço
+            details: (canal, início, fim); o serviço grava histórico e mapa de calor
+
+        Raises:
+            ValueError: Se duration for negativo
+        """
+        self._pending_deltas.append(make_delta(user_id, duration, guild_id, session_id, details))
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+        if len(self._pending_deltas) >= self.max_deltas:
+            self._flush_wakeup.set()
+
+    async def flush(self) -> None:
+        """Envia os deltas pendentes em um único frame e aguarda a confirmação
+
+        Sem confirmação (conexão caída, erro ou timeout no serviço) o lote
+        volta para o buffer; ele pode ter sido gravado mesmo assim, e os
+        ids das sessões evitam a dupla contagem no reenvio.
+        """
+        async with self._flush_lock:
+            if not self._pending_deltas:
+                return
+
+            batch, self._pending_deltas = self._pending_deltas, []
+            self._in_flight = len(batch)
+            try:
+                result = await self._request(OP_DELTAS, batch, timeout=DELTAS_ACK_TIMEOUT)
+            except (ConnectionError, OSError, StorageServiceError, asyncio.TimeoutError) as e:
+                self._pending_deltas[:0] = batch
+                logger.warning("Lote de %d sessões não confirmado pelo serviço: %s", len(batch), e)
+                return
+            finally:
+                self._in_flight = 0
+            if result.get("rejected"):
+                logger.error("Serviço rejeitou lote de %d sessões: %s", len(batch), result["rejected"])
+                return
+            self.last_flush_time = time.time()
+
+    async def _flush_loop(self) -> None:
+        """Envia os deltas a cada flush_interval (ou antes, se o lote encher)"""
+        while self._pending_deltas:
+            try:
+                await asyncio.wait_for(self._flush_wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_wakeup.clear()
+            await self.flush()
+
+    async def close(self) -> None:
+        """Envia os deltas pendentes e fecha as conexões"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+        for connection in self._connections:
+            if connection is not None:
+                await connection.close()
+        self._connections = [None] * self.pool_size
+
+
+# Cliente global, criado sob demanda quando STORAGE_SOCKET está definido
+_storage_client: Optional[StorageClient] = None
+
+
+def get_storage_client() -> Optional[StorageClient]:
+    """
+    Retorna o cliente do serviço de armazenamento, se configurado.
+
+    Returns:
+        Optional[StorageClient]: Cliente global ou None quando o bot
+            acessa os arquivos diretamente (STORAGE_SOCKET vazio)
+    """
+    global _storage_client
+    if not STORAGE_SOCKET:
+        return None
+    if _storage_client is None:
+        _storage_client = StorageClient(STORAGE_SOCKET)
+    return _storage_client
+
+
+async def close_storage_client() -> None:
+    """Envia os deltas pendentes e fecha o cliente global, se existir"""
+    global _storage_client
+    if _storage_client is not None:
+        await _storage_client.close()
+        _storage_client = None
+
+
+def main() -> None:
+    """Ponto de entrada do processo de armazenamento"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serviço de armazenamento do Bate-Ponto")
+    parser.add_argument("--socket", default=STORAGE_SOCKET or "bate-ponto-storage.sock",
+                        help="Caminho do socket Unix")
+    args = parser.parse_args()
+
+    configure_logging()
+    server = StorageServer(args.socket)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        logger.info("Serviço de armazenamento encerrado")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Benchmark de sessões/s por modo de durabilidade (none, group-commit, strict)
+
+Uso: python -m tests.benchmark.durability_benchmark [sessões]
+"""
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import database
+from group_commit import GroupCommitter
+
+USER_IDS = [str(123456789012345678 + i) for i in range(50)]
+
+
+def _use_temp_file(directory: str, mode: str) -> None:
+    database.DATA_FILE = Path(directory) / f"bench-{mode}.json"
+    database.DURABILITY_MODE = mode
+
+
+def bench_direct(mode: str, sessions: int, directory: str) -> float:
+    """Uma escrita por sessão (caminho de update_video_time)"""
+    _use_temp_file(directory, mode)
+    start = time.perf_counter()
+    for i in range(sessions):
+        database.update_video_time(USER_IDS[i % len(USER_IDS)], 60)
+    return sessions / (time.perf_counter() - start)
+
+
+async def bench_group_commit(sessions: int, directory: str) -> float:
+    """Sessões chegando pelo event loop e gravadas em lote"""
+    _use_temp_file(directory, "group-commit")
+    committer = GroupCommitter(interval=0.2, max_records=256)
+    start = time.perf_counter()
+    for i in range(sessions):
+        committer.record_session(USER_IDS[i % len(USER_IDS)], 60)
+        if i % 64 == 0:
+            await asyncio.sleep(0)  # outros eventos do gateway
+    await committer.close()
+    return sessions / (time.perf_counter() - start)
+
+
+def main() -> None:
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    original = (database.DATA_FILE, database.DURABILITY_MODE)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            results = {
+                "none": bench_direct("none", sessions, directory),
+                "group-commit": asyncio.run(bench_group_commit(sessions, directory)),
+                "strict": bench_direct("strict", sessions, directory),
+            }
+    finally:
+        database.DATA_FILE, database.DURABILITY_MODE = original
+
+    print(f"\n=== Durabilidade: {sessions} sessões ===")
+    for mode, rate in results.items():
+        print(f"{mode:>13}: {rate:>10.0f} sessões/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Benchmark de memória (RSS) e time-to-ready do cache do gateway (completo x enxuto)
+
+Cada modo roda em um subprocesso próprio, alimentando um ConnectionState do
+discord.py com payloads GUILD_CREATE sintéticos (todos os membros no modo
+completo, como após o chunking; só os membros em voz no modo enxuto, que
+não pede chunks).
+
+Uso: python -m tests.benchmark.gateway_cache_benchmark [membros]
+"""
+import json
+import resource
+import subprocess
+import sys
+import time
+
+GUILDS = 5
+VOICE_RATIO = 0.02  # fração dos membros em canal de voz
+BASE_ID = 100000000000000000
+
+
+def _member_payload(user_id: int) -> dict:
+    return {
+        "user": {"id": str(user_id), "username": f"user{user_id}", "discriminator": "0", "avatar": None},
+        "nick": None,
+        "roles": [],
+        "joined_at": "2024-01-01T00:00:00+00:00",
+        "deaf": False,
+        "mute": False,
+        "flags": 0,
+    }
+
+
+def guild_payload(guild_index: int, members: int, lean: bool) -> dict:
+    """
+    Payload GUILD_CREATE sintético.
+
+    Args:
+        guild_index: Índice do guild (define os IDs)
+        members: Membros do guild
+        lean: Inclui só os membros em voz (modo enxuto)
+    """
+    guild_id = BASE_ID + guild_index * 10_000_000
+    channel_id = guild_id + 1
+    in_voice = max(1, int(members * VOICE_RATIO))
+    user_ids = [guild_id + 100 + i for i in range(members)]
+    voice_states = [
+        {
+            "user_id": str(user_id), "channel_id": str(channel_id), "session_id": "s",
+            "deaf": False, "mute": False, "self_deaf": False, "self_mute": False,
+            "self_video": True, "suppress": False, "request_to_speak_timestamp": None,
+            "member": _member_payload(user_id),
+        }
+        for user_id in user_ids[:in_voice]
+    ]
+    return {
+        "id": str(guild_id),
+        "name": f"guild-{guild_index}",
+        "owner_id": str(user_ids[0]),
+        "member_count": members,
+        "roles": [{"id": str(guild_id), "name": "@everyone", "permissions": "0", "position": 0,
+                   "color": 0, "hoist": False, "managed": False, "mentionable": False}],
+        "channels": [{"id": str(channel_id), "type": 2, "name": "voz", "position": 0,
+                      "permission_overwrites": [], "bitrate": 64000, "user_limit": 0,
+                      "rtc_region": None}],
+        "voice_states": voice_states,
+        "members": [_member_payload(user_id) for user_id in (user_ids[:in_voice] if lean else user_ids)],
+        "emojis": [],
+        "stickers": [],
+        "features": [],
+        "large": True,
+    }
+
+
+def run_mode(lean: bool, members: int) -> dict:
+    """Constrói o cache de um modo neste processo e mede RSS e tempo"""
+    from unittest.mock import MagicMock
+
+    import discord
+    from discord.state import ConnectionState
+
+    from config import get_cache_options, get_intents
+
+    options = get_cache_options(lean=lean)
+    payloads = [json.dumps(guild_payload(i, members, lean)) for i in range(GUILDS)]
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    state = ConnectionState(
+        dispatch=lambda *args, **kwargs: None, handlers={}, hooks={}, http=MagicMock(),
+        intents=get_intents(lean=lean),
+        member_cache_flags=options.get('member_cache_flags', discord.MemberCacheFlags.all()),
+        chunk_guilds_at_startup=options.get('chunk_guilds_at_startup', True),
+    )
+    state.user = None
+    for payload in payloads:
+        state._add_guild_from_data(json.loads(payload))
+    ready = time.perf_counter() - start
+
+    return {
+        "cached_members": sum(len(guild.members) for guild in state.guilds),
+        "ready_ms": ready * 1000,
+        "rss_delta_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before,
+    }
+
+
+def main() -> None:
+    members = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+
+    if len(sys.argv) > 2:  # subprocesso: python -m ... <membros> <modo>
+        print(json.dumps(run_mode(sys.argv[2] == "lean", members)))
+        return
+
+    print(f"{GUILDS} guilds x {members} membros ({VOICE_RATIO:.0%} em voz)")
+    for mode in ("full", "lean"):
+        output = subprocess.run(
+            [sys.executable, "-m", "tests.benchmark.gateway_cache_benchmark", str(members), mode],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(
+            f"{mode:>5}: {result['cached_members']:>8} membros em cache  "
+            f"ready {result['ready_ms']:8.1f}ms  RSS +{result['rss_delta_kb'] / 1024:7.1f}MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
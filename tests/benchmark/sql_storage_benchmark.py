@@ -0,0 +1,85 @@
+"""Benchmark do backend SQL: upsert em lote x um comando por linha, e saturação do pool
+
+Usa aiosqlite em um arquivo temporário (o mesmo código roda em PostgreSQL
+com SQL_DATABASE_URL=postgresql://... como argumento).
+
+Uso: python -m tests.benchmark.sql_storage_benchmark [sessões] [url]
+"""
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sql_storage import SQLStorage
+
+USERS = 2000
+BATCH = 256
+READERS = 32
+
+
+async def _fresh(url: str, pool_size: int = 5) -> SQLStorage:
+    storage = SQLStorage.from_url(url, pool_size)
+    await storage.init_schema()
+    async with storage.pool.acquire() as connection:
+        await connection.execute("DELETE FROM video_time")
+    return storage
+
+
+async def bench_upserts(url: str, sessions: int) -> None:
+    deltas = [(str(100 + index % USERS), 60, None) for index in range(sessions)]
+
+    storage = await _fresh(url)
+    start = time.perf_counter()
+    for delta in deltas:
+        await storage.apply_session_deltas([delta])
+    per_row = time.perf_counter() - start
+    await storage.close()
+
+    storage = await _fresh(url)
+    start = time.perf_counter()
+    for offset in range(0, sessions, BATCH):
+        await storage.apply_session_deltas(deltas[offset:offset + BATCH])
+    batched = time.perf_counter() - start
+    statements = len(storage._statements)
+    await storage.close()
+
+    print(f"por linha : {sessions / per_row:10.0f} sessões/s")
+    print(f"em lote   : {sessions / batched:10.0f} sessões/s ({batched and per_row / batched:.1f}x, "
+          f"{statements} textos de comando distintos)")
+
+
+async def bench_pool(url: str, pool_size: int) -> None:
+    storage = await _fresh(url, pool_size)
+    await storage.apply_session_deltas([(str(100 + index), index, None) for index in range(USERS)])
+
+    async def reader() -> None:
+        for offset in range(0, 200, 20):
+            await storage.ranking_page(offset=offset, limit=20)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(reader() for _ in range(READERS)))
+    elapsed = time.perf_counter() - start
+    stats = storage.stats()
+    await storage.close()
+
+    print(
+        f"pool {pool_size:>2}: {stats['acquisitions'] / elapsed:8.0f} consultas/s  "
+        f"saturação {stats['saturation']:5.0%}  espera média {stats['wait_avg_ms']:6.2f}ms  "
+        f"máx {stats['wait_max_ms']:6.2f}ms"
+    )
+
+
+def main() -> None:
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    with tempfile.TemporaryDirectory() as directory:
+        url = sys.argv[2] if len(sys.argv) > 2 else f"sqlite:///{Path(directory) / 'bench.db'}"
+        print(f"{sessions} sessões de {USERS} usuários, lotes de {BATCH}")
+        asyncio.run(bench_upserts(url, sessions))
+        print(f"{READERS} leitores concorrentes do ranking")
+        for pool_size in (1, 4, 16):
+            asyncio.run(bench_pool(url, pool_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -61,8 +61,46 @@ def temp_data_file():
 
     # Cleanup: restaurar original e deletar temporário
     database.DATA_FILE = original_data_file
-    if Path(temp_path).exists():
-        Path(temp_path).unlink()
+    stats_path = Path(temp_path).with_name(Path(temp_path).stem + ".stats.json")
+    for path in (Path(temp_path), Path(temp_path + ".lock"), stats_path, Path(str(stats_path) + ".lock")):
+        if path.exists():
+            path.unlink()
+    # Journal, checkpoints e cópias de arquivos corrompidos (snapshot_journal)
+    for path in Path(temp_path).parent.glob(Path(temp_path).name + ".*"):
+        path.unlink()
+
+
+@pytest.fixture(autouse=True)
+def history_dir(tmp_path, monkeypatch):
+    """Isola o histórico de sessões em um diretório temporário por teste."""
+    import session_history
+    path = tmp_path / "history"
+    monkeypatch.setattr(session_history, "HISTORY_DIR", path)
+    monkeypatch.setattr(session_history, "_max_durations", {})
+    return path
+
+
+@pytest.fixture(autouse=True)
+def heatmap_dir(tmp_path, monkeypatch):
+    """Isola os contadores do mapa de calor em um diretório temporário."""
+    import heatmap
+    path = tmp_path / "heatmaps"
+    monkeypatch.setattr(heatmap, "HEATMAP_DIR", path)
+    return path
+
+
+@pytest.fixture(autouse=True)
+def clear_ranking_cache():
+    """Descarta o ranking e as páginas em cache entre testes (load_data é mockado por teste)."""
+    from commands import ranking_pages
+    from ranking import period_cache, ranking_cache
+    ranking_cache.invalidate()
+    period_cache.invalidate()
+    ranking_pages.clear()
+    yield
+    ranking_cache.invalidate()
+    period_cache.invalidate()
+    ranking_pages.clear()
 
 
 @pytest.fixture
@@ -15,6 +15,28 @@ async def test_bot_startup():
         assert bot.command_prefix == "!"
 
 
+@pytest.mark.asyncio
+async def test_bot_startup_sharded():
+    """Teste: com sharding configurado o bot usa AutoShardedBot"""
+    with patch('bot.AUTO_SHARDING', True), \
+            patch('bot.SHARD_COUNT', 4), \
+            patch('bot.SHARD_IDS', [0, 1]):
+        bot = create_bot()
+        assert isinstance(bot, commands.AutoShardedBot)
+        assert bot.shard_count == 4
+        assert bot.shard_ids == [0, 1]
+
+
+@pytest.mark.asyncio
+async def test_bot_startup_shard_ids_require_count():
+    """Teste: SHARD_IDS sem SHARD_COUNT é rejeitado"""
+    with patch('bot.AUTO_SHARDING', True), \
+            patch('bot.SHARD_COUNT', None), \
+            patch('bot.SHARD_IDS', [0, 1]):
+        with pytest.raises(ValueError):
+            create_bot()
+
+
 @pytest.mark.asyncio
 async def test_ranking_command_integration():
     """Teste: comando de ranking funciona end-to-end"""
@@ -0,0 +1,56 @@
+"""Tests para command_sync.py - sync dos comandos de barra só quando mudam"""
+import pytest
+from unittest.mock import AsyncMock
+
+import discord
+from discord.ext import commands
+
+from command_sync import command_tree_fingerprint, sync_command_tree
+
+
+def _bot_with(description: str) -> commands.Bot:
+    bot = commands.Bot(command_prefix="!", intents=discord.Intents.none())
+
+    @bot.tree.command(name="ranking", description=description)
+    async def ranking(interaction: discord.Interaction, pagina: int = 1) -> None:
+        pass
+
+    bot.tree.sync = AsyncMock(return_value=[])
+    return bot
+
+
+@pytest.mark.asyncio
+async def test_unchanged_tree_is_not_synced_again(tmp_path):
+    """Teste: a segunda inicialização com os mesmos comandos não chama sync"""
+    path = str(tmp_path / "command_tree.json")
+    first, second = _bot_with("Ranking"), _bot_with("Ranking")
+
+    assert await sync_command_tree(first.tree, path) is True
+    assert await sync_command_tree(second.tree, path) is False
+    first.tree.sync.assert_awaited_once()
+    second.tree.sync.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_changed_tree_is_synced(tmp_path):
+    """Teste: mudar um comando muda a assinatura e dispara o sync"""
+    path = str(tmp_path / "command_tree.json")
+    old, new = _bot_with("Ranking"), _bot_with("Ranking por período")
+    assert command_tree_fingerprint(old.tree) != command_tree_fingerprint(new.tree)
+
+    await sync_command_tree(old.tree, path)
+    assert await sync_command_tree(new.tree, path) is True
+    new.tree.sync.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_failed_sync_is_retried_next_startup(tmp_path):
+    """Teste: se o sync falhar a assinatura não é gravada"""
+    path = str(tmp_path / "command_tree.json")
+    failing = _bot_with("Ranking")
+    failing.tree.sync.side_effect = discord.HTTPException(AsyncMock(status=500, reason="x"), "erro")
+
+    with pytest.raises(discord.HTTPException):
+        await sync_command_tree(failing.tree, path)
+    retry = _bot_with("Ranking")
+    assert await sync_command_tree(retry.tree, path) is True
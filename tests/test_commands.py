@@ -5,7 +5,22 @@ import discord
 from discord.ext import commands
 import asyncio
 
-from commands import ranking_video
+from commands import (
+    ChannelCooldown,
+    SharedRankingError,
+    SingleFlight,
+    adjust_time,
+    export_command,
+    guild_stats_command,
+    heatmap_command,
+    merge_users_command,
+    profile_command,
+    ranking_admin,
+    ranking_video,
+    reset_ranking,
+    reset_user_command,
+    warm_up_ranking_cache,
+)
 
 
 @pytest.fixture
@@ -142,3 +157,481 @@ async def test_ranking_sorted_by_time(mock_ctx):
             # Último campo deve ter menos tempo (1000s)
             last_field = embed.fields[-1]
             assert "16min" in last_field.value
+
+
+@pytest.mark.asyncio
+async def test_ranking_uses_cache_until_data_changes(mock_ctx):
+    """Teste: ranking reaproveita o cache e recarrega após uma mutação"""
+    test_data = {"123": {"total_seconds": 100, "sessions": 1}}
+
+    with patch('commands.load_data', return_value=test_data) as mock_load:
+        with patch('commands.fetch_user') as mock_fetch:
+            mock_member = MagicMock(spec=discord.Member)
+            mock_member.display_name = "User"
+            mock_fetch.return_value = mock_member
+
+            await ranking_video(mock_ctx)
+            await ranking_video(mock_ctx)
+            assert mock_load.call_count == 1
+
+            # Qualquer mutação invalida o cache em um único passo
+            import database
+            database._bump_data_version()
+
+            await ranking_video(mock_ctx)
+            assert mock_load.call_count == 2
+
+
+@pytest.fixture
+def mock_user():
+    """Fixture para usuário alvo dos comandos administrativos"""
+    user = MagicMock(spec=discord.User)
+    user.id = 123456789012345678
+    user.display_name = "Target User"
+    return user
+
+
+@pytest.mark.asyncio
+async def test_reset_ranking_requires_confirmation(mock_ctx):
+    """Teste: reset completo exige confirmação explícita"""
+    mock_ctx.prefix = "!"
+    with patch('commands.reset_all_data') as mock_reset:
+        await reset_ranking(mock_ctx)
+
+        mock_reset.assert_not_called()
+        assert "confirmar" in mock_ctx.send.call_args[0][0]
+
+
+@pytest.mark.asyncio
+async def test_reset_ranking_with_confirmation(mock_ctx):
+    """Teste: reset completo com confirmação arquiva os dados"""
+    from pathlib import Path
+    with patch('commands.reset_all_data', return_value=Path("video_ranking.epoch-1.json")) as mock_reset:
+        await reset_ranking(mock_ctx, "confirmar")
+
+        mock_reset.assert_called_once()
+        assert "video_ranking.epoch-1.json" in mock_ctx.send.call_args[0][0]
+
+
+@pytest.mark.asyncio
+async def test_shared_ranking_admin_commands_require_owner(mock_ctx, monkeypatch):
+    """Teste: sem PARTITION_BY_GUILD, admin de um servidor não altera o ranking de todos"""
+    monkeypatch.setattr('database.PARTITION_BY_GUILD', False)
+    mock_ctx.guild.id = 1
+    mock_ctx.permissions = discord.Permissions(administrator=True)
+    mock_ctx.bot = MagicMock(is_owner=AsyncMock(return_value=False))
+    predicate = ranking_admin().predicate
+
+    with pytest.raises(SharedRankingError):
+        await predicate(mock_ctx)
+
+    mock_ctx.bot.is_owner.return_value = True
+    assert await predicate(mock_ctx)
+
+
+@pytest.mark.asyncio
+async def test_partitioned_ranking_admin_commands_require_guild_admin(mock_ctx, monkeypatch):
+    """Teste: com PARTITION_BY_GUILD basta ser administrador do servidor"""
+    monkeypatch.setattr('database.PARTITION_BY_GUILD', True)
+    mock_ctx.guild.id = 1
+    mock_ctx.permissions = discord.Permissions(administrator=True)
+    predicate = ranking_admin().predicate
+
+    assert await predicate(mock_ctx)
+
+    mock_ctx.permissions = discord.Permissions.none()
+    with pytest.raises(commands.MissingPermissions):
+        await predicate(mock_ctx)
+
+
+@pytest.mark.asyncio
+async def test_reset_user_command_missing_user(mock_ctx, mock_user):
+    """Teste: reset de usuário sem dados informa o administrador"""
+    with patch('commands.reset_user', return_value=None) as mock_reset:
+        await reset_user_command(mock_ctx, mock_user)
+
+        mock_reset.assert_called_once_with(str(mock_user.id), mock_ctx.guild.id)
+        assert "não possui dados" in mock_ctx.send.call_args[0][0]
+
+
+@pytest.mark.asyncio
+async def test_adjust_time_uses_batched_adjustment(mock_ctx, mock_user):
+    """Teste: ajuste de tempo usa a transação em lote"""
+    user_id = str(mock_user.id)
+    result = {user_id: {"total_seconds": 4200, "sessions": 5}}
+    with patch('commands.apply_adjustments', return_value=result) as mock_adjust:
+        await adjust_time(mock_ctx, mock_user, 600)
+
+        mock_adjust.assert_called_once_with({user_id: 600}, mock_ctx.guild.id)
+        assert "+600s" in mock_ctx.send.call_args[0][0]
+
+
+@pytest.mark.asyncio
+async def test_merge_users_command_rejects_same_user(mock_ctx, mock_user):
+    """Teste: mescla rejeita origem igual ao destino"""
+    with patch('commands.merge_users') as mock_merge:
+        await merge_users_command(mock_ctx, mock_user, mock_user)
+
+        mock_merge.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_warm_up_loads_each_partition_once():
+    """Teste: aquecimento carrega cada partição uma única vez"""
+    test_data = {"123": {"total_seconds": 100, "sessions": 1}}
+
+    with patch('commands.load_data', return_value=test_data) as mock_load:
+        # Sem PARTITION_BY_GUILD todos os guilds compartilham a partição global
+        warmed = await warm_up_ranking_cache([1, 2, 3])
+
+        assert warmed == 1
+        assert mock_load.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_rankings_share_one_computation(mock_ctx):
+    """Teste: !rankingvideo simultâneos no mesmo guild montam o ranking uma vez"""
+    test_data = {"123": {"total_seconds": 3600, "sessions": 5}}
+
+    async def slow_fetch(guild, user_id):
+        await asyncio.sleep(0.05)
+        member = MagicMock(spec=discord.Member)
+        member.display_name = "User"
+        return member
+
+    with patch('commands.load_data', return_value=test_data) as mock_load, \
+         patch('commands.fetch_user', side_effect=slow_fetch) as mock_fetch:
+        await asyncio.gather(*[ranking_video(mock_ctx) for _ in range(10)])
+
+    assert mock_load.call_count == 1
+    assert mock_fetch.call_count == 1
+    assert mock_ctx.send.call_count == 10
+
+
+@pytest.mark.asyncio
+async def test_single_flight_propagates_errors_and_resets():
+    """Teste: erro é entregue a todos e a próxima chamada executa de novo"""
+    flights = SingleFlight()
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("falhou")
+
+    results = await asyncio.gather(
+        flights.run("guild", failing), flights.run("guild", failing),
+        return_exceptions=True
+    )
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert len(calls) == 1
+    assert len(flights) == 0
+
+
+@pytest.mark.asyncio
+async def test_ranking_cooldown_replies_with_link(mock_ctx):
+    """Teste: dentro do cooldown o canal recebe o link do último ranking"""
+    test_data = {"123": {"total_seconds": 3600, "sessions": 5}}
+    posted = MagicMock(spec=discord.Message)
+    posted.jump_url = "https://discord.com/channels/1/2/3"
+    mock_ctx.send.return_value = posted
+
+    with patch('commands.ranking_cooldown', ChannelCooldown(30)), \
+         patch('commands.load_data', return_value=test_data) as mock_load, \
+         patch('commands.fetch_user', return_value=MagicMock(display_name="User")):
+        await ranking_video(mock_ctx)
+        await ranking_video(mock_ctx)
+
+    assert mock_load.call_count == 1
+    assert posted.jump_url in mock_ctx.send.call_args[0][0]
+
+
+def test_channel_cooldown_expires():
+    """Teste: cooldown expira e é independente por canal"""
+    now = [0.0]
+    cooldown = ChannelCooldown(10, clock=lambda: now[0])
+    message = MagicMock()
+
+    cooldown.record("canal-a", message)
+    assert cooldown.recent("canal-a") == (message, 0.0)
+    assert cooldown.recent("canal-b") is None
+
+    now[0] = 10.0
+    assert cooldown.recent("canal-a") is None
+
+
+def test_channel_cooldown_is_bounded():
+    """Teste: expiradas são varridas e o número de canais é limitado"""
+    now = [0.0]
+    cooldown = ChannelCooldown(10, clock=lambda: now[0], max_channels=3)
+
+    for channel in range(5):
+        cooldown.record(channel, MagicMock())
+    assert len(cooldown) == 3
+    assert cooldown.recent(0) is None and cooldown.recent(4) is not None
+
+    now[0] = 20.0
+    cooldown.record("novo", MagicMock())
+    assert len(cooldown) == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("command, args, storage_result", [
+    (adjust_time, (60,), {"123": {"total_seconds": 60, "sessions": 0}}),
+    (reset_user_command, (), None),
+    (merge_users_command, ("target",), None),
+])
+async def test_admin_mutations_forget_published_rankings(mock_ctx, command, args, storage_result):
+    """Teste: ajuste, remoção e mescla esquecem rankings publicados e páginas"""
+    user = MagicMock(id=123, display_name="User")
+    args = tuple(MagicMock(id=456, display_name="Target") if arg == "target" else arg for arg in args)
+    cooldown = ChannelCooldown(30)
+    cooldown.record(1, MagicMock())
+
+    with patch('commands.ranking_cooldown', cooldown), \
+         patch('commands.ranking_pages') as mock_pages, \
+         patch('commands._storage_call', AsyncMock(return_value=storage_result)):
+        await command(mock_ctx, user, *args)
+
+    assert cooldown.recent(1) is None
+    mock_pages.clear.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_profile_command_clamps_duration_and_sends_files(mock_ctx, tmp_path):
+    """Teste: !perfil limita a duração e envia os dois arquivos"""
+    stacks_path = tmp_path / "profile.collapsed"
+    tasks_path = tmp_path / "tasks.txt"
+    stacks_path.write_text("main;run 3\n")
+    tasks_path.write_text("0 task(s) pendente(s)\n")
+    sampler = MagicMock(samples=3)
+    sampler.top_frames.return_value = [("run (bot.py:1)", 3)]
+
+    with patch('sampling_profiler.profile_for', AsyncMock(return_value=(stacks_path, tasks_path, sampler))) as mock_profile:
+        await profile_command(mock_ctx, 10_000)
+
+    assert mock_profile.call_args[0][0] == 120
+    assert len(mock_ctx.send.call_args[1]['files']) == 2
+
+
+@pytest.mark.asyncio
+async def test_export_command_uploads_small_file(mock_ctx, tmp_path):
+    """Teste: !exportar roda fora do loop e anexa o arquivo"""
+    exported = tmp_path / "export.csv"
+    exported.write_text("guild_id,user_id,total_seconds,sessions\n")
+    mock_ctx.guild.filesize_limit = 8 * 1024 * 1024
+
+    with patch('commands.export_data', return_value=str(exported)) as mock_export:
+        await export_command(mock_ctx, "CSV", "gz")
+
+    assert mock_export.call_args[0][1:] == ("csv", True)
+    assert 'file' in mock_ctx.send.call_args[1]
+
+
+@pytest.mark.asyncio
+async def test_export_command_rejects_unknown_format(mock_ctx):
+    """Teste: formato desconhecido não exporta"""
+    with patch('commands.export_data') as mock_export:
+        await export_command(mock_ctx, "xml")
+
+    mock_export.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_guild_stats_command_renders_summary(mock_ctx):
+    """Teste: !statsservidor usa o resumo incremental (sem load_data)"""
+    summary = {
+        "users": 3, "total_seconds": 7200, "sessions": 4,
+        "mean_session": 1800.0, "median_session": 1500.0, "p90_session": 3500.0,
+        "histogram": [["< 1min", 0], ["15-30min", 3], ["30min-1h", 1]],
+    }
+    with patch('commands.guild_stats_summary', return_value=summary) as mock_stats, \
+         patch('commands.load_data') as mock_load:
+        await guild_stats_command(mock_ctx)
+
+    mock_stats.assert_called_once_with(mock_ctx.guild.id)
+    mock_load.assert_not_called()
+    embed = mock_ctx.send.call_args[1]['embed']
+    values = {field.name: field.value for field in embed.fields}
+    assert values["Mediana"] == "25min"
+    assert "███" in values["Duração das sessões"]
+
+
+@pytest.mark.asyncio
+async def test_heatmap_command_renders_peak(mock_ctx):
+    """Teste: !mapacalor renderiza os contadores e aponta o pico"""
+    counters = [0] * 168
+    counters[24 + 20] = 7200  # terça 20h
+    with patch('commands.load_heatmap', return_value=counters):
+        await heatmap_command(mock_ctx)
+
+    message = mock_ctx.send.call_args[0][0]
+    assert "Pico: Ter 20h" in message
+    assert "```" in message
+
+
+def _ranking_data(users):
+    return {str(100000000000000000 + i): {"total_seconds": 10000 - i, "sessions": 1} for i in range(users)}
+
+
+def _members_by_id(guild, user_ids, cache=None):
+    return {user_id: MagicMock(display_name=f"U{user_id[-2:]}") for user_id in user_ids}
+
+
+@pytest.mark.asyncio
+async def test_ranking_pages_command_sends_view_and_caches_pages(mock_ctx):
+    """Teste: !rankingcompleto envia botões; a página repetida vem do cache"""
+    from commands import RankingView, ranking_pages_command
+
+    with patch('ranking.load_data', return_value=_ranking_data(25)), \
+         patch('commands.fetch_members', side_effect=_members_by_id) as mock_fetch:
+        await ranking_pages_command(mock_ctx, 2)
+        await ranking_pages_command(mock_ctx, 2)
+
+    mock_fetch.assert_called_once()
+    kwargs = mock_ctx.send.call_args.kwargs
+    assert isinstance(kwargs["view"], RankingView)
+    assert (kwargs["view"].page, kwargs["view"].pages) == (1, 3)
+    assert kwargs["embed"].fields[0].name.startswith("#11 ")
+    assert "Página 2/3" in kwargs["embed"].footer.text
+
+
+@pytest.mark.asyncio
+async def test_ranking_view_buttons_change_page(mock_ctx):
+    """Teste: o botão de próxima página edita a mensagem com a página seguinte"""
+    from commands import RankingView
+
+    interaction = MagicMock()
+    interaction.response.defer = AsyncMock()
+    interaction.response.edit_message = AsyncMock()
+    interaction.edit_original_response = AsyncMock()
+    view = RankingView(mock_ctx.guild, 0, 3)
+    assert view.previous_page.disabled
+
+    with patch('ranking.load_data', return_value=_ranking_data(25)), \
+         patch('commands.fetch_members', side_effect=_members_by_id):
+        await view.next_page.callback(interaction)
+        await view.next_page.callback(interaction)
+
+    assert view.page == 2
+    assert view.next_page.disabled
+    interaction.response.defer.assert_awaited()
+    embed = interaction.edit_original_response.call_args.kwargs["embed"]
+    assert embed.fields[0].name.startswith("#21 ")
+
+
+@pytest.mark.asyncio
+async def test_my_position_command_shows_author_page(mock_ctx):
+    """Teste: !minhaposicao informa a posição e envia a página do autor"""
+    from commands import my_position_command
+
+    mock_ctx.author.id = 100000000000000013
+    mock_ctx.author.display_name = "Ana"
+    with patch('ranking.load_data', return_value=_ranking_data(25)), \
+         patch('commands.fetch_members', side_effect=_members_by_id):
+        await my_position_command(mock_ctx)
+
+    assert "#14" in mock_ctx.send.call_args.args[0]
+    assert "Página 2/3" in mock_ctx.send.call_args.kwargs["embed"].footer.text
+
+
+def _interaction(guild):
+    interaction = MagicMock()
+    interaction.guild = guild
+    interaction.user.id = 100000000000000003
+    interaction.response.is_done = MagicMock(return_value=False)
+    interaction.response.send_message = AsyncMock()
+
+    async def defer(**kwargs):
+        interaction.response.is_done.return_value = True
+
+    interaction.response.defer = AsyncMock(side_effect=defer)
+    interaction.followup.send = AsyncMock()
+    return interaction
+
+
+@pytest.mark.asyncio
+async def test_ranking_slash_defers_then_answers_from_cache(mock_ctx):
+    """Teste: /ranking usa defer() na primeira vez e responde na hora com a página em cache"""
+    from commands import RankingView, ranking_slash
+
+    cold, warm = _interaction(mock_ctx.guild), _interaction(mock_ctx.guild)
+    with patch('ranking.load_data', return_value=_ranking_data(25)), \
+         patch('commands.fetch_members', side_effect=_members_by_id) as mock_fetch:
+        await ranking_slash(cold, "total", 1)
+        await ranking_slash(warm, "total", 1)
+
+    cold.response.defer.assert_awaited_once()
+    assert cold.followup.send.call_args.kwargs["wait"] is True
+    warm.response.defer.assert_not_awaited()
+    kwargs = warm.response.send_message.call_args.kwargs
+    assert isinstance(kwargs["view"], RankingView)
+    assert kwargs["view"].interaction is warm
+    assert kwargs["embed"].fields[0].name.startswith("#1 ")
+    mock_fetch.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_my_position_slash_is_ephemeral(mock_ctx):
+    """Teste: /minhaposicao responde só ao autor com a posição dele"""
+    from commands import my_position_slash
+
+    interaction = _interaction(mock_ctx.guild)
+    with patch('ranking.load_data', return_value=_ranking_data(25)), \
+         patch('commands.fetch_members', side_effect=_members_by_id):
+        await my_position_slash(interaction)
+
+    interaction.response.defer.assert_awaited_once_with(ephemeral=True, thinking=True)
+    args, kwargs = interaction.followup.send.call_args
+    assert "#4" in args[0]
+    assert kwargs["ephemeral"] is True
+
+
+@pytest.mark.asyncio
+async def test_period_ranking_follows_history_written_by_service(tmp_path, temp_data_file):
+    """Teste: com storage_service, sessões gravadas pelo serviço invalidam o ranking por período"""
+    import time
+    import ranking
+    from commands import render_ranking_page
+    from storage_service import StorageClient, StorageServer
+
+    server = StorageServer(str(tmp_path / "storage.sock"))
+    await server.start()
+    client = StorageClient(server.socket_path, pool_size=1)
+    guild = MagicMock(spec=discord.Guild)
+    guild.id = 42
+    # No gateway a versão local do histórico nunca muda: quem grava é o serviço
+    frozen = ranking.ranking_version("semana")
+    try:
+        with patch('commands.get_storage_client', return_value=client), \
+             patch('commands.ranking_version', return_value=frozen), \
+             patch('commands.fetch_members', side_effect=_members_by_id):
+            empty, _ = await render_ranking_page(guild, period="semana")
+
+            now = time.time()
+            client.record_session("123456789012345678", 100, 42, ("a1", 1), (7, now - 100, now))
+            await client.flush()
+            updated, _ = await render_ranking_page(guild, period="semana")
+    finally:
+        await client.close()
+        await server.close()
+
+    assert empty.embed is None
+    assert updated.embed is not None
+    assert "Total de 1 usuários" in updated.embed.footer.text
+
+
+@pytest.mark.asyncio
+async def test_shared_ranking_export_requires_owner(mock_ctx, monkeypatch):
+    """Teste: sem PARTITION_BY_GUILD, !exportar (arquivo de todos os servidores) exige o dono"""
+    from bot import create_bot
+
+    monkeypatch.setattr('database.PARTITION_BY_GUILD', False)
+    command = create_bot().get_command('exportar')
+    mock_ctx.guild.id = 1
+    mock_ctx.permissions = discord.Permissions(administrator=True)
+    mock_ctx.bot = MagicMock(is_owner=AsyncMock(return_value=False))
+
+    with pytest.raises(SharedRankingError):
+        for check in command.checks:
+            await discord.utils.maybe_coroutine(check, mock_ctx)
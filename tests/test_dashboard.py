@@ -0,0 +1,211 @@
+"""Tests para dashboard.py - API do dashboard servida de snapshots em memória"""
+import asyncio
+import json
+
+import aiohttp
+import pytest
+from unittest.mock import patch
+
+from dashboard import DashboardServer, DashboardSnapshot, DashboardState, rank_changes
+
+
+class FakeRanking:
+    """Ranking mutável no formato de ranking.ranking_page, contando as cargas"""
+
+    def __init__(self, users: int):
+        self.version = 1
+        self.loads = 0
+        self.data = {str(1000 + i): {"total_seconds": 10000 - i * 10, "sessions": 2} for i in range(users)}
+
+    async def load(self, guild_id: int):
+        self.loads += 1
+        entries = sorted(self.data.items(), key=lambda item: (-item[1]["total_seconds"], item[0]))
+        return {"version": self.version, "total_users": len(entries), "offset": 0, "entries": entries, "position": None}
+
+
+async def _start(ranking: FakeRanking, refresh: float = 60.0, token: str = ""):
+    state = DashboardState(refresh, loader=ranking.load, names=lambda guild_id, user_id: f"U{user_id}")
+    server = DashboardServer(state, port=0, token=token)
+    await server.start()
+    return server, f"http://127.0.0.1:{server.port}/api/guilds/5"
+
+
+@pytest.mark.asyncio
+async def test_ranking_is_served_from_one_snapshot_with_etag():
+    """Teste: muitas requisições custam uma carga; If-None-Match responde 304"""
+    ranking = FakeRanking(30)
+    server, base = await _start(ranking)
+    try:
+        async with aiohttp.ClientSession() as session:
+            responses = await asyncio.gather(*(session.get(f"{base}/ranking?limit=10") for _ in range(50)))
+            bodies = [await response.json() for response in responses]
+            etag = responses[0].headers["ETag"]
+
+            async with session.get(f"{base}/ranking?limit=10", headers={"If-None-Match": etag}) as response:
+                assert response.status == 304
+                assert await response.read() == b""
+    finally:
+        await server.close()
+
+    assert ranking.loads == 1
+    assert bodies[0]["total_users"] == 30
+    assert bodies[0]["entries"][0] == {
+        "position": 1, "user_id": "1000", "name": "U1000", "total_seconds": 10000, "sessions": 2
+    }
+    assert all(body == bodies[0] for body in bodies)
+
+
+@pytest.mark.asyncio
+async def test_responses_are_gzip_compressed_when_accepted():
+    """Teste: respostas grandes saem com gzip para quem aceita"""
+    ranking = FakeRanking(100)
+    server, base = await _start(ranking)
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"{base}/ranking?limit=100", headers={"Accept-Encoding": "gzip"}) as response:
+                assert response.headers["Content-Encoding"] == "gzip"
+                assert len((await response.json())["entries"]) == 100
+            async with session.get(f"{base}/stats", headers={"Accept-Encoding": "identity"}) as response:
+                assert "Content-Encoding" not in response.headers
+                stats = await response.json()
+    finally:
+        await server.close()
+
+    assert stats["users"] == 100
+    assert stats["sessions"] == 200
+
+
+@pytest.mark.asyncio
+async def test_user_endpoint_and_token():
+    """Teste: /users traz a posição; com token, requisições sem ele recebem 401"""
+    ranking = FakeRanking(5)
+    server, base = await _start(ranking, token="segredo")
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"{base}/users/1003") as response:
+                assert response.status == 401
+            headers = {"Authorization": "Bearer segredo"}
+            async with session.get(f"{base}/users/1003", headers=headers) as response:
+                user = await response.json()
+            async with session.get(f"{base}/users/9999", headers=headers) as response:
+                assert response.status == 404
+    finally:
+        await server.close()
+
+    assert user["position"] == 4
+    assert user["total_users"] == 5
+
+
+@pytest.mark.asyncio
+async def test_snapshot_reused_while_data_version_is_unchanged():
+    """Teste: snapshot expirado com a mesma versão dos dados não é recarregado"""
+    ranking = FakeRanking(3)
+    now = [0.0]
+    state = DashboardState(1.0, loader=ranking.load, clock=lambda: now[0])
+
+    with patch('dashboard.get_data_version', return_value=1):
+        await state.snapshot(5)
+        now[0] = 10.0
+        await state.snapshot(5)
+    assert ranking.loads == 1
+
+    with patch('dashboard.get_data_version', return_value=2):
+        now[0] = 20.0
+        await state.snapshot(5)
+    assert ranking.loads == 2
+
+
+def test_etag_follows_content_not_process_version():
+    """Teste: mesma versão local com dados diferentes (ex: após reinício) muda o ETag"""
+    def snapshot(totals):
+        return DashboardSnapshot(5, 1, [(user, {"total_seconds": seconds, "sessions": 1})
+                                        for user, seconds in totals], 0)
+
+    before_restart = snapshot([("a", 30), ("b", 20)])
+    after_restart = snapshot([("a", 30), ("b", 25)])
+
+    assert before_restart.etag != after_restart.etag
+    assert before_restart.etag == snapshot([("a", 30), ("b", 20)]).etag
+
+
+@pytest.mark.asyncio
+async def test_watcher_survives_failed_first_snapshot():
+    """Teste: falha na primeira carga do watcher é registrada e repetida"""
+    ranking = FakeRanking(3)
+    failures = [RuntimeError("serviço indisponível")]
+
+    async def flaky_load(guild_id):
+        if failures:
+            raise failures.pop()
+        return await ranking.load(guild_id)
+
+    state = DashboardState(0.01, loader=flaky_load)
+    with patch('dashboard.get_data_version', return_value=0):
+        queue = state.subscribe(5)
+        await asyncio.sleep(0.05)
+        watcher = state._watchers.get(5)
+        assert watcher is not None and not watcher.done()
+
+        ranking.data["1002"]["total_seconds"] = 50000
+        ranking.version = 2
+        event = await asyncio.wait_for(queue.get(), 1)
+        state.unsubscribe(5, queue)
+        await asyncio.wait_for(watcher, 1)
+
+    assert b"event: ranking" in event
+    assert ranking.loads >= 2
+
+
+def test_rank_changes_reports_moves_and_exits():
+    """Teste: rank_changes traz quem subiu, desceu ou saiu do topo"""
+    def snapshot(version, totals):
+        return DashboardSnapshot(5, version, [(user, {"total_seconds": seconds, "sessions": 1})
+                                              for user, seconds in totals], 0)
+
+    old = snapshot(1, [("a", 30), ("b", 20), ("c", 10)])
+    new = snapshot(2, [("c", 40), ("a", 30), ("d", 25)])
+
+    changes = {change["user_id"]: change for change in rank_changes(old, new, top=3)}
+
+    assert changes["c"]["position"] == 1 and changes["c"]["previous_position"] == 3
+    assert changes["a"]["position"] == 2
+    assert changes["d"]["previous_position"] is None
+    assert changes["b"]["position"] is None
+
+
+@pytest.mark.asyncio
+async def test_event_stream_pushes_rank_changes():
+    """Teste: o stream SSE envia o topo ao conectar e depois as mudanças"""
+    ranking = FakeRanking(3)
+    server, base = await _start(ranking, refresh=0.01)
+    # Versão local diferente da do FakeRanking: o snapshot expirado é recarregado
+    version_patch = patch('dashboard.get_data_version', return_value=0)
+    version_patch.start()
+
+    async def next_event(response):
+        fields = {}
+        async for line in response.content:
+            line = line.decode().rstrip("\n")
+            if not line:
+                return fields
+            name, _, value = line.partition(": ")
+            fields[name] = value
+
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"{base}/events") as response:
+                assert response.headers["Content-Type"] == "text/event-stream"
+                first = await asyncio.wait_for(next_event(response), 1)
+
+                ranking.data["1002"]["total_seconds"] = 50000
+                ranking.version = 2
+                update = await asyncio.wait_for(next_event(response), 1)
+    finally:
+        version_patch.stop()
+        await server.close()
+
+    assert first["event"] == "snapshot"
+    assert update["event"] == "ranking"
+    assert update["id"] == "2"
+    changes = json.loads(update["data"])["changes"]
+    assert changes[0] == {"user_id": "1002", "position": 1, "previous_position": 3, "total_seconds": 50000}
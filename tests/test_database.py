@@ -4,7 +4,22 @@ import json
 import os
 import time
 from pathlib import Path
-from database import load_data, save_data, update_video_time, DATA_FILE
+from unittest.mock import patch
+from database import (
+    load_data,
+    save_data,
+    update_video_time,
+    reset_all_data,
+    reset_user,
+    apply_adjustments,
+    merge_users,
+    get_data_version,
+    data_file_for,
+    load_aggregated_data,
+    apply_session_deltas,
+    DATA_FILE,
+)
+from database_lock import CorruptedFileError
 
 
 class TestLoadData:
@@ -26,6 +41,20 @@ class TestLoadData:
         assert data == {}
         assert temp_data_file.exists()
 
+    def test_import_does_not_create_data_file(self, tmp_path):
+        """Teste: importar database não cria o arquivo (abertura preguiçosa)."""
+        import subprocess
+        import sys
+        project_root = Path(__file__).parent.parent
+
+        subprocess.run(
+            [sys.executable, "-c", f"import sys; sys.path.insert(0, {str(project_root)!r}); import database"],
+            cwd=tmp_path,
+            check=True,
+        )
+
+        assert not (tmp_path / "video_ranking.json").exists()
+
     def test_load_data_returns_empty_dict_for_empty_file(self, temp_data_file):
         """Teste: retorna dict vazio para arquivo vazio."""
         temp_data_file.write_text("{}")
@@ -44,23 +73,22 @@ class TestLoadData:
         assert "123456789012345678" in data
         assert data["123456789012345678"]["total_seconds"] == 3600
 
-    def test_load_data_handles_corrupted_json(self, temp_data_file):
-        """Teste: trata JSON corrompido retornando dict vazio."""
+    def test_load_data_rejects_corrupted_json(self, temp_data_file):
+        """Teste: JSON corrompido sem journal levanta erro em vez de virar dict vazio."""
         temp_data_file.write_text("{invalid json content")
 
-        data = load_data()
+        with pytest.raises(CorruptedFileError):
+            load_data()
 
-        assert data == {}
-        # safe_load_json retorna valor padrão sem recriar o arquivo
-        # O arquivo ainda contém o JSON corrompido
+        # O arquivo corrompido não é sobrescrito
+        assert temp_data_file.read_text() == "{invalid json content"
 
-    def test_load_data_handles_invalid_structure(self, temp_data_file):
-        """Teste: trata estrutura inválida retornando dict vazio."""
+    def test_load_data_rejects_invalid_structure(self, temp_data_file):
+        """Teste: estrutura inválida sem journal levanta erro."""
         temp_data_file.write_text('"not a dict"')
 
-        data = load_data()
-
-        assert data == {}
+        with pytest.raises(CorruptedFileError):
+            load_data()
 
 
 class TestSaveData:
@@ -264,3 +292,336 @@ class TestUpdateVideoTime:
 
         assert total_seconds == total_expected
         assert total_sessions == 50  # 5 usuários * 10 iterações
+
+
+class TestApplySessionDeltas:
+    """Testes para aplicação de sessões em lote."""
+
+    def test_apply_session_deltas_upserts_batch(self, temp_data_file, sample_data):
+        """Teste: lote soma durações e sessões como update_video_time."""
+        temp_data_file.write_text(json.dumps(sample_data))
+
+        applied = apply_session_deltas([
+            ("123456789012345678", 100, None),
+            ("123456789012345678", 200, None),
+            ("222222222222222222", 50, None),
+        ])
+
+        data = load_data()
+        assert applied == 3
+        assert data["123456789012345678"] == {"total_seconds": 3900, "sessions": 7}
+        assert data["222222222222222222"] == {"total_seconds": 50, "sessions": 1}
+
+    def test_apply_session_deltas_rejects_negative(self, temp_data_file):
+        """Teste: lote com duração negativa é rejeitado por inteiro."""
+        with pytest.raises(ValueError):
+            apply_session_deltas([("123456789012345678", -1, None)])
+
+        assert load_data() == {}
+
+
+class TestSnapshotReads:
+    """Testes para leituras sem lock sobre snapshots publicados atomicamente."""
+
+    def test_read_does_not_wait_for_writer_lock(self, temp_data_file, sample_data):
+        """Teste: leitura não espera um escritor segurando o lock."""
+        from database_lock import writer_lock
+
+        save_data(sample_data)
+        with writer_lock(str(temp_data_file)):
+            start = time.perf_counter()
+            data = load_data()
+            elapsed = time.perf_counter() - start
+
+        assert data == sample_data
+        assert elapsed < 0.1
+
+    def test_update_publishes_new_file(self, temp_data_file, sample_data):
+        """Teste: atualização publica um arquivo novo em vez de truncar o atual."""
+        save_data(sample_data)
+        with open(temp_data_file, 'r', encoding='utf-8') as old_snapshot:
+            update_video_time("123456789012345678", 60)
+
+            # Quem abriu antes continua lendo o snapshot antigo inteiro
+            assert json.load(old_snapshot) == sample_data
+
+        assert load_data()["123456789012345678"]["total_seconds"] == 3660
+
+
+class TestStreamingReads:
+    """Testes para a leitura em blocos do snapshot."""
+
+    @pytest.mark.parametrize("chunk_size", [1, 7, 1 << 16])
+    def test_iter_json_object_matches_json_load(self, temp_data_file, sample_data, chunk_size):
+        """Teste: leitura em blocos de qualquer tamanho equivale ao json.load."""
+        from database_lock import iter_json_object
+
+        save_data(sample_data)
+        items = list(iter_json_object(str(temp_data_file), chunk_size=chunk_size))
+
+        assert dict(items) == sample_data
+
+    def test_iter_json_object_empty_and_missing(self, temp_data_file, tmp_path):
+        """Teste: objeto vazio e arquivo inexistente não produzem itens."""
+        from database_lock import iter_json_object
+
+        assert list(iter_json_object(str(temp_data_file))) == []
+        assert list(iter_json_object(str(tmp_path / "nao-existe.json"))) == []
+
+    def test_iter_json_object_rejects_truncated_file(self, temp_data_file):
+        """Teste: arquivo truncado levanta erro em vez de encerrar em silêncio."""
+        from database_lock import iter_json_object
+
+        temp_data_file.write_text('{"123": {"total_seconds": 1, "sessions": 1}, "456": {"tot')
+
+        with pytest.raises(json.JSONDecodeError):
+            list(iter_json_object(str(temp_data_file), chunk_size=8))
+
+    def test_iter_data_keeps_snapshot_during_writes(self, temp_data_file, sample_data):
+        """Teste: iteração em andamento não enxerga publicações posteriores."""
+        from database import iter_data
+
+        save_data(sample_data)
+        rows = iter_data()
+        first = next(rows)
+        update_video_time("555555555555555555", 10)
+
+        remaining = dict(rows)
+        assert "555555555555555555" not in remaining
+        assert len(remaining) + 1 == len(sample_data)
+        assert first[0] in sample_data
+
+
+class TestDurability:
+    """Testes para os modos de durabilidade (fsync)."""
+
+    def test_none_mode_never_fsyncs(self, temp_data_file, monkeypatch):
+        """Teste: modo none não chama fsync."""
+        import database
+        monkeypatch.setattr(database, "DURABILITY_MODE", "none")
+
+        with patch('database_lock.os.fsync') as mock_fsync:
+            update_video_time("123456789012345678", 60)
+
+        mock_fsync.assert_not_called()
+
+    def test_strict_mode_fsyncs_file_and_directory(self, temp_data_file, monkeypatch):
+        """Teste: modo strict sincroniza arquivo, journal e diretório a cada escrita."""
+        import database
+        monkeypatch.setattr(database, "DURABILITY_MODE", "strict")
+        update_video_time("123456789012345678", 30)  # inicia o journal
+
+        with patch('database_lock.os.fsync') as mock_fsync:
+            update_video_time("123456789012345678", 60)
+
+        assert mock_fsync.call_count == 3
+        assert load_data()["123456789012345678"]["total_seconds"] == 90
+
+    def test_batch_costs_one_fsync_per_partition(self, temp_data_file, monkeypatch):
+        """Teste: um lote inteiro custa os fsyncs de uma única escrita."""
+        import database
+        monkeypatch.setattr(database, "DURABILITY_MODE", "group-commit")
+        apply_session_deltas([("123456789012345678", 10, None)])  # inicia o journal
+
+        with patch('database_lock.os.fsync') as mock_fsync:
+            apply_session_deltas([("123456789012345678", 10, None)] * 50)
+
+        assert mock_fsync.call_count == 3
+
+
+class TestAdminOperations:
+    """Testes para operações administrativas (reset/ajuste/mescla)."""
+
+    def test_reset_all_data_archives_current_file(self, temp_data_file, sample_data):
+        """Teste: reset arquiva o arquivo atual e publica um vazio."""
+        temp_data_file.write_text(json.dumps(sample_data))
+
+        archive_path = reset_all_data()
+
+        try:
+            assert load_data() == {}
+            assert json.loads(archive_path.read_text()) == sample_data
+        finally:
+            archive_path.unlink()
+
+    def test_reset_user_removes_only_that_user(self, temp_data_file, sample_data):
+        """Teste: reset de usuário remove apenas o registro dele."""
+        temp_data_file.write_text(json.dumps(sample_data))
+
+        removed = reset_user("123456789012345678")
+
+        data = load_data()
+        assert removed == {"total_seconds": 3600, "sessions": 5}
+        assert "123456789012345678" not in data
+        assert len(data) == 2
+
+    def test_reset_user_missing_returns_none(self, temp_data_file):
+        """Teste: reset de usuário inexistente retorna None."""
+        assert reset_user("123456789012345678") is None
+
+    def test_apply_adjustments_batch(self, temp_data_file, sample_data):
+        """Teste: ajustes em lote são aplicados juntos e nunca ficam negativos."""
+        temp_data_file.write_text(json.dumps(sample_data))
+
+        result = apply_adjustments({
+            "123456789012345678": 600,
+            "111111111111111111": -5000,
+            "222222222222222222": 100,
+        })
+
+        data = load_data()
+        assert data["123456789012345678"]["total_seconds"] == 4200
+        assert data["111111111111111111"]["total_seconds"] == 0
+        assert data["222222222222222222"] == {"total_seconds": 100, "sessions": 0}
+        assert result["123456789012345678"]["total_seconds"] == 4200
+
+    def test_merge_users_sums_and_removes_source(self, temp_data_file, sample_data):
+        """Teste: mescla soma tempo e sessões e remove a origem."""
+        temp_data_file.write_text(json.dumps(sample_data))
+
+        merged = merge_users("111111111111111111", "123456789012345678")
+
+        data = load_data()
+        assert merged == {"total_seconds": 5400, "sessions": 8}
+        assert "111111111111111111" not in data
+        assert data["123456789012345678"] == merged
+
+    def test_merge_users_rejects_same_user(self, temp_data_file):
+        """Teste: mescla rejeita origem igual ao destino."""
+        with pytest.raises(ValueError):
+            merge_users("123456789012345678", "123456789012345678")
+
+    def test_mutations_bump_data_version(self, temp_data_file):
+        """Teste: toda mutação incrementa a versão dos dados."""
+        version = get_data_version()
+
+        update_video_time("123456789012345678", 10)
+        apply_adjustments({"123456789012345678": 5})
+        reset_user("123456789012345678")
+
+        assert get_data_version() == version + 3
+
+
+class TestGuildPartitions:
+    """Testes para particionamento de dados por guild (sharding)."""
+
+    @pytest.fixture
+    def partitioned(self, temp_data_file, monkeypatch):
+        """Ativa PARTITION_BY_GUILD e remove as partições ao final."""
+        import database
+        monkeypatch.setattr(database, "PARTITION_BY_GUILD", True)
+        yield temp_data_file
+        for partition in temp_data_file.parent.glob(
+            f"{temp_data_file.stem}.guild-*{temp_data_file.suffix}"
+        ):
+            partition.unlink()
+
+    def test_data_file_for_without_partitioning(self, temp_data_file):
+        """Teste: sem particionamento todos os guilds usam o arquivo global."""
+        assert data_file_for(111) == temp_data_file
+        assert data_file_for(None) == temp_data_file
+
+    def test_updates_go_to_guild_partition(self, partitioned):
+        """Teste: cada guild grava no próprio arquivo."""
+        update_video_time("123456789012345678", 100, guild_id=1)
+        update_video_time("123456789012345678", 50, guild_id=2)
+
+        assert data_file_for(1) != data_file_for(2)
+        assert load_data(1)["123456789012345678"]["total_seconds"] == 100
+        assert load_data(2)["123456789012345678"]["total_seconds"] == 50
+        assert load_data() == {}
+
+    def test_load_aggregated_data_sums_partitions(self, partitioned):
+        """Teste: agregação soma o usuário em todas as partições."""
+        update_video_time("123456789012345678", 100, guild_id=1)
+        update_video_time("123456789012345678", 50, guild_id=2)
+        update_video_time("987654321098765432", 10, guild_id=2)
+
+        aggregated = load_aggregated_data()
+
+        assert aggregated["123456789012345678"] == {"total_seconds": 150, "sessions": 2}
+        assert aggregated["987654321098765432"] == {"total_seconds": 10, "sessions": 1}
+
+
+class TestIdempotentSessions:
+    """Testes para a aplicação idempotente de sessões com id."""
+
+    def test_same_session_is_applied_once(self, temp_data_file):
+        """Teste: regravar a mesma sessão (ou uma anterior da origem) não soma de novo."""
+        update_video_time("123456789012345678", 100, session_id=("p1", 10))
+        update_video_time("123456789012345678", 100, session_id=("p1", 10))
+        update_video_time("123456789012345678", 50, session_id=("p1", 9))
+
+        entry = load_data()["123456789012345678"]
+        assert (entry["total_seconds"], entry["sessions"]) == (100, 1)
+
+    def test_other_origins_always_apply(self, temp_data_file):
+        """Teste: processo reiniciado ou outro processo do cluster nunca é descartado."""
+        update_video_time("123456789012345678", 100, session_id=("before", 500))
+        update_video_time("123456789012345678", 30, session_id=("after", 1))
+        update_video_time("123456789012345678", 20, session_id=("other", 1))
+
+        entry = load_data()["123456789012345678"]
+        assert (entry["total_seconds"], entry["sessions"]) == (150, 3)
+        assert entry["applied"] == {"before": 500, "after": 1, "other": 1}
+
+    def test_applied_origins_are_bounded(self, temp_data_file, monkeypatch):
+        """Teste: só as origens mais recentes são lembradas por usuário."""
+        import database
+        monkeypatch.setattr(database, "APPLIED_ORIGINS_KEPT", 2)
+        for origin in ("a", "b", "c"):
+            update_video_time("123456789012345678", 10, session_id=(origin, 1))
+
+        assert list(load_data()["123456789012345678"]["applied"]) == ["b", "c"]
+
+    def test_legacy_wall_clock_version_is_dropped(self, temp_data_file):
+        """Teste: a versão antiga (relógio de parede) não descarta sessões."""
+        save_data({"123456789012345678": {"total_seconds": 10, "sessions": 1, "version": 9999999999999}})
+        update_video_time("123456789012345678", 5, session_id=("p1", 1))
+
+        assert load_data()["123456789012345678"] == {
+            "total_seconds": 15, "sessions": 2, "applied": {"p1": 1}
+        }
+
+    def test_merge_does_not_drop_queued_target_sessions(self, temp_data_file):
+        """Teste: sessão do destino ainda na fila, com contador menor, conta após a mescla."""
+        update_video_time("111111111111111111", 10, session_id=("p1", 5))
+        update_video_time("222222222222222222", 10, session_id=("p1", 1))
+        merge_users("111111111111111111", "222222222222222222")
+
+        # Sessão do destino fechada antes (n=3) e entregue só agora
+        assert apply_session_deltas([("222222222222222222", 30, None, ("p1", 3))]) == 1
+
+        entry = load_data()["222222222222222222"]
+        assert (entry["total_seconds"], entry["sessions"]) == (50, 3)
+
+    def test_retried_batch_is_not_double_applied(self, temp_data_file):
+        """Teste: lote reaplicado só soma as sessões ainda não gravadas."""
+        batch = [
+            ("123456789012345678", 60, None, ("p1", 1)),
+            ("123456789012345678", 30, None, ("p1", 2)),
+            ("987654321098765432", 10, None, ("p1", 5)),
+        ]
+        assert apply_session_deltas(batch[:1]) == 1
+        assert apply_session_deltas(batch) == 2
+        assert apply_session_deltas(batch) == 0
+
+        data = load_data()
+        assert (data["123456789012345678"]["total_seconds"], data["123456789012345678"]["sessions"]) == (90, 2)
+        assert data["987654321098765432"]["total_seconds"] == 10
+
+    def test_skipped_sessions_stay_out_of_stats(self, temp_data_file):
+        """Teste: sessões ignoradas não entram nas estatísticas do guild."""
+        from database import guild_stats_summary
+        batch = [("123456789012345678", 60, None, ("p1", 1))]
+        apply_session_deltas(batch)
+        apply_session_deltas(batch)
+
+        summary = guild_stats_summary()
+        assert (summary["sessions"], summary["total_seconds"]) == (1, 60)
+
+    def test_sessions_without_id_always_apply(self, temp_data_file):
+        """Teste: deltas sem id de sessão mantêm a semântica de upsert."""
+        apply_session_deltas([("123456789012345678", 60, None)] * 2)
+
+        assert load_data()["123456789012345678"] == {"total_seconds": 120, "sessions": 2}
@@ -0,0 +1,155 @@
+"""Tests para event_trace.py - gravação e replay dos eventos de voz"""
+import time
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import event_trace
+from database import load_data
+from event_trace import VIDEO, TraceRecorder, encode_event, iter_trace, replay, trace_files
+from events import active_video_sessions, on_voice_state_update, pending_closes
+
+
+@pytest.fixture(autouse=True)
+def clear_sessions():
+    """Limpa sessões e fechamentos pendentes antes e depois de cada teste"""
+    active_video_sessions.clear()
+    pending_closes.drain()
+    yield
+    active_video_sessions.clear()
+    pending_closes.drain()
+
+
+def _write_trace(path, toggles, wall=1_700_000_000.0):
+    """Trace sintético: toggles = [(segundos, user_id, ligou)]"""
+    with open(path, "w", encoding="utf-8") as f:
+        for offset, user_id, on in toggles:
+            before, after = (0, VIDEO) if on else (VIDEO, 0)
+            f.write(encode_event((100.0 + offset, wall + offset, None, user_id, 7, 7, before, after)) + "\n")
+
+
+def test_recorder_rotates_and_keeps_order(tmp_path):
+    """Teste: o trace rotaciona por tamanho e é lido em ordem cronológica"""
+    path = tmp_path / "voice.trace.jsonl"
+    recorder = TraceRecorder(str(path), max_bytes=300, backups=10)
+    on, off = MagicMock(self_video=False, channel=None), MagicMock(self_video=True, channel=None)
+    for index in range(20):
+        recorder.record(float(index), datetime.fromtimestamp(1_700_000_000 + index), 5, 1000 + index, on, off)
+    recorder.close()
+
+    assert recorder.rotations > 0
+    assert trace_files(str(path))[-1] == path
+    events = list(iter_trace(str(path)))
+    assert [event[3] for event in events] == [1000 + index for index in range(20)]
+    assert events[0][6:] == (0, VIDEO)
+
+
+def test_truncated_line_is_skipped(tmp_path):
+    """Teste: uma última linha cortada (processo interrompido) é ignorada"""
+    path = tmp_path / "voice.trace.jsonl"
+    _write_trace(path, [(0, 1, True), (5, 1, False)])
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"t": 12.0, "w"')
+
+    assert len(list(iter_trace(str(path)))) == 2
+
+
+@pytest.mark.asyncio
+async def test_handler_records_transitions(tmp_path):
+    """Teste: o handler de voz enfileira cada transição no gravador"""
+    path = tmp_path / "voice.trace.jsonl"
+    recorder = TraceRecorder(str(path))
+    member = MagicMock(id=42, display_name="x", guild=MagicMock(id=9, shard_id=None))
+
+    with patch('events.get_trace_recorder', return_value=recorder):
+        await on_voice_state_update(member, MagicMock(self_video=False), MagicMock(self_video=True))
+    recorder.close()
+
+    (event,) = list(iter_trace(str(path)))
+    assert event[2:4] == (9, 42)
+    assert event[6:] == (0, VIDEO)
+
+
+@pytest.mark.asyncio
+async def test_replay_rebuilds_totals_at_max_speed(tmp_path, temp_data_file):
+    """Teste: replay na velocidade máxima gera as durações gravadas"""
+    path = tmp_path / "voice.trace.jsonl"
+    _write_trace(path, [(0, 1, True), (0, 2, True), (600, 1, False), (3600, 1, True), (3900, 1, False), (7200, 2, False)])
+
+    start = time.monotonic()
+    stats = await replay(str(path), speed=0)
+
+    assert time.monotonic() - start < 5
+    assert stats.events == 6
+    assert stats.trace_seconds == 7200
+    data = load_data()
+    assert (data["1"]["total_seconds"], data["1"]["sessions"]) == (900, 2)
+    assert data["2"]["total_seconds"] == 7200
+
+
+@pytest.mark.asyncio
+async def test_replay_applies_grace_window_in_trace_time(tmp_path, temp_data_file, monkeypatch):
+    """Teste: a coalescência usa o tempo do trace, não o do replay"""
+    monkeypatch.setattr('events.CAMERA_GRACE_SECONDS', 30)
+    path = tmp_path / "voice.trace.jsonl"
+    # Usuário 1 oscila dentro da janela (uma sessão); usuário 2 religa depois dela (duas)
+    _write_trace(path, [
+        (0, 1, True), (100, 1, False), (110, 1, True), (200, 1, False),
+        (1000, 2, True), (1100, 2, False), (1400, 2, True), (1500, 2, False),
+    ])
+
+    await replay(str(path), speed=0)
+
+    data = load_data()
+    assert (data["1"]["total_seconds"], data["1"]["sessions"]) == (190, 1)
+    assert (data["2"]["total_seconds"], data["2"]["sessions"]) == (200, 2)
+    assert len(pending_closes) == 0
+
+
+@pytest.mark.asyncio
+async def test_replay_at_recorded_speed_paces_events(tmp_path):
+    """Teste: em 1x os eventos respeitam os intervalos gravados; o replay não grava a si mesmo"""
+    path = tmp_path / "voice.trace.jsonl"
+    _write_trace(path, [(0, 1, True), (0.2, 3, True)])
+    calls = []
+
+    async def handler(member, before, after):
+        calls.append((time.monotonic(), member.id, after.self_video, event_trace.get_trace_recorder()))
+
+    with patch('event_trace.EVENT_TRACE_FILE', str(tmp_path / "other.jsonl")):
+        await replay(str(path), speed=1.0, handler=handler)
+
+    assert [call[1] for call in calls] == [1, 3]
+    assert calls[1][0] - calls[0][0] >= 0.19
+    assert all(call[3] is None for call in calls)
+
+
+@pytest.mark.asyncio
+async def test_replay_writes_only_to_explicit_targets(tmp_path, temp_data_file, monkeypatch):
+    """Teste: replay ignora storage_service/group commit e só grava histórico e mapa de calor pedidos"""
+    import heatmap
+    import session_history
+    monkeypatch.setattr(session_history, "HISTORY_DIR", tmp_path / "live_history")
+    monkeypatch.setattr(heatmap, "HEATMAP_DIR", tmp_path / "live_heatmaps")
+    client = MagicMock()
+    path = tmp_path / "voice.trace.jsonl"
+    _write_trace(path, [(0, 1, True), (60, 1, False)])
+
+    with patch('events.get_storage_client', return_value=client):
+        await replay(str(path), speed=0, history_dir=tmp_path / "rebuilt_history")
+
+    client.record_session.assert_not_called()
+    assert load_data()["1"]["total_seconds"] == 60
+    assert list((tmp_path / "rebuilt_history").rglob("*.jsonl"))
+    assert not (tmp_path / "live_history").exists()
+    assert not (tmp_path / "live_heatmaps").exists()
+    assert session_history.HISTORY_DIR == tmp_path / "live_history"
+
+
+def test_cli_refuses_live_data_file(tmp_path, temp_data_file):
+    """Teste: a CLI não reconstrói sobre o arquivo de dados configurado"""
+    with pytest.raises(SystemExit):
+        event_trace.main([str(tmp_path / "voice.trace.jsonl"), "--data-file", str(temp_data_file)])
+    with pytest.raises(SystemExit):
+        event_trace.main([str(tmp_path / "voice.trace.jsonl")])
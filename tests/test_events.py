@@ -4,7 +4,13 @@ from datetime import datetime
 from unittest.mock import AsyncMock, MagicMock, patch
 import discord
 
-from events import on_voice_state_update, active_video_sessions
+from events import (
+    on_voice_state_update,
+    active_video_sessions,
+    get_session_manager,
+    pending_closes,
+    flush_pending_closes,
+)
 
 
 @pytest.fixture
@@ -85,3 +91,263 @@ async def test_camera_off_removes_session(mock_member, mock_voice_states):
 
         # Verificar que sessão foi removida usando has_session
         assert not active_video_sessions.has_session(user_id)
+
+
+@pytest.mark.asyncio
+async def test_sessions_are_shard_local(mock_member, mock_voice_states):
+    """Teste: sessões ficam no gerenciador do shard do guild"""
+    before, after = mock_voice_states
+    before.self_video = False
+    after.self_video = True
+    mock_member.guild = MagicMock(spec=discord.Guild)
+    mock_member.guild.shard_id = 3
+
+    await on_voice_state_update(mock_member, before, after)
+
+    shard_sessions = get_session_manager(3)
+    try:
+        assert shard_sessions is not active_video_sessions
+        assert shard_sessions.has_session(str(mock_member.id))
+        assert not active_video_sessions.has_session(str(mock_member.id))
+    finally:
+        shard_sessions.clear()
+
+
+def test_unsharded_bot_uses_global_manager():
+    """Teste: shard 0 (bot sem sharding) usa o gerenciador global"""
+    assert get_session_manager(0) is active_video_sessions
+    assert get_session_manager(None) is active_video_sessions
+
+
+@pytest.fixture
+def grace_window(monkeypatch):
+    """Ativa a janela de coalescência e limpa fechamentos pendentes"""
+    monkeypatch.setattr('events.CAMERA_GRACE_SECONDS', 30)
+    pending_closes.drain()
+    yield
+    pending_closes.drain()
+
+
+@pytest.mark.asyncio
+async def test_camera_flap_resumes_same_session(mock_member, grace_window):
+    """Teste: desligar e religar no mesmo canal dentro da janela retoma a sessão"""
+    channel = MagicMock(id=10)
+    on_before, on_after = MagicMock(self_video=False, channel=channel), MagicMock(self_video=True, channel=channel)
+    off_before, off_after = MagicMock(self_video=True, channel=channel), MagicMock(self_video=False, channel=channel)
+    user_id = str(mock_member.id)
+
+    with patch('events.update_video_time') as mock_update:
+        await on_voice_state_update(mock_member, on_before, on_after)
+        started = active_video_sessions.sessions[user_id]
+        await on_voice_state_update(mock_member, off_before, off_after)
+        assert user_id in pending_closes
+
+        await on_voice_state_update(mock_member, on_before, on_after)
+
+        mock_update.assert_not_called()
+        assert user_id not in pending_closes
+        assert active_video_sessions.sessions[user_id] == started
+
+
+@pytest.mark.asyncio
+async def test_camera_on_elsewhere_persists_pending_close(grace_window):
+    """Teste: religar em outro guild grava a sessão pendente no guild original"""
+    member_1 = MagicMock(id=5, display_name="x", guild=MagicMock(id=1, shard_id=None))
+    member_2 = MagicMock(id=5, display_name="x", guild=MagicMock(id=2, shard_id=None))
+
+    with patch('events.update_video_time') as mock_update:
+        await on_voice_state_update(member_1, MagicMock(self_video=False), MagicMock(self_video=True, channel=MagicMock(id=10)))
+        await on_voice_state_update(member_1, MagicMock(self_video=True, channel=MagicMock(id=10)), MagicMock(self_video=False))
+        await on_voice_state_update(member_2, MagicMock(self_video=False), MagicMock(self_video=True, channel=MagicMock(id=20)))
+
+        mock_update.assert_called_once()
+        assert mock_update.call_args.kwargs["guild_id"] == 1
+        assert "5" not in pending_closes
+        assert active_video_sessions.has_session("5")
+
+
+@pytest.mark.asyncio
+async def test_pending_close_is_persisted_once(mock_member, grace_window):
+    """Teste: sessão desligada é gravada uma vez ao encerrar a janela"""
+    off_before, off_after = MagicMock(self_video=True), MagicMock(self_video=False)
+    user_id = str(mock_member.id)
+    await active_video_sessions.start_session(user_id, datetime.now())
+
+    with patch('events.update_video_time') as mock_update:
+        await on_voice_state_update(mock_member, off_before, off_after)
+        mock_update.assert_not_called()
+
+        assert flush_pending_closes() == 1
+
+        mock_update.assert_called_once()
+        assert mock_update.call_args[0][0] == user_id
+
+
+@pytest.mark.asyncio
+async def test_camera_off_appends_session_history(mock_member, mock_voice_states):
+    """Teste: sessão encerrada é gravada no histórico com canal e horários"""
+    from session_history import query_sessions
+
+    mock_member.guild.id = 42
+    before, after = mock_voice_states
+    before.self_video = True
+    before.channel.id = 777
+    after.self_video = False
+    start = datetime(2024, 5, 14, 14, 0, 0)
+    await active_video_sessions.start_session(str(mock_member.id), start)
+
+    with patch('events.update_video_time'):
+        await on_voice_state_update(mock_member, before, after)
+
+    sessions = query_sessions(42, start.timestamp(), datetime.now().timestamp() + 1)
+    assert len(sessions) == 1
+    assert sessions[0].user_id == str(mock_member.id)
+    assert sessions[0].channel_id == 777
+    assert sessions[0].start == int(start.timestamp())
+
+
+@pytest.mark.asyncio
+async def test_batched_mode_sends_history_with_delta(mock_member, mock_voice_states):
+    """Teste: com group commit histórico e mapa de calor vão no delta, não no event loop"""
+    mock_member.guild.id = 42
+    before, after = mock_voice_states
+    before.self_video = True
+    before.channel.id = 777
+    after.self_video = False
+    start = datetime(2024, 5, 14, 14, 0, 0)
+    await active_video_sessions.start_session(str(mock_member.id), start)
+    committer = MagicMock()
+
+    with patch('events.get_group_committer', return_value=committer), \
+            patch('events.append_session') as mock_append, \
+            patch('events.heatmap.record_session') as mock_heatmap:
+        await on_voice_state_update(mock_member, before, after)
+
+    mock_append.assert_not_called()
+    mock_heatmap.assert_not_called()
+    channel_id, session_start, _ = committer.record_session.call_args[0][4]
+    assert (channel_id, session_start) == (777, start.timestamp())
+
+
+@pytest.mark.asyncio
+async def test_duration_uses_monotonic_clock(mock_member, mock_voice_states):
+    """Teste: um ajuste do relógio de parede não altera a duração gravada"""
+    import time
+    from datetime import timedelta
+
+    before, after = mock_voice_states
+    before.self_video = True
+    after.self_video = False
+    user_id = str(mock_member.id)
+    # Relógio de parede adiantou 5h (NTP) durante uma sessão de 30s
+    await active_video_sessions.start_session(
+        user_id, datetime.now() - timedelta(hours=5), time.monotonic() - 30
+    )
+
+    with patch('events.update_video_time') as mock_update:
+        await on_voice_state_update(mock_member, before, after)
+
+    assert mock_update.call_args[0][1] == 30
+
+
+@pytest.mark.asyncio
+async def test_session_uses_gateway_receive_time(mock_member):
+    """Teste: handler atrasado usa o instante de recebimento do evento"""
+    import asyncio
+    import time
+    from events import dispatch_delay, install_receive_clock
+
+    before, after = MagicMock(self_video=False), MagicMock(self_video=True)
+    tasks = []
+    bot = MagicMock()
+    # Parser do discord.py: cria a task do listener durante o parse
+    bot._connection.parsers = {
+        "VOICE_STATE_UPDATE": lambda data: tasks.append(
+            asyncio.create_task(on_voice_state_update(mock_member, before, after))
+        )
+    }
+    assert install_receive_clock(bot)
+    assert install_receive_clock(bot)  # idempotente
+
+    received = time.monotonic()
+    bot._connection.parsers["VOICE_STATE_UPDATE"]({})
+    time.sleep(0.05)  # loop ocupado antes de o handler rodar
+    await tasks[0]
+
+    start = await active_video_sessions.pop_session(str(mock_member.id))
+    assert received <= start.clock < received + 0.05
+    assert dispatch_delay.last >= 0.05
+    assert dispatch_delay.snapshot()["dispatch_delay_ms"] >= 50
+
+
+def _voice_event_bot(mock_member, transitions, tasks):
+    """Bot falso cujo parser cria a task do handler para cada payload"""
+    import asyncio
+    bot = MagicMock()
+    bot._connection._get_websocket.return_value = ws = MagicMock(session_id="sessao-1")
+
+    def parse(data):
+        before, after = transitions[data["t"]]
+        tasks.append(asyncio.create_task(on_voice_state_update(mock_member, before, after)))
+
+    bot._connection.parsers = {"VOICE_STATE_UPDATE": parse}
+    return bot, ws
+
+
+@pytest.mark.asyncio
+async def test_replayed_gateway_events_are_not_double_counted(mock_member):
+    """Teste: replay de ligou/desligou após RESUME não grava a sessão de novo"""
+    from events import install_receive_clock, recent_events
+
+    recent_events.clear()
+    mock_member.guild.id = 42
+    transitions = {
+        "on": (MagicMock(self_video=False), MagicMock(self_video=True)),
+        "off": (MagicMock(self_video=True), MagicMock(self_video=False)),
+    }
+    tasks = []
+    bot, ws = _voice_event_bot(mock_member, transitions, tasks)
+    install_receive_clock(bot)
+    parse = bot._connection.parsers["VOICE_STATE_UPDATE"]
+
+    with patch('events.update_video_time') as mock_update:
+        for seq, kind in [(10, "on"), (11, "off"), (10, "on"), (11, "off")]:
+            ws.sequence = seq
+            parse({"guild_id": "42", "t": kind})
+        for task in tasks:
+            await task
+
+    assert len(tasks) == 2
+    assert recent_events.duplicates == 2
+    mock_update.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_duplicate_camera_on_keeps_original_start(mock_member):
+    """Teste: "ligou" repetido com sessão ativa não reinicia a sessão"""
+    user_id = str(mock_member.id)
+    on_before, on_after = MagicMock(self_video=False), MagicMock(self_video=True)
+
+    await on_voice_state_update(mock_member, on_before, on_after)
+    first = active_video_sessions.sessions[user_id]
+    await on_voice_state_update(mock_member, on_before, on_after)
+
+    assert active_video_sessions.sessions[user_id] == first
+
+
+@pytest.mark.asyncio
+async def test_closed_sessions_get_unique_ids(mock_member, mock_voice_states):
+    """Teste: cada sessão encerrada leva um id próprio, sem usar o relógio de parede"""
+    before, after = mock_voice_states
+    before.self_video = True
+    after.self_video = False
+    user_id = str(mock_member.id)
+
+    with patch('events.update_video_time') as mock_update:
+        for _ in range(2):
+            await active_video_sessions.start_session(user_id, datetime.now())
+            await on_voice_state_update(mock_member, before, after)
+
+    first, second = (call.kwargs["session_id"] for call in mock_update.call_args_list)
+    assert first[0] == second[0]
+    assert second[1] > first[1]
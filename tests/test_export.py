@@ -0,0 +1,76 @@
+"""Tests para export.py - exportação em streaming"""
+import csv
+import gzip
+import json
+
+import pytest
+
+import database
+from database import save_data, update_video_time
+from export import export_data, main, write_export
+
+
+def test_export_csv(temp_data_file, sample_data, tmp_path):
+    """Teste: CSV com cabeçalho e uma linha por usuário"""
+    save_data(sample_data)
+    path = export_data(fmt="csv", output=str(tmp_path / "ranking.csv"))
+
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+
+    assert len(rows) == len(sample_data)
+    assert {row["user_id"]: int(row["total_seconds"]) for row in rows} == {
+        user_id: entry["total_seconds"] for user_id, entry in sample_data.items()
+    }
+
+
+def test_export_jsonl_gzip(temp_data_file, sample_data, tmp_path):
+    """Teste: JSONL comprimido com gzip"""
+    save_data(sample_data)
+    path = export_data(fmt="jsonl", compress=True, output=str(tmp_path / "ranking.jsonl.gz"))
+
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f]
+
+    assert {row["user_id"] for row in rows} == set(sample_data)
+    assert all(row["guild_id"] == "" for row in rows)
+
+
+def test_export_all_partitions(temp_data_file, monkeypatch, tmp_path):
+    """Teste: --all inclui o arquivo global e cada partição de guild"""
+    monkeypatch.setattr(database, "PARTITION_BY_GUILD", True)
+    update_video_time("123456789012345678", 60, guild_id=111)
+    update_video_time("123456789012345678", 30, guild_id=222)
+    try:
+        path = export_data(fmt="jsonl", output=str(tmp_path / "all.jsonl"), all_partitions=True)
+        rows = [json.loads(line) for line in open(path, encoding="utf-8")]
+    finally:
+        for guild in (111, 222):
+            database.data_file_for(guild).unlink(missing_ok=True)
+            database.data_file_for(guild).with_name(database.data_file_for(guild).name + ".lock").unlink(missing_ok=True)
+
+    assert sorted((row["guild_id"], row["total_seconds"]) for row in rows) == [(111, 60), (222, 30)]
+
+
+def test_write_export_failure_leaves_no_partial_file(tmp_path):
+    """Teste: falha no meio não publica um arquivo pela metade"""
+    def rows():
+        yield {"guild_id": "", "user_id": "1", "total_seconds": 1, "sessions": 1}
+        raise RuntimeError("falha de leitura")
+
+    target = tmp_path / "ranking.csv"
+    with pytest.raises(RuntimeError):
+        write_export(rows(), target)
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_cli_exports(temp_data_file, sample_data, tmp_path, capsys):
+    """Teste: linha de comando gera o arquivo pedido"""
+    save_data(sample_data)
+    target = tmp_path / "cli.csv"
+
+    main(["--output", str(target)])
+
+    assert target.exists()
+    assert str(target) in capsys.readouterr().out
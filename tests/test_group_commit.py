@@ -0,0 +1,187 @@
+"""Tests para group_commit.py - gravação em lote das sessões"""
+import asyncio
+import threading
+from unittest.mock import patch
+
+import pytest
+
+import database
+from database import load_data
+from group_commit import GroupCommitter
+from session_history import query_sessions
+
+
+@pytest.mark.asyncio
+async def test_sessions_are_written_in_one_batch(temp_data_file):
+    """Teste: várias sessões viram uma única escrita no flush"""
+    committer = GroupCommitter(interval=0.05, max_records=100)
+
+    with patch('group_commit.database.apply_session_deltas') as mock_apply:
+        for _ in range(10):
+            committer.record_session("123456789012345678", 60)
+        assert committer.pending_deltas == 10
+
+        await committer.close()
+
+    mock_apply.assert_called_once()
+    assert len(mock_apply.call_args[0][0]) == 10
+    assert committer.pending_deltas == 0
+    assert committer.last_flush_time is not None
+
+
+@pytest.mark.asyncio
+async def test_full_batch_flushes_before_interval(temp_data_file):
+    """Teste: lote cheio é gravado sem esperar o intervalo"""
+    committer = GroupCommitter(interval=60, max_records=3)
+
+    for _ in range(3):
+        committer.record_session("123456789012345678", 100)
+    await asyncio.sleep(0.05)
+
+    assert committer.pending_deltas == 0
+    assert load_data()["123456789012345678"] == {"total_seconds": 300, "sessions": 3}
+    await committer.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_kept_for_retry():
+    """Teste: falha na escrita devolve o lote ao buffer"""
+    committer = GroupCommitter(interval=60, max_records=100)
+    committer.record_session("123456789012345678", 100)
+
+    with patch('group_commit.database.apply_session_deltas', side_effect=RuntimeError("lock")):
+        await committer.flush()
+
+    assert committer.pending_deltas == 1
+    with patch('group_commit.database.apply_session_deltas') as mock_apply:
+        await committer.close()
+    mock_apply.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_unexpected_error_keeps_batch_and_flush_loop(temp_data_file):
+    """Teste: erro que não é RuntimeError também devolve o lote e o loop segue"""
+    committer = GroupCommitter(interval=0.01, max_records=100)
+
+    with patch('group_commit.database.apply_session_deltas', side_effect=OSError("disk full")):
+        committer.record_session("123456789012345678", 100)
+        await asyncio.sleep(0.05)
+        assert committer.pending_deltas == 1
+        assert not committer._flush_task.done()
+
+    await asyncio.sleep(0.05)
+    assert committer.pending_deltas == 0
+    assert load_data()["123456789012345678"]["total_seconds"] == 100
+    await committer.close()
+
+
+
+@pytest.mark.asyncio
+async def test_close_waits_for_in_flight_batch(temp_data_file):
+    """Teste: lote que falha durante o close() é gravado pelo flush final"""
+    committer = GroupCommitter(interval=60, max_records=1)
+    started = threading.Event()
+    release = threading.Event()
+    write = database.apply_session_deltas
+    calls = []
+
+    def slow_failure(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 1:
+            started.set()
+            release.wait(5)
+            raise OSError("disk full")
+        return write(*args, **kwargs)
+
+    with patch('group_commit.database.apply_session_deltas', side_effect=slow_failure):
+        committer.record_session("123456789012345678", 100)
+        assert await asyncio.to_thread(started.wait, 5)
+        closing = asyncio.create_task(committer.close())
+        await asyncio.sleep(0.05)
+        release.set()
+        await closing
+
+    assert committer.pending_deltas == 0
+    assert load_data()["123456789012345678"]["total_seconds"] == 100
+
+def test_record_without_event_loop_writes_immediately(temp_data_file):
+    """Teste: fora de um event loop a sessão é gravada na hora"""
+    committer = GroupCommitter()
+    committer.record_session("123456789012345678", 42)
+
+    assert committer.pending_deltas == 0
+    assert load_data()["123456789012345678"]["total_seconds"] == 42
+
+
+@pytest.mark.asyncio
+async def test_partially_written_batch_retry_is_idempotent(temp_data_file):
+    """Teste: lote gravado em parte e repetido não conta sessões duas vezes"""
+    import database
+    committer = GroupCommitter(interval=60, max_records=100)
+    committer.record_session("123456789012345678", 100, None, ("a1", 1), (7, 1_700_000_000, 1_700_000_100))
+    committer.record_session("987654321098765432", 50, None, ("a1", 2), (7, 1_700_000_000, 1_700_000_050))
+
+    real_apply = database.apply_session_deltas
+
+    def apply_then_fail(batch, **kwargs):
+        real_apply(batch[:1], **kwargs)  # primeira partição gravada antes da falha
+        raise RuntimeError("lock")
+
+    with patch('group_commit.database.apply_session_deltas', side_effect=apply_then_fail):
+        await committer.flush()
+    assert committer.pending_deltas == 2
+
+    await committer.close()
+
+    data = load_data()
+    assert data["123456789012345678"]["total_seconds"] == 100
+    assert data["123456789012345678"]["sessions"] == 1
+    assert data["987654321098765432"]["total_seconds"] == 50
+    # Histórico gravado uma vez por sessão, mesmo com o lote repetido
+    sessions = query_sessions(None, 1_700_000_000, 1_700_000_200)
+    assert sorted(record.user_id for record in sessions) == ["123456789012345678", "987654321098765432"]
+
+
+@pytest.mark.asyncio
+async def test_history_is_written_with_the_batch(temp_data_file):
+    """Teste: o histórico segue com o delta e é gravado no flush, não no record"""
+    committer = GroupCommitter(interval=60, max_records=100)
+    committer.record_session("123456789012345678", 100, 42, ("a1", 1), (777, 1_700_000_000, 1_700_000_100))
+
+    with patch('session_history.append_session') as mock_append:
+        assert query_sessions(42, 1_700_000_000, 1_700_000_200) == []
+        await committer.close()
+    mock_append.assert_not_called()
+
+    sessions = query_sessions(42, 1_700_000_000, 1_700_000_200)
+    assert [(record.user_id, record.channel_id, record.start, record.end) for record in sessions] == [
+        ("123456789012345678", 777, 1_700_000_000, 1_700_000_100)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_history_failure_keeps_ranking(temp_data_file):
+    """Teste: falha no histórico é registrada sem devolver o lote"""
+    committer = GroupCommitter(interval=60, max_records=100)
+    committer.record_session("123456789012345678", 100, None, ("a1", 1), (7, 1_700_000_000, 1_700_000_100))
+
+    with patch('group_commit.session_history.append_sessions', side_effect=OSError("disk full")):
+        await committer.close()
+
+    assert committer.pending_deltas == 0
+    assert load_data()["123456789012345678"]["total_seconds"] == 100
+
+
+@pytest.mark.asyncio
+async def test_heatmap_is_updated_once_per_guild_batch(temp_data_file):
+    """Teste: o mapa de calor é somado no flush, uma escrita por guild"""
+    import heatmap
+    committer = GroupCommitter(interval=60, max_records=100)
+    for n in range(3):
+        committer.record_session("123456789012345678", 3600, 42, ("a1", n), (7, 1_700_000_000, 1_700_003_600))
+
+    with patch('heatmap.safe_update_json', wraps=heatmap.safe_update_json) as mock_update:
+        await committer.close()
+
+    assert mock_update.call_count == 1
+    assert sum(heatmap.load_heatmap(42)) == 3 * 3600
@@ -0,0 +1,121 @@
+"""Tests para guild_stats.py - estatísticas incrementais por partição"""
+import json
+import random
+
+import pytest
+
+from database import (
+    apply_session_deltas,
+    guild_stats_summary,
+    merge_users,
+    reset_all_data,
+    reset_user,
+    save_data,
+    update_video_time,
+)
+from guild_stats import (
+    QuantileSketch,
+    histogram_bucket,
+    load_stats,
+    rebuild_stats,
+    stats_file_for,
+)
+
+USER_A = "123456789012345678"
+USER_B = "987654321098765432"
+
+
+def test_sketch_quantiles_within_relative_error():
+    """Teste: quantis do sketch ficam dentro do erro relativo"""
+    rng = random.Random(7)
+    values = sorted(rng.randint(1, 20000) for _ in range(5000))
+    sketch = QuantileSketch(accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+
+    for q in (0.1, 0.5, 0.9, 0.99):
+        exact = values[int(q * (len(values) - 1))]
+        assert sketch.quantile(q) == pytest.approx(exact, rel=0.02)
+    assert len(sketch.bins) < 1000
+
+
+def test_sketch_roundtrip_and_empty():
+    """Teste: sketch serializa e vazio não tem quantil"""
+    sketch = QuantileSketch()
+    assert sketch.quantile(0.5) is None
+    sketch.add(0)
+    sketch.add(100, count=3)
+
+    restored = QuantileSketch.from_dict(json.loads(json.dumps(sketch.to_dict())))
+    assert restored.count == 4
+    assert restored.quantile(0.0) == 0.0
+    assert restored.quantile(0.5) == pytest.approx(100, rel=0.01)
+
+
+def test_histogram_buckets():
+    """Teste: limites das faixas do histograma"""
+    assert histogram_bucket(0) == 0
+    assert histogram_bucket(59) == 0
+    assert histogram_bucket(60) == 1
+    assert histogram_bucket(3600) == 5
+    assert histogram_bucket(10 ** 6) == 7
+
+
+def test_incremental_stats_match_rebuild(temp_data_file):
+    """Teste: escritas mantêm as estatísticas iguais a uma varredura completa"""
+    update_video_time(USER_A, 600)
+    update_video_time(USER_A, 1200)
+    apply_session_deltas([(USER_B, 30, None), (USER_B, 4000, None)])
+
+    summary = guild_stats_summary()
+
+    assert summary["users"] == 2
+    assert summary["sessions"] == 4
+    assert summary["total_seconds"] == 5830
+    assert summary["mean_session"] == pytest.approx(5830 / 4)
+    assert dict(summary["histogram"])["< 1min"] == 1
+    assert dict(summary["histogram"])["1-2h"] == 1
+    assert 500 < summary["median_session"] < 1300
+
+    rebuilt = rebuild_stats(temp_data_file)
+    assert (rebuilt.users, rebuilt.sessions, rebuilt.total_seconds) == (2, 4, 5830)
+
+
+def test_admin_operations_keep_totals(temp_data_file):
+    """Teste: reset/mescla de usuários ajustam os totais"""
+    update_video_time(USER_A, 100)
+    update_video_time(USER_B, 200)
+
+    merge_users(USER_B, USER_A)
+    assert guild_stats_summary()["users"] == 1
+
+    reset_user(USER_A)
+    summary = guild_stats_summary()
+    assert (summary["users"], summary["total_seconds"], summary["sessions"]) == (0, 0, 0)
+
+
+def test_reset_all_data_zeroes_stats(temp_data_file):
+    """Teste: troca de época zera as estatísticas"""
+    update_video_time(USER_A, 100)
+
+    archive_path = reset_all_data()
+    try:
+        assert guild_stats_summary()["sessions"] == 0
+        update_video_time(USER_B, 50)
+        assert guild_stats_summary()["users"] == 1
+    finally:
+        archive_path.unlink()
+
+
+def test_stale_stats_are_rebuilt(temp_data_file):
+    """Teste: estatísticas de outro snapshot (save_data, queda) são reconstruídas"""
+    update_video_time(USER_A, 100)
+    save_data({USER_B: {"total_seconds": 900, "sessions": 3}})
+
+    assert load_stats(temp_data_file).users == 1
+    assert load_stats(temp_data_file).total_seconds == 900
+
+    # A próxima escrita também parte do snapshot correto
+    update_video_time(USER_B, 100)
+    stats = json.loads(stats_file_for(temp_data_file).read_text())
+    assert (stats["users"], stats["total_seconds"], stats["sessions"]) == (1, 1000, 4)
@@ -0,0 +1,104 @@
+"""Tests para health.py - monitor do event loop e endpoint de saúde"""
+import asyncio
+import time
+from unittest.mock import MagicMock, patch
+
+import aiohttp
+import pytest
+
+from health import HealthServer, LoopMonitor, build_health_report
+
+
+def _block_loop(seconds):
+    """Bloqueia o event loop (simula I/O síncrono no loop)"""
+    time.sleep(seconds)
+
+
+@pytest.mark.asyncio
+async def test_loop_monitor_names_blocking_task():
+    """Teste: bloqueio do loop é medido e atribuído à task culpada"""
+    monitor = LoopMonitor(interval=0.02, slow_threshold=0.05)
+    monitor.start()
+    try:
+        await asyncio.sleep(0.05)
+
+        async def culprit():
+            _block_loop(0.2)
+
+        await asyncio.create_task(culprit(), name="culprit-task")
+        await asyncio.sleep(0.05)
+    finally:
+        monitor.stop()
+
+    assert monitor.max_lag >= 0.15
+    slow = monitor.slow_callbacks[-1]
+    assert slow.task == "culprit-task"
+    assert "_block_loop" in slow.location
+
+
+@pytest.mark.asyncio
+async def test_loop_monitor_idle_loop_has_no_slow_callbacks():
+    """Teste: loop ocioso não registra callbacks lentos"""
+    monitor = LoopMonitor(interval=0.01, slow_threshold=0.1)
+    monitor.start()
+    await asyncio.sleep(0.05)
+    monitor.stop()
+
+    assert not monitor.slow_callbacks
+    assert not monitor.stalled
+
+
+def test_health_report_fields():
+    """Teste: relatório traz lag, latência, filas e última gravação"""
+    bot = MagicMock()
+    bot.latency = 0.0423
+    bot.is_ready.return_value = True
+    bot.is_closed.return_value = False
+    monitor = LoopMonitor()
+
+    with patch('health.get_storage_client', return_value=None), \
+         patch('health.get_last_persist_time', return_value=None):
+        report = build_health_report(bot, monitor)
+
+    assert report["status"] == "ok"
+    assert report["ready"] is True
+    assert report["gateway_latency_ms"] == 42.3
+    assert report["pending_deltas"] == 0
+    assert report["last_flush"] is None
+    assert "loop_lag_ms" in report
+
+
+def test_health_report_before_connect_has_no_latency():
+    """Teste: latência infinita (antes do heartbeat) vira None"""
+    bot = MagicMock()
+    bot.latency = float("inf")
+    bot.is_ready.return_value = False
+    bot.is_closed.return_value = False
+
+    with patch('health.get_storage_client', return_value=None):
+        report = build_health_report(bot, LoopMonitor())
+
+    assert report["gateway_latency_ms"] is None
+    assert report["ready"] is False
+
+
+@pytest.mark.asyncio
+async def test_health_server_status_codes():
+    """Teste: /health responde 200 e /ready 503 enquanto o bot não conecta"""
+    report = {"status": "ok", "ready": False}
+    server = HealthServer(lambda: report, port=0)
+    await server.start()
+    try:
+        async with aiohttp.ClientSession() as session:
+            base = f"http://127.0.0.1:{server.port}"
+            async with session.get(f"{base}/health") as response:
+                assert response.status == 200
+                assert (await response.json())["status"] == "ok"
+            async with session.get(f"{base}/ready") as response:
+                assert response.status == 503
+
+            report["status"] = "stalled"
+            async with session.get(f"{base}/health") as response:
+                assert response.status == 503
+    finally:
+        await server.close()
@@ -0,0 +1,78 @@
+"""Tests para heatmap.py - mapa de calor por hora da semana"""
+import calendar
+from array import array
+
+from heatmap import (
+    HOURS_PER_WEEK,
+    add_session,
+    load_heatmap,
+    record_session,
+    render_heatmap,
+)
+
+# Segunda, 13/05/2024 00:00 UTC (índice 0 com deslocamento 0)
+MONDAY = calendar.timegm((2024, 5, 13, 0, 0, 0))
+HOUR = 3600
+
+
+def _empty():
+    return array("q", [0] * HOURS_PER_WEEK)
+
+
+def test_session_inside_one_hour():
+    """Teste: sessão dentro de uma hora cai em um único contador"""
+    counters = _empty()
+    add_session(counters, MONDAY + 14 * HOUR + 600, MONDAY + 14 * HOUR + 1500)
+
+    assert counters[14] == 900
+    assert sum(counters) == 900
+
+
+def test_session_split_across_hour_boundaries():
+    """Teste: frações nas pontas e horas cheias no meio"""
+    counters = _empty()
+    add_session(counters, MONDAY + 13 * HOUR + 3000, MONDAY + 15 * HOUR + 900)
+
+    assert counters[13] == 600
+    assert counters[14] == HOUR
+    assert counters[15] == 900
+
+
+def test_session_wraps_around_week_and_applies_offset():
+    """Teste: domingo 23h -> segunda 01h e fuso deslocando as horas"""
+    counters = _empty()
+    sunday_23h = MONDAY + 6 * 24 * HOUR + 23 * HOUR
+    add_session(counters, sunday_23h, sunday_23h + 2 * HOUR)
+    assert counters[167] == HOUR and counters[0] == HOUR
+
+    counters = _empty()
+    add_session(counters, MONDAY + 12 * HOUR, MONDAY + 13 * HOUR, offset=-3 * HOUR)
+    assert counters[9] == HOUR
+
+
+def test_multi_week_session_is_arithmetic():
+    """Teste: sessão de 3 semanas soma o total sem perder segundos"""
+    counters = _empty()
+    start = MONDAY + 1800
+    end = start + 3 * HOURS_PER_WEEK * HOUR + 5 * HOUR
+
+    add_session(counters, start, end)
+
+    assert sum(counters) == end - start
+    assert counters[100] == 3 * HOUR
+
+
+def test_record_and_render(heatmap_dir):
+    """Teste: contadores gravados por guild e renderizados em 7 linhas"""
+    record_session(42, MONDAY + 14 * HOUR, MONDAY + 15 * HOUR)
+    record_session(42, MONDAY + 14 * HOUR, MONDAY + 14 * HOUR + 1800)
+
+    counters = load_heatmap(42)
+    assert len(counters) == HOURS_PER_WEEK
+    assert sum(counters) == 5400
+    assert load_heatmap(43) == [0] * HOURS_PER_WEEK
+
+    rendered = render_heatmap(counters).splitlines()
+    assert len(rendered) == 9
+    assert rendered[2].startswith("Seg ")
+    assert "█" in rendered[2]
@@ -0,0 +1,106 @@
+"""Tests para importer.py - importação em streaming"""
+import gzip
+import json
+from unittest.mock import patch
+
+import pytest
+
+from database import load_data, save_data
+from importer import checkpoint_path_for, import_file, to_import_record
+
+USER_A = "123456789012345678"
+USER_B = "987654321098765432"
+
+
+def _write_jsonl(path, records, compress=False):
+    lines = "".join(json.dumps(record) + "\n" for record in records)
+    if compress:
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            f.write(lines)
+    else:
+        path.write_text(lines, encoding="utf-8")
+
+
+def test_to_import_record_validates_ids_and_values():
+    """Teste: IDs inválidos e valores negativos são rejeitados"""
+    assert to_import_record({"user_id": USER_A, "total_seconds": 60, "sessions": 2}) == (USER_A, 60, 2, None)
+    assert to_import_record({"user_id": USER_A, "duration": 30}, default_guild=5) == (USER_A, 30, 1, 5)
+    assert to_import_record({"user_id": "123", "total_seconds": 60}) is None
+    assert to_import_record({"user_id": USER_A, "total_seconds": -1}) is None
+    assert to_import_record({"user_id": USER_A}) is None
+    assert to_import_record(["nao", "e", "dict"]) is None
+
+
+def test_import_jsonl_merges_with_existing_data(temp_data_file, tmp_path):
+    """Teste: registros são somados aos dados atuais (upsert)"""
+    save_data({USER_A: {"total_seconds": 100, "sessions": 1}})
+    source = tmp_path / "legado.jsonl"
+    _write_jsonl(source, [
+        {"user_id": USER_A, "total_seconds": 50, "sessions": 2},
+        {"user_id": "invalido", "total_seconds": 10},
+        {"user_id": USER_B, "duration": 30},
+    ])
+
+    progress = import_file(source, batch_size=1)
+
+    assert progress.imported == 2
+    assert progress.skipped == 1
+    data = load_data()
+    assert data[USER_A] == {"total_seconds": 150, "sessions": 3}
+    assert data[USER_B] == {"total_seconds": 30, "sessions": 1}
+
+
+def test_import_json_object_gzip(temp_data_file, tmp_path):
+    """Teste: objeto JSON comprimido (formato do video_ranking.json)"""
+    source = tmp_path / "outro-bot.json.gz"
+    with gzip.open(source, "wt", encoding="utf-8") as f:
+        json.dump({USER_A: {"total_seconds": 70, "sessions": 7}}, f)
+
+    import_file(source)
+
+    assert load_data()[USER_A] == {"total_seconds": 70, "sessions": 7}
+
+
+def test_import_resumes_from_checkpoint(temp_data_file, tmp_path):
+    """Teste: falha no meio retoma sem reaplicar lotes já gravados"""
+    source = tmp_path / "legado.jsonl.gz"
+    _write_jsonl(source, [{"user_id": USER_A, "duration": 10}] * 5, compress=True)
+
+    import database
+    real_merge = database.merge_totals
+    calls = []
+
+    def flaky_merge(batch):
+        calls.append(len(batch))
+        if len(calls) == 2:
+            raise RuntimeError("disco cheio")
+        return real_merge(batch)
+
+    with patch('importer.database.merge_totals', side_effect=flaky_merge):
+        with pytest.raises(RuntimeError):
+            import_file(source, batch_size=2)
+
+    assert load_data()[USER_A]["sessions"] == 2
+    checkpoint = json.loads(checkpoint_path_for(source).read_text())
+    assert checkpoint["imported"] == 2 and not checkpoint["done"]
+
+    progress = import_file(source, batch_size=2)
+
+    assert progress.imported == 5
+    assert load_data()[USER_A] == {"total_seconds": 50, "sessions": 5}
+
+    # Arquivo já concluído não é importado de novo
+    import_file(source, batch_size=2)
+    assert load_data()[USER_A]["sessions"] == 5
+
+
+def test_progress_callback_reports_throughput(temp_data_file, tmp_path):
+    """Teste: progresso reportado a cada lote"""
+    source = tmp_path / "legado.jsonl"
+    _write_jsonl(source, [{"user_id": USER_A, "duration": 1}] * 4)
+    reports = []
+
+    import_file(source, batch_size=2, on_progress=lambda p: reports.append((p.imported, p.rate)))
+
+    assert [imported for imported, _ in reports] == [2, 4, 4]
+    assert all(rate >= 0 for _, rate in reports)
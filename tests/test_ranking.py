@@ -0,0 +1,85 @@
+"""Tests para ranking.py - ranking ordenado, páginas e posições"""
+import time
+from unittest.mock import patch
+
+from ranking import RankingCache, period_totals, ranking_page
+from session_history import DAY_SECONDS, append_session
+
+DATA = {
+    str(100 + i): {"total_seconds": 1000 - (i // 2) * 10, "sessions": 1}
+    for i in range(25)
+}
+
+
+def test_ties_are_ordered_by_user_id():
+    """Teste: empates em total_seconds têm ordem determinística"""
+    cache = RankingCache()
+    _, ranked = cache.get(lambda: DATA)
+
+    assert [user_id for user_id, _ in ranked[:4]] == ["100", "101", "102", "103"]
+
+
+def test_page_by_offset_and_cursor_match():
+    """Teste: a página pelo cursor é a mesma que a página pelo offset"""
+    cache = RankingCache()
+    first = cache.page(lambda: DATA, offset=0, limit=10)
+    last_user, last_entry = first.entries[-1]
+
+    by_offset = cache.page(lambda: DATA, offset=10, limit=10)
+    by_cursor = cache.page(lambda: DATA, after=(-last_entry["total_seconds"], last_user), limit=10)
+
+    assert by_cursor == by_offset
+    assert by_offset.total_users == 25
+    assert len(cache.page(lambda: DATA, offset=20, limit=10).entries) == 5
+
+
+def test_position_uses_sorted_index():
+    """Teste: posição de cada usuário bate com o ranking ordenado"""
+    cache = RankingCache()
+    _, ranked = cache.get(lambda: DATA)
+
+    for index, (user_id, _) in enumerate(ranked):
+        assert cache.position(lambda: DATA, user_id) == index
+    assert cache.position(lambda: DATA, "999") is None
+
+
+def test_ranking_page_for_user_returns_their_page():
+    """Teste: ranking_page com user_id devolve a página que contém o usuário"""
+    with patch('ranking.load_data', return_value=DATA):
+        result = ranking_page(None, 0, 10, user_id="117")
+        beyond = ranking_page(None, 90, 10)
+
+    assert result["position"] == 17
+    assert result["offset"] == 10
+    assert "117" in [user_id for user_id, _ in result["entries"]]
+    assert beyond["offset"] == 20  # além do fim: última página
+
+
+def test_period_ranking_counts_only_recent_days():
+    """Teste: o ranking da semana soma só as sessões dos últimos 7 dias"""
+    now = time.time()
+    append_session("1", 5, None, now - 3 * DAY_SECONDS, now - 3 * DAY_SECONDS + 600)
+    append_session("2", 5, None, now - 20 * DAY_SECONDS, now - 20 * DAY_SECONDS + 9000)
+    append_session("2", 5, None, now - 60, now)
+
+    assert period_totals(5, 7, now) == {
+        "1": {"total_seconds": 600, "sessions": 1},
+        "2": {"total_seconds": 60, "sessions": 1},
+    }
+    week = ranking_page(5, 0, 10, period="semana")
+    month = ranking_page(5, 0, 10, period="mes")
+    assert [user_id for user_id, _ in week["entries"]] == ["1", "2"]
+    assert [user_id for user_id, _ in month["entries"]] == ["2", "1"]
+
+
+def test_period_ranking_is_invalidated_by_new_sessions():
+    """Teste: uma sessão gravada muda a versão e entra no ranking do período"""
+    now = time.time()
+    append_session("1", 5, None, now - 120, now - 60)
+    before = ranking_page(5, 0, 10, period="semana")
+
+    append_session("2", 5, None, now - 600, now)
+    after = ranking_page(5, 0, 10, period="semana")
+
+    assert after["version"] != before["version"]
+    assert [user_id for user_id, _ in after["entries"]] == ["2", "1"]
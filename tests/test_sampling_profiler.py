@@ -0,0 +1,74 @@
+"""Tests para sampling_profiler.py - profiler sob demanda"""
+import asyncio
+import sys
+import time
+
+import pytest
+
+from sampling_profiler import (
+    ProfilerBusyError,
+    StackSampler,
+    collapse_stack,
+    profile_for,
+    snapshot_tasks,
+)
+
+
+def _busy_function(seconds):
+    """Ocupa a thread atual (aparece nas amostras)"""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_collapse_stack_is_root_first():
+    """Teste: pilha collapsed vai da raiz até a função atual"""
+    stack = collapse_stack(sys._getframe())
+
+    leaf = stack.rsplit(";", 1)[-1]
+    assert leaf.startswith("test_collapse_stack_is_root_first (test_sampling_profiler.py:")
+    assert ";" in stack
+
+
+def test_sampler_sees_busy_function():
+    """Teste: função ocupada domina as amostras"""
+    sampler = StackSampler(interval=0.001)
+    sampler.start()
+    _busy_function(0.1)
+    sampler.stop()
+
+    assert sampler.samples > 0
+    frame, _ = sampler.top_frames(1)[0]
+    assert frame.startswith("_busy_function")
+    assert sampler.collapsed().splitlines()[0].rsplit(" ", 1)[1].isdigit()
+
+
+@pytest.mark.asyncio
+async def test_snapshot_lists_pending_tasks():
+    """Teste: snapshot inclui tasks pendentes e seus frames"""
+    async def waiting():
+        await asyncio.sleep(10)
+
+    task = asyncio.create_task(waiting(), name="tarefa-parada")
+    await asyncio.sleep(0)
+    try:
+        snapshot = snapshot_tasks()
+    finally:
+        task.cancel()
+
+    assert "Task tarefa-parada" in snapshot
+    assert "em waiting" in snapshot
+
+
+@pytest.mark.asyncio
+async def test_profile_for_writes_files_and_rejects_overlap(tmp_path):
+    """Teste: perfil grava os arquivos e só um roda por vez"""
+    first = asyncio.create_task(profile_for(0.05, tmp_path, interval=0.001))
+    await asyncio.sleep(0)
+
+    with pytest.raises(ProfilerBusyError):
+        await profile_for(0.01, tmp_path)
+
+    stacks_path, tasks_path, sampler = await first
+    assert stacks_path.exists() and tasks_path.exists()
+    assert "task(s) pendente(s)" in tasks_path.read_text(encoding="utf-8")
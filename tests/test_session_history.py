@@ -0,0 +1,89 @@
+"""Tests para session_history.py - log de sessões e consultas por intervalo"""
+import calendar
+import json
+
+import session_history
+from session_history import (
+    append_session,
+    compact_history,
+    daily_totals,
+    overlap_totals,
+    query_sessions,
+)
+
+GUILD = 123456789012345678
+USER_A = "111111111111111111"
+USER_B = "222222222222222222"
+
+# Terça, 14/05/2024 00:00 UTC
+TUESDAY = calendar.timegm((2024, 5, 14, 0, 0, 0))
+HOUR = 3600
+
+
+def test_append_writes_compact_line_in_start_day_segment(history_dir):
+    """Teste: sessão vai para o segmento do dia em que começou"""
+    record = append_session(USER_A, GUILD, 42, TUESDAY + 23 * HOUR, TUESDAY + 25 * HOUR)
+
+    segment = history_dir / f"guild-{GUILD}" / "2024-05-14.jsonl"
+    assert json.loads(segment.read_text()) == [USER_A, 42, record.start, record.end]
+    assert record.duration == 2 * HOUR
+    assert not (history_dir / f"guild-{GUILD}" / "2024-05-15.jsonl").exists()
+
+
+def test_query_returns_overlapping_sessions_only(history_dir):
+    """Teste: quem estava com a câmera ligada terça das 14h às 15h"""
+    append_session(USER_A, GUILD, 1, TUESDAY + 13 * HOUR, TUESDAY + 14 * HOUR + 1800)
+    append_session(USER_B, GUILD, 1, TUESDAY + 15 * HOUR, TUESDAY + 16 * HOUR)
+    append_session(USER_B, GUILD + 1, 1, TUESDAY + 14 * HOUR, TUESDAY + 15 * HOUR)
+
+    sessions = query_sessions(GUILD, TUESDAY + 14 * HOUR, TUESDAY + 15 * HOUR)
+
+    assert [record.user_id for record in sessions] == [USER_A]
+    assert overlap_totals(GUILD, TUESDAY + 14 * HOUR, TUESDAY + 15 * HOUR) == {USER_A: 1800}
+
+
+def test_query_finds_session_started_on_previous_day(history_dir):
+    """Teste: sessão que atravessa a meia-noite aparece no dia seguinte"""
+    append_session(USER_A, GUILD, 1, TUESDAY - HOUR, TUESDAY + HOUR)
+
+    sessions = query_sessions(GUILD, TUESDAY + 1800, TUESDAY + 2 * HOUR)
+
+    assert len(sessions) == 1
+    assert json.loads((history_dir / f"guild-{GUILD}" / "index.json").read_text()) == {
+        "max_duration": 2 * HOUR
+    }
+
+
+def test_query_skips_torn_lines(history_dir):
+    """Teste: linha incompleta (append interrompido) é ignorada"""
+    append_session(USER_A, GUILD, 1, TUESDAY, TUESDAY + 60)
+    segment = history_dir / f"guild-{GUILD}" / "2024-05-14.jsonl"
+    with open(segment, "a") as f:
+        f.write('["2222')
+
+    assert len(query_sessions(GUILD, TUESDAY, TUESDAY + HOUR)) == 1
+
+
+def test_compact_downsamples_and_expires(history_dir):
+    """Teste: dias antigos viram resumo diário e depois são apagados"""
+    append_session(USER_A, GUILD, 1, TUESDAY, TUESDAY + 60)
+    append_session(USER_A, GUILD, 1, TUESDAY + HOUR, TUESDAY + HOUR + 30)
+    append_session(USER_B, GUILD, 1, TUESDAY - 10 * 86400, TUESDAY - 10 * 86400 + 5)
+    guild_dir = history_dir / f"guild-{GUILD}"
+
+    downsampled, expired = compact_history(now=TUESDAY + 3 * 86400, raw_days=2, retention_days=5)
+
+    assert (downsampled, expired) == (1, 1)
+    assert not (guild_dir / "2024-05-14.jsonl").exists()
+    assert query_sessions(GUILD, TUESDAY, TUESDAY + 86400) == []
+    assert daily_totals(GUILD, TUESDAY, TUESDAY + 86400) == {"2024-05-14": {USER_A: [90, 2]}}
+    assert not list(guild_dir.glob("2024-05-04*"))
+
+
+def test_disabled_history_is_noop(monkeypatch):
+    """Teste: SESSION_HISTORY_DIR vazio desativa o histórico"""
+    monkeypatch.setattr(session_history, "HISTORY_DIR", None)
+
+    assert append_session(USER_A, GUILD, 1, TUESDAY, TUESDAY + 60) is None
+    assert query_sessions(GUILD, TUESDAY, TUESDAY + 60) == []
+    assert compact_history() == (0, 0)
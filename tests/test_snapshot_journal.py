@@ -0,0 +1,79 @@
+"""Tests para snapshot_journal.py - recuperação de arquivos corrompidos"""
+import pytest
+
+import snapshot_journal
+from database_lock import CorruptedFileError, safe_load_json, safe_update_json, verify_json_file
+from snapshot_journal import checkpoint_path, journal_path, list_checkpoints, read_journal, replay_journal
+
+
+def _write_generations(path, count):
+    """Grava ``count`` gerações com journal, uma chave nova por geração"""
+    for index in range(count):
+        safe_update_json(str(path), lambda data, i=index: {**data, str(i): {"total_seconds": i}}, journal=True)
+
+
+def test_corrupted_file_is_restored_from_checkpoint_and_journal(tmp_path):
+    """Teste: checkpoint + tail do journal reconstroem a última geração"""
+    path = tmp_path / "data.json"
+    _write_generations(path, 5)
+    path.write_text('{"0": {"total_sec')
+
+    data = safe_load_json(str(path))
+
+    assert sorted(data) == ["0", "1", "2", "3", "4"]
+    assert data["4"] == {"total_seconds": 4}
+    assert list(tmp_path.glob("data.json.corrupt-*"))
+    assert verify_json_file(str(path))
+
+
+def test_torn_journal_tail_is_ignored(tmp_path):
+    """Teste: um registro cortado no fim do journal não impede a recuperação"""
+    path = tmp_path / "data.json"
+    _write_generations(path, 3)
+    with open(journal_path(str(path)), "a", encoding="utf-8") as f:
+        f.write('deadbeef {"g": 4, "se')
+
+    assert [record["g"] for record in read_journal(str(path))] == [0, 1, 2, 3]
+    path.write_text("")
+    assert sorted(safe_load_json(str(path))) == ["0", "1", "2"]
+
+
+def test_journal_ahead_of_snapshot_rolls_forward(tmp_path):
+    """Teste: queda entre o journal e a publicação reaplica o registro pendente"""
+    path = tmp_path / "data.json"
+    _write_generations(path, 2)
+    digest = snapshot_journal.file_digest(str(path))
+    snapshot_journal.append_record(str(path), {"g": 3, "sha": "0" * 64, "set": {"9": {"total_seconds": 9}}, "del": ["0"]})
+
+    data, base, replayed, base_path, last = replay_journal(str(path))
+    assert (base, replayed, base_path, last) == (2, 1, str(path), 3)
+    assert snapshot_journal.last_record(str(path))["sha"] != digest
+
+    assert not verify_json_file(str(path))
+    assert sorted(safe_load_json(str(path))) == ["1", "9"]
+
+
+def test_checkpoints_are_pruned_and_journal_compacted(tmp_path, monkeypatch):
+    """Teste: só os checkpoints mais recentes ficam; o journal começa no mais antigo"""
+    monkeypatch.setattr(snapshot_journal, "CHECKPOINT_EVERY", 3)
+    path = tmp_path / "data.json"
+    _write_generations(path, 10)
+
+    generations = [generation for generation, _ in list_checkpoints(str(path))]
+    assert generations == [9, 6]
+    assert read_journal(str(path))[0]["g"] == 6
+    assert not (tmp_path / checkpoint_path("data.json", 3)).exists()
+
+    path.write_text("[]")
+    assert len(safe_load_json(str(path))) == 10
+
+
+def test_corruption_without_journal_raises(tmp_path):
+    """Teste: sem journal o arquivo corrompido é preservado e o erro propagado"""
+    path = tmp_path / "data.json"
+    path.write_text("{ invalid")
+
+    with pytest.raises(CorruptedFileError):
+        safe_load_json(str(path))
+    assert safe_load_json(str(path), {"x": 1}, strict=False) == {"x": 1}
+    assert path.read_text() == "{ invalid"
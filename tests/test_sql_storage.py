@@ -0,0 +1,124 @@
+"""Tests para sql_storage.py - backend SQL com pool de conexões (aiosqlite)"""
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+from sql_storage import ConnectionPool, SQLStorage, row_blocks
+
+
+@pytest.fixture
+async def storage(tmp_path):
+    storage = SQLStorage.from_url(f"sqlite:///{tmp_path / 'ranking.db'}", pool_size=2)
+    await storage.init_schema()
+    yield storage
+    await storage.close()
+
+
+def test_row_blocks_use_power_of_two_shapes():
+    """Teste: lotes viram poucos tamanhos de bloco (potências de 2, até 128)"""
+    assert row_blocks(0) == []
+    assert row_blocks(1) == [1]
+    assert row_blocks(300) == [128, 128, 32, 8, 4]
+    assert sum(row_blocks(1000)) == 1000
+
+
+@pytest.mark.asyncio
+async def test_batched_upsert_sums_sessions(storage):
+    """Teste: um lote com usuários repetidos soma tempo e sessões"""
+    deltas = [(str(user), 60, 1) for user in range(200)] + [("0", 40, 1), ("1", 10, 2)]
+
+    assert await storage.apply_session_deltas(deltas) == 202
+    await storage.apply_session_deltas([("0", 100, 1)])
+
+    data = await storage.load_data()
+    assert len(data) == 200
+    assert data["0"] == {"total_seconds": 200, "sessions": 3}
+    assert data["1"] == {"total_seconds": 70, "sessions": 2}
+
+
+@pytest.mark.asyncio
+async def test_resent_deltas_are_idempotent(storage):
+    """Teste: reenviar um lote com ids de sessão não soma de novo"""
+    batch = [("a", 30, None, ("p1", 1)), ("a", 20, None, ("p1", 2)), ("b", 5, None, ("p1", 3))]
+
+    assert await storage.apply_session_deltas(batch) == 3
+    assert await storage.apply_session_deltas(batch) == 0
+    assert await storage.apply_session_deltas([("a", 7, None, ("p2", 1))]) == 1
+
+    data = await storage.load_data()
+    assert data["a"] == {"total_seconds": 57, "sessions": 3}
+    assert data["b"] == {"total_seconds": 5, "sessions": 1}
+
+
+@pytest.mark.asyncio
+async def test_ranking_page_orders_by_total(storage):
+    """Teste: ranking_page ordena por tempo (empate pelo user_id) e pagina"""
+    await storage.merge_totals([("c", 10, 1, None), ("a", 30, 2, None), ("b", 30, 1, None), ("d", 5, 1, None)])
+
+    first = await storage.ranking_page(offset=0, limit=3)
+    second = await storage.ranking_page(offset=3, limit=3)
+
+    assert first["total_users"] == 4
+    assert [user_id for user_id, _ in first["entries"]] == ["a", "b", "c"]
+    assert second["entries"] == [("d", {"total_seconds": 5, "sessions": 1})]
+
+
+@pytest.mark.asyncio
+async def test_negative_duration_rolls_back_batch(storage):
+    """Teste: um delta inválido rejeita o lote inteiro"""
+    with pytest.raises(ValueError):
+        await storage.apply_session_deltas([("a", 10, None), ("b", -1, None)])
+    assert await storage.load_data() == {}
+
+
+@pytest.mark.asyncio
+async def test_pool_reports_saturation():
+    """Teste: com mais tarefas que conexões, o pool limita e mede a espera"""
+    opened = []
+
+    async def connect():
+        opened.append(object())
+        return opened[-1]
+
+    pool = ConnectionPool(connect, size=2)
+    peak = 0
+
+    async def worker():
+        nonlocal peak
+        async with pool.acquire():
+            peak = max(peak, pool.in_use)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*(worker() for _ in range(6)))
+    stats = pool.stats()
+
+    assert len(opened) == 2
+    assert peak == 2
+    assert stats["acquisitions"] == 6
+    assert stats["waited"] == 4
+    assert stats["in_use"] == 0 and stats["waiting"] == 0
+    assert stats["wait_max_ms"] > 0
+
+
+@pytest.mark.asyncio
+async def test_import_json_is_repeatable_and_keeps_applied_ids(storage, temp_data_file):
+    """Teste: reimportar não dobra os totais e sessões já contadas não voltam"""
+    import json
+    from sql_storage import import_json
+
+    temp_data_file.write_text(json.dumps({
+        "a": {"total_seconds": 100, "sessions": 2, "applied": {"p1": 2}},
+        "b": {"total_seconds": 30, "sessions": 1},
+        "c": {"total_seconds": 7, "sessions": 1},
+    }))
+
+    assert await import_json(storage, batch_size=2) == 3
+    assert await import_json(storage, batch_size=2) == 3
+
+    data = await storage.load_data()
+    assert data["a"] == {"total_seconds": 100, "sessions": 2}
+    assert data["b"] == {"total_seconds": 30, "sessions": 1}
+    # Reenvio de uma sessão já contada no JSON
+    assert await storage.apply_session_deltas([("a", 50, None, ("p1", 2))]) == 0
@@ -0,0 +1,45 @@
+"""Tests para startup.py - medição da inicialização"""
+import time
+
+from startup import StartupProfiler, format_import_profile, parse_importtime
+
+
+IMPORTTIME_SAMPLE = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:      1500 |       2000 |     json.decoder
+import time:       300 |       2300 |   json
+import time:      8000 |     400000 | discord
+"""
+
+
+def test_parse_importtime_extracts_modules():
+    """Teste: interpreta as linhas de -X importtime"""
+    timings = parse_importtime(IMPORTTIME_SAMPLE)
+
+    assert ("json.decoder", 1500, 2000) in timings
+    assert ("discord", 8000, 400000) in timings
+    assert len(timings) == 4  # cabeçalho ignorado
+
+
+def test_format_import_profile_sorts_by_cumulative():
+    """Teste: relatório lista primeiro os imports mais caros"""
+    report = format_import_profile(parse_importtime(IMPORTTIME_SAMPLE), top=2)
+    lines = report.splitlines()
+
+    assert len(lines) == 3  # cabeçalho + top 2
+    assert lines[1].endswith("discord")
+    assert lines[2].endswith("json")
+
+
+def test_startup_profiler_records_phases():
+    """Teste: fases e marcos aparecem no relatório na ordem executada"""
+    profiler = StartupProfiler(started_at=time.perf_counter())
+
+    with profiler.phase("logging"):
+        pass
+    profiler.mark("ready")
+
+    names = [name for name, _ in profiler.phases]
+    assert names == ["logging", "ready"]
+    assert "logging=" in profiler.report()
+    assert profiler.elapsed >= 0
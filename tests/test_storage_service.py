@@ -0,0 +1,196 @@
+"""Tests para storage_service.py - serviço de armazenamento via socket Unix"""
+import asyncio
+import json
+
+import pytest
+
+from database import load_data
+from storage_service import (
+    OP_CALL,
+    OP_DELTAS,
+    StorageClient,
+    StorageServer,
+    StorageServiceError,
+    encode_frame,
+    read_frame,
+)
+
+
+@pytest.fixture
+async def storage_server(tmp_path, temp_data_file):
+    """Servidor de armazenamento em um socket temporário"""
+    server = StorageServer(str(tmp_path / "storage.sock"))
+    await server.start()
+    yield server
+    await server.close()
+
+
+@pytest.fixture
+async def storage_client(storage_server):
+    """Cliente conectado ao servidor temporário"""
+    client = StorageClient(storage_server.socket_path, pool_size=2, flush_interval=0.01)
+    yield client
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_frame_roundtrip():
+    """Teste: frame codificado é lido de volta sem perdas"""
+    reader = asyncio.StreamReader()
+    reader.feed_data(encode_frame(OP_CALL, 42, {"m": "ranking", "a": [1]}))
+
+    opcode, request_id, payload = await read_frame(reader)
+
+    assert opcode == OP_CALL
+    assert request_id == 42
+    assert payload == {"m": "ranking", "a": [1]}
+
+
+@pytest.mark.asyncio
+async def test_record_session_batches_deltas(storage_server):
+    """Teste: sessões enfileiradas chegam ao serviço em um único lote"""
+    client = StorageClient(storage_server.socket_path, pool_size=1)
+    client.record_session("123456789012345678", 100, None)
+    client.record_session("123456789012345678", 50, None)
+    client.record_session("987654321098765432", 10, None)
+    assert client.pending_deltas == 3
+
+    await client.flush()
+    result = await client.call("load_data")
+    await client.close()
+
+    assert client.pending_deltas == 0
+    assert client.last_flush_time is not None
+    assert result["123456789012345678"] == {"total_seconds": 150, "sessions": 2}
+    assert load_data()["987654321098765432"]["sessions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_service_writes_session_history(storage_server):
+    """Teste: o histórico segue com o delta e é gravado pelo serviço"""
+    from session_history import query_sessions
+
+    client = StorageClient(storage_server.socket_path, pool_size=1)
+    client.record_session("123456789012345678", 100, 42, ("a1", 1), (777, 1_700_000_000, 1_700_000_100))
+    await client.flush()  # retorna após a confirmação do serviço
+    await client.close()
+
+    sessions = query_sessions(42, 1_700_000_000, 1_700_000_200)
+    assert [(record.user_id, record.channel_id) for record in sessions] == [("123456789012345678", 777)]
+
+
+@pytest.mark.asyncio
+async def test_slow_batch_does_not_block_pipelined_calls(storage_server):
+    """Teste: consultas na mesma conexão não esperam um lote lento"""
+    import time
+    from unittest.mock import patch
+
+    import storage_service
+
+    real_apply = storage_service.apply_closed_sessions
+
+    def slow_apply(batch):
+        time.sleep(0.3)
+        return real_apply(batch)
+
+    client = StorageClient(storage_server.socket_path, pool_size=1)
+    client.record_session("123456789012345678", 100, None, ("a1", 1))
+    with patch('storage_service.apply_closed_sessions', side_effect=slow_apply):
+        flush = asyncio.create_task(client.flush())
+        await asyncio.sleep(0.05)
+        result = await asyncio.wait_for(client.call("load_data"), 0.2)
+        assert not flush.done()
+        assert client.pending_deltas == 1  # enviado, ainda sem confirmação
+        await flush
+    await client.close()
+
+    assert "123456789012345678" not in result
+    assert load_data()["123456789012345678"]["total_seconds"] == 100
+    assert client.pending_deltas == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_kept_until_acknowledged(storage_server):
+    """Teste: lote que o serviço não gravou volta ao buffer e é reenviado"""
+    from unittest.mock import patch
+
+    client = StorageClient(storage_server.socket_path, pool_size=1)
+    client.record_session("123456789012345678", 100, None, ("a1", 1))
+    with patch('storage_service.apply_closed_sessions', side_effect=RuntimeError("lock")):
+        await client.flush()
+
+    assert client.pending_deltas == 1
+    assert client.last_flush_time is None
+    assert "123456789012345678" not in load_data()
+
+    await client.flush()
+    await client.close()
+
+    assert client.pending_deltas == 0
+    assert client.last_flush_time is not None
+    assert load_data()["123456789012345678"]["total_seconds"] == 100
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_are_pipelined(storage_client, temp_data_file):
+    """Teste: várias consultas em voo recebem cada uma sua resposta"""
+    temp_data_file.write_text(json.dumps({
+        str(123456789012345678 + i): {"total_seconds": i * 10, "sessions": 1}
+        for i in range(5)
+    }))
+
+    results = await asyncio.gather(*[
+        storage_client.call("ranking", None, limit) for limit in range(1, 6)
+    ])
+
+    for limit, result in zip(range(1, 6), results):
+        assert result["total_users"] == 5
+        assert len(result["top"]) == limit
+        assert result["top"][0][1]["total_seconds"] == 40
+
+
+@pytest.mark.asyncio
+async def test_unknown_method_returns_error(storage_client):
+    """Teste: método desconhecido retorna erro sem derrubar a conexão"""
+    with pytest.raises(StorageServiceError, match="Método desconhecido"):
+        await storage_client.call("drop_everything")
+
+    assert await storage_client.call("load_data") == {}
+
+
+@pytest.mark.asyncio
+async def test_flush_keeps_deltas_when_service_is_down(tmp_path):
+    """Teste: deltas não enviados permanecem na fila para nova tentativa"""
+    client = StorageClient(str(tmp_path / "missing.sock"))
+    client._pending_deltas.append(("123456789012345678", 100, None))
+
+    await client.flush()
+
+    assert client.pending_deltas == 1
+    assert client.last_flush_time is None
+
+
+@pytest.mark.asyncio
+async def test_service_runs_history_retention(tmp_path, temp_data_file):
+    """Teste: o serviço, que grava o histórico, aplica a retenção enquanto atende"""
+    from unittest.mock import patch
+
+    started, stopped = asyncio.Event(), asyncio.Event()
+
+    async def fake_retention():
+        started.set()
+        try:
+            await asyncio.sleep(3600)
+        finally:
+            stopped.set()
+
+    server = StorageServer(str(tmp_path / "storage.sock"))
+    with patch('storage_service.run_retention', fake_retention):
+        serving = asyncio.create_task(server.serve_forever())
+        await asyncio.wait_for(started.wait(), 1)
+        serving.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await serving
+    await server.close()
+
+    assert stopped.is_set()
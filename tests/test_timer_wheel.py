@@ -0,0 +1,87 @@
+"""Tests para timer_wheel.py - roda de temporizadores"""
+import asyncio
+
+import pytest
+
+from timer_wheel import TimerWheel
+
+
+class FakeClock:
+    """Relógio controlado manualmente"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_deadline_fires_only_after_delay(clock):
+    """Teste: prazo vence apenas quando o tempo passa"""
+    wheel = TimerWheel(lambda key, payload: None, tick=1.0, slots=8, clock=clock)
+    wheel.schedule("a", 3, "payload")
+
+    clock.now += 2
+    assert wheel.advance() == []
+
+    clock.now += 1
+    assert wheel.advance() == [("a", "payload")]
+    assert len(wheel) == 0
+
+
+def test_cancel_returns_payload(clock):
+    """Teste: cancelar devolve o payload e impede o disparo"""
+    wheel = TimerWheel(lambda key, payload: None, tick=1.0, slots=8, clock=clock)
+    wheel.schedule("a", 2, "payload")
+
+    assert wheel.cancel("a") == "payload"
+    assert wheel.cancel("a") is None
+
+    clock.now += 5
+    assert wheel.advance() == []
+
+
+def test_deadlines_beyond_one_rotation(clock):
+    """Teste: prazo maior que uma volta espera a volta certa"""
+    wheel = TimerWheel(lambda key, payload: None, tick=1.0, slots=4, clock=clock)
+    wheel.schedule("far", 10)
+    wheel.schedule("near", 2)
+
+    clock.now += 4
+    assert wheel.advance() == [("near", None)]
+
+    clock.now += 6
+    assert wheel.advance() == [("far", None)]
+
+
+def test_many_pending_timers_share_one_task(clock):
+    """Teste: dez mil prazos não criam dez mil tasks"""
+    async def scenario():
+        wheel = TimerWheel(lambda key, payload: None, tick=1.0, slots=64, clock=clock)
+        tasks_before = len(asyncio.all_tasks())
+        for user in range(10_000):
+            wheel.schedule(user, 5)
+
+        assert len(wheel) == 10_000
+        assert len(asyncio.all_tasks()) == tasks_before + 1
+
+        clock.now += 5
+        assert len(wheel.advance()) == 10_000
+        wheel.drain()
+
+    asyncio.run(scenario())
+
+
+def test_drain_returns_all_pending(clock):
+    """Teste: drain esvazia a roda e devolve os pendentes"""
+    wheel = TimerWheel(lambda key, payload: None, tick=1.0, slots=8, clock=clock)
+    wheel.schedule("a", 2, 1)
+    wheel.schedule("b", 20, 2)
+
+    assert sorted(wheel.drain()) == [("a", 1), ("b", 2)]
+    assert len(wheel) == 0
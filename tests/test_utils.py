@@ -8,7 +8,13 @@ from utils import (
     safe_int_conversion,
     validate_and_convert_user_id,
     truncate_string,
-    setup_logger
+    setup_logger,
+    JsonFormatter,
+    RateLimitFilter,
+    configure_logging,
+    stop_logging,
+    MemberCache,
+    fetch_user,
 )
 
 
@@ -253,4 +259,254 @@ class TestSetupLogger:
         setup_logger("test_logger_dup")
 
         # O número de handlers deve ser o mesmo
-        assert len(logger.handlers) == initial_handler_count
\ No newline at end of file
+        assert len(logger.handlers) == initial_handler_count
+
+
+def _make_record(msg, *args, level=20, **extra):
+    """Cria um LogRecord com campos extras."""
+    import logging
+    record = logging.LogRecord("events", level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class TestStructuredLogging:
+    """Testes para a camada de logging estruturado."""
+
+    def test_json_formatter_includes_extra_fields(self):
+        """Teste: JSON contém mensagem formatada e campos extras."""
+        import json
+        record = _make_record("%s ligou a câmera", "Ana", event="camera_on", user_id="1")
+
+        payload = json.loads(JsonFormatter().format(record))
+
+        assert payload["msg"] == "Ana ligou a câmera"
+        assert payload["level"] == "INFO"
+        assert payload["event"] == "camera_on"
+        assert payload["user_id"] == "1"
+
+    def test_rate_limit_filter_suppresses_and_reports(self):
+        """Teste: excedente da janela é descartado e contado na próxima."""
+        rate_filter = RateLimitFilter(max_per_interval=2, interval=60)
+        results = [rate_filter.filter(_make_record("toggle %s", i)) for i in range(5)]
+
+        assert results == [True, True, False, False, False]
+
+        # Forçar nova janela: o primeiro registro informa os descartados
+        rate_filter._windows["toggle %s"][0] -= 61
+        record = _make_record("toggle %s", 99)
+        assert rate_filter.filter(record)
+        assert record.suppressed == 3
+
+    def test_rate_limit_filter_is_per_template(self):
+        """Teste: cada template tem sua própria cota."""
+        rate_filter = RateLimitFilter(max_per_interval=1, interval=60)
+
+        assert rate_filter.filter(_make_record("ligou %s", 1))
+        assert rate_filter.filter(_make_record("desligou %s", 1))
+        assert not rate_filter.filter(_make_record("ligou %s", 2))
+
+    def test_rate_limit_filter_never_drops_warnings(self):
+        """Teste: WARNING ou acima sempre passa."""
+        rate_filter = RateLimitFilter(max_per_interval=1, interval=60)
+        rate_filter.filter(_make_record("falha %s", 1, level=30))
+
+        assert all(rate_filter.filter(_make_record("falha %s", i, level=30)) for i in range(5))
+
+    def test_configure_logging_formats_off_thread(self, tmp_path):
+        """Teste: root usa fila; a mensagem é formatada só no listener."""
+        import logging
+        root = logging.getLogger()
+        saved_handlers, saved_level = root.handlers[:], root.level
+        log_file = tmp_path / "bot.log"
+
+        try:
+            listener = configure_logging(log_file=str(log_file), json_format=True)
+            assert configure_logging() is listener  # idempotente
+
+            queue_handler = root.handlers[0]
+            record = _make_record("%s desligou", "Ana")
+            assert queue_handler.prepare(record).args == ("Ana",)
+
+            logging.getLogger("events").info("%s desligou - %ds", "Ana", 30)
+        finally:
+            stop_logging()
+            root.handlers[:] = saved_handlers
+            root.setLevel(saved_level)
+
+        assert '"msg": "Ana desligou - 30s"' in log_file.read_text(encoding="utf-8")
+
+
+class TestMemberCache:
+    """Testes para o cache de membros do modo enxuto."""
+
+    def test_evicts_least_recently_used(self):
+        """Teste: acima do limite, sai o membro usado há mais tempo."""
+        cache = MemberCache(max_size=2)
+        cache.put(1, 10, "a")
+        cache.put(1, 20, "b")
+        assert cache.get(1, 10) == (True, "a")
+
+        cache.put(1, 30, "c")
+
+        assert cache.get(1, 20) == (False, None)
+        assert cache.get(1, 10) == (True, "a")
+        assert len(cache) == 2
+
+    def test_entries_expire_after_ttl(self, monkeypatch):
+        """Teste: entradas vencidas viram miss e saem do cache."""
+        import utils
+        now = [100.0]
+        monkeypatch.setattr(utils.time, "monotonic", lambda: now[0])
+        cache = MemberCache(ttl=60)
+        cache.put(1, 10, "a")
+
+        now[0] += 61
+
+        assert cache.get(1, 10) == (False, None)
+        assert len(cache) == 0
+
+    def test_caches_missing_members(self):
+        """Teste: a ausência de um membro também é guardada."""
+        cache = MemberCache()
+        cache.put(1, 10, None)
+
+        assert cache.get(1, 10) == (True, None)
+        assert cache.hits == 1
+
+
+class TestFetchUser:
+    """Testes para fetch_user com cache de membros."""
+
+    @staticmethod
+    def _guild(fetch_result):
+        from unittest.mock import AsyncMock, MagicMock
+        guild = MagicMock()
+        guild.id = 1
+        guild.get_member.return_value = None
+        if isinstance(fetch_result, Exception):
+            guild.fetch_member = AsyncMock(side_effect=fetch_result)
+        else:
+            guild.fetch_member = AsyncMock(return_value=fetch_result)
+        return guild
+
+    @pytest.mark.asyncio
+    async def test_uses_gateway_cache_first(self):
+        """Teste: membro já em cache no discord.py não vai à API."""
+        guild = self._guild("api")
+        guild.get_member.return_value = "voz"
+
+        assert await fetch_user(guild, "123456789012345678", MemberCache()) == "voz"
+        guild.fetch_member.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_fetches_once_then_serves_from_cache(self):
+        """Teste: a segunda busca do mesmo membro sai do cache."""
+        guild = self._guild("api")
+        cache = MemberCache()
+
+        assert await fetch_user(guild, "123456789012345678", cache) == "api"
+        assert await fetch_user(guild, "123456789012345678", cache) == "api"
+        assert guild.fetch_member.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_not_found_is_cached_but_http_errors_are_not(self):
+        """Teste: NotFound é guardado; falhas transitórias repetem a busca."""
+        from unittest.mock import MagicMock
+        import discord
+        response = MagicMock(status=404)
+        guild = self._guild(discord.NotFound(response, "Unknown Member"))
+        cache = MemberCache()
+
+        assert await fetch_user(guild, "123456789012345678", cache) is None
+        assert await fetch_user(guild, "123456789012345678", cache) is None
+        assert guild.fetch_member.await_count == 1
+
+        response = MagicMock(status=503)
+        guild = self._guild(discord.HTTPException(response, "indisponível"))
+        cache = MemberCache()
+        await fetch_user(guild, "123456789012345678", cache)
+        await fetch_user(guild, "123456789012345678", cache)
+        assert guild.fetch_member.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_invalid_id_returns_none(self):
+        """Teste: ID inválido não chega à API."""
+        guild = self._guild("api")
+
+        assert await fetch_user(guild, "abc", MemberCache()) is None
+        guild.fetch_member.assert_not_awaited()
+
+
+class TestCacheOptions:
+    """Testes para as opções de cache do gateway (config)."""
+
+    def test_full_mode_keeps_discord_defaults(self):
+        """Teste: modo completo não altera o construtor e mantém o intent members."""
+        from config import get_cache_options, get_intents
+
+        assert get_cache_options(lean=False) == {}
+        assert get_intents(lean=False).members
+
+    def test_lean_mode_caches_only_voice_members(self):
+        """Teste: modo enxuto guarda só membros em voz e não faz chunking."""
+        from config import get_cache_options, get_intents
+
+        options = get_cache_options(lean=True)
+
+        assert options['chunk_guilds_at_startup'] is False
+        assert options['member_cache_flags'].voice
+        assert not options['member_cache_flags'].joined
+        assert not get_intents(lean=True).members
+        assert get_intents(lean=True).voice_states
+
+
+class TestFetchMembers:
+    """Testes para a resolução em lote dos nomes do ranking."""
+
+    @staticmethod
+    def _guild():
+        from unittest.mock import AsyncMock, MagicMock
+        guild = MagicMock()
+        guild.id = 1
+        guild.get_member.return_value = None
+        guild.fetch_member = AsyncMock(return_value="rest")
+        return guild
+
+    @pytest.mark.asyncio
+    async def test_resolves_missing_members_in_one_request(self):
+        """Teste: os membros fora do cache saem de uma única consulta ao gateway."""
+        from unittest.mock import AsyncMock, MagicMock
+        from utils import fetch_members
+        guild = self._guild()
+        found = MagicMock(id=123456789012345678)
+        guild.query_members = AsyncMock(return_value=[found])
+        cache = MemberCache()
+        cache.put(1, 222222222222222222, "cacheado")
+
+        result = await fetch_members(
+            guild, ["123456789012345678", "222222222222222222", "333333333333333333", "abc"], cache
+        )
+
+        guild.query_members.assert_awaited_once()
+        assert guild.query_members.call_args.kwargs["user_ids"] == [123456789012345678, 333333333333333333]
+        assert result == {
+            "123456789012345678": found,
+            "222222222222222222": "cacheado",
+            "333333333333333333": None,
+            "abc": None,
+        }
+        assert cache.get(1, 333333333333333333) == (True, None)
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_rest_when_gateway_times_out(self):
+        """Teste: sem resposta do gateway, busca cada membro pela API."""
+        import asyncio
+        from unittest.mock import AsyncMock
+        from utils import fetch_members
+        guild = self._guild()
+        guild.query_members = AsyncMock(side_effect=asyncio.TimeoutError)
+
+        result = await fetch_members(guild, ["123456789012345678"], MemberCache())
+
+        assert result == {"123456789012345678": "rest"}
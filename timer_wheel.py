@@ -0,0 +1,160 @@
+"""
+timer_wheel.py - Roda de temporizadores (hashed timing wheel).
+
+Agenda milhares de prazos com custo O(1) por agendamento/cancelamento e
+uma única task asyncio para todos eles, em vez de uma task com
+asyncio.sleep por item. Usada pelo events.py para fechamentos pendentes
+de sessões de câmera (coalescência de liga/desliga).
+"""
+
+import asyncio
+import inspect
+import logging
+import math
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class TimerWheel:
+    """Roda de temporizadores com resolução de ``tick`` segundos
+
+    Cada prazo cai no slot ``tick_alvo % slots``; a cada tick apenas o
+    slot corrente é examinado. Prazos além de uma volta completa ficam no
+    slot até que seu tick alvo chegue.
+
+    Estrutura interna:
+        _slots: List[Dict[chave, (tick_alvo, payload)]]
+        _index: Dict[chave, índice do slot] para cancelamento O(1)
+    """
+
+    def __init__(
+        self,
+        callback: Callable[[Hashable, Any], Any],
+        tick: float = 1.0,
+        slots: int = 64,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            callback: Chamada com (chave, payload) quando o prazo vence;
+                pode ser uma coroutine function
+            tick: Resolução da roda em segundos
+            slots: Número de slots (uma volta = tick * slots segundos)
+            clock: Relógio monotônico (injetável para testes)
+        """
+        self.callback = callback
+        self.tick = tick
+        self._clock = clock
+        self._origin = clock()
+        self._tick_count = 0
+        self._slots: List[Dict[Hashable, Tuple[int, Any]]] = [{} for _ in range(slots)]
+        self._index: Dict[Hashable, int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._index
+
+    def _tick_of(self, moment: float) -> int:
+        """Primeiro tick em ou após ``moment`` (usado para prazos)"""
+        return math.ceil((moment - self._origin) / self.tick)
+
+    def _elapsed_ticks(self, moment: float) -> int:
+        """Ticks completos decorridos até ``moment``"""
+        return math.floor((moment - self._origin) / self.tick)
+
+    def schedule(self, key: Hashable, delay: float, payload: Any = None) -> None:
+        """Agenda (ou reagenda) o prazo de uma chave
+
+        Args:
+            key: Identificador do prazo (ex: user_id)
+            delay: Segundos até o vencimento
+            payload: Dados entregues ao callback
+        """
+        self.cancel(key)
+        target = max(self._tick_of(self._clock() + delay), self._tick_count + 1)
+        slot = target % len(self._slots)
+        self._slots[slot][key] = (target, payload)
+        self._index[key] = slot
+
+        if self._task is None or self._task.done():
+            try:
+                self._task = asyncio.get_running_loop().create_task(self._run())
+            except RuntimeError:
+                # Sem event loop (ex: uso síncrono): advance() manual
+                self._task = None
+
+    def cancel(self, key: Hashable) -> Optional[Any]:
+        """Cancela o prazo de uma chave
+
+        Args:
+            key: Identificador do prazo
+
+        Returns:
+            Payload do prazo cancelado ou None se não existia
+        """
+        slot = self._index.pop(key, None)
+        if slot is None:
+            return None
+        return self._slots[slot].pop(key)[1]
+
+    def advance(self, now: Optional[float] = None) -> List[Tuple[Hashable, Any]]:
+        """Avança a roda até ``now`` e remove os prazos vencidos
+
+        Args:
+            now: Instante atual do relógio (default: clock())
+
+        Returns:
+            Lista [(chave, payload)] dos prazos vencidos
+        """
+        current = self._elapsed_ticks(self._clock() if now is None else now)
+        fired: List[Tuple[Hashable, Any]] = []
+        if current <= self._tick_count:
+            return fired
+
+        # Visitar no máximo uma volta: todo slot vencido é examinado uma vez
+        steps = min(current - self._tick_count, len(self._slots))
+        for offset in range(1, steps + 1):
+            bucket = self._slots[(self._tick_count + offset) % len(self._slots)]
+            due = [key for key, (target, _) in bucket.items() if target <= current]
+            for key in due:
+                _, payload = bucket.pop(key)
+                del self._index[key]
+                fired.append((key, payload))
+
+        self._tick_count = current
+        return fired
+
+    def drain(self) -> List[Tuple[Hashable, Any]]:
+        """Remove e retorna todos os prazos pendentes (ex: no shutdown)"""
+        pending = [
+            (key, self._slots[slot][key][1]) for key, slot in self._index.items()
+        ]
+        for bucket in self._slots:
+            bucket.clear()
+        self._index.clear()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        return pending
+
+    async def _run(self) -> None:
+        """Task única que dispara os callbacks enquanto houver prazos"""
+        while self._index:
+            await asyncio.sleep(self.tick)
+            for key, payload in self.advance():
+                try:
+                    result = self.callback(key, payload)
+                    if inspect.isawaitable(result):
+                        await result
+                except Exception as e:
+                    logger.error("Erro no callback do timer %s: %s", key, e, exc_info=True)
+
+
+__all__ = [
+    'TimerWheel',
+]
@@ -5,10 +5,18 @@ Este módulo fornece funções auxiliares para formatação de tempo,
 validação de dados e configuração de logs estruturados.
 """
 
+import asyncio
+import atexit
+import json
 import logging
+import logging.handlers
+import queue
 import re
+import threading
+import time
+from collections import OrderedDict
 import discord
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
 
 def format_seconds_to_time(seconds: int) -> str:
@@ -97,6 +105,166 @@ def validate_seconds(seconds: int) -> bool:
     return isinstance(seconds, int) and seconds >= 0
 
 
+# ============================================================================
+# LOGGING ESTRUTURADO (RNF11)
+# ============================================================================
+
+LOG_FORMAT: str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+LOG_DATE_FORMAT: str = "%Y-%m-%d %H:%M:%S"
+
+# Atributos padrão do LogRecord; o resto veio de extra={...}
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formata cada registro como uma linha JSON.
+
+    Campos passados via ``extra={...}`` entram como chaves de primeiro
+    nível, o que permite filtrar por evento/usuário no agregador de logs.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": self.formatTime(record, LOG_DATE_FORMAT),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Limita registros de alta frequência por template de mensagem.
+
+    Cada template (``record.msg``) pode emitir até ``max_per_interval``
+    registros por janela de ``interval`` segundos; o excedente é descartado
+    e contado. O primeiro registro da janela seguinte leva o campo
+    ``suppressed`` com quantos foram descartados. WARNING ou acima
+    nunca é descartado.
+    """
+
+    def __init__(self, max_per_interval: int = 20, interval: float = 1.0):
+        super().__init__()
+        self.max_per_interval = max_per_interval
+        self.interval = interval
+        # template -> [início da janela, emitidos, descartados]
+        self._windows: Dict[str, List[float]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.max_per_interval <= 0:
+            return True
+
+        now = time.monotonic()
+        window = self._windows.get(record.msg)
+        if window is None or now - window[0] >= self.interval:
+            suppressed = int(window[2]) if window is not None else 0
+            self._windows[record.msg] = [now, 1, 0]
+            if suppressed:
+                record.suppressed = suppressed
+            return True
+
+        if window[1] < self.max_per_interval:
+            window[1] += 1
+            return True
+
+        window[2] += 1
+        return False
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que não formata a mensagem na thread de origem.
+
+    O QueueHandler padrão chama format() em prepare(), ou seja, no event
+    loop. Aqui o registro vai intacto para a fila e a formatação (%-args,
+    JSON) acontece na thread do QueueListener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+_queue_listener: Optional[logging.handlers.QueueListener] = None
+_listener_lock = threading.Lock()
+
+
+def build_formatter(json_format: bool = False) -> logging.Formatter:
+    """
+    Retorna o formatter padrão do projeto.
+
+    Args:
+        json_format: True para uma linha JSON por registro
+
+    Returns:
+        logging.Formatter configurado
+    """
+    if json_format:
+        return JsonFormatter()
+    return logging.Formatter(fmt=LOG_FORMAT, datefmt=LOG_DATE_FORMAT)
+
+
+def configure_logging(
+    level: int = logging.INFO,
+    json_format: bool = False,
+    log_file: Optional[str] = None
+) -> logging.handlers.QueueListener:
+    """
+    Configura o logging do processo com I/O fora do event loop.
+
+    O logger root recebe apenas um QueueHandler; os handlers reais
+    (console e arquivo opcional) rodam na thread de um QueueListener.
+    Chamadas seguintes retornam o listener já ativo.
+
+    Args:
+        level: Nível de log do logger root
+        json_format: True para saída JSON (uma linha por registro)
+        log_file: Caminho opcional para arquivo de log
+
+    Returns:
+        QueueListener ativo (parado automaticamente no exit)
+    """
+    global _queue_listener
+    with _listener_lock:
+        if _queue_listener is not None:
+            return _queue_listener
+
+        formatter = build_formatter(json_format)
+        handlers: List[logging.Handler] = [logging.StreamHandler()]
+        if log_file:
+            handlers.append(logging.FileHandler(log_file, encoding="utf-8"))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        root = logging.getLogger()
+        root.handlers.clear()
+        root.addHandler(_DeferredQueueHandler(log_queue))
+        root.setLevel(level)
+
+        _queue_listener = logging.handlers.QueueListener(
+            log_queue, *handlers, respect_handler_level=True
+        )
+        _queue_listener.start()
+        atexit.register(stop_logging)
+        return _queue_listener
+
+
+def stop_logging() -> None:
+    """Esvazia a fila de logs e para o QueueListener, se ativo"""
+    global _queue_listener
+    with _listener_lock:
+        if _queue_listener is not None:
+            _queue_listener.stop()
+            _queue_listener = None
+
+
 def setup_logger(
     name: str = "bate-ponto",
     level: int = logging.INFO,
@@ -106,7 +274,9 @@ def setup_logger(
     Configura um logger estruturado conforme RNF11.
 
     Formata logs com timestamp, nível, nome do módulo e mensagem.
-    Suporta saída em console e/ou arquivo.
+    Suporta saída em console e/ou arquivo. O logger recebe handlers
+    próprios e não propaga para o root; para o processo do bot prefira
+    configure_logging, que tira o I/O do event loop.
 
     Args:
         name: Nome do logger (default: "bate-ponto")
@@ -122,15 +292,13 @@ def setup_logger(
     """
     logger = logging.getLogger(name)
     logger.setLevel(level)
+    logger.propagate = False
 
     # Evitar handlers duplicados
     if logger.handlers:
         logger.handlers.clear()
 
-    formatter = logging.Formatter(
-        fmt="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S"
-    )
+    formatter = build_formatter()
 
     # Handler para console
     console_handler = logging.StreamHandler()
@@ -236,7 +404,66 @@ def truncate_string(text: str, max_length: int = 50, suffix: str = "...") -> str
     return text[:max_length - len(suffix)] + suffix
 
 
-async def fetch_user(guild: discord.Guild, user_id: str) -> Optional[discord.Member]:
+class MemberCache:
+    """
+    Cache LRU limitado de membros resolvidos pela API REST.
+
+    No modo enxuto (LEAN_CACHE) o discord.py só mantém em memória os
+    membros em canais de voz; os demais nomes do ranking são buscados sob
+    demanda e guardados aqui. Membros inexistentes também são guardados
+    (None), para não repetir a busca a cada ranking. Entradas expiram após
+    ``ttl`` segundos para refletir mudanças de apelido.
+
+    Estrutura interna:
+        _entries: OrderedDict {(guild_id, user_id): (expira_em, membro ou None)}
+    """
+
+    def __init__(self, max_size: int = 1000, ttl: float = 600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[int, int], Tuple[float, Optional[discord.Member]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, guild_id: int, user_id: int) -> Tuple[bool, Optional[discord.Member]]:
+        """
+        Busca um membro no cache.
+
+        Returns:
+            Tuple[bool, Optional[discord.Member]]: (encontrado, membro ou None)
+        """
+        key = (guild_id, user_id)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self._entries.pop(key, None)
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, entry[1]
+
+    def put(self, guild_id: int, user_id: int, member: Optional[discord.Member]) -> None:
+        """Guarda um membro (ou a ausência dele), descartando o menos usado"""
+        if self.max_size <= 0:
+            return
+        key = (guild_id, user_id)
+        self._entries[key] = (time.monotonic() + self.ttl, member)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+async def fetch_user(
+    guild: discord.Guild,
+    user_id: str,
+    cache: Optional[MemberCache] = None
+) -> Optional[discord.Member]:
     """
     Busca informações de um usuário pelo ID.
 
@@ -244,9 +471,13 @@ async def fetch_user(guild: discord.Guild, user_id: str) -> Optional[discord.Mem
     Esta função trata exceções silenciosamente, retornando None quando o
     usuário não pode ser encontrado.
 
+    Com ``cache``, consulta primeiro o cache de membros do discord.py
+    (guild.get_member, sem rede), depois o MemberCache e só então a API.
+
     Args:
         guild: Objeto Guild do Discord onde buscar o usuário
         user_id: ID do usuário a buscar (string)
+        cache: Cache limitado de membros já resolvidos
 
     Returns:
         Optional[discord.Member]: Objeto Member ou None se não encontrado.
@@ -259,6 +490,89 @@ async def fetch_user(guild: discord.Guild, user_id: str) -> Optional[discord.Mem
     try:
         # Validar e converter user_id antes de usar na API
         converted_id = validate_and_convert_user_id(user_id)
-        return await guild.fetch_member(converted_id)
-    except (ValueError, TypeError, discord.NotFound, discord.HTTPException):
+    except (ValueError, TypeError):
         return None
+
+    if cache is not None:
+        member = guild.get_member(converted_id)
+        if member is not None:
+            return member
+        found, member = cache.get(guild.id, converted_id)
+        if found:
+            return member
+
+    try:
+        member = await guild.fetch_member(converted_id)
+    except discord.NotFound:
+        member = None
+    except (ValueError, TypeError, discord.HTTPException):
+        # Erro transitório: não guarda no cache
+        return None
+
+    if cache is not None:
+        cache.put(guild.id, converted_id, member)
+    return member
+
+
+# Máximo de IDs por requisição de membros ao gateway (limite do Discord)
+_QUERY_MEMBERS_LIMIT = 100
+
+
+async def fetch_members(
+    guild: discord.Guild,
+    user_ids: List[str],
+    cache: Optional[MemberCache] = None
+) -> Dict[str, Optional[discord.Member]]:
+    """
+    Resolve vários membros de uma vez (ex: os nomes de uma página do ranking).
+
+    Membros já em cache (guild.get_member e MemberCache) não saem do
+    processo; os demais são pedidos ao gateway em uma única requisição
+    (guild.query_members com user_ids, até 100 por requisição). Se o
+    gateway não responder, cai para fetch_user em paralelo pela API REST.
+
+    Args:
+        guild: Guild dos membros
+        user_ids: IDs dos usuários (strings)
+        cache: Cache limitado de membros já resolvidos
+
+    Returns:
+        Dict[str, Optional[discord.Member]]: Membro (ou None) por user_id
+    """
+    result: Dict[str, Optional[discord.Member]] = {}
+    missing: Dict[int, str] = {}
+    for user_id in user_ids:
+        try:
+            converted_id = validate_and_convert_user_id(user_id)
+        except (ValueError, TypeError):
+            result[user_id] = None
+            continue
+        member = guild.get_member(converted_id)
+        if member is None and cache is not None:
+            found, member = cache.get(guild.id, converted_id)
+            if found:
+                result[user_id] = member
+                continue
+        if member is not None:
+            result[user_id] = member
+        else:
+            missing[converted_id] = user_id
+
+    pending = list(missing)
+    for start in range(0, len(pending), _QUERY_MEMBERS_LIMIT):
+        chunk = pending[start:start + _QUERY_MEMBERS_LIMIT]
+        try:
+            found = await guild.query_members(user_ids=chunk, limit=len(chunk), cache=False)
+        except (discord.ClientException, asyncio.TimeoutError):
+            fetched = await asyncio.gather(*(fetch_user(guild, missing[i], cache) for i in chunk))
+            result.update(zip((missing[i] for i in chunk), fetched))
+            continue
+
+        by_id = {member.id: member for member in found}
+        for converted_id in chunk:
+            # Ausente na resposta = não é (mais) membro do guild
+            member = by_id.get(converted_id)
+            if cache is not None:
+                cache.put(guild.id, converted_id, member)
+            result[missing[converted_id]] = member
+    return result